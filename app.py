@@ -1,63 +1,114 @@
+import time
+# Titik awal pengukuran cold start (import modul ini hingga request pertama selesai)
+APP_IMPORT_STARTED = time.perf_counter()
+
 import os
+import re
 import json
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+import threading
+import zlib
+from datetime import datetime, timedelta
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, g
+from jinja2 import TemplateNotFound
 import redis
-import time 
+import click
+import numpy as np
+
+from route_codec import decode_route_columns, encode_route, load_route, route_columns
+from route_simplify import LOD_TOLERANCES_M, build_levels, select_level
+from route_analytics import analyze_route, haversine_m
+from segment_match import SegmentIndex
+from heatmap import HEATMAP_ZOOMS, route_tiles, tile_payload
+from training_analytics import analyze_training, append_columns, empty_columns
+from run_import import PARSERS as IMPORT_PARSERS
+from run_export import EXPORT_FORMATS, gzip_stream
+from http_cache import (
+    IMMUTABLE_MAX_AGE, choose_encoding, compress_payload, encoded_body, not_modified_encoding, response_headers, route_response_body, run_etag
+)
+from read_cache import LRUTTLCache, start_invalidation_listener
+from route_archive import RouteArchive
+import key_schema
+from key_schema import encode_run_fields, km_to_m, username_index_key
+from storage import MemoryStorage, SQLiteStorage, StorageBackend, recent_buckets, time_buckets
+from instrumentation import REGISTRY, init_app as init_instrumentation, instrument_methods, instrument_redis_client, timed
+from redis_connection import BREAKER, connection_stats, get_shared_client
 
 app = Flask(__name__)
 # Ambil SECRET_KEY dari Environment Variable untuk keamanan
 app.secret_key = os.environ.get('SECRET_KEY', 'default_secret_key_yang_sangat_panjang_dan_aman')
 
+# Metrik Prometheus di /metrics; SLOW_REQUEST_MS (opsional) mencetak request lambat beserta rincian perintah Redis
+SLOW_REQUEST_MS = float(os.environ['SLOW_REQUEST_MS']) if os.environ.get('SLOW_REQUEST_MS') else None
+init_instrumentation(app, slow_request_ms=SLOW_REQUEST_MS)
+
+# Decode rute dicatat terpisah karena sering mendominasi halaman detail
+load_route = timed('route_codec.load_route', load_route)
+
 
 # --- 1. Konfigurasi Redis (Diperbaiki untuk Serverless Vercel) ---
 
-REDIS_URL = os.environ.get('REDIS_URL')
+# Klien dibuat lazy di atas pool bersama (redis_connection.py): tanpa PING saat cold start,
+# koneksi dibuka oleh perintah pertama dan dipakai ulang; retry + backoff dan keepalive di level pool.
 redis_client_instance = None
-REDIS_READY = False
+redis_binary_instance = None
 
 def get_redis_client():
     """
-    Mengembalikan instance klien Redis yang terhubung (Lazy Initialization).
-    Mengutamakan koneksi via REDIS_URL (Vercel/Upstash) lalu fallback ke localhost (Lokal).
+    Mengembalikan klien Redis bersama (Lazy Initialization).
+    Mengembalikan None selama circuit breaker terbuka, agar request gagal cepat
+    alih-alih menunggu timeout koneksi ketika Redis sedang tidak tersedia.
     """
-    global redis_client_instance, REDIS_READY
+    global redis_client_instance
+
+    if not BREAKER.allow_request():
+        return None
+
+    if redis_client_instance is None:
+        redis_client_instance = instrument_redis_client(get_shared_client())
+    return redis_client_instance
 
-    if REDIS_READY is True and redis_client_instance is not None:
-        return redis_client_instance
-    
-    # 1. Coba koneksi ke Vercel/Eksternal via REDIS_URL
-    if REDIS_URL and not REDIS_READY:
-        try:
-            redis_client_instance = redis.from_url(
-                REDIS_URL,
-                decode_responses=True, 
-                socket_timeout=5,
-                socket_connect_timeout=5
-            )
-            redis_client_instance.ping()
-            REDIS_READY = True
-            print("Redis: Koneksi berhasil diinisialisasi dan diuji via Vercel ENV!")
-            return redis_client_instance
-        except Exception as e:
-            print(f"Redis ERROR: Gagal terhubung ke Redis via Vercel ENV! {e}")
-            REDIS_READY = False
-            # Lanjut ke fallback
-    
-    # 2. Fallback ke localhost untuk pengembangan lokal
-    if not REDIS_READY:
-        try:
-            redis_client_instance = redis.StrictRedis(host='localhost', port=6379, db=0, decode_responses=True)
-            redis_client_instance.ping()
-            REDIS_READY = True
-            print("Redis: Koneksi lokal berhasil diuji!")
-            return redis_client_instance
-        except Exception as e:
-            print(f"Redis ERROR: Gagal terhubung ke Redis lokal! {e}")
-            REDIS_READY = False
-            return None
-    
-    return None
+
+def get_redis_binary_client():
+    """
+    Klien Redis tanpa decode_responses untuk data biner (rute terkompresi).
+    Memakai konfigurasi koneksi yang sama dengan get_redis_client().
+    """
+    global redis_binary_instance
+
+    if redis_binary_instance is not None:
+        return redis_binary_instance if BREAKER.allow_request() else None
+
+    client = get_redis_client()
+    if client is None:
+        return None
+
+    if client is get_shared_client():
+        binary_client = get_shared_client(decode_responses=False)
+    else:
+        # Klien pengganti (mis. fakeredis di benchmark): turunkan pool dengan koneksi yang sama
+        pool = client.connection_pool
+        connection_kwargs = dict(pool.connection_kwargs, decode_responses=False)
+        binary_client = redis.Redis(
+            connection_pool=redis.ConnectionPool(connection_class=pool.connection_class, **connection_kwargs)
+        )
+    redis_binary_instance = instrument_redis_client(binary_client)
+    return redis_binary_instance
+
+
+COLD_START = {'import_ms': None, 'first_request_ms': None}
+
+@app.before_request
+def mark_cold_start_request():
+    if COLD_START['first_request_ms'] is None:
+        g.cold_start_request_started = time.perf_counter()
+
+@app.after_request
+def record_cold_start_request(response):
+    started = g.pop('cold_start_request_started', None)
+    if started is not None and COLD_START['first_request_ms'] is None:
+        COLD_START['first_request_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        COLD_START['import_to_first_response_ms'] = round((time.perf_counter() - APP_IMPORT_STARTED) * 1000, 3)
+    return response
 
 
 # --- JINJA2 FILTERS (Pace dan Durasi) ---
@@ -103,26 +154,233 @@ app.jinja_env.filters['format_pace'] = format_pace
 
 # --- 2. Model Data Tracking (Menggunakan Redis) ---
 class RunTrackerModel:
-    RUN_ID_COUNTER = 'run_id_counter'
-    USER_ID_COUNTER = 'user_id_counter'
-    USER_KEY = 'user:{}:details'
-    USER_USERNAME_IDX = 'user:username:{}' 
+    # Kunci inti dan format nilainya didefinisikan di key_schema.py (dipakai juga oleh models.py)
+    RUN_ID_COUNTER = key_schema.RUN_ID_COUNTER
+    USER_ID_COUNTER = key_schema.USER_ID_COUNTER
+    USER_KEY = key_schema.USER_KEY
     GLOBAL_LEADERBOARD = 'global_leaderboard'
-    USER_RUNS = 'user:{}:runs'
-    RUN_DETAIL = 'run:{}'
+    USER_RUNS = key_schema.USER_RUNS
+    RUN_DETAIL = key_schema.RUN_DETAIL
+    # Rute biner (lihat route_codec.py), terpisah dari hash run agar ringkasan tidak ikut membaca rute
+    RUN_ROUTE = 'run:{}:route'
+    # Level detail hasil simplifikasi (level >= 1); jumlah titik per level ada di field route_lod_points
+    RUN_ROUTE_LOD = 'run:{}:route:{}'
+    # Body respons rute per level yang sudah dikompresi (hash content-coding -> bytes), lihat http_cache.py
+    RUN_ROUTE_PAYLOAD = 'run:{}:route:payload:{}'
+    ROUTE_PAYLOAD_TTL = int(os.environ.get('ROUTE_PAYLOAD_TTL', str(30 * 86400)))
+    ROUTE_MIGRATION_BATCH = 200
+    ROUTE_DETAIL_MAX_POINTS = 2000
+    # Rute run yang lebih tua dari ROUTE_ARCHIVE_AFTER_DAYS dipindah ke file segmen di disk (archive-routes);
+    # hash run hanya menyimpan pointer di field route_archived, ringkasan tetap di Redis
+    ROUTE_ARCHIVE = RouteArchive(os.environ.get('ROUTE_ARCHIVE_DIR', 'route_segments'))
+    ROUTE_ARCHIVE_AFTER_DAYS = int(os.environ.get('ROUTE_ARCHIVE_AFTER_DAYS', '90'))
+    ROUTE_ARCHIVE_BATCH = 500
+
+    # Field ringkasan yang ditampilkan di riwayat (tanpa route_data)
+    RUN_SUMMARY_FIELDS = (
+        'run_id', 'user_id', 'timestamp', 'duration_sec', 'distance_km', 'average_pace', 'total_steps',
+        'moving_time_sec', 'cadence_spm'
+    )
+    RUNS_PAGE_DEFAULT = 20
+    RUNS_PAGE_MAX = 100
+    EXPORT_CHUNK_SIZE = 200
+
+    # Ringkasan leaderboard yang didenormalisasi: member "user_id:run_id" -> JSON
+    LEADERBOARD_SUMMARY = 'global_leaderboard:summary'
+    # Cache bersama (antar worker) untuk top-N leaderboard yang sudah dirangkai
+    LEADERBOARD_CACHE = 'global_leaderboard:cache'
+    LEADERBOARD_CACHE_SIZE = 50
+    LEADERBOARD_CACHE_TTL = 30
+
+    # Agregat per pengguna yang diperbarui setiap add_run: total, rekor, dan bucket mingguan/bulanan.
+    # Field bucket berbentuk '<bucket>:distance_m', '<bucket>:duration_sec', '<bucket>:runs'
+    # ('<bucket>:distance_km' float pada skema v1, tetap dibaca selama migrate-schema berjalan)
+    USER_STATS = key_schema.USER_STATS
+    USER_STATS_WEEKLY = key_schema.USER_STATS_WEEKLY
+    USER_STATS_MONTHLY = key_schema.USER_STATS_MONTHLY
+    STATS_BUCKET_FIELDS = ('distance_m', 'duration_sec', 'runs', 'distance_km')
+    STATS_RECENT_WEEKS = 8
+    STATS_RECENT_MONTHS = 6
+    STATS_REBUILD_BATCH = 500
+
+    # Leaderboard total jarak per pengguna: 'alltime', 'week:<2026-W42>', 'month:<2026-10>'
+    PERIOD_LEADERBOARD = 'leaderboard:distance:{}'
+    LEADERBOARD_PERIODS = ('week', 'month', 'alltime')
+    LEADERBOARD_WEEK_TTL = 35 * 86400
+    LEADERBOARD_MONTH_TTL = 400 * 86400
+    LEADERBOARD_NEIGHBORS_MAX = 50
+    LEADERBOARD_BUCKET_PATTERNS = {'week': re.compile(r'^\d{4}-W\d{2}$'), 'month': re.compile(r'^\d{4}-\d{2}$')}
+
+    # Indeks GEO lokasi run (member = run_id): titik awal, titik akhir, dan pusat bounding box rute
+    RUN_GEO = 'runs:geo:{}'
+    GEO_ANCHORS = ('start', 'end', 'center')
+    # Batas lintang yang diterima GEOADD (proyeksi web-mercator)
+    GEO_MAX_LAT = 85.05112878
+    NEARBY_MAX_RADIUS_M = 50000
+    NEARBY_SCAN_BATCH = 200
+    NEARBY_SCAN_MAX = 5000
+    GEO_REBUILD_BATCH = 200
+
+    # Field run_data hasil _prepare_run_data yang tidak ditulis ke hash run
+    RUN_DATA_EXTRA = ('route_data', 'route_levels', 'route_geo')
+
+    # Ingest atomik: ID run dialokasikan lebih dulu (INCR / INCRBY per chunk impor) agar setiap kunci
+    # yang ditulis script dideklarasikan di KEYS. Kunci global (leaderboard) dan kunci per pengguna
+    # berada di slot berbeda, jadi script ini butuh Redis single node (bukan Redis Cluster).
+    # Run yang hash-nya sudah ada tidak ditulis ulang, sehingga retry dengan run_id yang sama idempoten.
+    # KEYS: run hash, user runs, leaderboard, leaderboard summary, leaderboard cache, user details,
+    #       user stats, user stats weekly, user stats monthly,
+    #       leaderboard jarak all-time, mingguan, bulanan, geo start, geo end, geo center,
+    #       rute level 0, rute level 1..n
+    # ARGV: user_id, timestamp, duration_sec, distance_km, average_pace, route_data, total_steps,
+    #       ukuran cache leaderboard, run_id, bucket minggu ISO, bucket bulan,
+    #       TTL leaderboard mingguan, TTL leaderboard bulanan,
+    #       lng/lat start, end, center (kosong jika rute tidak punya titik valid),
+    #       jumlah pasangan field hash N, N pasangan field/nilai hash run, rute level 1..n
+    ADD_RUN_SCRIPT = """
+local run_id = tonumber(ARGV[9])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return run_id
+end
+local field_end = 20 + 2 * tonumber(ARGV[20])
+redis.call('HSET', KEYS[1], 'run_id', run_id, unpack(ARGV, 21, field_end))
+redis.call('SET', KEYS[16], ARGV[6])
+for i = field_end + 1, #ARGV do
+    redis.call('SET', KEYS[16 + i - field_end], ARGV[i])
+end
+redis.call('LPUSH', KEYS[2], run_id)
+
+local member = ARGV[1] .. ':' .. run_id
+local username = redis.call('HGET', KEYS[6], 'username')
+if not username then
+    username = 'Runner ' .. ARGV[1]
+end
+redis.call('ZADD', KEYS[3], ARGV[4], member)
+redis.call('HSET', KEYS[4], member, cjson.encode({
+    run_id = run_id, user_id = tonumber(ARGV[1]), username = username,
+    average_pace = tonumber(ARGV[5]), timestamp = ARGV[2]
+}))
+local rank = redis.call('ZREVRANK', KEYS[3], member)
+if rank and rank < tonumber(ARGV[8]) then
+    redis.call('DEL', KEYS[5])
+end
+
+local distance_m = math.floor(tonumber(ARGV[4]) * 1000 + 0.5)
+redis.call('HINCRBY', KEYS[7], 'run_count', 1)
+redis.call('HINCRBY', KEYS[7], 'total_distance_m', distance_m)
+redis.call('HINCRBY', KEYS[7], 'total_duration_sec', ARGV[3])
+redis.call('HINCRBY', KEYS[7], 'total_steps', ARGV[7])
+local longest = tonumber(redis.call('HGET', KEYS[7], 'longest_run_m') or '0')
+local legacy_longest = redis.call('HGET', KEYS[7], 'longest_run_km')
+if legacy_longest then
+    longest = math.max(longest, math.floor(tonumber(legacy_longest) * 1000 + 0.5))
+end
+if distance_m > longest then
+    redis.call('HSET', KEYS[7], 'longest_run_m', distance_m, 'longest_run_id', run_id)
+    redis.call('HDEL', KEYS[7], 'longest_run_km')
+end
+local pace = tonumber(ARGV[5])
+if pace > 0 then
+    local fastest = redis.call('HGET', KEYS[7], 'fastest_pace')
+    if not fastest or pace < tonumber(fastest) then
+        redis.call('HSET', KEYS[7], 'fastest_pace', ARGV[5], 'fastest_pace_run_id', run_id)
+    end
+end
+for i, bucket in ipairs({ARGV[10], ARGV[11]}) do
+    redis.call('HINCRBY', KEYS[7 + i], bucket .. ':distance_m', distance_m)
+    redis.call('HINCRBY', KEYS[7 + i], bucket .. ':duration_sec', ARGV[3])
+    redis.call('HINCRBY', KEYS[7 + i], bucket .. ':runs', 1)
+end
+
+redis.call('ZINCRBY', KEYS[10], ARGV[4], ARGV[1])
+for i = 0, 1 do
+    if tonumber(ARGV[12 + i]) > 0 then
+        redis.call('ZINCRBY', KEYS[11 + i], ARGV[4], ARGV[1])
+        redis.call('EXPIRE', KEYS[11 + i], ARGV[12 + i])
+    end
+end
+
+if ARGV[14] ~= '' then
+    for i = 0, 2 do
+        redis.call('GEOADD', KEYS[13 + i], ARGV[14 + 2 * i], ARGV[15 + 2 * i], run_id)
+    end
+end
+return run_id
+"""
+    SCRIPTING_AVAILABLE = True
+    _add_run_script_cache = {}
+
+    IMPORT_CHUNK_SIZE = 250
+    IMPORT_MAX_ERRORS = 100
+
+    # Cache baca in-process; koherensi antar worker lewat channel pub/sub invalidasi
+    USER_CACHE = LRUTTLCache('user_profiles', maxsize=10000, ttl=60)
+    RUN_SUMMARY_CACHE = LRUTTLCache('run_summaries', maxsize=50000, ttl=600)
+    # Blob rute arsip per run (semua level); rute yang diarsip tidak berubah sehingga tidak perlu invalidasi
+    ARCHIVED_ROUTE_CACHE = LRUTTLCache('archived_routes', maxsize=int(os.environ.get('ROUTE_ARCHIVE_CACHE_SIZE', '512')), ttl=3600)
+    # Respons run final yang sudah dikompresi (detail & rute), kunci = ETag dasar
+    RESPONSE_CACHE = LRUTTLCache('run_responses', maxsize=int(os.environ.get('RUN_RESPONSE_CACHE_SIZE', '1024')), ttl=3600)
+    CACHE_INVALIDATION_CHANNEL = 'cache:invalidate'
+    _cache_listener = None
 
     @staticmethod
     def get_redis_conn():
         """Fungsi pembantu untuk mendapatkan koneksi Redis yang aktif."""
         return get_redis_client()
 
+    @staticmethod
+    def _ensure_cache_listener(redis_conn):
+        """Menyalakan listener invalidasi sekali per proses; jika gagal, cache tetap jalan dengan TTL saja."""
+        if RunTrackerModel._cache_listener is not None:
+            return
+        try:
+            RunTrackerModel._cache_listener = start_invalidation_listener(
+                redis_conn, RunTrackerModel.CACHE_INVALIDATION_CHANNEL, RunTrackerModel._handle_cache_invalidation
+            )
+        except Exception as e:
+            print(f"Redis: Listener invalidasi cache gagal, hanya memakai TTL. {e}")
+            RunTrackerModel._cache_listener = False
+
+    @staticmethod
+    def _handle_cache_invalidation(message):
+        """Pesan invalidasi berbentuk 'user:<id>' atau 'run:<id>'."""
+        if isinstance(message, bytes):
+            message = message.decode('utf-8')
+        kind, _, key = str(message).partition(':')
+        if kind == 'user':
+            RunTrackerModel.USER_CACHE.invalidate(key)
+        elif kind == 'run':
+            RunTrackerModel.RUN_SUMMARY_CACHE.invalidate(key)
+
+    @staticmethod
+    def invalidate_cached(kind, key):
+        """Menghapus entri cache lokal lalu menyiarkan invalidasi ke worker lain."""
+        RunTrackerModel._handle_cache_invalidation(f"{kind}:{key}")
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if redis_conn:
+            try:
+                redis_conn.publish(RunTrackerModel.CACHE_INVALIDATION_CHANNEL, f"{kind}:{key}")
+            except Exception as e:
+                print(f"Warning: Gagal menyiarkan invalidasi cache: {e}")
+
+    @staticmethod
+    def cache_stats():
+        return [
+            RunTrackerModel.USER_CACHE.stats(), RunTrackerModel.RUN_SUMMARY_CACHE.stats(),
+            RunTrackerModel.ARCHIVED_ROUTE_CACHE.stats(), RunTrackerModel.RESPONSE_CACHE.stats(),
+            HeatmapModel.TILE_CACHE.stats(), TrainingModel.COLUMN_CACHE.stats()
+        ]
+
     @staticmethod
     def find_user_by_username(username):
         redis_conn = RunTrackerModel.get_redis_conn()
         if not redis_conn:
             return None
         
-        user_id_bytes = redis_conn.get(RunTrackerModel.USER_USERNAME_IDX.format(username))
+        user_id_bytes = redis_conn.hget(username_index_key(username), username)
+        if user_id_bytes is None:
+            # Indeks v1 (satu string key per pengguna) yang belum dipindah migrate-schema
+            user_id_bytes = redis_conn.get(key_schema.LEGACY_USERNAME_KEY.format(username))
         if user_id_bytes:
             user_id = int(user_id_bytes)
             return RunTrackerModel.get_user_data(user_id)
@@ -138,15 +396,17 @@ class RunTrackerModel:
                 return 'duplicate'
 
             user_id = redis_conn.incr(RunTrackerModel.USER_ID_COUNTER)
+            # HSETNX pada ember indeks sekaligus mengunci username (dua pendaftaran bersamaan)
+            if not redis_conn.hsetnx(username_index_key(username), username, user_id):
+                return 'duplicate'
+            # id tidak disimpan di hash: sudah ada di nama kunci dan diisi get_user_data
             user_data = {
                 'username': username,
                 'password': password,
-                'registered_at': datetime.now().isoformat(),
-                'id': user_id
+                'registered_at': datetime.now().isoformat()
             }
             redis_conn.hset(RunTrackerModel.USER_KEY.format(user_id), mapping=user_data)
-                                                                                          
-            redis_conn.set(RunTrackerModel.USER_USERNAME_IDX.format(username), user_id)
+            RunTrackerModel.invalidate_cached('user', user_id)
 
             return user_id
         except Exception as e:
@@ -159,48 +419,683 @@ class RunTrackerModel:
         if not redis_conn:
             return None
 
+        RunTrackerModel._ensure_cache_listener(redis_conn)
+        cached = RunTrackerModel.USER_CACHE.get(str(user_id))
+        if cached is not None:
+            return dict(cached)
+
         data = redis_conn.hgetall(RunTrackerModel.USER_KEY.format(user_id))
         if data:
             user_data = dict(data)
             user_data['id'] = int(user_id)
-            return user_data
+            RunTrackerModel.USER_CACHE.set(str(user_id), user_data)
+            return dict(user_data)
         return None
                
     @staticmethod
-    def add_run(user_id, duration_sec, distance_km, average_pace, route_data, total_steps):
+    def add_run(user_id, duration_sec, distance_km, average_pace, route_data, total_steps, analytics=None, timestamp=None,
+                run_id=None):
+        """
+        Menyimpan run baru secara atomik: INCR untuk ID lalu satu EVALSHA (Lua).
+        Jika scripting tidak tersedia, ID yang sama ditulis lewat satu pipeline MULTI/EXEC.
+        Statistik rute (analyze_route) dihitung sekali di sini bila belum diberikan pemanggil.
+        run_id: ID yang sudah dipesan pemanggil (finish sesi); jika run itu sudah tersimpan, tidak ditulis dua kali.
+        """
         redis_conn = RunTrackerModel.get_redis_conn()
         if not redis_conn:
             return None
 
         try:
-            run_id = redis_conn.incr(RunTrackerModel.RUN_ID_COUNTER)
-            timestamp = datetime.now().isoformat()
-                                                                                          
-            run_data_raw = {
-                'run_id': run_id,
-                'user_id': user_id,
-                'timestamp': timestamp,
-                'duration_sec': int(duration_sec),
-                'distance_km': float(distance_km),
-                'average_pace': float(average_pace),
-                'route_data': json.dumps(route_data),
-                'total_steps': int(total_steps)
-            }                                                                                                                                                           
-            run_data_redis = {k: str(v) for k, v in run_data_raw.items()}
-                                                                                          
-            redis_conn.hset(RunTrackerModel.RUN_DETAIL.format(run_id), mapping=run_data_redis)
-
-            redis_conn.lpush(RunTrackerModel.USER_RUNS.format(user_id), run_id)
-
-            redis_conn.zadd(RunTrackerModel.GLOBAL_LEADERBOARD, {f"{user_id}:{run_id}": float(distance_km)})
-
-            return run_id
+            run_data_redis = RunTrackerModel._prepare_run_data(
+                user_id, duration_sec, distance_km, average_pace, route_data, total_steps,
+                analytics=analytics, timestamp=timestamp, defer_levels=POST_PROCESS_MODE == 'stream'
+            )
+
+            if run_id is None:
+                run_id = RunTrackerModel._allocate_run_ids(redis_conn)[0]
+            stored = False
+            if RunTrackerModel.SCRIPTING_AVAILABLE:
+                try:
+                    RunTrackerModel._add_run_script(redis_conn, run_data_redis, run_id)
+                    stored = True
+                except redis.exceptions.ResponseError as e:
+                    if not RunTrackerModel._scripting_disabled(e):
+                        raise
+
+            if not stored:
+                RunTrackerModel._add_run_pipeline(redis_conn, run_data_redis, run_id)
         except Exception as e:
             print(f"Error saving run to Redis: {e}")
             return None
-          
+
+        # Tahap pasca-simpan (level rute, segmen, heatmap): di request (inline) atau lewat worker (stream).
+        # Kegagalannya tidak membatalkan run yang sudah tersimpan.
+        try:
+            if POST_PROCESS_MODE == 'stream':
+                RunJobModel.enqueue(redis_conn, [run_id])
+            else:
+                RunJobModel.process_run(run_id, route_data=route_data)
+        except Exception as e:
+            print(f"Error post-processing run {run_id}: {e}")
+        return run_id
+
+    @staticmethod
+    def _prepare_run_data(user_id, duration_sec, distance_km, average_pace, route_data, total_steps,
+                          analytics=None, timestamp=None, defer_levels=False):
+        """
+        Menyusun field hash run (string) beserta blob rute per level, siap ditulis ke Redis.
+        defer_levels=True hanya menyimpan rute penuh; simplifikasi RDP dikerjakan worker (RunJobModel).
+        """
+        if analytics is None:
+            analytics = analyze_route(route_data, duration_sec, total_steps)
+
+        run_data_raw = {
+            'user_id': int(user_id),
+            'timestamp': timestamp or datetime.now().isoformat(),
+            'duration_sec': int(duration_sec),
+            'distance_km': float(distance_km),
+            'average_pace': float(average_pace),
+            'total_steps': int(total_steps),
+            **RunTrackerModel._analytics_fields(analytics)
+        }
+        run_data_redis = encode_run_fields(run_data_raw)
+        if defer_levels:
+            lod_points, route_blobs = str(len(route_data or [])), [encode_route(route_data)]
+        else:
+            lod_points, route_blobs = RunTrackerModel._encode_route_levels(route_data)
+        run_data_redis['route_lod_points'] = lod_points
+        run_data_redis['route_data'] = route_blobs[0]
+        run_data_redis['route_levels'] = route_blobs[1:]
+        run_data_redis['route_geo'] = RunTrackerModel._route_geo_points(route_data)
+        return run_data_redis
+
+    @staticmethod
+    def _route_geo_points(route_data):
+        """
+        Titik indeks GEO sebuah rute: [(lng, lat) start, end, pusat bounding box], atau None jika
+        rute kosong / di luar jangkauan GEOADD. Bounding box tidak menangani rute yang melintasi antimeridian.
+        """
+        lats, lngs, _ = route_columns(route_data)
+        if not lats:
+            return None
+        lat_min, lat_max = min(lats), max(lats)
+        lng_min, lng_max = min(lngs), max(lngs)
+        if max(abs(lat_min), abs(lat_max)) > RunTrackerModel.GEO_MAX_LAT or max(abs(lng_min), abs(lng_max)) > 180:
+            return None
+        return [
+            (lngs[0], lats[0]),
+            (lngs[-1], lats[-1]),
+            ((lng_min + lng_max) / 2, (lat_min + lat_max) / 2)
+        ]
+
+    @staticmethod
+    def _scripting_disabled(error):
+        """True jika server menolak EVAL/EVALSHA; sisa proses lalu memakai jalur pipeline."""
+        message = str(error).lower()
+        if not any(reason in message for reason in ('unknown command', 'noperm', 'not allowed', 'disabled')):
+            return False
+        print(f"Redis: Scripting tidak tersedia, fallback ke pipeline MULTI. {error}")
+        RunTrackerModel.SCRIPTING_AVAILABLE = False
+        return True
+
+    @staticmethod
+    def _allocate_run_ids(redis_conn, count=1):
+        """Mengalokasikan count ID run berurutan dengan satu INCRBY."""
+        last = redis_conn.incrby(RunTrackerModel.RUN_ID_COUNTER, count)
+        return list(range(last - count + 1, last + 1))
+
+    @staticmethod
+    def _add_run_script(redis_conn, run_data, run_id, pipe=None):
+        """
+        Menjalankan ADD_RUN_SCRIPT untuk run_id yang sudah dialokasikan; redis-py memakai EVALSHA dan
+        memuat ulang script saat NOSCRIPT. Jika pipe diberikan, panggilan hanya diantrekan.
+        """
+        script = RunTrackerModel._add_run_script_cache.get(id(redis_conn))
+        if script is None:
+            script = redis_conn.register_script(RunTrackerModel.ADD_RUN_SCRIPT)
+            RunTrackerModel._add_run_script_cache[id(redis_conn)] = script
+
+        user_id = run_data['user_id']
+        keys = [
+            RunTrackerModel.RUN_DETAIL.format(run_id),
+            RunTrackerModel.USER_RUNS.format(user_id),
+            RunTrackerModel.GLOBAL_LEADERBOARD,
+            RunTrackerModel.LEADERBOARD_SUMMARY,
+            RunTrackerModel.LEADERBOARD_CACHE,
+            RunTrackerModel.USER_KEY.format(user_id),
+            RunTrackerModel.USER_STATS.format(user_id),
+            RunTrackerModel.USER_STATS_WEEKLY.format(user_id),
+            RunTrackerModel.USER_STATS_MONTHLY.format(user_id)
+        ]
+        week_bucket, month_bucket = RunTrackerModel._time_buckets(run_data['timestamp'])
+        week_ttl, month_ttl = RunTrackerModel._period_leaderboard_ttls(week_bucket, month_bucket)
+        keys.extend(RunTrackerModel._period_leaderboard_keys(week_bucket, month_bucket))
+        keys.extend(RunTrackerModel.RUN_GEO.format(anchor) for anchor in RunTrackerModel.GEO_ANCHORS)
+        keys.append(RunTrackerModel.RUN_ROUTE.format(run_id))
+        keys.extend(RunTrackerModel.RUN_ROUTE_LOD.format(run_id, level) for level in range(1, len(run_data['route_levels']) + 1))
+        args = [
+            user_id,
+            run_data['timestamp'],
+            run_data['duration_sec'],
+            run_data['distance_km'],
+            run_data['average_pace'],
+            run_data['route_data'],
+            run_data['total_steps'],
+            RunTrackerModel.LEADERBOARD_CACHE_SIZE,
+            run_id,
+            week_bucket,
+            month_bucket,
+            week_ttl,
+            month_ttl
+        ]
+        for lng, lat in run_data.get('route_geo') or [('', '')] * len(RunTrackerModel.GEO_ANCHORS):
+            args.extend((lng, lat))
+        run_fields = {k: v for k, v in run_data.items() if k not in RunTrackerModel.RUN_DATA_EXTRA}
+        args.append(len(run_fields))
+        for field, value in run_fields.items():
+            args.extend((field, value))
+        args.extend(run_data['route_levels'])
+
+        if pipe is not None:
+            script(keys=keys, args=args, client=pipe)
+            return None
+        return int(script(keys=keys, args=args, client=redis_conn))
+
+    @staticmethod
+    def import_runs(user_id, records, chunk_size=IMPORT_CHUNK_SIZE):
+        """
+        Impor massal run dari generator (index, record) milik run_import.
+        Run ditulis per chunk: satu INCRBY untuk ID seluruh chunk, lalu satu pipeline berisi
+        EVALSHA ADD_RUN_SCRIPT per run, sehingga satu chunk hanya butuh dua round trip. Mengembalikan laporan throughput & error.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        report = {'imported': 0, 'failed': 0, 'errors': []}
+        started = time.perf_counter()
+        defer_levels = POST_PROCESS_MODE == 'stream'
+
+        def record_error(index, error):
+            report['failed'] += 1
+            if len(report['errors']) < RunTrackerModel.IMPORT_MAX_ERRORS:
+                report['errors'].append({'index': index, 'message': str(error)})
+
+        def flush(chunk):
+            allocated = RunTrackerModel._allocate_run_ids(redis_conn, len(chunk))
+            if RunTrackerModel.SCRIPTING_AVAILABLE:
+                pipe = redis_conn.pipeline(transaction=False)
+                for (_, run_data), run_id in zip(chunk, allocated):
+                    RunTrackerModel._add_run_script(redis_conn, run_data, run_id, pipe=pipe)
+                try:
+                    results = pipe.execute(raise_on_error=False)
+                except redis.exceptions.ResponseError as e:
+                    if not RunTrackerModel._scripting_disabled(e):
+                        raise
+                    results = None
+                if results is not None:
+                    if any(isinstance(r, redis.exceptions.ResponseError) and RunTrackerModel._scripting_disabled(r) for r in results):
+                        results = None
+                if results is not None:
+                    run_ids = []
+                    for (index, _), run_id, result in zip(chunk, allocated, results):
+                        if isinstance(result, Exception):
+                            record_error(index, result)
+                        else:
+                            report['imported'] += 1
+                            run_ids.append(run_id)
+                    enqueue(run_ids)
+                    return
+
+            run_ids = []
+            for (index, run_data), run_id in zip(chunk, allocated):
+                try:
+                    run_ids.append(RunTrackerModel._add_run_pipeline(redis_conn, run_data, run_id))
+                    report['imported'] += 1
+                except Exception as e:
+                    record_error(index, e)
+            enqueue(run_ids)
+
+        def enqueue(run_ids):
+            # Mode stream: run impor ikut diproses worker (level rute, segmen, heatmap)
+            if defer_levels and run_ids:
+                RunJobModel.enqueue(redis_conn, run_ids, reason='import')
+
+        chunk = []
+        for index, record in records:
+            if isinstance(record, Exception):
+                record_error(index, record)
+                continue
+            try:
+                duration_sec = int(record['duration_sec'])
+                analytics = analyze_route(record['route_data'], duration_sec, record['total_steps'])
+                distance_km = analytics['distance_km'] if analytics['point_count'] >= 2 else float(record['distance_km'])
+                chunk.append((index, RunTrackerModel._prepare_run_data(
+                    user_id, duration_sec, distance_km,
+                    RunTrackerModel.calculate_pace(duration_sec, distance_km),
+                    record['route_data'], record['total_steps'],
+                    analytics=analytics, timestamp=record.get('timestamp'), defer_levels=defer_levels
+                )))
+            except (ValueError, TypeError, IndexError, KeyError) as e:
+                record_error(index, e)
+                continue
+
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+
+        elapsed = time.perf_counter() - started
+        report['elapsed_sec'] = round(elapsed, 3)
+        report['runs_per_sec'] = round(report['imported'] / elapsed, 1) if elapsed > 0 else 0.0
+        return report
+
+    @staticmethod
+    def _add_run_pipeline(redis_conn, run_data, run_id):
+        """
+        Jalur fallback tanpa Lua: semua penulisan run_id (sudah dialokasikan) dalam satu transaksi MULTI/EXEC.
+        Rekor (longest/fastest) dibaca di bawah WATCH agar pembaruan kondisionalnya tetap atomik.
+        """
+        user_id = run_data['user_id']
+
+        member = f"{user_id}:{run_id}"
+        stats_key = RunTrackerModel.USER_STATS.format(user_id)
+        distance_km = float(run_data['distance_km'])
+        distance_m = km_to_m(distance_km)
+        average_pace = float(run_data['average_pace'])
+        week_bucket, month_bucket = RunTrackerModel._time_buckets(run_data['timestamp'])
+        period_ttls = RunTrackerModel._period_leaderboard_ttls(week_bucket, month_bucket)
+        run_fields = {k: v for k, v in run_data.items() if k not in RunTrackerModel.RUN_DATA_EXTRA}
+        run_key = RunTrackerModel.RUN_DETAIL.format(run_id)
+
+        with redis_conn.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    pipe.watch(stats_key, run_key)
+                    if pipe.exists(run_key):
+                        return run_id
+                    longest_m, longest_km, fastest = pipe.hmget(stats_key, ['longest_run_m', 'longest_run_km', 'fastest_pace'])
+                    username = pipe.hget(RunTrackerModel.USER_KEY.format(user_id), 'username')
+                    leaderboard_summary = RunTrackerModel._leaderboard_summary(
+                        run_id, user_id, username, run_data['average_pace'], run_data['timestamp']
+                    )
+
+                    pipe.multi()
+                    pipe.hset(run_key, mapping={'run_id': str(run_id), **run_fields})
+                    pipe.set(RunTrackerModel.RUN_ROUTE.format(run_id), run_data['route_data'])
+                    for level, blob in enumerate(run_data['route_levels'], start=1):
+                        pipe.set(RunTrackerModel.RUN_ROUTE_LOD.format(run_id, level), blob)
+                    pipe.lpush(RunTrackerModel.USER_RUNS.format(user_id), run_id)
+                    pipe.zadd(RunTrackerModel.GLOBAL_LEADERBOARD, {member: distance_km})
+                    pipe.hset(RunTrackerModel.LEADERBOARD_SUMMARY, member, json.dumps(leaderboard_summary))
+                    pipe.hincrby(stats_key, 'run_count', 1)
+                    pipe.hincrby(stats_key, 'total_distance_m', distance_m)
+                    pipe.hincrby(stats_key, 'total_duration_sec', int(run_data['duration_sec']))
+                    pipe.hincrby(stats_key, 'total_steps', int(run_data['total_steps']))
+                    if distance_m > max(int(longest_m or 0), km_to_m(longest_km)):
+                        pipe.hset(stats_key, mapping={'longest_run_m': distance_m, 'longest_run_id': run_id})
+                        pipe.hdel(stats_key, 'longest_run_km')
+                    if average_pace > 0 and (fastest is None or average_pace < float(fastest)):
+                        pipe.hset(stats_key, mapping={'fastest_pace': average_pace, 'fastest_pace_run_id': run_id})
+                    for bucket_key, bucket in (
+                        (RunTrackerModel.USER_STATS_WEEKLY.format(user_id), week_bucket),
+                        (RunTrackerModel.USER_STATS_MONTHLY.format(user_id), month_bucket)
+                    ):
+                        pipe.hincrby(bucket_key, f"{bucket}:distance_m", distance_m)
+                        pipe.hincrby(bucket_key, f"{bucket}:duration_sec", int(run_data['duration_sec']))
+                        pipe.hincrby(bucket_key, f"{bucket}:runs", 1)
+                    alltime_key, week_key, month_key = RunTrackerModel._period_leaderboard_keys(week_bucket, month_bucket)
+                    pipe.zincrby(alltime_key, distance_km, user_id)
+                    for period_key, ttl in zip((week_key, month_key), period_ttls):
+                        if ttl:
+                            pipe.zincrby(period_key, distance_km, user_id)
+                            pipe.expire(period_key, ttl)
+                    for anchor, (lng, lat) in zip(RunTrackerModel.GEO_ANCHORS, run_data.get('route_geo') or []):
+                        pipe.geoadd(RunTrackerModel.RUN_GEO.format(anchor), [lng, lat, run_id])
+                    pipe.zrevrank(RunTrackerModel.GLOBAL_LEADERBOARD, member)
+                    rank = pipe.execute()[-1]
+                    break
+                except redis.exceptions.WatchError:
+                    continue
+
+        # Cache top-N hanya basi jika run baru masuk ke dalam top-N
+        if rank is not None and rank < RunTrackerModel.LEADERBOARD_CACHE_SIZE:
+            redis_conn.delete(RunTrackerModel.LEADERBOARD_CACHE)
+
+        return run_id
+
+    @staticmethod
+    def _time_buckets(timestamp):
+        """Bucket agregat dari timestamp ISO run: ('2026-W42', '2026-10')."""
+        return time_buckets(timestamp)
+
+    @staticmethod
+    def _period_leaderboard_keys(week_bucket, month_bucket):
+        return (
+            RunTrackerModel.PERIOD_LEADERBOARD.format('alltime'),
+            RunTrackerModel.PERIOD_LEADERBOARD.format(f"week:{week_bucket}"),
+            RunTrackerModel.PERIOD_LEADERBOARD.format(f"month:{month_bucket}")
+        )
+
+    @staticmethod
+    def _leaderboard_buckets(now=None):
+        """Bucket minggu & bulan yang leaderboard periodenya masih hidup (sesuai TTL); terbaru lebih dulu."""
+        recent_weeks, recent_months = RunTrackerModel._recent_buckets(now)
+        return recent_weeks[:RunTrackerModel.LEADERBOARD_WEEK_TTL // (7 * 86400)], recent_months
+
+    @staticmethod
+    def _period_leaderboard_ttls(week_bucket, month_bucket):
+        """
+        TTL leaderboard minggu & bulan untuk bucket sebuah run; 0 jika bucket di luar _leaderboard_buckets,
+        agar impor run lama tidak menghidupkan lagi papan periode yang sudah kedaluwarsa.
+        """
+        live_weeks, live_months = RunTrackerModel._leaderboard_buckets()
+        return (
+            RunTrackerModel.LEADERBOARD_WEEK_TTL if week_bucket in live_weeks else 0,
+            RunTrackerModel.LEADERBOARD_MONTH_TTL if month_bucket in live_months else 0
+        )
+
+    @staticmethod
+    def _period_leaderboard_key(period, bucket=None):
+        """Kunci leaderboard periode; bucket default = minggu/bulan berjalan."""
+        if period == 'alltime':
+            return RunTrackerModel.PERIOD_LEADERBOARD.format('alltime')
+        if bucket is None:
+            week_bucket, month_bucket = RunTrackerModel._time_buckets(datetime.now().isoformat())
+            bucket = week_bucket if period == 'week' else month_bucket
+        return RunTrackerModel.PERIOD_LEADERBOARD.format(f"{period}:{bucket}")
+
+    @staticmethod
+    def _ranked_entries(redis_conn, entries, first_rank):
+        """Menambahkan username (satu pipeline HGET) ke hasil ZREVRANGE withscores."""
+        pipe = redis_conn.pipeline(transaction=False)
+        for member, _ in entries:
+            pipe.hget(RunTrackerModel.USER_KEY.format(member), 'username')
+        usernames = pipe.execute() if entries else []
+
+        return [
+            {
+                'rank': first_rank + offset + 1,
+                'user_id': int(member),
+                'username': username or f"Runner {member}",
+                'distance_km': round(float(score), 3)
+            }
+            for offset, ((member, score), username) in enumerate(zip(entries, usernames))
+        ]
+
+    @staticmethod
+    def get_period_leaderboard(period, bucket=None, count=10, user_id=None, neighbors=5):
+        """
+        Leaderboard total jarak per periode. Jika user_id diberikan, posisi pengguna
+        beserta tetangganya dihitung dengan ZREVRANK/ZSCORE (O(log N)), tanpa memindai anggota.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        key = RunTrackerModel._period_leaderboard_key(period, bucket)
+        try:
+            pipe = redis_conn.pipeline(transaction=False)
+            pipe.zrevrange(key, 0, count - 1, withscores=True)
+            pipe.zcard(key)
+            if user_id is not None:
+                pipe.zrevrank(key, user_id)
+                pipe.zscore(key, user_id)
+            results = pipe.execute()
+
+            leaderboard = {
+                'period': period,
+                'key': key,
+                'total_members': results[1],
+                'top': RunTrackerModel._ranked_entries(redis_conn, results[0], 0),
+                'me': None
+            }
+
+            if user_id is not None and results[2] is not None:
+                rank, score = results[2], results[3]
+                start = max(rank - neighbors, 0)
+                around = redis_conn.zrevrange(key, start, rank + neighbors, withscores=True)
+                leaderboard['me'] = {
+                    'user_id': int(user_id),
+                    'rank': rank + 1,
+                    'distance_km': round(float(score), 3),
+                    'neighbors': RunTrackerModel._ranked_entries(redis_conn, around, start)
+                }
+            return leaderboard
+        except Exception as e:
+            print(f"Error retrieving period leaderboard: {e}")
+            return None
+
+    @staticmethod
+    def _recent_buckets(now=None):
+        """Daftar bucket minggu & bulan terbaru (terbaru lebih dulu) untuk dibaca lewat HMGET."""
+        return recent_buckets(now, RunTrackerModel.STATS_RECENT_WEEKS, RunTrackerModel.STATS_RECENT_MONTHS)
+
+    @staticmethod
+    def get_user_stats(user_id):
+        """Statistik agregat pengguna dalam O(1): satu pipeline HGETALL + HMGET bucket terbaru."""
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        weeks, months = RunTrackerModel._recent_buckets()
+        bucket_fields = RunTrackerModel.STATS_BUCKET_FIELDS
+
+        try:
+            pipe = redis_conn.pipeline(transaction=False)
+            pipe.hgetall(RunTrackerModel.USER_STATS.format(user_id))
+            pipe.hmget(RunTrackerModel.USER_STATS_WEEKLY.format(user_id),
+                       [f"{week}:{field}" for week in weeks for field in bucket_fields])
+            pipe.hmget(RunTrackerModel.USER_STATS_MONTHLY.format(user_id),
+                       [f"{month}:{field}" for month in months for field in bucket_fields])
+            totals, weekly_raw, monthly_raw = pipe.execute()
+        except Exception as e:
+            print(f"Error retrieving user stats: {e}")
+            return None
+
+        return RunTrackerModel._parse_user_stats(user_id, weeks, months, totals, weekly_raw, monthly_raw)
+
+    @staticmethod
+    def _parse_user_stats(user_id, weeks, months, totals, weekly_raw, monthly_raw):
+        """
+        Menyusun respons statistik dari HGETALL total + HMGET bucket (dipakai model sync & async).
+        Jarak v2 (meter) dan sisa field v1 (km) dijumlahkan agar hasil benar selama migrate-schema.
+        """
+        stride = len(RunTrackerModel.STATS_BUCKET_FIELDS)
+
+        def buckets(names, values):
+            result = []
+            for index, name in enumerate(names):
+                distance_m, duration, runs, legacy_km = values[index * stride:(index + 1) * stride]
+                result.append({
+                    'bucket': name,
+                    'distance_km': round((int(distance_m or 0) + km_to_m(legacy_km)) / 1000.0, 3),
+                    'duration_sec': int(duration or 0),
+                    'runs': int(runs or 0)
+                })
+            return result
+
+        total_m = int(totals.get('total_distance_m') or 0) + km_to_m(totals.get('total_distance_km'))
+        longest_m = max(int(totals.get('longest_run_m') or 0), km_to_m(totals.get('longest_run_km')))
+        return {
+            'user_id': int(user_id),
+            'run_count': int(totals.get('run_count') or 0),
+            'total_distance_km': round(total_m / 1000.0, 3),
+            'total_duration_sec': int(totals.get('total_duration_sec') or 0),
+            'total_steps': int(totals.get('total_steps') or 0),
+            'longest_run_km': longest_m / 1000.0,
+            'longest_run_id': int(totals['longest_run_id']) if totals.get('longest_run_id') else None,
+            'fastest_pace': float(totals.get('fastest_pace') or 0.0),
+            'fastest_pace_run_id': int(totals['fastest_pace_run_id']) if totals.get('fastest_pace_run_id') else None,
+            'weekly': buckets(weeks, weekly_raw),
+            'monthly': buckets(months, monthly_raw)
+        }
+
+    @staticmethod
+    def rebuild_user_stats(user_id, batch_size=STATS_REBUILD_BATCH):
+        """
+        Menghitung ulang agregat pengguna dari seluruh riwayat (LRANGE + HMGET per batch),
+        lalu mengganti hash statistik dalam satu transaksi. List run dan hash statistik di-WATCH
+        selama pembacaan; add_run yang masuk di tengah jalan membatalkan transaksi dan
+        perhitungan diulang, sehingga run baru tidak hilang tertimpa hasil lama.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        list_key = RunTrackerModel.USER_RUNS.format(user_id)
+        stats_keys = (
+            RunTrackerModel.USER_STATS.format(user_id),
+            RunTrackerModel.USER_STATS_WEEKLY.format(user_id),
+            RunTrackerModel.USER_STATS_MONTHLY.format(user_id)
+        )
+        alltime_key = RunTrackerModel.PERIOD_LEADERBOARD.format('alltime')
+        live_weeks, live_months = RunTrackerModel._leaderboard_buckets()
+
+        with redis_conn.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    pipe.watch(list_key, *stats_keys)
+                    totals, records, weekly, monthly = RunTrackerModel._aggregate_user_runs(redis_conn, list_key, batch_size)
+
+                    pipe.multi()
+                    pipe.delete(*stats_keys)
+                    for key, mapping in zip(stats_keys, ({**totals, **records}, weekly, monthly)):
+                        if mapping:
+                            pipe.hset(key, mapping=mapping)
+
+                    # Leaderboard periode: all-time (hanya pengguna yang punya jarak) dan bucket dalam jendela TTL
+                    if totals['total_distance_m'] > 0:
+                        pipe.zadd(alltime_key, {user_id: totals['total_distance_m'] / 1000.0})
+                    else:
+                        pipe.zrem(alltime_key, user_id)
+                    for period, buckets, source, ttl in (
+                        ('week', live_weeks, weekly, RunTrackerModel.LEADERBOARD_WEEK_TTL),
+                        ('month', live_months, monthly, RunTrackerModel.LEADERBOARD_MONTH_TTL)
+                    ):
+                        for bucket in buckets:
+                            key = RunTrackerModel.PERIOD_LEADERBOARD.format(f"{period}:{bucket}")
+                            if f"{bucket}:distance_m" in source:
+                                pipe.zadd(key, {user_id: source[f"{bucket}:distance_m"] / 1000.0})
+                                pipe.expire(key, ttl)
+                            else:
+                                pipe.zrem(key, user_id)
+                    pipe.execute()
+                    break
+                except redis.exceptions.WatchError:
+                    continue
+        return totals['run_count']
+
+    @staticmethod
+    def _aggregate_user_runs(redis_conn, list_key, batch_size):
+        """Membaca riwayat run per batch dan menjumlahkan (totals, rekor, bucket mingguan, bucket bulanan)."""
+        fields = ('run_id', 'timestamp', 'duration_sec', 'distance_km', 'average_pace', 'total_steps')
+        totals = {'run_count': 0, 'total_distance_m': 0, 'total_duration_sec': 0, 'total_steps': 0}
+        records = {}
+        weekly = {}
+        monthly = {}
+
+        def add_bucket(target, bucket, distance_m, duration_sec):
+            target[f"{bucket}:distance_m"] = target.get(f"{bucket}:distance_m", 0) + distance_m
+            target[f"{bucket}:duration_sec"] = target.get(f"{bucket}:duration_sec", 0) + duration_sec
+            target[f"{bucket}:runs"] = target.get(f"{bucket}:runs", 0) + 1
+
+        start = 0
+        while True:
+            run_ids = redis_conn.lrange(list_key, start, start + batch_size - 1)
+            if not run_ids:
+                break
+            pipe = redis_conn.pipeline(transaction=False)
+            for run_id in run_ids:
+                pipe.hmget(RunTrackerModel.RUN_DETAIL.format(run_id), fields)
+
+            for values in pipe.execute():
+                run = dict(zip(fields, values))
+                if not run['run_id']:
+                    continue
+                distance_m = km_to_m(run['distance_km'])
+                duration_sec = int(run['duration_sec'] or 0)
+                average_pace = float(run['average_pace'] or 0.0)
+
+                totals['run_count'] += 1
+                totals['total_distance_m'] += distance_m
+                totals['total_duration_sec'] += duration_sec
+                totals['total_steps'] += int(run['total_steps'] or 0)
+                if distance_m > records.get('longest_run_m', 0):
+                    records.update(longest_run_m=distance_m, longest_run_id=run['run_id'])
+                if average_pace > 0 and average_pace < records.get('fastest_pace', float('inf')):
+                    records.update(fastest_pace=average_pace, fastest_pace_run_id=run['run_id'])
+
+                week_bucket, month_bucket = RunTrackerModel._time_buckets(run['timestamp'])
+                add_bucket(weekly, week_bucket, distance_m, duration_sec)
+                add_bucket(monthly, month_bucket, distance_m, duration_sec)
+
+            start += batch_size
+        return totals, records, weekly, monthly
+
+    @staticmethod
+    def calculate_pace(duration_sec, distance_km):
+        """Pace rata-rata (menit desimal per km), 0.00 jika jarak atau durasi kosong."""
+        if distance_km > 0 and duration_sec > 0:
+            duration_min = duration_sec / 60
+            return float(f"{duration_min / distance_km:.2f}")
+        return 0.00
+
+    @staticmethod
+    def _analytics_fields(analytics):
+        """Mengubah hasil analyze_route menjadi field hash run (nilai kosong = tidak tersedia; di-encode encode_run_fields)."""
+        return {
+            'moving_time_sec': analytics['moving_time_sec'],
+            'paused_time_sec': analytics['paused_time_sec'],
+            'best_1k_sec': '' if analytics['best_1k_sec'] is None else analytics['best_1k_sec'],
+            'best_5k_sec': '' if analytics['best_5k_sec'] is None else analytics['best_5k_sec'],
+            'cadence_spm': analytics['cadence_spm'],
+            'splits_sec': analytics['splits_sec']
+        }
+
+    @staticmethod
+    def _parse_analytics_fields(detail):
+        """Mengonversi field statistik rute di hash run ke tipe aslinya (run lama diberi nilai default)."""
+        detail['moving_time_sec'] = int(detail.get('moving_time_sec') or detail.get('duration_sec') or 0)
+        detail['paused_time_sec'] = int(detail.get('paused_time_sec') or 0)
+        detail['best_1k_sec'] = int(detail['best_1k_sec']) if detail.get('best_1k_sec') else None
+        detail['best_5k_sec'] = int(detail['best_5k_sec']) if detail.get('best_5k_sec') else None
+        detail['cadence_spm'] = float(detail.get('cadence_spm') or 0.0)
+        detail['splits_sec'] = json.loads(detail.get('splits_sec') or '[]')
+        return detail
+
+    @staticmethod
+    def _encode_route_levels(route_data):
+        """Menyederhanakan rute (RDP) ke beberapa level; mengembalikan (route_lod_points, [blob level 0..n])."""
+        levels = build_levels(route_data, LOD_TOLERANCES_M)
+        lod_points = ','.join(str(len(level)) for level in levels)
+        return lod_points, [encode_route(level) for level in levels]
+
+    @staticmethod
+    def _select_route_level(lod_points, max_points=None, tolerance=None):
+        if not lod_points or (max_points is None and tolerance is None):
+            return 0
+        point_counts = [int(count) for count in lod_points.split(',')]
+        return select_level(point_counts, LOD_TOLERANCES_M, max_points=max_points, tolerance=tolerance)
+
+    @staticmethod
+    def store_route_levels(run_id, route_data):
+        """Menulis level detail 1..n sebuah run yang ingest-nya menunda simplifikasi (defer_levels)."""
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        lod_points, route_blobs = RunTrackerModel._encode_route_levels(route_data)
+        pipe = redis_conn.pipeline(transaction=True)
+        for level, blob in enumerate(route_blobs[1:], start=1):
+            pipe.set(RunTrackerModel.RUN_ROUTE_LOD.format(run_id, level), blob)
+        pipe.hset(RunTrackerModel.RUN_DETAIL.format(run_id), 'route_lod_points', lod_points)
+        pipe.execute()
+        return lod_points
+
     @staticmethod
-    def get_run_detail(run_id):
+    def get_run_detail(run_id, max_points=None):
         redis_conn = RunTrackerModel.get_redis_conn()
         if not redis_conn:
             return None
@@ -217,9 +1112,16 @@ class RunTrackerModel:
             detail['distance_km'] = float(detail['distance_km'])
             detail['average_pace'] = float(detail['average_pace'])
             detail['total_steps'] = int(detail.get('total_steps', 0))
+            RunTrackerModel._parse_analytics_fields(detail)
 
-            route_data_json_string = detail.get('route_data', '[]')
-            detail['route_data'] = json.loads(route_data_json_string)
+            if 'route_data' in detail:
+                # Run lama (sebelum migrate-routes) masih menyimpan rute sebagai JSON di hash
+                detail['route_data'] = load_route(detail['route_data'])
+                detail['route_level'] = 0
+            else:
+                level = RunTrackerModel._select_route_level(detail.pop('route_lod_points', None), max_points=max_points)
+                detail['route_data'] = RunTrackerModel.get_run_route(run_id, level, archived=detail.pop('route_archived', None))
+                detail['route_level'] = level
 
             return detail
         except Exception as e:
@@ -227,119 +1129,2076 @@ class RunTrackerModel:
             return None
                  
     @staticmethod
-    def get_user_runs(user_id):
-        redis_conn = RunTrackerModel.get_redis_conn()
-        if not redis_conn:
+    def get_run_route(run_id, level=0, archived=None):
+        """
+        Membaca dan men-decode rute biner sebuah run (level 0 = rute penuh).
+        Jika kunci rute sudah tidak ada di Redis, rute dibaca dari arsip disk (archived = pointer jika sudah diketahui).
+        """
+        binary_conn = get_redis_binary_client()
+        if not binary_conn:
             return []
-                                                                                      
-        run_ids = redis_conn.lrange(RunTrackerModel.USER_RUNS.format(user_id), 0, -1)
-        runs = []                                                                     
-        for run_id_str in run_ids:
-            try:
-                run_id = int(run_id_str)
-                run_detail = RunTrackerModel.get_run_detail(run_id)
-                if run_detail:
-                    runs.append(run_detail)
-            except ValueError:
-                print(f"Warning: Failed to convert run_id {run_id_str} to int.")
-                                                                                      
-        return runs
 
+        if level:
+            key = RunTrackerModel.RUN_ROUTE_LOD.format(run_id, level)
+        else:
+            key = RunTrackerModel.RUN_ROUTE.format(run_id)
+        blob = binary_conn.get(key)
+        if blob is None:
+            blobs = RunTrackerModel._archived_route_blobs(run_id, archived)
+            if blobs:
+                blob = blobs[min(level, len(blobs) - 1)]
+        return load_route(blob)
 
     @staticmethod
-    def get_global_leaderboard(count=5):
+    def _archived_route_blobs(run_id, pointer=None):
+        """Blob rute per level dari arsip disk lewat ARCHIVED_ROUTE_CACHE; None jika run tidak diarsip."""
+        cache_key = str(run_id)
+        blobs = RunTrackerModel.ARCHIVED_ROUTE_CACHE.get(cache_key)
+        if blobs is not None:
+            return blobs
+
+        if pointer is None:
+            redis_conn = RunTrackerModel.get_redis_conn()
+            if not redis_conn:
+                return None
+            pointer = redis_conn.hget(RunTrackerModel.RUN_DETAIL.format(run_id), 'route_archived')
+            if pointer is None:
+                return None
+        try:
+            blobs = RunTrackerModel.ROUTE_ARCHIVE.read(pointer)
+        except (OSError, ValueError) as e:
+            # Pointer rusak/segmen hilang: coba cari ulang lewat index offset segmen
+            print(f"Warning: Gagal membaca arsip rute run {run_id} ({pointer}): {e}")
+            pointer = RunTrackerModel.ROUTE_ARCHIVE.locate(run_id)
+            if pointer is None:
+                return None
+            blobs = RunTrackerModel.ROUTE_ARCHIVE.read(pointer)
+        RunTrackerModel.ARCHIVED_ROUTE_CACHE.set(cache_key, blobs)
+        return blobs
+
+    @staticmethod
+    def get_route_for_display(run_id, max_points=None, tolerance=None):
+        """Mengambil rute pada level detail yang sesuai dengan batas max_points / toleransi (meter)."""
         redis_conn = RunTrackerModel.get_redis_conn()
         if not redis_conn:
-            return []
+            return None
 
         try:
-            leaderboard_raw = redis_conn.zrevrange(RunTrackerModel.GLOBAL_LEADERBOARD, 0, count - 1, withscores=True)
-            leaderboard = []
-                                                                                          
-            for key_score, distance in leaderboard_raw:
-                try:
-                    key_score_str = key_score
-                    user_id_str, run_id_str = key_score_str.split(':')
-                    run_id = int(run_id_str)
-                    user_id = int(user_id_str)
-
-                    run_detail = RunTrackerModel.get_run_detail(run_id)
-                    user_data = RunTrackerModel.get_user_data(user_id)
- 
-                    username = user_data.get('username', f"Runner {user_id}")
-                                                                                                  
-                    if run_detail:
-                        leaderboard.append({
-                            'run_id': run_id,
-                            'username': username,
-                            'distance': float(distance),
-                            'average_pace': run_detail.get('average_pace', 0.0),
-                            'timestamp': run_detail.get('timestamp')
-                        })
+            stored_run_id, lod_points, legacy_route = redis_conn.hmget(
+                RunTrackerModel.RUN_DETAIL.format(run_id), ['run_id', 'route_lod_points', 'route_data']
+            )
+            if stored_run_id is None:
+                return None
 
-                except Exception as e:
-                    print(f"Error parsing leaderboard entry or getting detail: {e}")
+            if legacy_route is not None:
+                level, route = 0, load_route(legacy_route)
+            else:
+                level = RunTrackerModel._select_route_level(lod_points, max_points=max_points, tolerance=tolerance)
+                route = RunTrackerModel.get_run_route(run_id, level)
 
-            return leaderboard
+            return {
+                'run_id': int(run_id),
+                'level': level,
+                'tolerance_m': ((0.0,) + LOD_TOLERANCES_M)[level],
+                'points': len(route),
+                'route_data': route
+            }
         except Exception as e:
-            print(f"Error retrieving leaderboard: {e}")
-            return []
-        
-# --- 3. Routing Halaman Web (Autentikasi di sisi Klien) ---
+            print(f"Error retrieving run route: {e}")
+            return None
 
-def get_current_user_id():
-    # Fungsi Dummy untuk simulasi sesi
-    return 1
-                                                                              
-@app.route('/')
-@app.route('/web')
-@app.route('/web/dashboard')
-def web_dashboard():
-    user_id = get_current_user_id()
-    user_data = RunTrackerModel.get_user_data(user_id)
-    username = user_data.get('username') if user_data else 'Pelari'
+    @staticmethod
+    def _route_levels_final(lod_points):
+        """Level detail sudah dibuat (ingest inline / worker), atau run lama tanpa level yang tidak akan diproses lagi."""
+        return lod_points is None or ',' in lod_points
 
-    user_runs = RunTrackerModel.get_user_runs(user_id)
+    @staticmethod
+    def route_is_final(run_id):
+        """Run ada dan level detailnya final (satu HMGET); False untuk run yang tidak ada."""
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return False
+        stored_run_id, lod_points = redis_conn.hmget(RunTrackerModel.RUN_DETAIL.format(run_id), ['run_id', 'route_lod_points'])
+        return stored_run_id is not None and RunTrackerModel._route_levels_final(lod_points)
 
-    leaderboard = RunTrackerModel.get_global_leaderboard(count=5)
+    @staticmethod
+    def get_route_payload(run_id, max_points=None, tolerance=None):
+        """
+        Body respons /api/runs/<id>/route yang sudah dikompresi: {'level', 'final', 'encoded'}.
+        Untuk run final, payload per level disimpan di RUN_ROUTE_PAYLOAD sehingga rute hanya
+        di-decode, diserialisasi dan dikompresi sekali; run yang levelnya masih ditunda tidak disimpan.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        binary_conn = get_redis_binary_client()
+        if not redis_conn or not binary_conn:
+            return None
 
-    return render_template('dashboard.html',
-        user_runs=user_runs,
-        leaderboard=leaderboard,
-        username=username
-    )                                                                         
-@app.route('/web/register')
-def web_register():
-    return render_template('register.html')
+        try:
+            stored_run_id, lod_points = redis_conn.hmget(RunTrackerModel.RUN_DETAIL.format(run_id), ['run_id', 'route_lod_points'])
+            if stored_run_id is None:
+                return None
+            final = RunTrackerModel._route_levels_final(lod_points)
+            level = RunTrackerModel._select_route_level(lod_points, max_points=max_points, tolerance=tolerance)
+            key = RunTrackerModel.RUN_ROUTE_PAYLOAD.format(run_id, level)
+            if final:
+                stored = binary_conn.hgetall(key)
+                if stored:
+                    return {'level': level, 'final': True, 'encoded': {name.decode(): body for name, body in stored.items()}}
 
-@app.route('/web/login')                                                      
-def web_login():
-    return render_template('login.html')
-      
-@app.route('/web/run/<int:run_id>')                                           
-def web_run_detail(run_id):
-    run_detail = RunTrackerModel.get_run_detail(run_id)
+            route = RunTrackerModel.get_route_for_display(run_id, max_points=max_points, tolerance=tolerance)
+            if route is None:
+                return None
+            encoded = compress_payload(route_response_body(route))
+            if final:
+                pipe = binary_conn.pipeline(transaction=True)
+                pipe.hset(key, mapping=encoded)
+                pipe.expire(key, RunTrackerModel.ROUTE_PAYLOAD_TTL)
+                pipe.execute()
+            return {'level': route['level'], 'final': final, 'encoded': encoded}
+        except Exception as e:
+            print(f"Error retrieving route payload: {e}")
+            return None
 
-    if not run_detail:
-        return render_template('base.html', content="Error: Sesi lari tidak ditemukan")
-                                                                                  
-    user_data = RunTrackerModel.get_user_data(run_detail['user_id'])
-                                                                                  
-    return render_template('run_detail.html', run=run_detail, username=user_data.get('username'))
+    @staticmethod
+    def migrate_routes(batch_size=ROUTE_MIGRATION_BATCH):
+        """
+        Memindahkan route_data JSON lama dari hash run:{id} ke kunci biner run:{id}:route
+        (beserta level detail hasil simplifikasi).
+        Berjalan per batch (SCAN + pipeline) dan aman diulang; mengembalikan jumlah run yang dimigrasi.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
 
-@app.route('/web/start_run')
-def web_start_run():
-    user_id = get_current_user_id()
-    user_data = RunTrackerModel.get_user_data(user_id)
-    if not user_data:
-        return render_template('base.html', content=f"Pengguna ID {user_id} tidak ditemukan")
+        migrated = 0
+        batch = []
 
-    return render_template('start_run.html', user_id=user_id, username=user_data.get('username'))
+        def flush(keys):
+            pipe = redis_conn.pipeline(transaction=False)
+            for key in keys:
+                pipe.hget(key, 'route_data')
+            routes = pipe.execute()
 
-# --- 4. API Endpoint ---                                                     
-@app.route('/api/log_run', methods=['POST'])
-def api_log_run():
-    data = request.get_json()
+            pipe = redis_conn.pipeline(transaction=True)
+            count = 0
+            for key, route_json in zip(keys, routes):
+                if route_json is None:
+                    continue
+                try:
+                    lod_points, route_blobs = RunTrackerModel._encode_route_levels(load_route(route_json))
+                except (ValueError, TypeError, IndexError, KeyError) as e:
+                    print(f"Warning: Rute {key} tidak valid, dilewati: {e}")
+                    continue
+                pipe.set(f"{key}:route", route_blobs[0])
+                for level, blob in enumerate(route_blobs[1:], start=1):
+                    pipe.set(f"{key}:route:{level}", blob)
+                pipe.hset(key, 'route_lod_points', lod_points)
+                pipe.hdel(key, 'route_data')
+                count += 1
+            if count:
+                pipe.execute()
+            return count
+
+        for key in RunTrackerModel._scan_run_keys(redis_conn, batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                migrated += flush(batch)
+                batch = []
+        if batch:
+            migrated += flush(batch)
+
+        return migrated
+
+    @staticmethod
+    def _scan_run_keys(redis_conn, count):
+        """SCAN semua hash run:{id}, tanpa hash lain yang juga cocok dengan pola run:*."""
+        for key in redis_conn.scan_iter(match=RunTrackerModel.RUN_DETAIL.format('*'), count=count, _type='hash'):
+            if key_schema.RUN_DETAIL_KEY.match(key):
+                yield key
+
+    @staticmethod
+    def _is_older_than(timestamp, cutoff):
+        try:
+            run_time = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            return False
+        if run_time.tzinfo is not None:
+            run_time = run_time.astimezone().replace(tzinfo=None)
+        return run_time < cutoff
+
+    @staticmethod
+    def archive_routes(older_than_days=ROUTE_ARCHIVE_AFTER_DAYS, batch_size=ROUTE_ARCHIVE_BATCH, dry_run=False):
+        """
+        Memindahkan rute biner (semua level) run yang lebih tua dari older_than_days ke arsip disk.
+        Urutan per batch: tulis + fsync segmen, lalu simpan pointer route_archived dan hapus kunci rute
+        dalam satu MULTI; jika proses mati di tengah, record yatim di segmen aman dan run diarsip ulang.
+        Aman diulang. Mengembalikan ringkasan jumlah run dan byte Redis yang dibebaskan.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        binary_conn = get_redis_binary_client()
+        if not redis_conn or not binary_conn:
+            return None
+
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        report = {'scanned': 0, 'archived': 0, 'redis_bytes_freed': 0, 'dry_run': dry_run}
+        batch = []
+
+        def flush(keys):
+            pipe = redis_conn.pipeline(transaction=False)
+            for key in keys:
+                pipe.hmget(key, ['run_id', 'timestamp', 'route_lod_points', 'route_archived'])
+            rows = pipe.execute()
+
+            # Hanya run lama yang level detailnya sudah lengkap (bukan JSON lama / simplifikasi tertunda)
+            eligible = [
+                (key, run_id, lod_points.count(',') + 1)
+                for key, (run_id, timestamp, lod_points, archived) in zip(keys, rows)
+                if run_id is not None and archived is None and lod_points and ',' in lod_points
+                and RunTrackerModel._is_older_than(timestamp, cutoff)
+            ]
+            report['scanned'] += len(keys)
+            if not eligible:
+                return
+
+            pipe = binary_conn.pipeline(transaction=False)
+            for key, _, level_count in eligible:
+                pipe.get(f"{key}:route")
+                for level in range(1, level_count):
+                    pipe.get(f"{key}:route:{level}")
+            values = iter(pipe.execute())
+            records = []
+            for key, run_id, level_count in eligible:
+                blobs = [next(values) for _ in range(level_count)]
+                if any(blob is None for blob in blobs):
+                    print(f"Warning: Rute {key} tidak lengkap, dilewati.")
+                    continue
+                records.append((key, run_id, blobs))
+            report['archived'] += len(records)
+            report['redis_bytes_freed'] += sum(len(blob) for _, _, blobs in records for blob in blobs)
+            if dry_run or not records:
+                return
+
+            pointers = RunTrackerModel.ROUTE_ARCHIVE.append([(run_id, blobs) for _, run_id, blobs in records])
+            pipe = redis_conn.pipeline(transaction=True)
+            for key, run_id, blobs in records:
+                pipe.hset(key, 'route_archived', pointers[run_id])
+                pipe.delete(f"{key}:route", *(f"{key}:route:{level}" for level in range(1, len(blobs))))
+                pipe.delete(*(f"{key}:route:payload:{level}" for level in range(len(blobs))))
+            pipe.execute()
+
+        for key in RunTrackerModel._scan_run_keys(redis_conn, batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+        report['archive'] = RunTrackerModel.ROUTE_ARCHIVE.stats()
+        return report
+
+    @staticmethod
+    def get_schema_version():
+        """Versi skema data di Redis (1 jika migrate-schema belum pernah selesai)."""
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+        return int(redis_conn.get(key_schema.SCHEMA_VERSION_KEY) or 1)
+
+    @staticmethod
+    def _migrate_usernames(redis_conn, keys):
+        """user:username:<nama> (string) -> ember users:by_name:<n>; HSETNX agar pendaftaran baru tidak tertimpa."""
+        pipe = redis_conn.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+        user_ids = pipe.execute()
+
+        prefix_length = len(key_schema.LEGACY_USERNAME_KEY.format(''))
+        pipe = redis_conn.pipeline(transaction=True)
+        count = 0
+        for key, user_id in zip(keys, user_ids):
+            if user_id is None:
+                continue
+            username = key[prefix_length:]
+            pipe.hsetnx(username_index_key(username), username, user_id)
+            pipe.delete(key)
+            count += 1
+        if count:
+            pipe.execute()
+        return count
+
+    @staticmethod
+    def _migrate_run_fields(redis_conn, keys):
+        """Menulis ulang field angka hash run dalam bentuk ringkas dan menghapus field bernilai default."""
+        fields = tuple(key_schema.RUN_FIELD_DIGITS) + tuple(key_schema.RUN_FIELD_DEFAULTS)
+        pipe = redis_conn.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(key, fields)
+        rows = pipe.execute()
+
+        pipe = redis_conn.pipeline(transaction=False)
+        count = 0
+        for key, values in zip(keys, rows):
+            current = {field: value for field, value in zip(fields, values) if value is not None}
+            source = dict(current)
+            if source.get('splits_sec'):
+                try:
+                    source['splits_sec'] = json.loads(source['splits_sec'])
+                except ValueError:
+                    pass
+            encoded = encode_run_fields(source)
+            changed = {field: value for field, value in encoded.items() if current[field] != value}
+            dropped = [field for field in current if field not in encoded]
+            if changed:
+                pipe.hset(key, mapping=changed)
+            if dropped:
+                pipe.hdel(key, *dropped)
+            if changed or dropped:
+                count += 1
+        if count:
+            pipe.execute()
+        return count
+
+    # Mengubah field jarak float v1 sebuah hash statistik menjadi integer meter, atomik terhadap add_run.
+    # KEYS: hash statistik. Mengembalikan jumlah field yang dikonversi.
+    STATS_MIGRATE_SCRIPT = """
+local converted = 0
+local fields = redis.call('HGETALL', KEYS[1])
+for i = 1, #fields, 2 do
+    local field = fields[i]
+    local meters = math.floor(tonumber(fields[i + 1]) * 1000 + 0.5)
+    if field == 'total_distance_km' or string.sub(field, -12) == ':distance_km' then
+        redis.call('HINCRBY', KEYS[1], string.sub(field, 1, -3) .. 'm', meters)
+        redis.call('HDEL', KEYS[1], field)
+        converted = converted + 1
+    elseif field == 'longest_run_km' then
+        if meters > tonumber(redis.call('HGET', KEYS[1], 'longest_run_m') or '-1') then
+            redis.call('HSET', KEYS[1], 'longest_run_m', meters)
+        end
+        redis.call('HDEL', KEYS[1], field)
+        converted = converted + 1
+    end
+end
+return converted
+"""
+    _stats_migrate_script_cache = {}
+
+    @staticmethod
+    def _legacy_stats_fields(values):
+        """{field v1: field v2} untuk field jarak km di sebuah hash statistik."""
+        return {
+            field: field[:-2] + 'm'
+            for field in values
+            if field in ('total_distance_km', 'longest_run_km') or field.endswith(':distance_km')
+        }
+
+    @staticmethod
+    def _migrate_stats_key_pipeline(redis_conn, key):
+        """Fallback tanpa Lua untuk STATS_MIGRATE_SCRIPT: WATCH + MULTI per kunci."""
+        with redis_conn.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    values = pipe.hgetall(key)
+                    legacy = RunTrackerModel._legacy_stats_fields(values)
+                    if not legacy:
+                        return 0
+                    pipe.multi()
+                    for field, target in legacy.items():
+                        meters = km_to_m(values[field])
+                        if field == 'longest_run_km':
+                            if meters > int(values.get('longest_run_m') or -1):
+                                pipe.hset(key, 'longest_run_m', meters)
+                        else:
+                            pipe.hincrby(key, target, meters)
+                    pipe.hdel(key, *legacy)
+                    pipe.execute()
+                    return len(legacy)
+                except redis.exceptions.WatchError:
+                    continue
+
+    @staticmethod
+    def _migrate_stats(redis_conn, keys):
+        if RunTrackerModel.SCRIPTING_AVAILABLE:
+            script = RunTrackerModel._stats_migrate_script_cache.get(id(redis_conn))
+            if script is None:
+                script = redis_conn.register_script(RunTrackerModel.STATS_MIGRATE_SCRIPT)
+                RunTrackerModel._stats_migrate_script_cache[id(redis_conn)] = script
+            pipe = redis_conn.pipeline(transaction=False)
+            for key in keys:
+                script(keys=[key], client=pipe)
+            try:
+                return sum(1 for converted in pipe.execute() if converted)
+            except redis.exceptions.ResponseError as e:
+                if not RunTrackerModel._scripting_disabled(e):
+                    raise
+        return sum(1 for key in keys if RunTrackerModel._migrate_stats_key_pipeline(redis_conn, key))
+
+    # Fase migrate-schema: (nama, pola SCAN, tipe kunci, handler batch, regex penyaring kunci atau None)
+    SCHEMA_MIGRATION_PHASES = (
+        ('usernames', key_schema.LEGACY_USERNAME_KEY.format('*'), 'string', '_migrate_usernames', None),
+        ('runs', key_schema.RUN_DETAIL.format('*'), 'hash', '_migrate_run_fields', key_schema.RUN_DETAIL_KEY),
+        ('stats', key_schema.USER_STATS.format('*') + '*', 'hash', '_migrate_stats', None)
+    )
+    SCHEMA_MIGRATION_BATCH = 500
+
+    @staticmethod
+    def migrate_schema(batch_size=SCHEMA_MIGRATION_BATCH, reset=False, progress=None):
+        """
+        Migrasi online skema v1 -> v2, fase demi fase (SCAN + pipeline per batch).
+        Fase, cursor SCAN dan jumlah kunci disimpan di hash schema:migration setelah setiap batch,
+        sehingga migrasi yang terputus dilanjutkan dari batch terakhir. Semua konversi idempoten dan
+        aplikasi membaca kedua format selama migrasi berjalan. progress(state) dipanggil per batch.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        if reset:
+            redis_conn.delete(key_schema.SCHEMA_MIGRATION_KEY)
+        state = redis_conn.hgetall(key_schema.SCHEMA_MIGRATION_KEY)
+        if state.get('phase') == 'done':
+            return state
+
+        names = [phase[0] for phase in RunTrackerModel.SCHEMA_MIGRATION_PHASES]
+        first = names.index(state['phase']) if state.get('phase') in names else 0
+        state.setdefault('started_at', datetime.now().isoformat())
+        for name, pattern, key_type, handler, key_filter in RunTrackerModel.SCHEMA_MIGRATION_PHASES[first:]:
+            cursor = int(state.get('cursor') or 0) if state.get('phase') == name else 0
+            state['phase'] = name
+            while True:
+                cursor, keys = redis_conn.scan(cursor=cursor, match=pattern, count=batch_size, _type=key_type)
+                if key_filter is not None:
+                    keys = [key for key in keys if key_filter.match(key)]
+                converted = getattr(RunTrackerModel, handler)(redis_conn, keys) if keys else 0
+                state['cursor'] = cursor
+                state[f"{name}_scanned"] = int(state.get(f"{name}_scanned") or 0) + len(keys)
+                state[f"{name}_converted"] = int(state.get(f"{name}_converted") or 0) + converted
+                redis_conn.hset(key_schema.SCHEMA_MIGRATION_KEY, mapping=state)
+                if progress:
+                    progress(dict(state))
+                if cursor == 0:
+                    break
+
+        state.update(phase='done', cursor=0, finished_at=datetime.now().isoformat())
+        pipe = redis_conn.pipeline(transaction=True)
+        pipe.hset(key_schema.SCHEMA_MIGRATION_KEY, mapping=state)
+        pipe.set(key_schema.SCHEMA_VERSION_KEY, key_schema.SCHEMA_VERSION)
+        pipe.execute()
+        return state
+
+    # Kelompok kunci pada laporan memori: (nama, pola SCAN, tipe kunci, regex penyaring kunci atau None)
+    MEMORY_REPORT_GROUPS = (
+        ('usernames v1', key_schema.LEGACY_USERNAME_KEY.format('*'), 'string', None),
+        ('usernames v2', key_schema.USERNAME_INDEX.format('*'), 'hash', None),
+        ('users', key_schema.USER_KEY.format('*'), 'hash', None),
+        ('runs', key_schema.RUN_DETAIL.format('*'), 'hash', key_schema.RUN_DETAIL_KEY),
+        ('stats', key_schema.USER_STATS.format('*') + '*', 'hash', None)
+    )
+    MEMORY_REPORT_SAMPLE = 200
+
+    @staticmethod
+    def schema_memory_report(sample_size=MEMORY_REPORT_SAMPLE):
+        """
+        used_memory server, lalu per kelompok kunci: jumlah kunci (SCAN penuh), rata-rata MEMORY USAGE
+        dan encoding dari sampel, serta perkiraan total. Kunci models.py lama dihitung terpisah.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        report = {'schema_version': RunTrackerModel.get_schema_version(), 'used_memory': None, 'groups': []}
+        try:
+            report['used_memory'] = int(redis_conn.info('memory').get('used_memory', 0))
+        except redis.exceptions.ResponseError as e:
+            print(f"Warning: INFO memory tidak tersedia: {e}")
+        for name, pattern, key_type, key_filter in RunTrackerModel.MEMORY_REPORT_GROUPS:
+            count = 0
+            sample = []
+            for key in redis_conn.scan_iter(match=pattern, count=1000, _type=key_type):
+                if key_filter is not None and not key_filter.match(key):
+                    continue
+                count += 1
+                if len(sample) < sample_size:
+                    sample.append(key)
+
+            group = {'name': name, 'keys': count, 'sampled': len(sample), 'avg_bytes': None, 'estimated_bytes': None, 'encodings': {}}
+            if sample:
+                try:
+                    pipe = redis_conn.pipeline(transaction=False)
+                    for key in sample:
+                        pipe.memory_usage(key, samples=0)
+                        pipe.object('encoding', key)
+                    results = pipe.execute()
+                    usages = [usage for usage in results[0::2] if usage is not None]
+                    if usages:
+                        group['avg_bytes'] = round(sum(usages) / len(usages), 1)
+                        group['estimated_bytes'] = int(group['avg_bytes'] * count)
+                    for encoding in results[1::2]:
+                        group['encodings'][encoding] = group['encodings'].get(encoding, 0) + 1
+                except redis.exceptions.ResponseError as e:
+                    # Mis. MEMORY/OBJECT dinonaktifkan (rename-command) di Redis terkelola
+                    print(f"Warning: MEMORY USAGE tidak tersedia: {e}")
+            report['groups'].append(group)
+
+        # Tulisan models.py versi lama (user:<id>, emails, leaderboard:total_distance, global:*_counter)
+        legacy_users = sum(
+            1 for key in redis_conn.scan_iter(match='user:*', count=1000, _type='hash') if key.count(':') == 1
+        )
+        report['legacy_models_keys'] = legacy_users + redis_conn.exists(*key_schema.LEGACY_MODELS_KEYS)
+        return report
+
+    @staticmethod
+    def _parse_run_summary(values):
+        """Mengubah hasil HMGET (urutan RUN_SUMMARY_FIELDS) menjadi dict bertipe."""
+        summary = dict(zip(RunTrackerModel.RUN_SUMMARY_FIELDS, values))
+        if not summary.get('run_id'):
+            return None
+
+        return {
+            'run_id': int(summary['run_id']),
+            'user_id': int(summary['user_id']),
+            'timestamp': summary.get('timestamp'),
+            'duration_sec': int(summary.get('duration_sec') or 0),
+            'distance_km': float(summary.get('distance_km') or 0.0),
+            'average_pace': float(summary.get('average_pace') or 0.0),
+            'total_steps': int(summary.get('total_steps') or 0),
+            'moving_time_sec': int(summary.get('moving_time_sec') or summary.get('duration_sec') or 0),
+            'cadence_spm': float(summary.get('cadence_spm') or 0.0)
+        }
+
+    @staticmethod
+    def _cached_summaries(run_ids):
+        """Memisahkan run_ids menjadi ({run_id: ringkasan} dari RUN_SUMMARY_CACHE, [run_id yang harus di-HMGET])."""
+        cached = {}
+        missing = []
+        for run_id in run_ids:
+            summary = RunTrackerModel.RUN_SUMMARY_CACHE.get(str(run_id))
+            if summary is None:
+                missing.append(run_id)
+            else:
+                cached[str(run_id)] = summary
+        return cached, missing
+
+    @staticmethod
+    def _merge_summaries(run_ids, cached, missing, rows):
+        """
+        Mem-parse baris HMGET run yang belum ada di cache (lalu menyimpannya) dan mengembalikan
+        ringkasan sesuai urutan run_ids. Dipakai model sync & async agar hasilnya identik.
+        """
+        for run_id, values in zip(missing, rows):
+            try:
+                summary = RunTrackerModel._parse_run_summary(values)
+                if summary:
+                    RunTrackerModel.RUN_SUMMARY_CACHE.set(str(run_id), summary)
+                    cached[str(run_id)] = summary
+            except (TypeError, ValueError) as e:
+                print(f"Warning: Gagal membaca ringkasan run: {e}")
+
+        return [dict(cached[str(run_id)]) for run_id in run_ids if str(run_id) in cached]
+
+    @staticmethod
+    def get_run_summaries(run_ids):
+        """
+        Mengambil ringkasan beberapa run sekaligus (tanpa route_data). Ringkasan run tidak berubah
+        setelah add_run, jadi dibaca dari RUN_SUMMARY_CACHE; yang belum ada diambil dalam satu pipeline HMGET.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn or not run_ids:
+            return []
+
+        RunTrackerModel._ensure_cache_listener(redis_conn)
+        cached, missing = RunTrackerModel._cached_summaries(run_ids)
+
+        rows = []
+        if missing:
+            pipe = redis_conn.pipeline(transaction=False)
+            for run_id in missing:
+                pipe.hmget(RunTrackerModel.RUN_DETAIL.format(run_id), RunTrackerModel.RUN_SUMMARY_FIELDS)
+            rows = pipe.execute()
+
+        return RunTrackerModel._merge_summaries(run_ids, cached, missing, rows)
+
+    @staticmethod
+    def _runs_page_range(cursor, limit):
+        """
+        Argumen (start, stop) LRANGE untuk satu halaman riwayat. Cursor None = halaman terbaru;
+        indeks negatif LRANGE dihitung dari ujung kanan list (run paling lama).
+        """
+        if cursor is None:
+            return 0, limit - 1
+        cursor = int(cursor)
+        low = max(cursor - limit + 1, 0)
+        return -(cursor + 1), -(low + 1)
+
+    @staticmethod
+    def _runs_page_next_cursor(total, cursor, fetched):
+        """Cursor halaman berikutnya dari LLEN dan jumlah run_id yang didapat LRANGE (None jika habis)."""
+        high = total - 1 if cursor is None else min(int(cursor), total - 1)
+        low = high - fetched + 1
+        return low - 1 if fetched and low > 0 else None
+
+    @staticmethod
+    def get_user_runs_page(user_id, cursor=None, limit=RUNS_PAGE_DEFAULT):
+        """
+        Mengambil satu halaman riwayat lari (terbaru lebih dulu) berbasis cursor.
+
+        Cursor adalah posisi run dihitung dari run paling lama (ujung kanan list),
+        sehingga tetap stabil walaupun run baru di-LPUSH saat pengguna sedang paging.
+        Biaya per halaman O(limit): satu pipeline LLEN+LRANGE dan satu pipeline HMGET.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        limit = max(1, min(int(limit), RunTrackerModel.RUNS_PAGE_MAX))
+        list_key = RunTrackerModel.USER_RUNS.format(user_id)
+
+        try:
+            pipe = redis_conn.pipeline(transaction=False)
+            pipe.llen(list_key)
+            pipe.lrange(list_key, *RunTrackerModel._runs_page_range(cursor, limit))
+            total, run_ids = pipe.execute()
+
+            return {
+                'runs': RunTrackerModel.get_run_summaries(run_ids),
+                'total': total,
+                'next_cursor': RunTrackerModel._runs_page_next_cursor(total, cursor, len(run_ids))
+            }
+        except Exception as e:
+            print(f"Error retrieving run history page: {e}")
+            return None
+
+    @staticmethod
+    def export_range(user_id, start=0, end=None):
+        """
+        Rentang posisi ekspor (dihitung dari run paling lama, seperti cursor riwayat): (start, end, total).
+        end inklusif dan dibatasi total saat ini, sehingga run yang ditambahkan selama ekspor tidak ikut.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+        total = redis_conn.llen(RunTrackerModel.USER_RUNS.format(user_id))
+        end = total - 1 if end is None else min(int(end), total - 1)
+        return int(start), end, total
+
+    @staticmethod
+    def iter_user_runs(user_id, start, end, with_routes=False, chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Generator (position, ringkasan, route_data|None) untuk posisi start..end, paling lama lebih dulu.
+        Dibaca per chunk (LRANGE + pipeline HMGET/GET) tanpa melewati RUN_SUMMARY_CACHE, agar ekspor
+        riwayat panjang tidak mengusir entri cache yang sedang dipakai; memori terbatas pada satu chunk.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        binary_conn = get_redis_binary_client() if with_routes else None
+        if not redis_conn or (with_routes and not binary_conn):
+            raise ConnectionError("Koneksi Redis gagal saat ekspor.")
+
+        list_key = RunTrackerModel.USER_RUNS.format(user_id)
+        fields = RunTrackerModel.RUN_SUMMARY_FIELDS + (('route_data', 'route_archived') if with_routes else ())
+        for low in range(start, end + 1, chunk_size):
+            high = min(low + chunk_size - 1, end)
+            # Indeks negatif LRANGE dihitung dari ujung kanan (run paling lama); dibalik agar urut naik
+            run_ids = redis_conn.lrange(list_key, -(high + 1), -(low + 1))[::-1]
+
+            pipe = redis_conn.pipeline(transaction=False)
+            for run_id in run_ids:
+                pipe.hmget(RunTrackerModel.RUN_DETAIL.format(run_id), fields)
+            rows = pipe.execute()
+
+            blobs = [None] * len(run_ids)
+            if with_routes:
+                pipe = binary_conn.pipeline(transaction=False)
+                for run_id in run_ids:
+                    pipe.get(RunTrackerModel.RUN_ROUTE.format(run_id))
+                blobs = pipe.execute()
+
+            for position, run_id, values, blob in zip(range(low, high + 1), run_ids, rows, blobs):
+                summary = RunTrackerModel._parse_run_summary(values)
+                if summary is None:
+                    continue
+                route = None
+                if with_routes:
+                    legacy_route, archived = values[-2:]
+                    if legacy_route is not None:
+                        route = load_route(legacy_route)
+                    elif blob is None and archived is not None:
+                        archived_blobs = RunTrackerModel._archived_route_blobs(run_id, archived)
+                        route = load_route(archived_blobs[0] if archived_blobs else None)
+                    else:
+                        route = load_route(blob)
+                yield position, summary, route
+
+    @staticmethod
+    def get_nearby_runs(lat, lng, radius_m=None, width_m=None, height_m=None, anchor='start',
+                        min_km=None, max_km=None, cursor=0, limit=RUNS_PAGE_DEFAULT):
+        """
+        Run di sekitar sebuah titik (radius atau kotak width_m x height_m), terdekat lebih dulu.
+
+        GEOSEARCH hanya memeriksa sel geohash di sekitar area pencarian, sehingga biayanya
+        bergantung pada kepadatan run di area itu, bukan jumlah seluruh run. Filter jarak run
+        (min_km/max_km) diterapkan pada ringkasan dari RUN_SUMMARY_CACHE. Cursor adalah jumlah
+        kandidat (urut jarak) yang sudah dilewati halaman sebelumnya.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        limit = max(1, min(int(limit), RunTrackerModel.RUNS_PAGE_MAX))
+        area = {'radius': radius_m} if radius_m is not None else {'width': width_m, 'height': height_m}
+        key = RunTrackerModel.RUN_GEO.format(anchor)
+
+        try:
+            runs = []
+            position = cursor
+            candidates = []
+            exhausted = False
+            while len(runs) < limit:
+                if position >= len(candidates):
+                    if exhausted or position >= RunTrackerModel.NEARBY_SCAN_MAX:
+                        break
+                    # COUNT membatasi kandidat yang diurutkan & dikirim; diperbesar per batch bila filter membuang banyak run
+                    count = min(position + max(limit * 2, RunTrackerModel.NEARBY_SCAN_BATCH), RunTrackerModel.NEARBY_SCAN_MAX)
+                    candidates = redis_conn.geosearch(
+                        key, longitude=lng, latitude=lat, unit='m', sort='ASC', count=count, withdist=True, **area
+                    )
+                    exhausted = len(candidates) < count
+                    if position >= len(candidates):
+                        break
+
+                batch = candidates[position:position + limit - len(runs)]
+                summaries = {
+                    summary['run_id']: summary
+                    for summary in RunTrackerModel.get_run_summaries([run_id for run_id, _ in batch])
+                }
+                for run_id, distance_m in batch:
+                    position += 1
+                    summary = summaries.get(int(run_id))
+                    if summary is None:
+                        continue
+                    if min_km is not None and summary['distance_km'] < min_km:
+                        continue
+                    if max_km is not None and summary['distance_km'] > max_km:
+                        continue
+                    runs.append({**summary, 'distance_m': round(float(distance_m), 1)})
+
+            has_more = position < len(candidates) or (not exhausted and position < RunTrackerModel.NEARBY_SCAN_MAX)
+            return {
+                'anchor': anchor,
+                'runs': runs,
+                'next_cursor': position if runs and has_more else None
+            }
+        except Exception as e:
+            print(f"Error searching nearby runs: {e}")
+            return None
+
+    @staticmethod
+    def rebuild_geo_index(batch_size=GEO_REBUILD_BATCH):
+        """
+        Mengisi indeks GEO untuk run yang sudah ada (SCAN run:{id} + pipeline per batch).
+        Aman diulang: GEOADD menimpa posisi member yang sama. Mengembalikan jumlah run yang diindeks.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        binary_conn = get_redis_binary_client()
+        if not redis_conn or not binary_conn:
+            return None
+
+        indexed = 0
+        batch = []
+
+        def flush(keys):
+            pipe = redis_conn.pipeline(transaction=False)
+            for key in keys:
+                pipe.hmget(key, ['run_id', 'route_data', 'route_archived'])
+            rows = pipe.execute()
+
+            pipe = binary_conn.pipeline(transaction=False)
+            for key in keys:
+                pipe.get(f"{key}:route")
+            blobs = pipe.execute()
+
+            pipe = redis_conn.pipeline(transaction=False)
+            count = 0
+            for key, (run_id, legacy_route, archived), blob in zip(keys, rows, blobs):
+                if run_id is None:
+                    continue
+                try:
+                    if blob is None and archived is not None:
+                        blob = (RunTrackerModel._archived_route_blobs(run_id, archived) or [None])[0]
+                    points = RunTrackerModel._route_geo_points(load_route(legacy_route if legacy_route is not None else blob))
+                except (ValueError, TypeError, IndexError, KeyError) as e:
+                    print(f"Warning: Rute {key} tidak valid, dilewati: {e}")
+                    continue
+                if points is None:
+                    continue
+                for anchor, (lng, lat) in zip(RunTrackerModel.GEO_ANCHORS, points):
+                    pipe.geoadd(RunTrackerModel.RUN_GEO.format(anchor), [lng, lat, run_id])
+                count += 1
+            if count:
+                pipe.execute()
+            return count
+
+        for key in RunTrackerModel._scan_run_keys(redis_conn, batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                indexed += flush(batch)
+                batch = []
+        if batch:
+            indexed += flush(batch)
+
+        return indexed
+
+
+    @staticmethod
+    def _leaderboard_summary(run_id, user_id, username, average_pace, timestamp):
+        """Menyusun ringkasan run yang disimpan di hash LEADERBOARD_SUMMARY."""
+        return {
+            'run_id': int(run_id),
+            'user_id': int(user_id),
+            'username': username or f"Runner {user_id}",
+            'average_pace': float(average_pace or 0.0),
+            'timestamp': timestamp
+        }
+
+    @staticmethod
+    def _build_leaderboard(redis_conn, count):
+        """
+        Merangkai top-N leaderboard dengan lookup batch (tanpa N+1).
+        Entri lama yang belum punya ringkasan di-backfill sekali dari run & user hash.
+        """
+        leaderboard_raw = redis_conn.zrevrange(RunTrackerModel.GLOBAL_LEADERBOARD, 0, count - 1, withscores=True)
+        if not leaderboard_raw:
+            return []
+
+        members = [member for member, _ in leaderboard_raw]
+        summaries = redis_conn.hmget(RunTrackerModel.LEADERBOARD_SUMMARY, members)
+
+        missing = [member for member, summary in zip(members, summaries) if not summary]
+        backfilled = {}
+        if missing:
+            pipe = redis_conn.pipeline(transaction=False)
+            for member in missing:
+                user_id_str, run_id_str = member.split(':')
+                pipe.hmget(RunTrackerModel.RUN_DETAIL.format(run_id_str), ['average_pace', 'timestamp'])
+                pipe.hget(RunTrackerModel.USER_KEY.format(user_id_str), 'username')
+            results = pipe.execute()
+
+            for index, member in enumerate(missing):
+                (average_pace, timestamp), username = results[2 * index], results[2 * index + 1]
+                if timestamp is None:
+                    continue
+                user_id_str, run_id_str = member.split(':')
+                backfilled[member] = RunTrackerModel._leaderboard_summary(
+                    run_id_str, user_id_str, username, average_pace, timestamp
+                )
+
+            if backfilled:
+                redis_conn.hset(
+                    RunTrackerModel.LEADERBOARD_SUMMARY,
+                    mapping={member: json.dumps(summary) for member, summary in backfilled.items()}
+                )
+
+        leaderboard = []
+        for (member, distance), summary_json in zip(leaderboard_raw, summaries):
+            try:
+                summary = json.loads(summary_json) if summary_json else backfilled.get(member)
+                if not summary:
+                    continue
+                leaderboard.append({
+                    'run_id': summary['run_id'],
+                    'username': summary['username'],
+                    'distance': float(distance),
+                    'average_pace': summary['average_pace'],
+                    'timestamp': summary['timestamp']
+                })
+            except Exception as e:
+                print(f"Error parsing leaderboard entry: {e}")
+
+        return leaderboard
+
+    @staticmethod
+    def get_global_leaderboard(count=5):
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return []
+
+        try:
+            if count > RunTrackerModel.LEADERBOARD_CACHE_SIZE:
+                return RunTrackerModel._build_leaderboard(redis_conn, count)
+
+            cached = redis_conn.get(RunTrackerModel.LEADERBOARD_CACHE)
+            if cached is not None:
+                return json.loads(cached)[:count]
+
+            leaderboard = RunTrackerModel._build_leaderboard(redis_conn, RunTrackerModel.LEADERBOARD_CACHE_SIZE)
+            redis_conn.set(
+                RunTrackerModel.LEADERBOARD_CACHE,
+                json.dumps(leaderboard),
+                ex=RunTrackerModel.LEADERBOARD_CACHE_TTL
+            )
+            return leaderboard[:count]
+        except Exception as e:
+            print(f"Error retrieving leaderboard: {e}")
+            return []
+
+class RunSessionModel:
+    """
+    Ingest GPS bertahap selama lari: klien mengirim batch titik kecil ber-nomor urut (seq)
+    ke Redis Stream, lalu finish membangun run lewat RunTrackerModel.add_run.
+    """
+    SESSION_ID_COUNTER = 'run_session_id_counter'
+    SESSION_KEY = 'run_session:{}'
+    SESSION_POINTS = 'run_session:{}:points'
+    SESSION_TTL = 6 * 3600
+    SESSION_READ_CHUNK = 500
+    MAX_POINTS_PER_BATCH = 1000
+
+    # Append idempoten: seq <= last_seq diabaikan (retry), seq > last_seq + 1 ditolak (ada batch hilang).
+    # KEYS: session hash, points stream
+    # ARGV: seq, points JSON, jumlah titik, delta jarak (m), lat terakhir, lng terakhir, TTL
+    APPEND_SCRIPT = """
+local session = redis.call('HMGET', KEYS[1], 'last_seq', 'status')
+if not session[1] then
+    return {-1, 0}
+end
+if session[2] ~= 'active' then
+    return {-2, tonumber(session[1])}
+end
+local last_seq = tonumber(session[1])
+local seq = tonumber(ARGV[1])
+if seq <= last_seq then
+    return {0, last_seq}
+end
+if seq > last_seq + 1 then
+    return {-3, last_seq}
+end
+redis.call('XADD', KEYS[2], '*', 'seq', ARGV[1], 'points', ARGV[2])
+redis.call('HSET', KEYS[1], 'last_seq', seq, 'last_lat', ARGV[5], 'last_lng', ARGV[6])
+redis.call('HINCRBY', KEYS[1], 'point_count', ARGV[3])
+redis.call('HINCRBYFLOAT', KEYS[1], 'distance_m', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[7])
+redis.call('EXPIRE', KEYS[2], ARGV[7])
+return {1, seq}
+"""
+    _append_script_cache = {}
+
+    @staticmethod
+    def start_session(user_id):
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        try:
+            session_id = redis_conn.incr(RunSessionModel.SESSION_ID_COUNTER)
+            session_key = RunSessionModel.SESSION_KEY.format(session_id)
+            pipe = redis_conn.pipeline(transaction=True)
+            pipe.hset(session_key, mapping={
+                'session_id': session_id,
+                'user_id': int(user_id),
+                'started_at': datetime.now().isoformat(),
+                'status': 'active',
+                'last_seq': 0,
+                'point_count': 0,
+                'distance_m': 0
+            })
+            pipe.expire(session_key, RunSessionModel.SESSION_TTL)
+            pipe.execute()
+            return session_id
+        except Exception as e:
+            print(f"Error starting run session: {e}")
+            return None
+
+    @staticmethod
+    def get_session(session_id):
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        data = redis_conn.hgetall(RunSessionModel.SESSION_KEY.format(session_id))
+        if not data:
+            return None
+
+        return {
+            'session_id': int(session_id),
+            'user_id': int(data['user_id']),
+            'started_at': data.get('started_at'),
+            'status': data.get('status'),
+            'last_seq': int(data.get('last_seq') or 0),
+            'point_count': int(data.get('point_count') or 0),
+            'distance_km': round(float(data.get('distance_m') or 0) / 1000.0, 3),
+            'run_id': int(data['run_id']) if data.get('run_id') else None
+        }
+
+    @staticmethod
+    def append_points(session_id, seq, points):
+        """
+        Menambah satu batch titik. Jarak bertambah dihitung dari titik terakhir sesi,
+        dan script memastikan batch dengan seq yang sama tidak tercatat dua kali.
+        Mengembalikan (status, last_seq): 'accepted', 'duplicate', 'gap', 'closed' atau 'not_found'.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None, None
+
+        session_key = RunSessionModel.SESSION_KEY.format(session_id)
+        lats, lngs, _ = route_columns(points)
+        if not lats:
+            raise ValueError("Batch titik kosong")
+
+        last_lat, last_lng = redis_conn.hmget(session_key, ['last_lat', 'last_lng'])
+        if last_lat is not None:
+            lats_with_prev = [float(last_lat)] + lats
+            lngs_with_prev = [float(last_lng)] + lngs
+        else:
+            lats_with_prev, lngs_with_prev = lats, lngs
+        delta_m = float(haversine_m(np.asarray(lats_with_prev), np.asarray(lngs_with_prev)).sum())
+
+        script = RunSessionModel._append_script_cache.get(id(redis_conn))
+        if script is None:
+            script = redis_conn.register_script(RunSessionModel.APPEND_SCRIPT)
+            RunSessionModel._append_script_cache[id(redis_conn)] = script
+
+        code, last_seq = script(
+            keys=[session_key, RunSessionModel.SESSION_POINTS.format(session_id)],
+            args=[int(seq), json.dumps(points), len(lats), delta_m, lats[-1], lngs[-1], RunSessionModel.SESSION_TTL],
+            client=redis_conn
+        )
+        status = {1: 'accepted', 0: 'duplicate', -1: 'not_found', -2: 'closed', -3: 'gap'}[int(code)]
+        return status, int(last_seq)
+
+    @staticmethod
+    def _read_points(redis_conn, session_id):
+        """Membaca seluruh batch titik dari stream per chunk (XRANGE ... COUNT)."""
+        stream_key = RunSessionModel.SESSION_POINTS.format(session_id)
+        points = []
+        start = '-'
+        while True:
+            entries = redis_conn.xrange(stream_key, min=start, max='+', count=RunSessionModel.SESSION_READ_CHUNK)
+            for _, fields in entries:
+                points.extend(json.loads(fields['points']))
+            if len(entries) < RunSessionModel.SESSION_READ_CHUNK:
+                return points
+            start = '(' + entries[-1][0]
+
+    @staticmethod
+    def finish_session(session_id, duration_sec, total_steps):
+        """
+        Menutup sesi dan menyimpan run lewat add_run. Aman dipanggil ulang:
+        sesi yang sudah selesai mengembalikan run_id yang sama.
+        ID run dipesan (reserved_run_id) sebelum langkah yang bisa gagal, dan add_run dengan ID itu idempoten,
+        sehingga retry setelah gagal di tengah jalan tidak membuat run ganda.
+        Mengembalikan (status, run_id): 'finished', 'in_progress', 'not_found' atau 'error'.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return 'error', None
+
+        session_key = RunSessionModel.SESSION_KEY.format(session_id)
+        session = RunSessionModel.get_session(session_id)
+        if not session:
+            return 'not_found', None
+        if session['run_id']:
+            return 'finished', session['run_id']
+        if not redis_conn.hsetnx(session_key, 'finishing', 1):
+            return 'in_progress', None
+
+        run_id = None
+        try:
+            redis_conn.hset(session_key, 'status', 'finishing')
+            run_id = redis_conn.hget(session_key, 'reserved_run_id')
+            if run_id is None:
+                run_id = RunTrackerModel._allocate_run_ids(redis_conn)[0]
+                redis_conn.hset(session_key, 'reserved_run_id', run_id)
+            run_id = int(run_id)
+
+            route_data = RunSessionModel._read_points(redis_conn, session_id)
+            analytics = analyze_route(route_data, duration_sec, total_steps)
+            distance_km = analytics['distance_km'] if analytics['point_count'] >= 2 else session['distance_km']
+
+            stored_run_id = RunTrackerModel.add_run(
+                session['user_id'],
+                duration_sec,
+                distance_km,
+                RunTrackerModel.calculate_pace(int(duration_sec), distance_km),
+                route_data,
+                total_steps,
+                analytics=analytics,
+                run_id=run_id
+            )
+            if not stored_run_id:
+                raise RuntimeError("add_run gagal")
+
+            pipe = redis_conn.pipeline(transaction=True)
+            pipe.hset(session_key, mapping={'status': 'finished', 'run_id': run_id})
+            pipe.delete(RunSessionModel.SESSION_POINTS.format(session_id))
+            pipe.execute()
+            return 'finished', run_id
+        except Exception as e:
+            print(f"Error finishing run session: {e}")
+            try:
+                # Sesi hanya dibuka kembali jika run belum tersimpan; jika sudah, retry cukup menuntaskan serah terima
+                if run_id is None or not redis_conn.exists(RunTrackerModel.RUN_DETAIL.format(run_id)):
+                    redis_conn.hset(session_key, 'status', 'active')
+                redis_conn.hdel(session_key, 'finishing')
+            except Exception as cleanup_error:
+                print(f"Error releasing run session {session_id}: {cleanup_error}")
+            return 'error', None
+
+
+class SegmentModel:
+    """
+    Segmen ala Strava: polyline tetap yang dicocokkan dengan setiap rute run (segment_match.py).
+    Effort tercepat tiap pengguna disimpan di sorted set per segmen (skor = detik, kecil lebih baik).
+    Indeks segmen dibangun sekali per proses dan dimuat ulang jika SEGMENTS_VERSION berubah.
+    """
+    SEGMENT_ID_COUNTER = 'segment_id_counter'
+    SEGMENT_KEY = 'segment:{}'
+    SEGMENT_POLYLINE = 'segment:{}:polyline'
+    SEGMENTS_VERSION = 'segments:version'
+    SEGMENT_LEADERBOARD = 'segment:{}:leaderboard'
+    # user_id -> JSON effort terbaik (run_id, elapsed_sec, timestamp)
+    SEGMENT_EFFORTS = 'segment:{}:efforts'
+    RUN_SEGMENTS = 'run:{}:segments'
+    MIN_DISTANCE_M = 100
+    MAX_POINTS = 5000
+    INDEX_LOAD_BATCH = 1000
+    INDEX_CHECK_SEC = 5
+    LEADERBOARD_MAX = 100
+
+    # Menyimpan effort hanya jika lebih cepat dari rekor pengguna di segmen ini.
+    # KEYS: leaderboard segmen, hash effort terbaik
+    # ARGV: user_id, elapsed_sec, effort JSON
+    EFFORT_SCRIPT = """
+local current = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if current and tonumber(current) <= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+return 1
+"""
+    _effort_script_cache = {}
+
+    _index = None
+    _index_version = None
+    _index_checked_at = 0.0
+    _index_lock = threading.Lock()
+
+    @staticmethod
+    def create_segment(name, points):
+        """Menyimpan segmen baru; ValueError jika polyline tidak valid atau terlalu pendek."""
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        lats, lngs, _ = route_columns(points)
+        if len(lats) < 2 or len(lats) > SegmentModel.MAX_POINTS:
+            raise ValueError(f"Segmen harus punya 2 sampai {SegmentModel.MAX_POINTS} titik")
+        if max(map(abs, lats)) > 90 or max(map(abs, lngs)) > 180:
+            raise ValueError("Koordinat di luar jangkauan")
+        distance_m = float(haversine_m(np.asarray(lats), np.asarray(lngs)).sum())
+        if distance_m < SegmentModel.MIN_DISTANCE_M:
+            raise ValueError(f"Segmen minimal {SegmentModel.MIN_DISTANCE_M} meter")
+
+        try:
+            segment_id = redis_conn.incr(SegmentModel.SEGMENT_ID_COUNTER)
+            pipe = redis_conn.pipeline(transaction=True)
+            pipe.hset(SegmentModel.SEGMENT_KEY.format(segment_id), mapping={
+                'segment_id': segment_id,
+                'name': name,
+                'distance_m': round(distance_m, 1),
+                'point_count': len(lats),
+                'created_at': datetime.now().isoformat()
+            })
+            pipe.set(SegmentModel.SEGMENT_POLYLINE.format(segment_id), encode_route([[lat, lng] for lat, lng in zip(lats, lngs)]))
+            pipe.incr(SegmentModel.SEGMENTS_VERSION)
+            pipe.execute()
+            # Worker lain memuat ulang indeks setelah INDEX_CHECK_SEC; proses ini langsung
+            SegmentModel._index_checked_at = 0.0
+            return segment_id
+        except Exception as e:
+            print(f"Error creating segment: {e}")
+            return None
+
+    @staticmethod
+    def get_segment(segment_id):
+        redis_conn = RunTrackerModel.get_redis_conn()
+        binary_conn = get_redis_binary_client()
+        if not redis_conn or not binary_conn:
+            return None
+
+        data = redis_conn.hgetall(SegmentModel.SEGMENT_KEY.format(segment_id))
+        if not data:
+            return None
+        return {
+            'segment_id': int(data['segment_id']),
+            'name': data.get('name'),
+            'distance_m': float(data.get('distance_m') or 0.0),
+            'point_count': int(data.get('point_count') or 0),
+            'created_at': data.get('created_at'),
+            'efforts': redis_conn.zcard(SegmentModel.SEGMENT_LEADERBOARD.format(segment_id)),
+            'points': load_route(binary_conn.get(SegmentModel.SEGMENT_POLYLINE.format(segment_id)))
+        }
+
+    @staticmethod
+    def get_index(redis_conn):
+        """Indeks segmen in-process; versi dicek paling sering sekali per INDEX_CHECK_SEC."""
+        now = time.monotonic()
+        if SegmentModel._index is not None and now - SegmentModel._index_checked_at < SegmentModel.INDEX_CHECK_SEC:
+            return SegmentModel._index
+
+        with SegmentModel._index_lock:
+            version = redis_conn.get(SegmentModel.SEGMENTS_VERSION)
+            if SegmentModel._index is None or version != SegmentModel._index_version:
+                SegmentModel._index = SegmentModel._load_index(redis_conn)
+                SegmentModel._index_version = version
+            SegmentModel._index_checked_at = now
+            return SegmentModel._index
+
+    @staticmethod
+    def _load_index(redis_conn):
+        binary_conn = get_redis_binary_client()
+        last_id = int(redis_conn.get(SegmentModel.SEGMENT_ID_COUNTER) or 0)
+        segments = []
+        for first in range(1, last_id + 1, SegmentModel.INDEX_LOAD_BATCH):
+            segment_ids = range(first, min(first + SegmentModel.INDEX_LOAD_BATCH, last_id + 1))
+            pipe = binary_conn.pipeline(transaction=False)
+            for segment_id in segment_ids:
+                pipe.get(SegmentModel.SEGMENT_POLYLINE.format(segment_id))
+            for segment_id, blob in zip(segment_ids, pipe.execute()):
+                if blob is None:
+                    continue
+                lats, lngs, _ = decode_route_columns(blob)
+                segments.append({'segment_id': segment_id, 'points': np.column_stack((lats, lngs))})
+        return SegmentIndex(segments)
+
+    @staticmethod
+    def match_run(run_id, route_data=None, user_id=None, timestamp=None):
+        """
+        Mencocokkan rute sebuah run dengan semua segmen lalu mencatat effort-nya (satu pipeline).
+        Tanpa route_data, rute & pemilik dibaca dari Redis. Mengembalikan list effort
+        (personal_best=True jika menjadi rekor baru pengguna), atau None jika gagal.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        try:
+            index = SegmentModel.get_index(redis_conn)
+            if len(index) == 0:
+                return []
+
+            if route_data is None:
+                user_id, timestamp = redis_conn.hmget(RunTrackerModel.RUN_DETAIL.format(run_id), ['user_id', 'timestamp'])
+                if user_id is None:
+                    return None
+                route_data = RunTrackerModel.get_route_for_display(run_id)['route_data']
+
+            efforts = index.match(route_data)
+            if not efforts:
+                return []
+
+            script = SegmentModel._effort_script_cache.get(id(redis_conn))
+            if script is None:
+                script = redis_conn.register_script(SegmentModel.EFFORT_SCRIPT)
+                SegmentModel._effort_script_cache[id(redis_conn)] = script
+
+            pipe = redis_conn.pipeline(transaction=False)
+            for effort in efforts:
+                segment_id = effort['segment_id']
+                script(
+                    keys=[SegmentModel.SEGMENT_LEADERBOARD.format(segment_id), SegmentModel.SEGMENT_EFFORTS.format(segment_id)],
+                    args=[int(user_id), effort['elapsed_sec'], json.dumps({
+                        'run_id': int(run_id), 'elapsed_sec': effort['elapsed_sec'], 'timestamp': timestamp
+                    })],
+                    client=pipe
+                )
+            results = pipe.execute()
+
+            for effort, improved in zip(efforts, results):
+                effort['personal_best'] = bool(improved)
+            redis_conn.set(SegmentModel.RUN_SEGMENTS.format(run_id), json.dumps(efforts))
+            return efforts
+        except Exception as e:
+            print(f"Error matching segments: {e}")
+            return None
+
+    @staticmethod
+    def get_run_segments(run_id):
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+        return json.loads(redis_conn.get(SegmentModel.RUN_SEGMENTS.format(run_id)) or '[]')
+
+    @staticmethod
+    def get_segment_leaderboard(segment_id, count=10, user_id=None):
+        """Top-N effort tercepat per pengguna (ZRANGE naik) dan posisi user_id lewat ZRANK."""
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        key = SegmentModel.SEGMENT_LEADERBOARD.format(segment_id)
+        efforts_key = SegmentModel.SEGMENT_EFFORTS.format(segment_id)
+        try:
+            pipe = redis_conn.pipeline(transaction=False)
+            pipe.zrange(key, 0, count - 1, withscores=True)
+            pipe.zcard(key)
+            if user_id is not None:
+                pipe.zrank(key, user_id)
+                pipe.hget(efforts_key, user_id)
+            results = pipe.execute()
+            entries = results[0]
+
+            best_efforts, usernames = [], []
+            if entries:
+                pipe = redis_conn.pipeline(transaction=False)
+                pipe.hmget(efforts_key, [member for member, _ in entries])
+                for member, _ in entries:
+                    pipe.hget(RunTrackerModel.USER_KEY.format(member), 'username')
+                best_efforts, *usernames = pipe.execute()
+
+            top = []
+            for rank, ((member, elapsed), effort_json, username) in enumerate(zip(entries, best_efforts, usernames)):
+                effort = json.loads(effort_json) if effort_json else {}
+                top.append({
+                    'rank': rank + 1,
+                    'user_id': int(member),
+                    'username': username or f"Runner {member}",
+                    'elapsed_sec': float(elapsed),
+                    'run_id': effort.get('run_id'),
+                    'timestamp': effort.get('timestamp')
+                })
+
+            leaderboard = {'segment_id': int(segment_id), 'total_athletes': results[1], 'top': top, 'me': None}
+            if user_id is not None and results[2] is not None:
+                effort = json.loads(results[3]) if results[3] else {}
+                leaderboard['me'] = {
+                    'user_id': int(user_id),
+                    'rank': results[2] + 1,
+                    'elapsed_sec': effort.get('elapsed_sec'),
+                    'run_id': effort.get('run_id')
+                }
+            return leaderboard
+        except Exception as e:
+            print(f"Error retrieving segment leaderboard: {e}")
+            return None
+
+class HeatmapModel:
+    """
+    Heatmap run per tile web-mercator (heatmap.py). Setiap add_run hanya menaikkan hitungan
+    bin pada tile yang dilewati rutenya, beserta versi tile untuk ETag. Semua tile sebuah run dan
+    bit HEATMAP_INDEXED_RUNS-nya ditulis dalam satu EVALSHA, sehingga retry tidak pernah menghitung ganda.
+    """
+    # Hash per tile: field = indeks bin, nilai = jumlah run; field TILE_VERSION_FIELD untuk ETag
+    HEATMAP_TILE = 'heatmap:{}:{}:{}'
+    TILE_VERSION_FIELD = '_version'
+    # Bitmap run yang sudah masuk heatmap (SETBIT run_id), mencegah hitungan ganda saat diulang
+    HEATMAP_INDEXED_RUNS = 'heatmap:indexed_runs'
+    TILE_MAX_AGE = 60
+    # Rebuild ditulis ke kunci sementara (di luar pola heatmap:*) lalu menggantikan heatmap lama di akhir
+    REBUILD_TILE = 'heatmap_rebuild:{}:{}:{}'
+    REBUILD_INDEXED_RUNS = 'heatmap_rebuild:indexed_runs'
+    REBUILD_BATCH = 200
+
+    # KEYS[1]: bitmap run terindeks, KEYS[2..]: hash tile
+    # ARGV[1]: run_id, lalu per tile: jumlah bin diikuti indeks bin yang dilewati rute (unik)
+    # SETBIT dijalankan terakhir; run yang bit-nya sudah terpasang tidak ditulis lagi. Tipe semua tile
+    # diperiksa sebelum menulis, karena Redis tidak membatalkan tulisan yang sudah terjadi saat script error.
+    ROUTE_SCRIPT = """
+if redis.call('GETBIT', KEYS[1], ARGV[1]) == 1 then
+    return 0
+end
+for k = 2, #KEYS do
+    local kind = redis.call('TYPE', KEYS[k])['ok']
+    if kind ~= 'hash' and kind ~= 'none' then
+        return redis.error_reply('WRONGTYPE tile ' .. KEYS[k] .. ' bukan hash')
+    end
+end
+local arg = 2
+for k = 2, #KEYS do
+    local count = tonumber(ARGV[arg])
+    for i = arg + 1, arg + count do
+        redis.call('HINCRBY', KEYS[k], ARGV[i], 1)
+    end
+    redis.call('HINCRBY', KEYS[k], '_version', 1)
+    arg = arg + count + 1
+end
+redis.call('SETBIT', KEYS[1], ARGV[1], 1)
+return #KEYS - 1
+"""
+    _route_script_cache = {}
+
+    # Payload tile yang sudah dirangkai, disimpan bersama versinya
+    TILE_CACHE = LRUTTLCache('heatmap_tiles', maxsize=2000, ttl=300)
+
+    @staticmethod
+    def add_route(run_id, route_data=None):
+        """
+        Menambahkan rute sebuah run ke heatmap; mengembalikan jumlah tile yang diperbarui
+        (0 jika run sudah pernah masuk atau tidak punya rute). None jika Redis tidak tersedia;
+        kegagalan penulisan dilempar ulang agar job pasca-simpan tidak di-ACK dan bisa di-retry.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        try:
+            if route_data is None:
+                route = RunTrackerModel.get_route_for_display(run_id)
+                if route is None:
+                    return 0
+                route_data = route['route_data']
+
+            tiles = route_tiles(route_data)
+            if not tiles:
+                return 0
+
+            if RunTrackerModel.SCRIPTING_AVAILABLE:
+                try:
+                    return HeatmapModel._add_route_script(redis_conn, int(run_id), tiles)
+                except redis.exceptions.ResponseError as e:
+                    if not RunTrackerModel._scripting_disabled(e):
+                        raise
+            return HeatmapModel._add_route_pipeline(redis_conn, int(run_id), tiles)
+        except Exception as e:
+            print(f"Error updating heatmap: {e}")
+            raise
+
+    @staticmethod
+    def _add_route_script(redis_conn, run_id, tiles):
+        script = HeatmapModel._route_script_cache.get(id(redis_conn))
+        if script is None:
+            script = redis_conn.register_script(HeatmapModel.ROUTE_SCRIPT)
+            HeatmapModel._route_script_cache[id(redis_conn)] = script
+
+        keys = [HeatmapModel.HEATMAP_INDEXED_RUNS]
+        args = [run_id]
+        for (zoom, x, y), bins in tiles.items():
+            keys.append(HeatmapModel.HEATMAP_TILE.format(zoom, x, y))
+            args.append(len(bins))
+            args.extend(bins.tolist())
+        return script(keys=keys, args=args)
+
+    @staticmethod
+    def _add_route_pipeline(redis_conn, run_id, tiles):
+        """
+        Jalur fallback tanpa Lua: GETBIT dan tipe tile diperiksa di bawah WATCH, lalu tile dan SETBIT
+        dalam satu MULTI/EXEC (EXEC tidak membatalkan perintah lain jika salah satunya error).
+        """
+        tile_keys = [HeatmapModel.HEATMAP_TILE.format(zoom, x, y) for zoom, x, y in tiles]
+        with redis_conn.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    pipe.watch(HeatmapModel.HEATMAP_INDEXED_RUNS, *tile_keys)
+                    if pipe.getbit(HeatmapModel.HEATMAP_INDEXED_RUNS, run_id):
+                        return 0
+                    for tile_key in tile_keys:
+                        if pipe.type(tile_key) not in ('hash', 'none'):
+                            raise redis.exceptions.ResponseError(f"WRONGTYPE tile {tile_key} bukan hash")
+                    pipe.multi()
+                    for tile_key, bins in zip(tile_keys, tiles.values()):
+                        for index in bins.tolist():
+                            pipe.hincrby(tile_key, index, 1)
+                        pipe.hincrby(tile_key, HeatmapModel.TILE_VERSION_FIELD, 1)
+                    pipe.setbit(HeatmapModel.HEATMAP_INDEXED_RUNS, run_id, 1)
+                    pipe.execute()
+                    return len(tiles)
+                except redis.exceptions.WatchError:
+                    continue
+
+    @staticmethod
+    def get_tile_version(zoom, x, y):
+        """Versi tile (0 jika belum ada run); cukup satu HGET untuk menjawab If-None-Match."""
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+        return int(redis_conn.hget(HeatmapModel.HEATMAP_TILE.format(zoom, x, y), HeatmapModel.TILE_VERSION_FIELD) or 0)
+
+    @staticmethod
+    def get_tile(zoom, x, y, version):
+        """Payload tile untuk versi tertentu, dari TILE_CACHE jika versinya masih sama."""
+        cache_key = f"{zoom}/{x}/{y}"
+        cached = HeatmapModel.TILE_CACHE.get(cache_key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        raw = redis_conn.hgetall(HeatmapModel.HEATMAP_TILE.format(zoom, x, y)) if version else {}
+        raw.pop(HeatmapModel.TILE_VERSION_FIELD, None)
+        payload = tile_payload(zoom, x, y, {int(index): int(count) for index, count in raw.items()})
+        HeatmapModel.TILE_CACHE.set(cache_key, (version, payload))
+        return payload
+
+    @staticmethod
+    def rebuild(batch_size=REBUILD_BATCH):
+        """
+        Menghitung ulang heatmap dari seluruh run tanpa menghentikan ingest; mengembalikan jumlah run.
+
+        Rute dibaca per batch (pipeline), hitungan bin dijumlahkan in-process lalu ditulis ke kunci
+        REBUILD_*. Kunci sementara menggantikan heatmap lama dalam satu MULTI/EXEC di bawah WATCH bitmap
+        run terindeks, jadi add_route yang berjalan selama rebuild tidak ikut tertimpa diam-diam: run di
+        atas RUN_ID_COUNTER awal, dan run yang belum tersimpan saat dibaca, dimasukkan lagi lewat
+        add_route setelah pertukaran (idempoten lewat bitmap).
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        binary_conn = get_redis_binary_client()
+        if not redis_conn or not binary_conn:
+            return None
+
+        def delete_matching(pattern):
+            keys = list(redis_conn.scan_iter(match=pattern, count=1000))
+            for start in range(0, len(keys), 1000):
+                redis_conn.delete(*keys[start:start + 1000])
+
+        # Sisa rebuild sebelumnya yang terhenti
+        delete_matching(HeatmapModel.REBUILD_TILE.format('*', '*', '*'))
+        redis_conn.delete(HeatmapModel.REBUILD_INDEXED_RUNS)
+
+        last_run_id = int(redis_conn.get(RunTrackerModel.RUN_ID_COUNTER) or 0)
+        built = set()
+        missing = []
+        indexed = 0
+        for start in range(1, last_run_id + 1, batch_size):
+            run_ids = list(range(start, min(start + batch_size, last_run_id + 1)))
+            bin_counts = {}
+            versions = {}
+            pipe = redis_conn.pipeline(transaction=False)
+            for run_id, route_data in zip(run_ids, HeatmapModel._read_routes(redis_conn, binary_conn, run_ids)):
+                if route_data is None:
+                    missing.append(run_id)
+                    continue
+                tiles = route_tiles(route_data)
+                if not tiles:
+                    continue
+                for tile, bins in tiles.items():
+                    tile_bins = bin_counts.setdefault(tile, {})
+                    for index in bins.tolist():
+                        tile_bins[index] = tile_bins.get(index, 0) + 1
+                    versions[tile] = versions.get(tile, 0) + 1
+                pipe.setbit(HeatmapModel.REBUILD_INDEXED_RUNS, run_id, 1)
+                indexed += 1
+            for tile, tile_bins in bin_counts.items():
+                key = HeatmapModel.REBUILD_TILE.format(*tile)
+                for index, count in tile_bins.items():
+                    pipe.hincrby(key, index, count)
+                pipe.hincrby(key, HeatmapModel.TILE_VERSION_FIELD, versions[tile])
+            built.update(bin_counts)
+            pipe.execute()
+
+        with redis_conn.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    # add_route di antara pemindaian dan EXEC mengubah bitmap -> WatchError, pindai ulang
+                    pipe.watch(HeatmapModel.HEATMAP_INDEXED_RUNS)
+                    live_keys = list(redis_conn.scan_iter(match=HeatmapModel.HEATMAP_TILE.format('*', '*', '*'), count=1000))
+                    pipe.multi()
+                    pipe.delete(HeatmapModel.HEATMAP_INDEXED_RUNS)
+                    for start in range(0, len(live_keys), 1000):
+                        pipe.delete(*live_keys[start:start + 1000])
+                    for tile in built:
+                        pipe.rename(HeatmapModel.REBUILD_TILE.format(*tile), HeatmapModel.HEATMAP_TILE.format(*tile))
+                    if indexed:
+                        pipe.rename(HeatmapModel.REBUILD_INDEXED_RUNS, HeatmapModel.HEATMAP_INDEXED_RUNS)
+                    pipe.execute()
+                    break
+                except redis.exceptions.WatchError:
+                    continue
+        HeatmapModel.TILE_CACHE.clear()
+
+        for run_id in missing + list(range(last_run_id + 1, int(redis_conn.get(RunTrackerModel.RUN_ID_COUNTER) or 0) + 1)):
+            if HeatmapModel.add_route(run_id):
+                indexed += 1
+        return indexed
+
+    @staticmethod
+    def _read_routes(redis_conn, binary_conn, run_ids):
+        """Rute resolusi penuh sekumpulan run (dua pipeline); None untuk run yang belum/tidak tersimpan."""
+        pipe = redis_conn.pipeline(transaction=False)
+        for run_id in run_ids:
+            pipe.hmget(RunTrackerModel.RUN_DETAIL.format(run_id), ['run_id', 'route_data', 'route_archived'])
+        rows = pipe.execute()
+
+        pipe = binary_conn.pipeline(transaction=False)
+        for run_id in run_ids:
+            pipe.get(RunTrackerModel.RUN_ROUTE.format(run_id))
+        blobs = pipe.execute()
+
+        routes = []
+        for run_id, (stored_run_id, legacy_route, archived), blob in zip(run_ids, rows, blobs):
+            if stored_run_id is None:
+                routes.append(None)
+                continue
+            try:
+                if legacy_route is not None:
+                    blob = legacy_route
+                elif blob is None and archived is not None:
+                    blob = (RunTrackerModel._archived_route_blobs(run_id, archived) or [None])[0]
+                routes.append(load_route(blob))
+            except (ValueError, TypeError, IndexError, KeyError) as e:
+                print(f"Warning: Rute run {run_id} tidak valid, dilewati: {e}")
+                routes.append([])
+        return routes
+
+
+class TrainingModel:
+    # Kolom ringkasan run per pengguna (in-process). user:{id}:runs hanya bertambah di kepala (LPUSH oleh
+    # add_run / import), sehingga entri yang mencakup N run cukup dilengkapi dengan LLEN - N run terbaru.
+    COLUMN_CACHE = LRUTTLCache('training_columns', maxsize=2000, ttl=3600)
+
+    @staticmethod
+    def _run_day(timestamp):
+        """Hari sejak epoch (pecahan) menurut jam lokal run; None jika timestamp tidak valid."""
+        try:
+            run_time = datetime.fromisoformat(timestamp).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return None
+        return (run_time - datetime(1970, 1, 1)).total_seconds() / 86400.0
+
+    @staticmethod
+    def _load_entry(user_id):
+        """Entri cache {count, columns, analysis, analysis_key} yang sudah mencakup semua run pengguna."""
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        total = redis_conn.llen(RunTrackerModel.USER_RUNS.format(user_id))
+        entry = TrainingModel.COLUMN_CACHE.get(str(user_id))
+        if entry is None or entry['count'] > total:
+            entry = {'count': 0, 'columns': empty_columns(), 'analysis': None, 'analysis_key': None}
+        if total > entry['count']:
+            # Hanya run yang belum ada di kolom (posisi count..total-1) yang dibaca dari Redis
+            rows = []
+            for _, summary, _ in RunTrackerModel.iter_user_runs(user_id, entry['count'], total - 1):
+                day = TrainingModel._run_day(summary['timestamp'])
+                if day is not None:
+                    rows.append((day, summary['distance_km'], summary['duration_sec'], summary['moving_time_sec'], summary['run_id']))
+            entry = {
+                'count': total,
+                'columns': append_columns(entry['columns'], rows),
+                'analysis': None,
+                'analysis_key': None
+            }
+            TrainingModel.COLUMN_CACHE.set(str(user_id), entry)
+        return entry
+
+    @staticmethod
+    def get_training_summary(user_id, today=None):
+        """Analitik latihan pengguna (lihat training_analytics.analyze_training), di-cache per jumlah run & hari."""
+        try:
+            entry = TrainingModel._load_entry(user_id)
+            if entry is None:
+                return None
+
+            today = today or datetime.now().date()
+            key = (entry['count'], today)
+            if entry['analysis_key'] != key:
+                entry['analysis'] = analyze_training(entry['columns'], today=today)
+                entry['analysis_key'] = key
+            return {'user_id': int(user_id), **entry['analysis']}
+        except Exception as e:
+            print(f"Error computing training analytics: {e}")
+            return None
+
+
+# inline: tahap pasca-simpan dijalankan di dalam request (default, cocok untuk serverless tanpa worker).
+# stream: add_run hanya mengantrekan job; worker.py memprosesnya di multiprocessing pool.
+POST_PROCESS_MODE = os.environ.get('POST_PROCESS_MODE', 'inline').lower()
+
+
+class RunJobModel:
+    """
+    Antrean job pasca-simpan run di Redis Stream dengan consumer group. Entri yang sudah di-ACK
+    langsung dihapus (XDEL), sehingga panjang stream = job yang belum selesai (pending + belum terkirim).
+    Job gagal tetap pending dan diklaim ulang setelah RETRY_IDLE_MS; setelah MAX_ATTEMPTS
+    pengiriman, job dipindah ke stream dead-letter.
+    """
+    STREAM = 'jobs:runs'
+    GROUP = 'run-workers'
+    DEAD_LETTER = 'jobs:runs:dead'
+    DEAD_LETTER_MAXLEN = 10000
+    # Pesan error terakhir per message id, disalin ke entri dead-letter
+    ERRORS = 'jobs:runs:errors'
+    # Penghitung processed / failed / dead dari semua worker
+    STATS = 'jobs:runs:stats'
+    MAX_ATTEMPTS = 5
+    RETRY_IDLE_MS = 30000
+
+    @staticmethod
+    def enqueue(redis_conn, run_ids, reason='add_run'):
+        pipe = redis_conn.pipeline(transaction=False)
+        for run_id in run_ids:
+            pipe.xadd(RunJobModel.STREAM, {'run_id': run_id, 'reason': reason, 'enqueued_at': round(time.time(), 3)})
+        pipe.execute()
+
+    @staticmethod
+    def ensure_group(redis_conn):
+        """Membuat consumer group (dan stream) sekali; id '0' agar job yang sudah antre ikut terbaca."""
+        try:
+            redis_conn.xgroup_create(RunJobModel.STREAM, RunJobModel.GROUP, id='0', mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    @staticmethod
+    def process_run(run_id, route_data=None):
+        """
+        Tahap pasca-simpan sebuah run: level detail rute (jika ingest menundanya), pencocokan segmen
+        dan heatmap. Setiap tahap idempoten sehingga aman di-retry; melempar exception jika gagal.
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            raise ConnectionError("Koneksi Redis gagal")
+
+        user_id, timestamp, lod_points = redis_conn.hmget(
+            RunTrackerModel.RUN_DETAIL.format(run_id), ['user_id', 'timestamp', 'route_lod_points']
+        )
+        if user_id is None:
+            raise LookupError(f"Run {run_id} tidak ditemukan")
+        if route_data is None:
+            route_data = RunTrackerModel.get_run_route(run_id)
+
+        if lod_points and ',' not in lod_points:
+            RunTrackerModel.store_route_levels(run_id, route_data)
+        if SegmentModel.match_run(run_id, route_data=route_data, user_id=user_id, timestamp=timestamp) is None:
+            raise RuntimeError("Pencocokan segmen gagal")
+        if HeatmapModel.add_route(run_id, route_data=route_data) is None:
+            raise ConnectionError("Koneksi Redis gagal")
+
+    @staticmethod
+    def ack(redis_conn, message_ids, stat='processed'):
+        pipe = redis_conn.pipeline(transaction=True)
+        pipe.xack(RunJobModel.STREAM, RunJobModel.GROUP, *message_ids)
+        pipe.xdel(RunJobModel.STREAM, *message_ids)
+        pipe.hdel(RunJobModel.ERRORS, *message_ids)
+        pipe.hincrby(RunJobModel.STATS, stat, len(message_ids))
+        pipe.execute()
+
+    @staticmethod
+    def record_failures(redis_conn, failures):
+        """failures: {message_id: pesan error}; job tetap pending untuk di-retry."""
+        pipe = redis_conn.pipeline(transaction=False)
+        pipe.hset(RunJobModel.ERRORS, mapping=failures)
+        pipe.hincrby(RunJobModel.STATS, 'failed', len(failures))
+        pipe.execute()
+
+    @staticmethod
+    def dead_letter(redis_conn, entries, attempts):
+        """Memindahkan entri (message_id, fields) ke stream dead-letter lalu meng-ACK aslinya."""
+        errors = redis_conn.hmget(RunJobModel.ERRORS, [message_id for message_id, _ in entries])
+        pipe = redis_conn.pipeline(transaction=False)
+        for (message_id, fields), error in zip(entries, errors):
+            pipe.xadd(RunJobModel.DEAD_LETTER, {
+                **fields,
+                'message_id': message_id,
+                'attempts': attempts[message_id],
+                'error': error or '',
+                'dead_at': round(time.time(), 3)
+            }, maxlen=RunJobModel.DEAD_LETTER_MAXLEN, approximate=True)
+        pipe.execute()
+        RunJobModel.ack(redis_conn, [message_id for message_id, _ in entries], stat='dead')
+
+    @staticmethod
+    def queue_stats():
+        """
+        Kedalaman & lag antrean: backlog = entri yang belum pernah dikirim ke worker,
+        lag_seconds = umur entri tertua yang belum dikirim, oldest_pending_seconds = umur job
+        tertua yang sedang dikerjakan / menunggu retry. Hanya membaca: stream atau consumer group
+        yang belum dibuat worker dihitung kosong (XINFO GROUPS gagal untuk stream yang belum ada).
+        """
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+
+        pipe = redis_conn.pipeline(transaction=False)
+        pipe.xlen(RunJobModel.STREAM)
+        pipe.xlen(RunJobModel.DEAD_LETTER)
+        pipe.hgetall(RunJobModel.STATS)
+        length, dead, counters = pipe.execute()
+        try:
+            groups = redis_conn.xinfo_groups(RunJobModel.STREAM)
+        except redis.exceptions.ResponseError as e:
+            if 'no such key' not in str(e).lower():
+                raise
+            groups = []
+
+        group = next((g for g in groups if g['name'] == RunJobModel.GROUP), {})
+        if group:
+            pending = redis_conn.xpending(RunJobModel.STREAM, RunJobModel.GROUP)
+        else:
+            pending = {'pending': 0, 'min': None}
+        now_ms = time.time() * 1000
+
+        def age_sec(message_id):
+            return round(max(now_ms - int(message_id.split('-')[0]), 0) / 1000, 3) if message_id else 0.0
+
+        oldest_undelivered = redis_conn.xrange(
+            RunJobModel.STREAM, min=f"({group.get('last-delivered-id') or '0-0'}", count=1
+        )
+        return {
+            'mode': POST_PROCESS_MODE,
+            'stream_length': length,
+            'pending': pending['pending'],
+            'backlog': max(length - pending['pending'], 0),
+            'lag_seconds': age_sec(oldest_undelivered[0][0]) if oldest_undelivered else 0.0,
+            'oldest_pending_seconds': age_sec(pending['min']) if pending['pending'] else 0.0,
+            'consumers': group.get('consumers', 0),
+            'dead_letter_length': dead,
+            'processed': int(counters.get('processed') or 0),
+            'failed': int(counters.get('failed') or 0),
+            'dead': int(counters.get('dead') or 0)
+        }
+
+
+class RedisStorage(StorageBackend):
+    """Backend default: mendelegasikan ke RunTrackerModel (Lua ingest, cache, leaderboard periode)."""
+
+    name = 'redis'
+    RUNS_PAGE_DEFAULT = RunTrackerModel.RUNS_PAGE_DEFAULT
+    RUNS_PAGE_MAX = RunTrackerModel.RUNS_PAGE_MAX
+
+    def register_user(self, username, password):
+        return RunTrackerModel.register_user(username, password)
+
+    def find_user_by_username(self, username):
+        return RunTrackerModel.find_user_by_username(username)
+
+    def get_user_data(self, user_id):
+        return RunTrackerModel.get_user_data(user_id)
+
+    def add_run(self, user_id, duration_sec, distance_km, average_pace, route_data, total_steps,
+                analytics=None, timestamp=None):
+        return RunTrackerModel.add_run(user_id, duration_sec, distance_km, average_pace, route_data, total_steps,
+                                       analytics=analytics, timestamp=timestamp)
+
+    def get_run_detail(self, run_id, max_points=None):
+        return RunTrackerModel.get_run_detail(run_id, max_points=max_points)
+
+    def get_route_for_display(self, run_id, max_points=None, tolerance=None):
+        return RunTrackerModel.get_route_for_display(run_id, max_points=max_points, tolerance=tolerance)
+
+    def route_is_final(self, run_id):
+        return RunTrackerModel.route_is_final(run_id)
+
+    def get_route_payload(self, run_id, max_points=None, tolerance=None):
+        return RunTrackerModel.get_route_payload(run_id, max_points=max_points, tolerance=tolerance)
+
+    def get_user_runs_page(self, user_id, cursor=None, limit=RunTrackerModel.RUNS_PAGE_DEFAULT):
+        return RunTrackerModel.get_user_runs_page(user_id, cursor=cursor, limit=limit)
+
+    def get_global_leaderboard(self, count=5):
+        return RunTrackerModel.get_global_leaderboard(count=count)
+
+    def get_user_stats(self, user_id):
+        return RunTrackerModel.get_user_stats(user_id)
+
+    def memory_usage_bytes(self):
+        redis_conn = RunTrackerModel.get_redis_conn()
+        if not redis_conn:
+            return None
+        try:
+            return int(redis_conn.info('memory').get('used_memory', 0))
+        except Exception as e:
+            print(f"Error reading Redis memory info: {e}")
+            return None
+
+
+# Timing per method model untuk histogram /metrics dan slow request log
+instrument_methods(RunTrackerModel, exclude=('get_redis_conn', 'calculate_pace', 'cache_stats'))
+instrument_methods(RunSessionModel)
+instrument_methods(SegmentModel)
+instrument_methods(HeatmapModel)
+instrument_methods(TrainingModel)
+instrument_methods(RunJobModel)
+instrument_methods(MemoryStorage)
+instrument_methods(SQLiteStorage)
+
+
+def cache_metrics():
+    all_stats = RunTrackerModel.cache_stats()
+    lines = []
+    # Hit/miss/eviction hanya bertambah sejak proses mulai (counter, agar rate() benar saat restart)
+    for name, field, metric_type, help_text in (
+        ('runtracker_cache_hits_total', 'hits', 'counter', 'Lookup cache baca in-process yang ditemukan.'),
+        ('runtracker_cache_misses_total', 'misses', 'counter', 'Lookup cache baca in-process yang tidak ditemukan.'),
+        ('runtracker_cache_evictions_total', 'evictions', 'counter', 'Entri cache yang diusir karena kapasitas penuh.'),
+        ('runtracker_cache_entries', 'size', 'gauge', 'Jumlah entri cache saat ini.'),
+        ('runtracker_cache_capacity', 'maxsize', 'gauge', 'Kapasitas maksimum cache.')
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        lines += [f'{name}{{cache="{stats["name"]}"}} {stats[field]}' for stats in all_stats]
+    return lines
+
+REGISTRY.add_collector(cache_metrics)
+
+
+def connection_metrics():
+    stats = connection_stats()
+    lines = []
+    for name, value, help_text in (
+        ('runtracker_redis_connections_created', stats['connections_created'], 'Koneksi Redis yang pernah dibuka.'),
+        ('runtracker_redis_connection_checkouts', stats['checkouts'], 'Pengambilan koneksi dari pool.'),
+        ('runtracker_redis_connect_failures', stats['connect_failures'], 'Kegagalan membuka koneksi Redis.'),
+        ('runtracker_redis_breaker_open', int(stats['breaker']['state'] == 'open'), 'Circuit breaker Redis terbuka (1/0).')
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return lines
+
+REGISTRY.add_collector(connection_metrics)
+
+
+def job_metrics():
+    stats = RunJobModel.queue_stats()
+    if stats is None:
+        return []
+    lines = []
+    for name, field, metric_type, help_text in (
+        ('runtracker_jobs_stream_length', 'stream_length', 'gauge', 'Job pasca-simpan yang belum selesai.'),
+        ('runtracker_jobs_pending', 'pending', 'gauge', 'Job yang sudah dikirim ke worker tetapi belum di-ACK.'),
+        ('runtracker_jobs_backlog', 'backlog', 'gauge', 'Job yang belum pernah dikirim ke worker.'),
+        ('runtracker_jobs_lag_seconds', 'lag_seconds', 'gauge', 'Umur job tertua yang belum dikirim ke worker.'),
+        ('runtracker_jobs_oldest_pending_seconds', 'oldest_pending_seconds', 'gauge', 'Umur job pending tertua.'),
+        ('runtracker_jobs_dead_letter_length', 'dead_letter_length', 'gauge', 'Entri di stream dead-letter.'),
+        ('runtracker_jobs_processed_total', 'processed', 'counter', 'Job yang selesai diproses.'),
+        ('runtracker_jobs_failed_total', 'failed', 'counter', 'Percobaan job yang gagal.')
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {stats[field]}"]
+    return lines
+
+# Antrean hanya dipakai mode stream; mode inline tidak perlu membaca stream di setiap scrape
+if POST_PROCESS_MODE == 'stream':
+    REGISTRY.add_collector(job_metrics)
+
+# Backend penyimpanan untuk route inti (redis | memory | sqlite). Fitur yang bergantung pada
+# Redis (sesi streaming, impor massal, leaderboard periode, CLI) tetap memakai RunTrackerModel.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'redis').lower()
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'runtracker.db')
+STORAGE_BACKENDS = {
+    'redis': RedisStorage,
+    'memory': MemoryStorage,
+    'sqlite': lambda: SQLiteStorage(SQLITE_PATH)
+}
+storage_instance = None
+
+def get_storage():
+    """Mengembalikan backend penyimpanan aktif (Lazy Initialization, sekali per proses)."""
+    global storage_instance
+    if storage_instance is None:
+        if STORAGE_BACKEND not in STORAGE_BACKENDS:
+            raise ValueError(f"STORAGE_BACKEND tidak dikenal: {STORAGE_BACKEND} (pilihan: {', '.join(STORAGE_BACKENDS)})")
+        storage_instance = STORAGE_BACKENDS[STORAGE_BACKEND]()
+        print(f"Storage backend aktif: {storage_instance.name}")
+    return storage_instance
+
+_template_versions = {}
+
+
+def _template_version(name):
+    """CRC32 sumber template (bagian ETag halaman HTML); berubah saat template di-deploy ulang."""
+    version = _template_versions.get(name)
+    if version is None:
+        try:
+            source, _, _ = app.jinja_env.loader.get_source(app.jinja_env, name)
+            version = f"{zlib.crc32(source.encode('utf-8')):08x}"
+        except TemplateNotFound:
+            version = '0'
+        _template_versions[name] = version
+    return version
+
+
+def _not_modified(run_id, etag, max_age=IMMUTABLE_MAX_AGE):
+    """
+    Respons 304 jika If-None-Match memuat ETag run ini (varian encoding mana pun, termasuk '*').
+    ETag bisa dihitung tanpa storage, jadi 304 hanya untuk run yang ada dan final: payload di
+    RESPONSE_CACHE sudah membuktikannya, selain itu cukup satu pemeriksaan route_is_final.
+    """
+    encoding = not_modified_encoding(request.headers.get('If-None-Match'), etag)
+    if encoding is None:
+        return None
+    if RunTrackerModel.RESPONSE_CACHE.get(etag) is None and not get_storage().route_is_final(run_id):
+        return None
+    return app.response_class(status=304, headers=response_headers(etag, encoding, max_age=max_age, not_modified=True))
+
+
+def _cached_run_response(etag, payload, mimetype, max_age=IMMUTABLE_MAX_AGE):
+    """Body payload dalam encoding terbaik yang diterima klien; ETag hanya dikirim untuk run final."""
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'), payload['encoded'])
+    headers = response_headers(etag if payload['final'] else None, encoding, max_age=max_age)
+    return app.response_class(encoded_body(payload['encoded'], encoding), mimetype=mimetype, headers=headers)
+
+# --- 3. Routing Halaman Web (Autentikasi di sisi Klien) ---
+
+def get_current_user_id():
+    # Fungsi Dummy untuk simulasi sesi
+    return 1
+                                                                              
+@app.route('/')
+@app.route('/web')
+@app.route('/web/dashboard')
+def web_dashboard():
+    user_id = get_current_user_id()
+    user_data = get_storage().get_user_data(user_id)
+    username = user_data.get('username') if user_data else 'Pelari'
+
+    # Hanya halaman pertama riwayat (ringkasan tanpa route), sisanya via /api/runs
+    runs_page = get_storage().get_user_runs_page(user_id) or {'runs': [], 'total': 0, 'next_cursor': None}
+
+    leaderboard = get_storage().get_global_leaderboard(count=5)
+
+    return render_template('dashboard.html',
+        user_runs=runs_page['runs'],
+        total_runs=runs_page['total'],
+        next_cursor=runs_page['next_cursor'],
+        leaderboard=leaderboard,
+        username=username
+    )                                                                         
+@app.route('/web/register')
+def web_register():
+    return render_template('register.html')
+
+@app.route('/web/login')                                                      
+def web_login():
+    return render_template('login.html')
+      
+@app.route('/web/run/<int:run_id>')                                           
+def web_run_detail(run_id):
+    max_points = request.args.get('max_points', RunTrackerModel.ROUTE_DETAIL_MAX_POINTS, type=int)
+    # HTML ikut bergantung pada template, jadi klien selalu revalidasi; 304 tanpa membaca run dan render
+    etag = run_etag(run_id, 'page', max_points, _template_version('run_detail.html'))
+    cached = _not_modified(run_id, etag, max_age=None)
+    if cached is not None:
+        return cached
+
+    payload = RunTrackerModel.RESPONSE_CACHE.get(etag)
+    if payload is None:
+        run_detail = get_storage().get_run_detail(run_id, max_points=max_points)
+
+        if not run_detail:
+            return render_template('base.html', content="Error: Sesi lari tidak ditemukan")
+
+        user_data = get_storage().get_user_data(run_detail['user_id'])
+        html = render_template('run_detail.html', run=run_detail, username=user_data.get('username'))
+        payload = {'final': get_storage().route_is_final(run_id), 'encoded': compress_payload(html.encode('utf-8'))}
+        if payload['final']:
+            RunTrackerModel.RESPONSE_CACHE.set(etag, payload)
+
+    return _cached_run_response(etag, payload, 'text/html', max_age=None)
+
+@app.route('/web/start_run')
+def web_start_run():
+    user_id = get_current_user_id()
+    user_data = get_storage().get_user_data(user_id)
+    if not user_data:
+        return render_template('base.html', content=f"Pengguna ID {user_id} tidak ditemukan")
+
+    return render_template('start_run.html', user_id=user_id, username=user_data.get('username'))
+
+# --- 4. API Endpoint ---                                                     
+@app.route('/api/log_run', methods=['POST'])
+def api_log_run():
+    data = request.get_json()
 
     if not all(k in data for k in ['user_id', 'duration_sec', 'distance_km', 'route_data', 'total_steps']):
         return jsonify({"message": "Data tidak lengkap.", "success": False}), 400
@@ -347,21 +3206,24 @@ def api_log_run():
     duration_sec = int(data['duration_sec'])
     distance_km = float(data['distance_km'])
 
-    final_pace = 0.00
-    if distance_km > 0 and duration_sec > 0:
-        duration_min = duration_sec / 60
-        calculated_pace = duration_min / distance_km
-        final_pace = float(f"{calculated_pace:.2f}")
-    elif distance_km == 0:
-        final_pace = 0.00
+    # Jarak dihitung ulang di server dari route_data; nilai klien hanya dipakai jika rute kosong
+    try:
+        analytics = analyze_route(data['route_data'], duration_sec, data['total_steps'])
+    except (ValueError, TypeError, IndexError) as e:
+        return jsonify({"message": f"Format route_data tidak valid: {e}", "success": False}), 400
+    if analytics['point_count'] >= 2:
+        distance_km = analytics['distance_km']
+
+    final_pace = RunTrackerModel.calculate_pace(duration_sec, distance_km)
 
-    run_id = RunTrackerModel.add_run(
+    run_id = get_storage().add_run(
         data['user_id'],
         data['duration_sec'],
-        data['distance_km'],
+        distance_km,
         final_pace,
         data['route_data'],
-        data['total_steps']
+        data['total_steps'],
+        analytics=analytics
     )
 
     if run_id:
@@ -373,6 +3235,380 @@ def api_log_run():
     else:
         return jsonify({"message": "Gagal menyimpan ke database. Koneksi Redis mungkin gagal.", "success": False}), 500
 
+@app.route('/api/dashboard', methods=['GET'])
+def api_dashboard():
+    try:
+        user_id = int(request.args.get('user_id', get_current_user_id()))
+    except ValueError:
+        return jsonify({"message": "Parameter user_id tidak valid.", "success": False}), 400
+
+    storage = get_storage()
+    user_data = storage.get_user_data(user_id)
+    runs_page = storage.get_user_runs_page(user_id) or {'runs': [], 'total': 0, 'next_cursor': None}
+
+    return jsonify({
+        "username": user_data.get('username') if user_data else 'Pelari',
+        "runs": runs_page['runs'],
+        "total_runs": runs_page['total'],
+        "next_cursor": runs_page['next_cursor'],
+        "leaderboard": storage.get_global_leaderboard(count=5),
+        "success": True
+    })
+
+@app.route('/api/runs', methods=['GET'])
+def api_runs():
+    try:
+        user_id = int(request.args.get('user_id', get_current_user_id()))
+        cursor = request.args.get('cursor')
+        cursor = int(cursor) if cursor not in (None, '') else None
+        limit = int(request.args.get('limit', RunTrackerModel.RUNS_PAGE_DEFAULT))
+    except ValueError:
+        return jsonify({"message": "Parameter user_id, cursor, atau limit tidak valid.", "success": False}), 400
+
+    if (cursor is not None and cursor < 0) or limit <= 0:
+        return jsonify({"message": "Parameter cursor atau limit tidak valid.", "success": False}), 400
+
+    page = get_storage().get_user_runs_page(user_id, cursor=cursor, limit=limit)
+    if page is None:
+        return jsonify({"message": "Gagal membaca riwayat lari. Koneksi Redis mungkin gagal.", "success": False}), 500
+
+    return jsonify({
+        "runs": page['runs'],
+        "total": page['total'],
+        "next_cursor": page['next_cursor'],
+        "success": True
+    })
+
+@app.route('/api/runs/nearby', methods=['GET'])
+def api_nearby_runs():
+    """Pencarian radius (?lat&lng&radius_m) atau kotak (?lat&lng&width_m&height_m); hanya backend Redis."""
+    try:
+        lat = float(request.args['lat'])
+        lng = float(request.args['lng'])
+        radius_m = request.args.get('radius_m', type=float)
+        width_m = request.args.get('width_m', type=float)
+        height_m = request.args.get('height_m', type=float)
+        min_km = request.args.get('min_km', type=float)
+        max_km = request.args.get('max_km', type=float)
+        cursor = int(request.args.get('cursor') or 0)
+        limit = int(request.args.get('limit', RunTrackerModel.RUNS_PAGE_DEFAULT))
+    except (KeyError, ValueError):
+        return jsonify({"message": "Parameter lat, lng, cursor, atau limit tidak valid.", "success": False}), 400
+
+    anchor = request.args.get('anchor', 'start')
+    if anchor not in RunTrackerModel.GEO_ANCHORS:
+        return jsonify({"message": "Parameter anchor harus start, end, atau center.", "success": False}), 400
+    if abs(lat) > RunTrackerModel.GEO_MAX_LAT or abs(lng) > 180:
+        return jsonify({"message": "Koordinat di luar jangkauan.", "success": False}), 400
+    if cursor < 0 or limit <= 0:
+        return jsonify({"message": "Parameter cursor atau limit tidak valid.", "success": False}), 400
+
+    max_area_m = RunTrackerModel.NEARBY_MAX_RADIUS_M
+    if radius_m is None and width_m is None and height_m is None:
+        radius_m = 1000.0
+    if radius_m is not None:
+        if not 0 < radius_m <= max_area_m:
+            return jsonify({"message": f"radius_m harus antara 0 dan {max_area_m} meter.", "success": False}), 400
+    elif width_m is None or height_m is None or not (0 < width_m <= 2 * max_area_m and 0 < height_m <= 2 * max_area_m):
+        return jsonify({"message": f"width_m dan height_m harus antara 0 dan {2 * max_area_m} meter.", "success": False}), 400
+    if min_km is not None and max_km is not None and min_km > max_km:
+        return jsonify({"message": "min_km tidak boleh lebih besar dari max_km.", "success": False}), 400
+
+    result = RunTrackerModel.get_nearby_runs(
+        lat, lng, radius_m=radius_m, width_m=width_m, height_m=height_m, anchor=anchor,
+        min_km=min_km, max_km=max_km, cursor=cursor, limit=limit
+    )
+    if result is None:
+        return jsonify({"message": "Gagal mencari run terdekat. Koneksi Redis mungkin gagal.", "success": False}), 500
+
+    return jsonify({**result, "success": True})
+
+@app.route('/api/runs/<int:run_id>/route', methods=['GET'])
+def api_run_route(run_id):
+    try:
+        max_points = request.args.get('max_points')
+        max_points = int(max_points) if max_points not in (None, '') else None
+        tolerance = request.args.get('tolerance')
+        tolerance = float(tolerance) if tolerance not in (None, '') else None
+    except ValueError:
+        return jsonify({"message": "Parameter max_points atau tolerance tidak valid.", "success": False}), 400
+
+    etag = run_etag(run_id, 'route', max_points, tolerance)
+    cached = _not_modified(run_id, etag)
+    if cached is not None:
+        return cached
+
+    payload = RunTrackerModel.RESPONSE_CACHE.get(etag)
+    if payload is None:
+        payload = get_storage().get_route_payload(run_id, max_points=max_points, tolerance=tolerance)
+        if payload is None:
+            return jsonify({"message": "Sesi lari tidak ditemukan.", "success": False}), 404
+        if payload['final']:
+            RunTrackerModel.RESPONSE_CACHE.set(etag, payload)
+
+    return _cached_run_response(etag, payload, 'application/json')
+
+@app.route('/api/run_sessions', methods=['POST'])
+def api_start_run_session():
+    data = request.get_json() or {}
+    user_id = data.get('user_id', get_current_user_id())
+
+    session_id = RunSessionModel.start_session(user_id)
+    if not session_id:
+        return jsonify({"message": "Gagal memulai sesi. Koneksi Redis mungkin gagal.", "success": False}), 500
+
+    return jsonify({"session_id": session_id, "success": True})
+
+@app.route('/api/run_sessions/<int:session_id>', methods=['GET'])
+def api_run_session_status(session_id):
+    session_data = RunSessionModel.get_session(session_id)
+    if not session_data:
+        return jsonify({"message": "Sesi tidak ditemukan atau sudah kedaluwarsa.", "success": False}), 404
+
+    return jsonify({**session_data, "success": True})
+
+@app.route('/api/run_sessions/<int:session_id>/points', methods=['POST'])
+def api_append_run_points(session_id):
+    data = request.get_json() or {}
+    if 'seq' not in data or 'points' not in data:
+        return jsonify({"message": "Data tidak lengkap (seq, points).", "success": False}), 400
+    if len(data['points']) > RunSessionModel.MAX_POINTS_PER_BATCH:
+        return jsonify({"message": "Batch titik terlalu besar.", "success": False}), 413
+
+    try:
+        status, last_seq = RunSessionModel.append_points(session_id, int(data['seq']), data['points'])
+    except (ValueError, TypeError, IndexError) as e:
+        return jsonify({"message": f"Format points tidak valid: {e}", "success": False}), 400
+
+    if status is None:
+        return jsonify({"message": "Koneksi Redis gagal.", "success": False}), 500
+    if status == 'not_found':
+        return jsonify({"message": "Sesi tidak ditemukan atau sudah kedaluwarsa.", "success": False}), 404
+    if status in ('gap', 'closed'):
+        # Klien melanjutkan dari last_seq + 1 (GET status) setelah koneksi putus
+        return jsonify({"message": "Batch ditolak.", "status": status, "last_seq": last_seq, "success": False}), 409
+
+    return jsonify({"status": status, "last_seq": last_seq, "success": True})
+
+@app.route('/api/run_sessions/<int:session_id>/finish', methods=['POST'])
+def api_finish_run_session(session_id):
+    data = request.get_json() or {}
+    if not all(k in data for k in ['duration_sec', 'total_steps']):
+        return jsonify({"message": "Data tidak lengkap.", "success": False}), 400
+
+    status, run_id = RunSessionModel.finish_session(session_id, int(data['duration_sec']), int(data['total_steps']))
+    if status == 'not_found':
+        return jsonify({"message": "Sesi tidak ditemukan atau sudah kedaluwarsa.", "success": False}), 404
+    if status == 'in_progress':
+        return jsonify({"message": "Sesi sedang diproses.", "success": False}), 409
+    if status != 'finished':
+        return jsonify({"message": "Gagal menyimpan ke database. Koneksi Redis mungkin gagal.", "success": False}), 500
+
+    return jsonify({"message": "Sesi lari berhasil dicatat!", "run_id": run_id, "success": True})
+
+@app.route('/api/import', methods=['POST'])
+def api_import_runs():
+    import_format = request.args.get('format', 'ndjson').lower()
+    if import_format not in IMPORT_PARSERS:
+        return jsonify({"message": "Format harus gpx atau ndjson.", "success": False}), 400
+
+    try:
+        user_id = int(request.args.get('user_id', get_current_user_id()))
+    except ValueError:
+        return jsonify({"message": "Parameter user_id tidak valid.", "success": False}), 400
+
+    # Body dibaca sebagai stream, tidak dimuat utuh ke memori
+    report = RunTrackerModel.import_runs(user_id, IMPORT_PARSERS[import_format](request.stream))
+    if report is None:
+        return jsonify({"message": "Koneksi Redis gagal.", "success": False}), 500
+
+    return jsonify({**report, "success": True})
+
+EXPORT_RANGE_PATTERN = re.compile(r'^runs=(\d+)-(\d*)$')
+
+@app.route('/api/users/<int:user_id>/export', methods=['GET'])
+def api_export_runs(user_id):
+    """
+    Ekspor seluruh riwayat lari sebagai stream: ?format=csv|ndjson|gpx (ZIP berisi satu GPX per run).
+    Rentang posisi run (0 = run paling lama) lewat ?start&end atau header 'Range: runs=start-end'
+    untuk melanjutkan ekspor yang terputus; hanya backend Redis.
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"message": "Format harus csv, ndjson, atau gpx.", "success": False}), 400
+
+    # Range dengan unit lain (mis. bytes dari download manager) diabaikan: dikirim penuh dengan 200
+    range_header = request.headers.get('Range', '').strip()
+    if not range_header.startswith('runs='):
+        range_header = None
+    try:
+        if range_header:
+            match = EXPORT_RANGE_PATTERN.match(range_header)
+            if not match:
+                return jsonify({"message": "Header Range harus berbentuk runs=start-end.", "success": False}), 416
+            start, end = int(match.group(1)), int(match.group(2)) if match.group(2) else None
+        else:
+            start = int(request.args.get('start') or 0)
+            end = request.args.get('end')
+            end = int(end) if end not in (None, '') else None
+    except ValueError:
+        return jsonify({"message": "Parameter start atau end tidak valid.", "success": False}), 400
+    if start < 0 or (end is not None and end < start):
+        return jsonify({"message": "Parameter start atau end tidak valid.", "success": False}), 400
+
+    bounds = RunTrackerModel.export_range(user_id, start, end)
+    if bounds is None:
+        return jsonify({"message": "Koneksi Redis gagal.", "success": False}), 500
+    start, end, total = bounds
+    if range_header and start >= total:
+        response = jsonify({"message": "Rentang di luar riwayat lari.", "success": False})
+        response.headers['Content-Range'] = f"runs */{total}"
+        return response, 416
+
+    formatter, mimetype, extension, with_routes, compressible = EXPORT_FORMATS[export_format]
+    chunks = formatter(RunTrackerModel.iter_user_runs(user_id, start, end, with_routes=with_routes))
+    headers = {
+        'Content-Disposition': f'attachment; filename="runs-{user_id}-{start}-{max(end, start)}.{extension}"',
+        'Accept-Ranges': 'runs',
+        'X-Export-Total': str(total),
+        'Cache-Control': 'no-store'
+    }
+    if compressible and request.accept_encodings['gzip']:
+        chunks = gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    if range_header:
+        headers['Content-Range'] = f"runs {start}-{end}/{total}"
+    return Response(chunks, status=206 if range_header else 200, mimetype=mimetype, headers=headers)
+
+@app.route('/api/users/<int:user_id>/stats', methods=['GET'])
+def api_user_stats(user_id):
+    stats = get_storage().get_user_stats(user_id)
+    if stats is None:
+        return jsonify({"message": "Gagal membaca statistik. Koneksi Redis mungkin gagal.", "success": False}), 500
+
+    return jsonify({**stats, "success": True})
+
+@app.route('/api/users/<int:user_id>/training', methods=['GET'])
+def api_user_training(user_id):
+    """Volume 7 hari bergulir, ATL/CTL/TSB, tren pace dan prediksi waktu lomba; hanya backend Redis."""
+    training = TrainingModel.get_training_summary(user_id)
+    if training is None:
+        return jsonify({"message": "Gagal menghitung analitik latihan. Koneksi Redis mungkin gagal.", "success": False}), 500
+
+    return jsonify({**training, "success": True})
+
+@app.route('/api/leaderboards/<period>', methods=['GET'])
+def api_period_leaderboard(period):
+    if period not in RunTrackerModel.LEADERBOARD_PERIODS:
+        return jsonify({"message": "Periode harus week, month, atau alltime.", "success": False}), 400
+
+    bucket = request.args.get('bucket')
+    if bucket is not None and period != 'alltime' and not RunTrackerModel.LEADERBOARD_BUCKET_PATTERNS[period].match(bucket):
+        return jsonify({"message": "Parameter bucket harus berformat YYYY-Www (week) atau YYYY-MM (month).", "success": False}), 400
+
+    try:
+        count = max(1, min(int(request.args.get('count', 10)), 100))
+        user_id = request.args.get('user_id')
+        user_id = int(user_id) if user_id not in (None, '') else None
+        neighbors = max(0, min(int(request.args.get('neighbors', 5)), RunTrackerModel.LEADERBOARD_NEIGHBORS_MAX))
+    except ValueError:
+        return jsonify({"message": "Parameter count, user_id, atau neighbors tidak valid.", "success": False}), 400
+
+    leaderboard = RunTrackerModel.get_period_leaderboard(
+        period, bucket=bucket, count=count, user_id=user_id, neighbors=neighbors
+    )
+    if leaderboard is None:
+        return jsonify({"message": "Gagal membaca leaderboard. Koneksi Redis mungkin gagal.", "success": False}), 500
+
+    return jsonify({**leaderboard, "success": True})
+
+@app.route('/api/segments', methods=['POST'])
+def api_create_segment():
+    data = request.get_json() or {}
+    if not data.get('name') or 'points' not in data:
+        return jsonify({"message": "Data tidak lengkap (name, points).", "success": False}), 400
+
+    try:
+        segment_id = SegmentModel.create_segment(str(data['name']), data['points'])
+    except (ValueError, TypeError, IndexError) as e:
+        return jsonify({"message": f"Segmen tidak valid: {e}", "success": False}), 400
+    if not segment_id:
+        return jsonify({"message": "Gagal menyimpan segmen. Koneksi Redis mungkin gagal.", "success": False}), 500
+
+    return jsonify({"message": "Segmen berhasil dibuat.", "segment_id": segment_id, "success": True})
+
+@app.route('/api/segments/<int:segment_id>', methods=['GET'])
+def api_segment_detail(segment_id):
+    segment = SegmentModel.get_segment(segment_id)
+    if not segment:
+        return jsonify({"message": "Segmen tidak ditemukan.", "success": False}), 404
+
+    return jsonify({**segment, "success": True})
+
+@app.route('/api/segments/<int:segment_id>/leaderboard', methods=['GET'])
+def api_segment_leaderboard(segment_id):
+    try:
+        count = max(1, min(int(request.args.get('count', 10)), SegmentModel.LEADERBOARD_MAX))
+        user_id = request.args.get('user_id')
+        user_id = int(user_id) if user_id not in (None, '') else None
+    except ValueError:
+        return jsonify({"message": "Parameter count atau user_id tidak valid.", "success": False}), 400
+
+    leaderboard = SegmentModel.get_segment_leaderboard(segment_id, count=count, user_id=user_id)
+    if leaderboard is None:
+        return jsonify({"message": "Gagal membaca leaderboard segmen. Koneksi Redis mungkin gagal.", "success": False}), 500
+
+    return jsonify({**leaderboard, "success": True})
+
+@app.route('/api/runs/<int:run_id>/segments', methods=['GET'])
+def api_run_segments(run_id):
+    efforts = SegmentModel.get_run_segments(run_id)
+    if efforts is None:
+        return jsonify({"message": "Koneksi Redis gagal.", "success": False}), 500
+
+    return jsonify({"run_id": run_id, "efforts": efforts, "success": True})
+
+@app.route('/api/heatmap/<int:zoom>/<int:x>/<int:y>.json', methods=['GET'])
+def api_heatmap_tile(zoom, x, y):
+    if zoom not in HEATMAP_ZOOMS:
+        return jsonify({"message": f"Zoom heatmap yang tersedia: {', '.join(map(str, HEATMAP_ZOOMS))}.", "success": False}), 400
+    if x >= (1 << zoom) or y >= (1 << zoom):
+        return jsonify({"message": "Koordinat tile di luar jangkauan.", "success": False}), 400
+
+    version = HeatmapModel.get_tile_version(zoom, x, y)
+    if version is None:
+        return jsonify({"message": "Koneksi Redis gagal.", "success": False}), 500
+
+    etag = f"heatmap-{zoom}-{x}-{y}-{version}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        tile = HeatmapModel.get_tile(zoom, x, y, version)
+        if tile is None:
+            return jsonify({"message": "Koneksi Redis gagal.", "success": False}), 500
+        response = jsonify({**tile, "version": version, "success": True})
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = HeatmapModel.TILE_MAX_AGE
+    return response
+
+@app.route('/api/jobs/stats', methods=['GET'])
+def api_job_stats():
+    stats = RunJobModel.queue_stats()
+    if stats is None:
+        return jsonify({"message": "Koneksi Redis gagal.", "success": False}), 500
+
+    return jsonify({**stats, "success": True})
+
+@app.route('/api/cache_stats', methods=['GET'])
+def api_cache_stats():
+    return jsonify({"caches": RunTrackerModel.cache_stats(), "success": True})
+
+@app.route('/api/connection_stats', methods=['GET'])
+def api_connection_stats():
+    return jsonify({"cold_start": COLD_START, "redis": connection_stats(), "success": True})
+
 @app.route('/api/register', methods=['POST'])
 def api_register():
     data = request.get_json()
@@ -380,7 +3616,7 @@ def api_register():
     if not all(k in data for k in ['username', 'password']):
         return jsonify({"message": "Username dan password dibutuhkan.", "success": False}), 400
     
-    user_id = RunTrackerModel.register_user(data['username'], data['password'])
+    user_id = get_storage().register_user(data['username'], data['password'])
      
     if user_id == 'duplicate':
         return jsonify({"message": "Pendaftaran gagal: Username sudah terdaftar.", "success": False}), 409
@@ -395,7 +3631,167 @@ def api_register():
         return jsonify({"message": "Pendaftaran gagal karena masalah server (Koneksi Redis Gagal).", "success": False}), 500
 
 
-# --- 5. Jalankan Aplikasi ---                                                
+# --- 5. Perintah CLI (flask --app app <perintah>) ---
+@app.cli.command('migrate-routes')
+@click.option('--batch-size', default=RunTrackerModel.ROUTE_MIGRATION_BATCH, show_default=True, help='Jumlah run per pipeline.')
+def migrate_routes_command(batch_size):
+    """Mengonversi route_data JSON lama ke format biner ringkas."""
+    started = time.perf_counter()
+    migrated = RunTrackerModel.migrate_routes(batch_size=batch_size)
+    if migrated is None:
+        raise click.ClickException("Koneksi Redis gagal.")
+    click.echo(f"{migrated} rute dimigrasi dalam {time.perf_counter() - started:.2f} detik.")
+
+
+@app.cli.command('archive-routes')
+@click.option('--older-than-days', default=RunTrackerModel.ROUTE_ARCHIVE_AFTER_DAYS, show_default=True,
+              help='Rute run yang lebih tua dari ini dipindah ke arsip disk.')
+@click.option('--batch-size', default=RunTrackerModel.ROUTE_ARCHIVE_BATCH, show_default=True, help='Jumlah run per pipeline.')
+@click.option('--dry-run', is_flag=True, help='Hanya menghitung run yang akan diarsip.')
+def archive_routes_command(older_than_days, batch_size, dry_run):
+    """Memindahkan rute run lama dari Redis ke file segmen terkompresi di disk."""
+    started = time.perf_counter()
+    report = RunTrackerModel.archive_routes(older_than_days=older_than_days, batch_size=batch_size, dry_run=dry_run)
+    if report is None:
+        raise click.ClickException("Koneksi Redis gagal.")
+    action = "akan diarsip" if dry_run else "diarsip"
+    click.echo(f"{report['scanned']} run diperiksa, {report['archived']} rute {action} "
+               f"({report['redis_bytes_freed']} byte Redis) dalam {time.perf_counter() - started:.2f} detik.")
+    archive = report['archive']
+    click.echo(f"Arsip {archive['directory']}: {archive['records']} record di {archive['segments']} segmen, {archive['bytes']} byte.")
+
+
+
+def _echo_memory_report(title, report):
+    used_memory = f"{report['used_memory']} byte" if report['used_memory'] is not None else "tidak tersedia"
+    click.echo(f"{title}: skema v{report['schema_version']}, used_memory {used_memory}.")
+    for group in report['groups']:
+        if group['avg_bytes'] is None:
+            click.echo(f"  {group['name']:<13} {group['keys']:>9} kunci")
+            continue
+        encodings = ', '.join(f"{name} {count}" for name, count in sorted(group['encodings'].items()))
+        click.echo(f"  {group['name']:<13} {group['keys']:>9} kunci, rata-rata {group['avg_bytes']} byte "
+                   f"(~{group['estimated_bytes']} byte; {encodings})")
+    if report['legacy_models_keys']:
+        click.echo(f"  {report['legacy_models_keys']} kunci models.py lama (tidak dimigrasi, periksa manual).")
+
+
+@app.cli.command('migrate-schema')
+@click.option('--batch-size', default=RunTrackerModel.SCHEMA_MIGRATION_BATCH, show_default=True, help='Jumlah kunci per SCAN.')
+@click.option('--reset', is_flag=True, help='Mulai dari awal, abaikan posisi migrasi yang tersimpan.')
+@click.option('--report-only', is_flag=True, help='Hanya menampilkan laporan memori per kelompok kunci.')
+def migrate_schema_command(batch_size, reset, report_only):
+    """Migrasi online kunci Redis ke skema v2 (bisa dilanjutkan jika terputus) beserta laporan memori."""
+    before = RunTrackerModel.schema_memory_report()
+    if before is None:
+        raise click.ClickException("Koneksi Redis gagal.")
+    _echo_memory_report("Sebelum" if not report_only else "Memori", before)
+    if report_only:
+        return
+
+    def progress(state):
+        phase = state['phase']
+        click.echo(f"{phase}: {state[f'{phase}_scanned']} kunci diperiksa, {state[f'{phase}_converted']} dikonversi.")
+
+    started = time.perf_counter()
+    RunTrackerModel.migrate_schema(batch_size=batch_size, reset=reset, progress=progress)
+    click.echo(f"Migrasi selesai dalam {time.perf_counter() - started:.2f} detik.")
+    after = RunTrackerModel.schema_memory_report()
+    _echo_memory_report("Sesudah", after)
+    if before['used_memory'] is not None and after['used_memory'] is not None:
+        click.echo(f"Selisih used_memory: {after['used_memory'] - before['used_memory']} byte.")
+
+
+@app.cli.command('rebuild-stats')
+@click.option('--user-id', type=int, default=None, help='Hanya pengguna ini (default: semua pengguna).')
+@click.option('--batch-size', default=RunTrackerModel.STATS_REBUILD_BATCH, show_default=True, help='Jumlah run per pipeline.')
+def rebuild_stats_command(user_id, batch_size):
+    """Menghitung ulang agregat statistik pengguna dari riwayat run."""
+    redis_conn = RunTrackerModel.get_redis_conn()
+    if not redis_conn:
+        raise click.ClickException("Koneksi Redis gagal.")
+
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = range(1, int(redis_conn.get(RunTrackerModel.USER_ID_COUNTER) or 0) + 1)
+
+    started = time.perf_counter()
+    for current_id in user_ids:
+        run_count = RunTrackerModel.rebuild_user_stats(current_id, batch_size=batch_size)
+        if run_count:
+            click.echo(f"Pengguna {current_id}: {run_count} run.")
+    click.echo(f"Selesai dalam {time.perf_counter() - started:.2f} detik.")
+
+
+@app.cli.command('index-geo')
+@click.option('--batch-size', default=RunTrackerModel.GEO_REBUILD_BATCH, show_default=True, help='Jumlah run per pipeline.')
+def index_geo_command(batch_size):
+    """Mengisi indeks GEO (start, end, center) untuk run yang sudah ada."""
+    started = time.perf_counter()
+    indexed = RunTrackerModel.rebuild_geo_index(batch_size=batch_size)
+    if indexed is None:
+        raise click.ClickException("Koneksi Redis gagal.")
+    click.echo(f"{indexed} run diindeks dalam {time.perf_counter() - started:.2f} detik.")
+
+
+@app.cli.command('match-segments')
+@click.option('--run-id', type=int, default=None, help='Hanya run ini (default: semua run).')
+def match_segments_command(run_id):
+    """Mencocokkan ulang run yang sudah ada dengan semua segmen (misalnya setelah segmen baru dibuat)."""
+    redis_conn = RunTrackerModel.get_redis_conn()
+    if not redis_conn:
+        raise click.ClickException("Koneksi Redis gagal.")
+
+    if run_id is not None:
+        run_ids = [run_id]
+    else:
+        run_ids = range(1, int(redis_conn.get(RunTrackerModel.RUN_ID_COUNTER) or 0) + 1)
+
+    started = time.perf_counter()
+    matched = 0
+    for current_id in run_ids:
+        efforts = SegmentModel.match_run(current_id)
+        matched += len(efforts or [])
+    click.echo(f"{matched} effort segmen dicatat dalam {time.perf_counter() - started:.2f} detik.")
+
+
+@app.cli.command('rebuild-heatmap')
+@click.option('--batch-size', default=HeatmapModel.REBUILD_BATCH, show_default=True, help='Jumlah run per pipeline.')
+def rebuild_heatmap_command(batch_size):
+    """Menghitung ulang seluruh tile heatmap dari rute semua run (aman selama ingest berjalan)."""
+    started = time.perf_counter()
+    try:
+        indexed = HeatmapModel.rebuild(batch_size=batch_size)
+    except redis.exceptions.RedisError as e:
+        raise click.ClickException(f"Rebuild heatmap gagal: {e}")
+    if indexed is None:
+        raise click.ClickException("Koneksi Redis gagal.")
+    click.echo(f"{indexed} run masuk heatmap dalam {time.perf_counter() - started:.2f} detik.")
+
+
+@app.cli.command('import-runs')
+@click.argument('archive', type=click.File('rb'))
+@click.option('--user-id', type=int, required=True, help='Pemilik run yang diimpor.')
+@click.option('--format', 'import_format', type=click.Choice(sorted(IMPORT_PARSERS)), default='ndjson', show_default=True)
+@click.option('--chunk-size', default=RunTrackerModel.IMPORT_CHUNK_SIZE, show_default=True, help='Jumlah run per pipeline.')
+def import_runs_command(archive, user_id, import_format, chunk_size):
+    """Impor massal arsip GPX/NDJSON."""
+    report = RunTrackerModel.import_runs(user_id, IMPORT_PARSERS[import_format](archive), chunk_size=chunk_size)
+    if report is None:
+        raise click.ClickException("Koneksi Redis gagal.")
+    click.echo(
+        f"{report['imported']} run diimpor, {report['failed']} gagal, "
+        f"{report['elapsed_sec']} detik ({report['runs_per_sec']} run/detik)."
+    )
+    for error in report['errors']:
+        click.echo(f"  #{error['index']}: {error['message']}")
+
+
+COLD_START['import_ms'] = round((time.perf_counter() - APP_IMPORT_STARTED) * 1000, 3)
+
+
+# --- 6. Jalankan Aplikasi ---                                                
 if __name__ == '__main__':
     # Jalankan aplikasi di lokal
     app.run(host='0.0.0.0', port=5000, debug=True)
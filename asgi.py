@@ -0,0 +1,291 @@
+# asgi.py
+"""
+Entry point ASGI: uvicorn asgi:app (atau server ASGI lain).
+
+Endpoint baca yang paling sering dipanggil dilayani langsung oleh AsyncRunTrackerModel
+(redis.asyncio, lookup independen dijalankan bersamaan). Request lain diteruskan ke aplikasi
+Flask (WSGI) di thread pool, sehingga seluruh fitur tetap tersedia dari satu proses.
+"""
+import asyncio
+import json
+import re
+import sys
+import tempfile
+from urllib.parse import parse_qs
+
+from flask import render_template
+
+import app as runtracker
+from app import RunTrackerModel
+from async_model import AsyncRunTrackerModel, breaker_scope, close_async_redis
+from http_cache import choose_encoding, encoded_body, not_modified_encoding, response_headers, run_etag
+from instrumentation import RequestStats, _current_stats, finish_request
+
+# Body request di atas ukuran ini ditampung di file sementara, bukan memori (impor massal)
+WSGI_BODY_SPOOL_BYTES = 1024 * 1024
+
+
+def _json_response(payload, status=200):
+    return status, [(b'content-type', b'application/json')], json.dumps(payload).encode('utf-8')
+
+
+def _header(scope, name):
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _encode_headers(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+def _query_int(query, name, default=None):
+    value = query.get(name, [None])[0]
+    return int(value) if value not in (None, '') else default
+
+
+# --- Handler async (hanya aktif jika STORAGE_BACKEND=redis) ---
+
+async def dashboard_json(scope, query, match):
+    try:
+        user_id = _query_int(query, 'user_id', runtracker.get_current_user_id())
+    except ValueError:
+        return _json_response({"message": "Parameter user_id tidak valid.", "success": False}, 400)
+    dashboard = await AsyncRunTrackerModel.get_dashboard(user_id)
+    return _json_response({
+        'username': dashboard['username'],
+        'runs': dashboard['runs_page']['runs'],
+        'total_runs': dashboard['runs_page']['total'],
+        'next_cursor': dashboard['runs_page']['next_cursor'],
+        'leaderboard': dashboard['leaderboard'],
+        'success': True
+    })
+
+
+async def dashboard_html(scope, query, match, environ):
+    dashboard = await AsyncRunTrackerModel.get_dashboard(runtracker.get_current_user_id())
+
+    def render():
+        with runtracker.app.request_context(environ):
+            return render_template('dashboard.html',
+                user_runs=dashboard['runs_page']['runs'],
+                total_runs=dashboard['runs_page']['total'],
+                next_cursor=dashboard['runs_page']['next_cursor'],
+                leaderboard=dashboard['leaderboard'],
+                username=dashboard['username']
+            )
+
+    html = await asyncio.to_thread(render)
+    return 200, [(b'content-type', b'text/html; charset=utf-8')], html.encode('utf-8')
+
+
+async def runs_page(scope, query, match):
+    try:
+        user_id = _query_int(query, 'user_id', runtracker.get_current_user_id())
+        cursor = _query_int(query, 'cursor')
+        limit = _query_int(query, 'limit', RunTrackerModel.RUNS_PAGE_DEFAULT)
+    except ValueError:
+        return _json_response({"message": "Parameter user_id, cursor, atau limit tidak valid.", "success": False}, 400)
+
+    if (cursor is not None and cursor < 0) or limit <= 0:
+        return _json_response({"message": "Parameter cursor atau limit tidak valid.", "success": False}, 400)
+
+    page = await AsyncRunTrackerModel.get_user_runs_page(user_id, cursor=cursor, limit=limit)
+    if page is None:
+        return _json_response({"message": "Gagal membaca riwayat lari. Koneksi Redis mungkin gagal.", "success": False}, 500)
+
+    return _json_response({
+        "runs": page['runs'],
+        "total": page['total'],
+        "next_cursor": page['next_cursor'],
+        "success": True
+    })
+
+
+async def run_route(scope, query, match):
+    try:
+        max_points = _query_int(query, 'max_points')
+        tolerance = query.get('tolerance', [None])[0]
+        tolerance = float(tolerance) if tolerance not in (None, '') else None
+    except ValueError:
+        return _json_response({"message": "Parameter max_points atau tolerance tidak valid.", "success": False}, 400)
+
+    run_id = int(match.group(1))
+    # Sama dengan /api/runs/<id>/route di app.py: 304 hanya untuk run yang ada dan final, payload terkompresi dari cache/Redis
+    etag = run_etag(run_id, 'route', max_points, tolerance)
+    payload = RunTrackerModel.RESPONSE_CACHE.get(etag)
+    encoding = not_modified_encoding(_header(scope, b'if-none-match'), etag)
+    if encoding is not None and (payload is not None or await AsyncRunTrackerModel.route_is_final(run_id)):
+        return 304, _encode_headers(response_headers(etag, encoding, not_modified=True)), b''
+
+    if payload is None:
+        payload = await AsyncRunTrackerModel.get_route_payload(run_id, max_points=max_points, tolerance=tolerance)
+        if payload is None:
+            return _json_response({"message": "Sesi lari tidak ditemukan.", "success": False}, 404)
+        if payload['final']:
+            RunTrackerModel.RESPONSE_CACHE.set(etag, payload)
+
+    encoding = choose_encoding(_header(scope, b'accept-encoding'), payload['encoded'])
+    headers = response_headers(etag if payload['final'] else None, encoding)
+    headers.append(('Content-Type', 'application/json'))
+    return 200, _encode_headers(headers), encoded_body(payload['encoded'], encoding)
+
+
+async def user_stats(scope, query, match):
+    stats = await AsyncRunTrackerModel.get_user_stats(int(match.group(1)))
+    if stats is None:
+        return _json_response({"message": "Gagal membaca statistik. Koneksi Redis mungkin gagal.", "success": False}, 500)
+
+    return _json_response({**stats, "success": True})
+
+
+# (pola path, handler, nama endpoint Flask yang setara untuk label metrik /metrics)
+ASYNC_ROUTES = [
+    (re.compile(r'^/api/dashboard$'), dashboard_json, 'api_dashboard'),
+    (re.compile(r'^/api/runs$'), runs_page, 'api_runs'),
+    (re.compile(r'^/api/runs/(\d+)/route$'), run_route, 'api_run_route'),
+    (re.compile(r'^/api/users/(\d+)/stats$'), user_stats, 'api_user_stats'),
+]
+# Halaman HTML butuh environ WSGI untuk request context Flask (url_for, dsb.)
+ASYNC_PAGES = [
+    (re.compile(r'^/(?:web(?:/dashboard)?)?$'), dashboard_html, 'web_dashboard'),
+]
+
+
+async def _instrumented(endpoint, scope, handler, *args):
+    """
+    Menjalankan handler async dengan metrik request yang sama dengan hook Flask (instrumentation.init_app),
+    dan satu keputusan circuit breaker untuk seluruh request (dibagi semua cabang asyncio.gather).
+    """
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+    status = 500
+    try:
+        with breaker_scope():
+            response = await handler(scope, *args)
+        status = response[0]
+        return response
+    finally:
+        _current_stats.reset(token)
+        query = scope.get('query_string', b'').decode('latin-1')
+        finish_request(stats, endpoint, scope['method'], status, scope['path'] + (f"?{query}" if query else ''),
+                       slow_request_ms=runtracker.SLOW_REQUEST_MS)
+
+
+# --- Jembatan ASGI -> WSGI untuk route Flask lainnya ---
+
+async def _read_body(receive):
+    body = tempfile.SpooledTemporaryFile(max_size=WSGI_BODY_SPOOL_BYTES)
+    more_body = True
+    while more_body:
+        message = await receive()
+        body.write(message.get('body', b''))
+        more_body = message.get('more_body', False)
+    body.seek(0)
+    return body
+
+
+def _build_environ(scope, body):
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        # Body sudah dibaca utuh, jadi Werkzeug boleh membaca sampai EOF walau tanpa Content-Length
+        'wsgi.input_terminated': True,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _call_wsgi(environ, send):
+    """Menjalankan aplikasi Flask di thread; body dialirkan per chunk (mendukung respons streaming)."""
+    response_start = {}
+
+    def start_response(status, headers, exc_info=None):
+        response_start['status'] = int(status.split(' ', 1)[0])
+        response_start['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+        return lambda data: None
+
+    iterable = await asyncio.to_thread(runtracker.app.wsgi_app, environ, start_response)
+    iterator = iter(iterable)
+    started = False
+    try:
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, None)
+            if not started:
+                await send({'type': 'http.response.start', 'status': response_start['status'],
+                            'headers': response_start['headers']})
+                started = True
+            if chunk is None:
+                break
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            await asyncio.to_thread(close)
+
+
+async def _send_response(send, status, headers, body):
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Listener invalidasi cache memakai klien sync; dinyalakan sekali di luar event loop
+            redis_conn = await asyncio.to_thread(runtracker.get_redis_client)
+            if redis_conn is not None:
+                await asyncio.to_thread(RunTrackerModel._ensure_cache_listener, redis_conn)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_redis()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    path = scope['path']
+    if scope['method'] == 'GET' and runtracker.STORAGE_BACKEND == 'redis':
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        for pattern, handler, endpoint in ASYNC_ROUTES:
+            match = pattern.match(path)
+            if match:
+                return await _send_response(send, *await _instrumented(endpoint, scope, handler, query, match))
+        for pattern, handler, endpoint in ASYNC_PAGES:
+            match = pattern.match(path)
+            if match:
+                environ = _build_environ(scope, await _read_body(receive))
+                return await _send_response(send, *await _instrumented(endpoint, scope, handler, query, match, environ))
+
+    environ = _build_environ(scope, await _read_body(receive))
+    await _call_wsgi(environ, send)
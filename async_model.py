@@ -0,0 +1,260 @@
+# async_model.py
+import asyncio
+import contextlib
+import contextvars
+import json
+
+import redis
+import redis.asyncio as aioredis
+
+from app import RunTrackerModel, load_route
+from http_cache import compress_payload, route_response_body
+from instrumentation import instrument_async_redis_client
+from redis_connection import BREAKER, async_connection_pool
+from route_simplify import LOD_TOLERANCES_M
+
+# Varian async dari jalur baca RunTrackerModel di atas redis.asyncio. Skema kunci, parser dan
+# cache in-process (USER_CACHE, RUN_SUMMARY_CACHE) dipakai bersama dengan model sync, sehingga
+# hasilnya identik; penulisan (add_run, sesi, impor) tetap lewat model sync.
+# Klien async memakai circuit breaker, statistik pool dan metrik perintah Redis yang sama dengan klien sync.
+
+# Blob rute di atas ukuran ini di-decode di thread agar event loop tidak tertahan
+ROUTE_THREAD_DECODE_BYTES = 16384
+
+_clients = {}
+# Keputusan circuit breaker untuk request yang sedang berjalan (None = di luar breaker_scope)
+_breaker_decision = contextvars.ContextVar('runtracker_async_breaker_decision', default=None)
+
+
+@contextlib.contextmanager
+def breaker_scope():
+    """
+    Satu keputusan circuit breaker untuk semua perintah di dalam blok (satu request ASGI, atau satu
+    asyncio.gather). Saat half-open breaker hanya mengizinkan satu probe, jadi cabang gather yang
+    bertanya sendiri-sendiri akan ditolak walau Redis sudah pulih. Blok bersarang memakai keputusan luar.
+    """
+    if _breaker_decision.get() is not None:
+        yield
+        return
+    token = _breaker_decision.set(BREAKER.allow_request())
+    try:
+        yield
+    finally:
+        _breaker_decision.reset(token)
+
+
+def get_async_redis(binary=False):
+    """
+    Klien redis.asyncio per event loop (Lazy Initialization); koneksi pertama dibuat saat perintah pertama.
+    Selama circuit breaker terbuka, ConnectionError dilempar langsung (ditangkap method model seperti
+    get_redis_client() yang mengembalikan None di model sync). Di dalam breaker_scope keputusan
+    breaker diambil sekali per scope, di luar itu per panggilan.
+    """
+    admitted = _breaker_decision.get()
+    if admitted is None:
+        admitted = BREAKER.allow_request()
+    if not admitted:
+        raise redis.exceptions.ConnectionError("Circuit breaker Redis terbuka")
+
+    loop = asyncio.get_running_loop()
+    key = (id(loop), binary)
+    client = _clients.get(key)
+    if client is None:
+        client = _clients[key] = instrument_async_redis_client(
+            aioredis.Redis(connection_pool=async_connection_pool(decode_responses=not binary))
+        )
+    return client
+
+
+async def close_async_redis():
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _clients if key[0] == loop_id]:
+        client = _clients.pop(key)
+        await client.aclose()
+        # Pool dibuat sendiri (bukan from_url), jadi aclose() tidak ikut menutup koneksinya
+        await client.connection_pool.disconnect()
+
+
+class AsyncRunTrackerModel:
+
+    @staticmethod
+    async def get_user_data(user_id):
+        cached = RunTrackerModel.USER_CACHE.get(str(user_id))
+        if cached is not None:
+            return dict(cached)
+
+        try:
+            data = await get_async_redis().hgetall(RunTrackerModel.USER_KEY.format(user_id))
+        except Exception as e:
+            print(f"Error retrieving user data (async): {e}")
+            return None
+        if not data:
+            return None
+
+        user_data = dict(data)
+        user_data['id'] = int(user_id)
+        RunTrackerModel.USER_CACHE.set(str(user_id), user_data)
+        return dict(user_data)
+
+    @staticmethod
+    async def get_run_summaries(run_ids):
+        if not run_ids:
+            return []
+
+        cached, missing = RunTrackerModel._cached_summaries(run_ids)
+
+        rows = []
+        if missing:
+            pipe = get_async_redis().pipeline(transaction=False)
+            for run_id in missing:
+                pipe.hmget(RunTrackerModel.RUN_DETAIL.format(run_id), RunTrackerModel.RUN_SUMMARY_FIELDS)
+            rows = await pipe.execute()
+
+        return RunTrackerModel._merge_summaries(run_ids, cached, missing, rows)
+
+    @staticmethod
+    async def get_user_runs_page(user_id, cursor=None, limit=RunTrackerModel.RUNS_PAGE_DEFAULT):
+        """Semantik cursor sama dengan RunTrackerModel.get_user_runs_page."""
+        limit = max(1, min(int(limit), RunTrackerModel.RUNS_PAGE_MAX))
+        list_key = RunTrackerModel.USER_RUNS.format(user_id)
+
+        try:
+            pipe = get_async_redis().pipeline(transaction=False)
+            pipe.llen(list_key)
+            pipe.lrange(list_key, *RunTrackerModel._runs_page_range(cursor, limit))
+            total, run_ids = await pipe.execute()
+
+            return {
+                'runs': await AsyncRunTrackerModel.get_run_summaries(run_ids),
+                'total': total,
+                'next_cursor': RunTrackerModel._runs_page_next_cursor(total, cursor, len(run_ids))
+            }
+        except Exception as e:
+            print(f"Error retrieving run history page (async): {e}")
+            return None
+
+    @staticmethod
+    async def get_global_leaderboard(count=5):
+        """Membaca cache top-N; jika kosong, builder sync (dengan backfill) dijalankan di thread."""
+        try:
+            if count <= RunTrackerModel.LEADERBOARD_CACHE_SIZE:
+                cached = await get_async_redis().get(RunTrackerModel.LEADERBOARD_CACHE)
+                if cached is not None:
+                    return json.loads(cached)[:count]
+        except Exception as e:
+            print(f"Error retrieving leaderboard (async): {e}")
+            return []
+        return await asyncio.to_thread(RunTrackerModel.get_global_leaderboard, count)
+
+    @staticmethod
+    async def get_user_stats(user_id):
+        weeks, months = RunTrackerModel._recent_buckets()
+        bucket_fields = RunTrackerModel.STATS_BUCKET_FIELDS
+
+        try:
+            pipe = get_async_redis().pipeline(transaction=False)
+            pipe.hgetall(RunTrackerModel.USER_STATS.format(user_id))
+            pipe.hmget(RunTrackerModel.USER_STATS_WEEKLY.format(user_id),
+                       [f"{week}:{field}" for week in weeks for field in bucket_fields])
+            pipe.hmget(RunTrackerModel.USER_STATS_MONTHLY.format(user_id),
+                       [f"{month}:{field}" for month in months for field in bucket_fields])
+            totals, weekly_raw, monthly_raw = await pipe.execute()
+        except Exception as e:
+            print(f"Error retrieving user stats (async): {e}")
+            return None
+
+        return RunTrackerModel._parse_user_stats(user_id, weeks, months, totals, weekly_raw, monthly_raw)
+
+    @staticmethod
+    async def get_route_for_display(run_id, max_points=None, tolerance=None):
+        try:
+            stored_run_id, lod_points, legacy_route, archived = await get_async_redis().hmget(
+                RunTrackerModel.RUN_DETAIL.format(run_id), ['run_id', 'route_lod_points', 'route_data', 'route_archived']
+            )
+            if stored_run_id is None:
+                return None
+
+            if legacy_route is not None:
+                level, blob = 0, legacy_route
+            else:
+                level = RunTrackerModel._select_route_level(lod_points, max_points=max_points, tolerance=tolerance)
+                key = RunTrackerModel.RUN_ROUTE_LOD.format(run_id, level) if level else RunTrackerModel.RUN_ROUTE.format(run_id)
+                blob = await get_async_redis(binary=True).get(key)
+                if blob is None and archived is not None:
+                    # Rute sudah diarsip ke disk: baca lewat mmap + LRU di thread agar event loop tidak terblokir
+                    blobs = await asyncio.to_thread(RunTrackerModel._archived_route_blobs, run_id, archived)
+                    if blobs:
+                        blob = blobs[min(level, len(blobs) - 1)]
+
+            if blob is not None and len(blob) > ROUTE_THREAD_DECODE_BYTES:
+                route = await asyncio.to_thread(load_route, blob)
+            else:
+                route = load_route(blob)
+            return {
+                'run_id': int(run_id),
+                'level': level,
+                'tolerance_m': ((0.0,) + LOD_TOLERANCES_M)[level],
+                'points': len(route),
+                'route_data': route
+            }
+        except Exception as e:
+            print(f"Error retrieving run route (async): {e}")
+            return None
+
+    @staticmethod
+    async def route_is_final(run_id):
+        """Varian async RunTrackerModel.route_is_final; dipakai sebelum menjawab 304."""
+        try:
+            stored_run_id, lod_points = await get_async_redis().hmget(
+                RunTrackerModel.RUN_DETAIL.format(run_id), ['run_id', 'route_lod_points']
+            )
+        except Exception as e:
+            print(f"Error checking run route (async): {e}")
+            return False
+        return stored_run_id is not None and RunTrackerModel._route_levels_final(lod_points)
+
+    @staticmethod
+    async def get_route_payload(run_id, max_points=None, tolerance=None):
+        """Varian async RunTrackerModel.get_route_payload; kompresi payload baru dijalankan di thread."""
+        try:
+            stored_run_id, lod_points = await get_async_redis().hmget(
+                RunTrackerModel.RUN_DETAIL.format(run_id), ['run_id', 'route_lod_points']
+            )
+            if stored_run_id is None:
+                return None
+            final = RunTrackerModel._route_levels_final(lod_points)
+            level = RunTrackerModel._select_route_level(lod_points, max_points=max_points, tolerance=tolerance)
+            key = RunTrackerModel.RUN_ROUTE_PAYLOAD.format(run_id, level)
+            if final:
+                stored = await get_async_redis(binary=True).hgetall(key)
+                if stored:
+                    return {'level': level, 'final': True, 'encoded': {name.decode(): body for name, body in stored.items()}}
+
+            route = await AsyncRunTrackerModel.get_route_for_display(run_id, max_points=max_points, tolerance=tolerance)
+            if route is None:
+                return None
+            encoded = await asyncio.to_thread(compress_payload, route_response_body(route))
+            if final:
+                pipe = get_async_redis(binary=True).pipeline(transaction=True)
+                pipe.hset(key, mapping=encoded)
+                pipe.expire(key, RunTrackerModel.ROUTE_PAYLOAD_TTL)
+                await pipe.execute()
+            return {'level': route['level'], 'final': final, 'encoded': encoded}
+        except Exception as e:
+            print(f"Error retrieving route payload (async): {e}")
+            return None
+
+    @staticmethod
+    async def get_dashboard(user_id, leaderboard_count=5):
+        """Tiga lookup independen dijalankan bersamaan: latensi = cabang paling lambat, bukan jumlahnya."""
+        with breaker_scope():
+            user_data, runs_page, leaderboard = await asyncio.gather(
+                AsyncRunTrackerModel.get_user_data(user_id),
+                AsyncRunTrackerModel.get_user_runs_page(user_id),
+                AsyncRunTrackerModel.get_global_leaderboard(count=leaderboard_count)
+            )
+        return {
+            'username': user_data.get('username') if user_data else 'Pelari',
+            'runs_page': runs_page or {'runs': [], 'total': 0, 'next_cursor': None},
+            'leaderboard': leaderboard
+        }
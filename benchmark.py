@@ -0,0 +1,411 @@
+# benchmark.py
+"""
+Benchmark endpoint Flask dengan dataset sintetis.
+
+Contoh:
+    python benchmark.py --users 50 --runs-per-user 40 --points 1800 --output bench.json
+    python benchmark.py --backend sqlite --compare bench.json
+
+Default memakai fakeredis (pip install fakeredis) sebagai pengganti Redis lokal agar data
+produksi tidak tersentuh; --redis local memakai REDIS_URL/localhost seperti aplikasi.
+"""
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import click
+import numpy as np
+import redis
+from jinja2 import TemplateNotFound
+
+import app as runtracker
+from app import RunTrackerModel
+
+# Titik awal rute sintetis (sekitar Jakarta), disebar agar tidak semua rute bertumpuk
+ORIGIN_LAT = -6.2
+ORIGIN_LNG = 106.82
+ORIGIN_SPREAD_DEG = 0.05
+METERS_PER_DEG_LAT = 111320.0
+
+SAMPLE_INTERVAL_SEC = 2
+PACE_RANGE_MPS = (2.3, 4.2)
+PAUSE_PROBABILITY = 0.01
+STEPS_PER_METER = 1.35
+
+SCENARIOS = ('dashboard', 'run_detail', 'run_route', 'runs_page', 'global_leaderboard', 'log_run')
+# Skenario halaman HTML dilewati jika templatenya tidak ada (mis. checkout tanpa folder templates)
+SCENARIO_TEMPLATES = {
+    'dashboard': ('dashboard.html',),
+    'run_detail': ('run_detail.html', 'base.html')
+}
+
+
+# --- Penghitung perintah Redis ---
+
+class RedisCommandCounter:
+    """Menghitung perintah Redis yang dikirim (langsung maupun lewat pipeline) selama counter aktif."""
+
+    def __init__(self):
+        self.commands = 0
+        self._originals = None
+
+    def install(self):
+        counter = self
+        execute_command = redis.client.Redis.execute_command
+        pipeline_execute = redis.client.Pipeline.execute
+
+        def counted_execute_command(client, *args, **options):
+            counter.commands += 1
+            return execute_command(client, *args, **options)
+
+        def counted_pipeline_execute(pipe, *args, **kwargs):
+            counter.commands += len(pipe.command_stack)
+            return pipeline_execute(pipe, *args, **kwargs)
+
+        self._originals = (execute_command, pipeline_execute)
+        redis.client.Redis.execute_command = counted_execute_command
+        redis.client.Pipeline.execute = counted_pipeline_execute
+
+    def uninstall(self):
+        if self._originals:
+            redis.client.Redis.execute_command, redis.client.Pipeline.execute = self._originals
+            self._originals = None
+
+
+# --- Generator data sintetis ---
+
+def generate_routes(rng, count, points, start_time):
+    """
+    Membuat `count` rute GPS realistis sekaligus dengan NumPy: random walk dengan arah yang
+    berubah halus, kecepatan lari per rute, jitter GPS dan jeda sesekali (lampu merah).
+    Mengembalikan list rute [[lat, lng, epoch_ms], ...] dan durasi tiap rute (detik).
+    """
+    heading = rng.uniform(0, 2 * np.pi, (count, 1)) + np.cumsum(rng.normal(0.0, 0.08, (count, points)), axis=1)
+    speed = rng.uniform(*PACE_RANGE_MPS, (count, 1)) * rng.normal(1.0, 0.05, (count, points))
+    paused = rng.random((count, points)) < PAUSE_PROBABILITY
+    step_m = np.where(paused, 0.0, np.clip(speed, 0.0, None) * SAMPLE_INTERVAL_SEC)
+    step_m[:, 0] = 0.0
+
+    north_m = np.cumsum(step_m * np.cos(heading), axis=1) + rng.normal(0.0, 1.5, (count, points))
+    east_m = np.cumsum(step_m * np.sin(heading), axis=1) + rng.normal(0.0, 1.5, (count, points))
+    origin_lat = ORIGIN_LAT + rng.uniform(-ORIGIN_SPREAD_DEG, ORIGIN_SPREAD_DEG, (count, 1))
+    origin_lng = ORIGIN_LNG + rng.uniform(-ORIGIN_SPREAD_DEG, ORIGIN_SPREAD_DEG, (count, 1))
+    lats = np.round(origin_lat + north_m / METERS_PER_DEG_LAT, 6)
+    lngs = np.round(origin_lng + east_m / (METERS_PER_DEG_LAT * np.cos(np.radians(origin_lat))), 6)
+
+    start_ms = np.asarray([int(t.timestamp() * 1000) for t in start_time], dtype=np.int64).reshape(count, 1)
+    times = start_ms + np.arange(points, dtype=np.int64) * SAMPLE_INTERVAL_SEC * 1000
+
+    routes = [
+        [list(point) for point in zip(lat_row, lng_row, time_row)]
+        for lat_row, lng_row, time_row in zip(lats.tolist(), lngs.tolist(), times.tolist())
+    ]
+    durations = [(points - 1) * SAMPLE_INTERVAL_SEC] * count
+    return routes, durations
+
+
+def generate_runs(rng, count, points, days=90):
+    """Record run (format run_import) dengan waktu mulai tersebar dalam `days` hari terakhir."""
+    now = datetime.now()
+    start_times = [now - timedelta(seconds=float(offset)) for offset in rng.uniform(0, days * 86400, count)]
+    routes, durations = generate_routes(rng, count, points, start_times)
+    records = []
+    for route, duration_sec, start_time in zip(routes, durations, start_times):
+        records.append({
+            'route_data': route,
+            'duration_sec': duration_sec,
+            'distance_km': 0.0,
+            'total_steps': int(duration_sec * PACE_RANGE_MPS[0] * STEPS_PER_METER),
+            'timestamp': start_time.isoformat()
+        })
+    return records
+
+
+def seed_dataset(storage, rng, users, runs_per_user, points):
+    """Mengisi backend dengan pengguna & run sintetis; Redis memakai import_runs (pipeline per chunk)."""
+    started = time.perf_counter()
+    user_ids = []
+    for index in range(users):
+        user_id = storage.register_user(f"bench_runner_{index}_{rng.integers(1 << 30)}", 'benchmark')
+        if not user_id or user_id == 'duplicate':
+            raise click.ClickException("Gagal membuat pengguna benchmark.")
+        user_ids.append(int(user_id))
+
+    runs = 0
+    for user_id in user_ids:
+        records = generate_runs(rng, runs_per_user, points)
+        if storage.name == 'redis':
+            report = RunTrackerModel.import_runs(user_id, enumerate(records))
+            if report is None or report['failed']:
+                raise click.ClickException(f"Seed gagal: {report}")
+            runs += report['imported']
+        else:
+            for record in records:
+                storage.add_run(user_id, record['duration_sec'], 0.0, 0.0, record['route_data'],
+                                record['total_steps'], timestamp=record['timestamp'])
+                runs += 1
+
+    return user_ids, {'users': users, 'runs': runs, 'elapsed_sec': round(time.perf_counter() - started, 3)}
+
+
+# --- Skenario ---
+
+def build_scenarios(client, storage, rng, user_ids, points):
+    """Setiap skenario adalah fungsi tanpa argumen yang mengembalikan status HTTP (atau 200 untuk model)."""
+    log_run_payloads = generate_runs(rng, 16, points)
+
+    def random_user():
+        return int(rng.choice(user_ids))
+
+    def random_run_id():
+        page = storage.get_user_runs_page(random_user(), limit=RunTrackerModel.RUNS_PAGE_MAX) or {'runs': []}
+        return page['runs'][int(rng.integers(len(page['runs'])))]['run_id'] if page['runs'] else 1
+
+    run_ids = [random_run_id() for _ in range(64)]
+
+    def dashboard():
+        runtracker.get_current_user_id = random_user
+        return client.get('/web/dashboard').status_code
+
+    def run_detail():
+        return client.get(f"/web/run/{rng.choice(run_ids)}").status_code
+
+    def run_route():
+        return client.get(f"/api/runs/{rng.choice(run_ids)}/route?max_points=500").status_code
+
+    def runs_page():
+        return client.get(f"/api/runs?user_id={random_user()}&limit=20").status_code
+
+    def global_leaderboard():
+        storage.get_global_leaderboard(count=5)
+        return 200
+
+    def log_run():
+        record = log_run_payloads[int(rng.integers(len(log_run_payloads)))]
+        return client.post('/api/log_run', json={
+            'user_id': random_user(),
+            'duration_sec': record['duration_sec'],
+            'distance_km': 0.0,
+            'route_data': record['route_data'],
+            'total_steps': record['total_steps']
+        }).status_code
+
+    scenarios = {
+        'dashboard': dashboard,
+        'run_detail': run_detail,
+        'run_route': run_route,
+        'runs_page': runs_page,
+        'global_leaderboard': global_leaderboard,
+        'log_run': log_run
+    }
+    return scenarios
+
+
+def missing_templates(name):
+    """Template skenario yang tidak bisa dimuat Flask (list kosong jika lengkap)."""
+    missing = []
+    for template in SCENARIO_TEMPLATES.get(name, ()):
+        try:
+            runtracker.app.jinja_env.get_template(template)
+        except TemplateNotFound:
+            missing.append(template)
+    return missing
+
+
+def run_scenario(func, requests, warmup, counter):
+    """
+    Mengukur latensi satu skenario. Respons non-2xx (termasuk saat warmup) dihitung sebagai error
+    dan tidak ikut percentile; skenario dengan error ditandai failed agar hasilnya tidak dibandingkan.
+    """
+    errors = 0
+    statuses = {}
+    for _ in range(warmup):
+        status = func()
+        if not 200 <= status < 300:
+            errors += 1
+            statuses[status] = statuses.get(status, 0) + 1
+
+    latencies = []
+    commands_before = counter.commands
+    for _ in range(requests):
+        started = time.perf_counter()
+        status = func()
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        if 200 <= status < 300:
+            latencies.append(elapsed_ms)
+        else:
+            errors += 1
+            statuses[status] = statuses.get(status, 0) + 1
+    commands = counter.commands - commands_before
+
+    result = {
+        'requests': requests,
+        'errors': errors,
+        'error_statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'failed': errors > 0,
+        'redis_commands_per_request': round(commands / requests, 2)
+    }
+    if latencies:
+        latencies = np.asarray(latencies, dtype=np.float64)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        result.update({
+            'p50_ms': round(float(p50), 3),
+            'p95_ms': round(float(p95), 3),
+            'p99_ms': round(float(p99), 3),
+            'mean_ms': round(float(latencies.mean()), 3),
+            'max_ms': round(float(latencies.max()), 3)
+        })
+    else:
+        result.update({'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'mean_ms': None, 'max_ms': None})
+    return result
+
+
+# --- Lingkungan & laporan ---
+
+def use_fake_redis():
+    try:
+        import fakeredis
+    except ImportError:
+        raise click.ClickException("fakeredis belum terpasang (pip install fakeredis) atau gunakan --redis local.")
+
+    client = runtracker.instrument_redis_client(fakeredis.FakeRedis(decode_responses=True))
+    runtracker.redis_client_instance = client
+    runtracker.redis_binary_instance = None
+    return client
+
+
+def memory_report(storage, redis_conn):
+    report = {
+        'backend_bytes': storage.memory_usage_bytes(),
+        'process_max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+    if redis_conn is not None:
+        try:
+            report['redis_keys'] = redis_conn.dbsize()
+        except redis.exceptions.RedisError:
+            report['redis_keys'] = None
+    return report
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    click.echo(f"\nPerbandingan terhadap {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous or current.get('skipped') or previous.get('skipped') or current.get('failed') or previous.get('failed'):
+            continue
+        changes = []
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'redis_commands_per_request'):
+            if previous.get(metric) and current.get(metric) is not None:
+                changes.append(f"{metric} {(current[metric] - previous[metric]) / previous[metric] * 100:+.1f}%")
+        click.echo(f"  {name:<20} " + ', '.join(changes))
+
+
+@click.command()
+@click.option('--backend', type=click.Choice(['redis', 'memory', 'sqlite']), default='redis', show_default=True)
+@click.option('--redis', 'redis_mode', type=click.Choice(['fake', 'local']), default='fake', show_default=True,
+              help='fake = fakeredis in-process, local = REDIS_URL/localhost (data ikut ditulis).')
+@click.option('--users', default=20, show_default=True)
+@click.option('--runs-per-user', default=25, show_default=True)
+@click.option('--points', default=1200, show_default=True, help='Titik GPS per rute.')
+@click.option('--requests', 'request_count', default=200, show_default=True, help='Request terukur per skenario.')
+@click.option('--warmup', default=20, show_default=True)
+@click.option('--scenario', 'scenario_names', multiple=True, type=click.Choice(SCENARIOS), help='Default: semua skenario.')
+@click.option('--seed', default=42, show_default=True)
+@click.option('--output', default='benchmark_results.json', show_default=True)
+@click.option('--compare', 'baseline', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='File hasil sebelumnya untuk dibandingkan.')
+def main(backend, redis_mode, users, runs_per_user, points, request_count, warmup, scenario_names, seed, output, baseline):
+    """Mengisi dataset sintetis lalu mengukur latensi endpoint utama."""
+    rng = np.random.default_rng(seed)
+    redis_conn = use_fake_redis() if redis_mode == 'fake' else runtracker.get_redis_client()
+    if backend == 'redis' and redis_conn is None:
+        raise click.ClickException("Koneksi Redis gagal.")
+
+    if backend == 'sqlite':
+        runtracker.SQLITE_PATH = os.path.join(tempfile.mkdtemp(prefix='runtracker-bench-'), 'bench.db')
+    runtracker.STORAGE_BACKEND = backend
+    runtracker.storage_instance = None
+    storage = runtracker.get_storage()
+
+    counter = RedisCommandCounter()
+    counter.install()
+    try:
+        click.echo(f"Seed: {users} pengguna x {runs_per_user} run x {points} titik ({storage.name})...")
+        user_ids, seed_report = seed_dataset(storage, rng, users, runs_per_user, points)
+        click.echo(f"  selesai dalam {seed_report['elapsed_sec']} detik.")
+
+        # Exception view tetap dihitung sebagai error (status 500) tanpa membanjiri output dengan traceback
+        runtracker.app.logger.setLevel(logging.CRITICAL)
+        client = runtracker.app.test_client()
+        scenarios = build_scenarios(client, storage, rng, user_ids, points)
+        results = {
+            'meta': {
+                'commit': git_revision(),
+                'created_at': datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'backend': storage.name,
+                'redis': redis_mode,
+                'config': {
+                    'users': users, 'runs_per_user': runs_per_user, 'points': points,
+                    'requests': request_count, 'warmup': warmup, 'seed': seed
+                }
+            },
+            'seed': seed_report,
+            'scenarios': {}
+        }
+
+        for name in scenario_names or SCENARIOS:
+            missing = missing_templates(name)
+            if missing:
+                results['scenarios'][name] = {'skipped': f"template tidak ada: {', '.join(missing)}"}
+                click.echo(f"  {name:<20} dilewati (template tidak ada: {', '.join(missing)})")
+                continue
+
+            results['scenarios'][name] = stats = run_scenario(scenarios[name], request_count, warmup, counter)
+            if stats['failed']:
+                click.echo(
+                    f"  {name:<20} GAGAL: {stats['errors']} respons non-2xx "
+                    f"({', '.join(f'{status} x{count}' for status, count in stats['error_statuses'].items())})"
+                )
+                continue
+            click.echo(
+                f"  {name:<20} p50 {stats['p50_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms  "
+                f"p99 {stats['p99_ms']:>8.2f} ms  {stats['redis_commands_per_request']:>6} cmd/req"
+            )
+    finally:
+        counter.uninstall()
+
+    results['memory'] = memory_report(storage, redis_conn)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    click.echo(f"Hasil disimpan ke {output}")
+
+    if baseline:
+        print_comparison(results, baseline)
+
+    failed = [name for name, stats in results['scenarios'].items() if stats.get('failed')]
+    if failed:
+        raise click.ClickException(f"Skenario gagal (respons non-2xx): {', '.join(failed)}")
+
+
+if __name__ == '__main__':
+    main()
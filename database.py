@@ -1,20 +1,8 @@
 # database.py
 
-import redis
-from config import Config
+from redis_connection import get_shared_client
 
-# Inisialisasi koneksi Redis
+# Klien Redis bersama (pool yang sama dengan app.py)
 # decode_responses=True agar hasil yang diterima dari Redis berupa string
-redis_client = redis.Redis(
-    host=Config.REDIS_HOST,
-    port=Config.REDIS_PORT,
-    db=Config.REDIS_DB,
-    decode_responses=True
-)
-
-# Test koneksi ke Redis (Opsional, bisa dilakukan di app.py)
-try:
-    redis_client.ping()
-    print("✅ Redis: Koneksi berhasil dari database.py!")
-except Exception as e:
-    print(f"❌ Redis: Gagal terhubung! Error: {e}")
+# Tidak ada PING saat import: koneksi dibuka saat perintah pertama dijalankan
+redis_client = get_shared_client()
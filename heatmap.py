@@ -0,0 +1,78 @@
+# heatmap.py
+import numpy as np
+
+from route_analytics import haversine_m
+from route_codec import route_columns
+
+# Tile web-mercator (z/x/y seperti peta slippy) dibagi TILE_BINS x TILE_BINS bin.
+# Pada zoom 16 satu bin ~9.5 m di ekuator; zoom yang lebih rendah untuk tampilan kota/wilayah.
+HEATMAP_ZOOMS = (10, 13, 16)
+TILE_BINS = 64
+MAX_LAT = 85.05112878
+# Rute dirapatkan agar garis tetap tersambung di zoom tertinggi walau titik GPS jarang
+DENSIFY_STEP_M = 4.0
+
+
+def densify(lats, lngs, step_m=DENSIFY_STEP_M):
+    """Menyisipkan titik interpolasi linear sehingga jarak antar titik <= step_m (vektor)."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    if len(lats) < 2:
+        return lats, lngs
+
+    pieces = np.maximum(np.ceil(haversine_m(lats, lngs) / step_m).astype(np.int64), 1)
+    segment = np.repeat(np.arange(len(pieces)), pieces)
+    fraction = (np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)) / np.repeat(pieces, pieces)
+    dense_lats = lats[segment] + (lats[segment + 1] - lats[segment]) * fraction
+    dense_lngs = lngs[segment] + (lngs[segment + 1] - lngs[segment]) * fraction
+    return np.append(dense_lats, lats[-1]), np.append(dense_lngs, lngs[-1])
+
+
+def mercator_bins(lats, lngs, zoom):
+    """Koordinat bin global (x, y) pada zoom tertentu; tile = bin // TILE_BINS."""
+    size = (1 << zoom) * TILE_BINS
+    lat_rad = np.radians(np.clip(lats, -MAX_LAT, MAX_LAT))
+    x = np.floor((np.asarray(lngs) + 180.0) / 360.0 * size).astype(np.int64)
+    y = np.floor((1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * size).astype(np.int64)
+    return np.clip(x, 0, size - 1), np.clip(y, 0, size - 1)
+
+
+def route_tiles(route_data, zooms=HEATMAP_ZOOMS):
+    """
+    Bin yang dilewati sebuah rute per tile: {(zoom, tile_x, tile_y): array indeks bin}.
+    Setiap bin dihitung sekali per rute, sehingga nilai heatmap = jumlah run yang melewatinya
+    (lari bolak-balik atau berhenti lama tidak menggelembungkan hitungan).
+    """
+    lats, lngs, _ = route_columns(route_data)
+    if not lats:
+        return {}
+    lats, lngs = densify(lats, lngs)
+
+    tiles = {}
+    for zoom in zooms:
+        x, y = mercator_bins(lats, lngs, zoom)
+        tile_x, tile_y = x // TILE_BINS, y // TILE_BINS
+        bins = (y % TILE_BINS) * TILE_BINS + (x % TILE_BINS)
+        # Satu kunci int64 per (tile, bin) agar deduplikasi cukup satu np.unique
+        keys = np.unique((tile_x << 40) | (tile_y << 16) | bins)
+        key_tiles = keys >> 16
+        boundaries = np.flatnonzero(np.diff(key_tiles)) + 1
+        for group in np.split(keys, boundaries):
+            tile_key = int(group[0] >> 16)
+            tiles[(zoom, tile_key >> 24, tile_key & 0xFFFFFF)] = group & 0xFFFF
+    return tiles
+
+
+def tile_payload(zoom, x, y, counts):
+    """Payload JSON ringkas sebuah tile dari {indeks bin: jumlah run} (sparse, bin urut)."""
+    bins = sorted(counts)
+    values = [counts[index] for index in bins]
+    return {
+        'z': zoom,
+        'x': x,
+        'y': y,
+        'bins': TILE_BINS,
+        'max': max(values, default=0),
+        'pixels': bins,
+        'counts': values
+    }
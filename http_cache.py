@@ -0,0 +1,93 @@
+# http_cache.py
+import json
+import zlib
+
+from werkzeug.http import parse_accept_header, parse_etags
+
+from key_schema import SCHEMA_VERSION
+
+try:
+    import brotli
+except ImportError:
+    # Opsional (pip install brotli); tanpa modul ini hanya varian gzip yang disiapkan
+    brotli = None
+
+# Cache HTTP untuk representasi run. Run tidak berubah setelah add_run, kecuali level detail rute
+# yang dibuat worker (POST_PROCESS_MODE=stream); setelah level final, representasi run ditentukan
+# sepenuhnya oleh run id, versi skema dan parameter tampilan, sehingga ETag-nya bisa dihitung
+# tanpa membaca Redis; If-None-Match dijawab 304 setelah memastikan run ada dan final (cache
+# respons in-process, atau satu HMGET), bukan membaca dan mengompresi rute. Body dikompresi sekali (gzip, dan
+# brotli bila terpasang) lalu disimpan bersama run; setiap content-coding punya ETag kuat sendiri.
+IMMUTABLE_MAX_AGE = 365 * 86400
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# Urutan preferensi saat klien menerima beberapa encoding
+CONTENT_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+ETAG_SUFFIXES = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+
+
+def run_etag(run_id, kind, *variant):
+    """ETag dasar (tanpa akhiran encoding): run-<id>-s<versi skema>-<jenis>[-parameter...]."""
+    parts = [f"run-{int(run_id)}-s{SCHEMA_VERSION}-{kind}"]
+    parts += ['' if value is None else str(value) for value in variant]
+    return '-'.join(parts)
+
+
+def route_response_body(route):
+    """Body JSON /api/runs/<id>/route (bentuk sama dengan jsonify({**route, 'success': True}))."""
+    return json.dumps({**route, 'success': True}, separators=(',', ':')).encode('utf-8')
+
+
+def compress_payload(body):
+    """{content-coding: bytes} dari satu body; varian gzip selalu ada (sumber untuk klien tanpa kompresi)."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    encoded = {'gzip': compressor.compress(body) + compressor.flush()}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+    return encoded
+
+
+def choose_encoding(accept_encoding, encoded):
+    """Content-coding terbaik yang diterima klien (header Accept-Encoding) dan tersedia di payload."""
+    accepted = parse_accept_header(accept_encoding or '')
+    for encoding in CONTENT_ENCODINGS:
+        if encoding in encoded and accepted[encoding]:
+            return encoding
+    return 'identity'
+
+
+def encoded_body(encoded, encoding):
+    if encoding == 'identity':
+        return zlib.decompress(encoded['gzip'], 31)
+    return encoded[encoding]
+
+
+def not_modified_encoding(if_none_match, etag):
+    """Encoding dari ETag (varian mana pun) yang sudah dimiliki klien menurut If-None-Match, atau None."""
+    if not if_none_match:
+        return None
+    etags = parse_etags(if_none_match)
+    for encoding, suffix in ETAG_SUFFIXES.items():
+        if etags.contains_weak(etag + suffix):
+            return encoding
+    return None
+
+
+def response_headers(etag, encoding, max_age=IMMUTABLE_MAX_AGE, not_modified=False):
+    """
+    Header respons run sebagai pasangan (nama, nilai).
+    etag None: representasi belum final, klien tidak boleh menyimpannya (no-cache tanpa ETag).
+    max_age None: ETag saja dan klien selalu revalidasi (mis. HTML yang bergantung pada template).
+    """
+    headers = [('Vary', 'Accept-Encoding')]
+    if encoding != 'identity' and not not_modified:
+        headers.append(('Content-Encoding', encoding))
+    if etag is None:
+        headers.append(('Cache-Control', 'no-cache'))
+        return headers
+    headers.append(('ETag', f'"{etag}{ETAG_SUFFIXES[encoding]}"'))
+    if max_age is None:
+        headers.append(('Cache-Control', 'no-cache'))
+    else:
+        headers.append(('Cache-Control', f"public, max-age={max_age}, immutable"))
+    return headers
@@ -0,0 +1,373 @@
+# instrumentation.py
+import contextvars
+import functools
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+# Metrik in-process dengan format teks Prometheus (tanpa dependensi tambahan).
+# Setiap worker gunicorn punya registry sendiri; scrape per worker atau jalankan satu worker per pod.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COMMAND_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, label_values)} {value}")
+        return lines
+
+
+class HistogramMetric:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label_values -> [jumlah per bucket (non-kumulatif) + +Inf, sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    labels = _label_text(self.labels + ('le',), label_values + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _label_text(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = CounterMetric(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        metric = HistogramMetric(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """collector() mengembalikan baris-baris teks Prometheus tambahan (misalnya gauge statistik cache)."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print(f"Warning: Collector metrik gagal: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+HTTP_DURATION = REGISTRY.histogram(
+    'runtracker_http_request_duration_seconds', 'Durasi request HTTP.', ('endpoint', 'method', 'status')
+)
+REDIS_COMMANDS_PER_REQUEST = REGISTRY.histogram(
+    'runtracker_redis_commands_per_request', 'Jumlah perintah Redis per request HTTP.', ('endpoint',), COMMAND_BUCKETS
+)
+REDIS_COMMANDS = REGISTRY.counter('runtracker_redis_commands_total', 'Perintah Redis yang dikirim.', ('command',))
+REDIS_BYTES = REGISTRY.counter(
+    'runtracker_redis_bytes_total', 'Perkiraan byte payload Redis (argumen & balasan).', ('direction',)
+)
+MODEL_DURATION = REGISTRY.histogram(
+    'runtracker_model_duration_seconds', 'Durasi pemanggilan method model/helper.', ('method',)
+)
+TEMPLATE_DURATION = REGISTRY.histogram(
+    'runtracker_template_render_seconds', 'Durasi render template Jinja (termasuk filter).', ('template',)
+)
+SLOW_REQUESTS = REGISTRY.counter('runtracker_slow_requests_total', 'Request di atas ambang slow log.', ('endpoint',))
+
+
+class RequestStats:
+    """Rincian biaya satu request HTTP: perintah Redis, byte, waktu model & template."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.commands = Counter()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.model_sec = Counter()
+        self.template_sec = Counter()
+
+    def as_dict(self):
+        return {
+            'redis_commands': sum(self.commands.values()),
+            'redis_breakdown': dict(self.commands.most_common()),
+            'redis_bytes_sent': self.bytes_sent,
+            'redis_bytes_received': self.bytes_received,
+            'model_ms': {name: round(sec * 1000, 3) for name, sec in self.model_sec.most_common()},
+            'template_ms': {name: round(sec * 1000, 3) for name, sec in self.template_sec.items()}
+        }
+
+
+_current_stats = contextvars.ContextVar('runtracker_request_stats', default=None)
+
+
+def current_stats():
+    return _current_stats.get()
+
+
+def _payload_size(value):
+    """Perkiraan ukuran payload (byte) argumen atau balasan Redis yang sudah di-parse."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, dict):
+        return sum(_payload_size(k) + _payload_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sum(_payload_size(item) for item in value)
+    return len(str(value))
+
+
+def _record_redis(command_args, response):
+    command = str(command_args[0]).upper() if command_args else 'UNKNOWN'
+    sent = _payload_size(command_args)
+    received = _payload_size(response)
+    REDIS_COMMANDS.inc(command)
+    REDIS_BYTES.inc('sent', amount=sent)
+    REDIS_BYTES.inc('received', amount=received)
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.commands[command] += 1
+        stats.bytes_sent += sent
+        stats.bytes_received += received
+
+
+def instrument_redis_client(client):
+    """
+    Membungkus instance klien Redis (termasuk pipeline dari client.pipeline()) agar setiap
+    perintah dicatat ke metrik global dan statistik request aktif. Method asli di-resolve dari
+    kelasnya saat dipanggil, sehingga patch di level kelas (benchmark) tetap berlaku.
+    """
+    if client is None or getattr(client, '_runtracker_instrumented', False):
+        return client
+
+    def execute_command(*args, **options):
+        response = type(client).execute_command(client, *args, **options)
+        _record_redis(args, response)
+        return response
+
+    def pipeline(*args, **kwargs):
+        return _instrument_pipeline(type(client).pipeline(client, *args, **kwargs))
+
+    client.execute_command = execute_command
+    client.pipeline = pipeline
+    client._runtracker_instrumented = True
+    return client
+
+
+def _instrument_pipeline(pipe):
+    def immediate_execute_command(*args, **options):
+        response = type(pipe).immediate_execute_command(pipe, *args, **options)
+        _record_redis(args, response)
+        return response
+
+    def execute(*args, **kwargs):
+        commands = [command_args for command_args, _ in pipe.command_stack]
+        results = type(pipe).execute(pipe, *args, **kwargs)
+        for command_args, response in zip(commands, results):
+            _record_redis(command_args, response)
+        return results
+
+    pipe.immediate_execute_command = immediate_execute_command
+    pipe.execute = execute
+    return pipe
+
+
+def instrument_async_redis_client(client):
+    """Varian instrument_redis_client untuk klien redis.asyncio (execute_command dan pipeline async)."""
+    if client is None or getattr(client, '_runtracker_instrumented', False):
+        return client
+
+    async def execute_command(*args, **options):
+        response = await type(client).execute_command(client, *args, **options)
+        _record_redis(args, response)
+        return response
+
+    def pipeline(*args, **kwargs):
+        return _instrument_async_pipeline(type(client).pipeline(client, *args, **kwargs))
+
+    client.execute_command = execute_command
+    client.pipeline = pipeline
+    client._runtracker_instrumented = True
+    return client
+
+
+def _instrument_async_pipeline(pipe):
+    async def immediate_execute_command(*args, **options):
+        response = await type(pipe).immediate_execute_command(pipe, *args, **options)
+        _record_redis(args, response)
+        return response
+
+    async def execute(*args, **kwargs):
+        commands = [command_args for command_args, _ in pipe.command_stack]
+        results = await type(pipe).execute(pipe, *args, **kwargs)
+        for command_args, response in zip(commands, results):
+            _record_redis(command_args, response)
+        return results
+
+    pipe.immediate_execute_command = immediate_execute_command
+    pipe.execute = execute
+    return pipe
+
+
+def timed(name, func):
+    """Membungkus fungsi agar durasinya masuk histogram model dan statistik request aktif."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            MODEL_DURATION.observe(elapsed, name)
+            stats = _current_stats.get()
+            if stats is not None:
+                stats.model_sec[name] += elapsed
+    return wrapper
+
+
+def instrument_methods(cls, exclude=()):
+    """Membungkus semua method publik sebuah kelas model (staticmethod maupun method biasa)."""
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('_') or attr in exclude:
+            continue
+        name = f"{cls.__name__}.{attr}"
+        if isinstance(value, staticmethod):
+            setattr(cls, attr, staticmethod(timed(name, value.__func__)))
+        elif callable(value) and not isinstance(value, type):
+            setattr(cls, attr, timed(name, value))
+    return cls
+
+
+def finish_request(stats, endpoint, method, status, path, slow_request_ms=None):
+    """
+    Mencatat request yang selesai ke histogram durasi & perintah Redis, dan mencetak slow log di atas
+    ambang. Dipakai hook Flask (init_app) dan jalur async asgi.py agar keduanya masuk ke seri yang sama.
+    """
+    elapsed = time.perf_counter() - stats.started
+    HTTP_DURATION.observe(elapsed, endpoint, method, str(status))
+    REDIS_COMMANDS_PER_REQUEST.observe(sum(stats.commands.values()), endpoint)
+
+    if slow_request_ms is not None and elapsed * 1000 >= slow_request_ms:
+        SLOW_REQUESTS.inc(endpoint)
+        print("SLOW REQUEST " + json.dumps({
+            'method': method,
+            'path': path,
+            'endpoint': endpoint,
+            'status': status,
+            'duration_ms': round(elapsed * 1000, 3),
+            **stats.as_dict()
+        }))
+
+
+def init_app(app, slow_request_ms=None):
+    """
+    Memasang hook per request, timing template dan endpoint /metrics.
+    slow_request_ms (opsional): request di atas ambang ini dicetak beserta rincian perintah Redis.
+    """
+    from flask import Response, before_render_template, request, template_rendered
+
+    template_starts = contextvars.ContextVar('runtracker_template_starts', default=None)
+
+    @app.before_request
+    def start_request_stats():
+        request.environ['runtracker.stats_token'] = _current_stats.set(RequestStats())
+
+    @app.after_request
+    def finish_request_stats(response):
+        stats = _current_stats.get()
+        if stats is None:
+            return response
+
+        finish_request(stats, request.endpoint or 'unknown', request.method, response.status_code,
+                       request.full_path.rstrip('?'), slow_request_ms=slow_request_ms)
+        return response
+
+    @app.teardown_request
+    def reset_request_stats(error=None):
+        token = request.environ.pop('runtracker.stats_token', None)
+        if token is not None:
+            _current_stats.reset(token)
+
+    def on_before_render(sender, template, context, **extra):
+        starts = template_starts.get()
+        if starts is None:
+            starts = []
+            template_starts.set(starts)
+        starts.append(time.perf_counter())
+
+    def on_rendered(sender, template, context, **extra):
+        starts = template_starts.get()
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        name = template.name or 'unknown'
+        TEMPLATE_DURATION.observe(elapsed, name)
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.template_sec[name] += elapsed
+
+    before_render_template.connect(on_before_render, app, weak=False)
+    template_rendered.connect(on_rendered, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
@@ -0,0 +1,84 @@
+# key_schema.py
+import json
+import re
+import zlib
+
+# Skema kunci Redis bersama app.py dan models.py. Versi tersimpan di SCHEMA_VERSION_KEY setelah
+# `flask migrate-schema` selesai; selama migrasi pembaca memahami format v1 dan v2 sekaligus.
+#
+# v2 (dibanding v1):
+# - username -> id disimpan di hash berember users:by_name:<n> (bukan satu string key per pengguna),
+#   ember kecil tetap ber-encoding listpack sehingga overhead per kunci hilang
+# - jarak di hash statistik berupa integer meter (HINCRBY) alih-alih float string (HINCRBYFLOAT)
+# - field angka hash run ditulis sependek mungkin (nilai bulat = integer encoding) dan field
+#   yang bernilai default tidak ditulis
+SCHEMA_VERSION = 2
+SCHEMA_VERSION_KEY = 'schema:version'
+SCHEMA_MIGRATION_KEY = 'schema:migration'
+
+RUN_ID_COUNTER = 'run_id_counter'
+USER_ID_COUNTER = 'user_id_counter'
+USER_KEY = 'user:{}:details'
+USER_RUNS = 'user:{}:runs'
+RUN_DETAIL = 'run:{}'
+# Pola SCAN run:* juga mengenai hash lain di bawah run:{id}: (mis. run:{id}:route:payload:{n});
+# hanya kunci yang cocok dengan pola ini yang merupakan hash run
+RUN_DETAIL_KEY = re.compile(r'^run:\d+$')
+
+# Jumlah ember dipilih agar ember tetap di bawah hash-max-listpack-entries (128) hingga ~100 ribu pengguna
+USERNAME_INDEX = 'users:by_name:{}'
+EMAIL_INDEX = 'users:by_email:{}'
+INDEX_BUCKETS = 1024
+LEGACY_USERNAME_KEY = 'user:username:{}'
+
+# Hash statistik: total_distance_m, longest_run_m, '<bucket>:distance_m' (v1: *_km, '<bucket>:distance_km')
+USER_STATS = 'user:{}:stats'
+USER_STATS_WEEKLY = 'user:{}:stats:weekly'
+USER_STATS_MONTHLY = 'user:{}:stats:monthly'
+
+# Presisi field float hash run; nilai lain ditulis apa adanya
+RUN_FIELD_DIGITS = {'distance_km': 3, 'average_pace': 2, 'cadence_spm': 1}
+# Field hash run yang tidak ditulis jika bernilai default (pembaca memakai default yang sama)
+RUN_FIELD_DEFAULTS = {'paused_time_sec': '0', 'best_1k_sec': '', 'best_5k_sec': '', 'splits_sec': '[]'}
+
+# Kunci tulisan models.py lama; id-nya beririsan dengan counter app.py sehingga tidak dimigrasi otomatis
+LEGACY_MODELS_KEYS = ('emails', 'leaderboard:total_distance', 'global:user_counter', 'global:run_counter')
+
+
+def index_bucket(value):
+    return zlib.crc32(str(value).encode('utf-8')) % INDEX_BUCKETS
+
+
+def username_index_key(username):
+    return USERNAME_INDEX.format(index_bucket(username))
+
+
+def email_index_key(email):
+    return EMAIL_INDEX.format(index_bucket(email.lower()))
+
+
+def km_to_m(distance_km):
+    """Jarak km (angka atau string, boleh kosong) ke integer meter."""
+    return int(round(float(distance_km or 0) * 1000))
+
+
+def compact_number(value, digits):
+    """Representasi terpendek setelah pembulatan: 5.0 -> '5' (integer encoding), 5.12345 -> '5.123'."""
+    text = f"{round(float(value), digits):.{digits}f}".rstrip('0').rstrip('.')
+    return '0' if text in ('', '-0') else text
+
+
+def encode_run_fields(fields):
+    """Field hash run (nilai apa pun) -> string ringkas v2; field default dihilangkan."""
+    encoded = {}
+    for field, value in fields.items():
+        if field in RUN_FIELD_DIGITS and value not in (None, ''):
+            value = compact_number(value, RUN_FIELD_DIGITS[field])
+        elif isinstance(value, (list, dict)):
+            value = json.dumps(value, separators=(',', ':'))
+        else:
+            value = str(value)
+        if RUN_FIELD_DEFAULTS.get(field) == value:
+            continue
+        encoded[field] = value
+    return encoded
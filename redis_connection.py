@@ -0,0 +1,228 @@
+# redis_connection.py
+import os
+import threading
+import time
+
+import redis
+import redis.asyncio as aioredis
+from redis.backoff import ExponentialWithJitterBackoff
+from redis.retry import Retry
+
+from config import Config
+
+# Pool koneksi Redis bersama untuk app.py dan database.py. Tidak ada I/O jaringan saat import
+# maupun saat pool dibuat: koneksi pertama dibuka oleh perintah pertama, lalu dipakai ulang
+# oleh request berikutnya selama instance serverless masih hangat.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 20))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 5))
+REDIS_CONNECT_TIMEOUT = float(os.environ.get('REDIS_CONNECT_TIMEOUT', 2))
+# Koneksi yang idle lebih lama dari ini di-PING dulu sebelum dipakai (mendeteksi koneksi putus oleh proxy)
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', 30))
+REDIS_RETRIES = int(os.environ.get('REDIS_RETRIES', 2))
+REDIS_BACKOFF_BASE = 0.05
+REDIS_BACKOFF_CAP = 0.5
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('REDIS_BREAKER_THRESHOLD', 5))
+BREAKER_RESET_TIMEOUT = float(os.environ.get('REDIS_BREAKER_RESET_SEC', 10))
+
+
+class CircuitBreaker:
+    """
+    closed -> open setelah `failure_threshold` kegagalan koneksi berturut-turut; selama open,
+    get_redis_client() langsung mengembalikan None (tanpa menunggu timeout). Setelah
+    `reset_timeout` detik breaker half-open dan hanya satu pemanggil (probe) yang diizinkan;
+    pemanggil lain ditolak sampai probe berhasil (closed) atau gagal (open lagi). Probe yang
+    tidak pernah melapor (mis. request berhenti sebelum membuka koneksi) dianggap hilang setelah
+    `reset_timeout` detik dan digantikan probe baru.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.probing = False
+        self.probe_started = None
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probing = False
+            if self.probing and now - self.probe_started < self.reset_timeout:
+                return False
+            self.probing = True
+            self.probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                    print(f"Redis: Circuit breaker terbuka setelah {self.failures} kegagalan koneksi.")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state, 'consecutive_failures': self.failures,
+                'times_opened': self.times_opened, 'probing': self.probing
+            }
+
+
+BREAKER = CircuitBreaker()
+POOL_STATS = {'connections_created': 0, 'checkouts': 0, 'connect_failures': 0, 'first_connect_ms': None}
+_stats_lock = threading.Lock()
+
+
+def _record_connection_created():
+    with _stats_lock:
+        POOL_STATS['connections_created'] += 1
+
+
+def _record_connect_failure():
+    with _stats_lock:
+        POOL_STATS['connect_failures'] += 1
+    BREAKER.record_failure()
+
+
+def _record_checkout(started):
+    with _stats_lock:
+        POOL_STATS['checkouts'] += 1
+        if POOL_STATS['first_connect_ms'] is None:
+            POOL_STATS['first_connect_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    BREAKER.record_success()
+
+
+class TrackedConnectionPool(redis.ConnectionPool):
+    """ConnectionPool yang mencatat reuse koneksi dan melapor hasil koneksi ke circuit breaker."""
+
+    def make_connection(self):
+        _record_connection_created()
+        return super().make_connection()
+
+    def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError):
+            _record_connect_failure()
+            raise
+
+        _record_checkout(started)
+        return connection
+
+
+class TrackedAsyncConnectionPool(aioredis.ConnectionPool):
+    """Varian redis.asyncio dari TrackedConnectionPool: statistik dan circuit breaker yang sama."""
+
+    def make_connection(self):
+        _record_connection_created()
+        return super().make_connection()
+
+    async def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+        except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError):
+            _record_connect_failure()
+            raise
+
+        _record_checkout(started)
+        return connection
+
+
+_pools = {}
+_clients = {}
+_pool_lock = threading.Lock()
+
+
+def redis_url():
+    """REDIS_URL (Vercel/Upstash) jika ada; selain itu Redis lokal dari config.py."""
+    return REDIS_URL or f"redis://{Config.REDIS_HOST}:{Config.REDIS_PORT}/{Config.REDIS_DB}"
+
+
+def get_connection_pool(decode_responses=True):
+    """Pool bersama per mode decode (teks vs biner), dibuat sekali per proses tanpa I/O jaringan."""
+    pool = _pools.get(decode_responses)
+    if pool is not None:
+        return pool
+
+    with _pool_lock:
+        if decode_responses not in _pools:
+            _pools[decode_responses] = TrackedConnectionPool.from_url(
+                redis_url(),
+                decode_responses=decode_responses,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+                socket_keepalive=True,
+                health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+                retry=Retry(ExponentialWithJitterBackoff(cap=REDIS_BACKOFF_CAP, base=REDIS_BACKOFF_BASE), REDIS_RETRIES)
+            )
+        return _pools[decode_responses]
+
+
+def async_connection_pool(decode_responses=True):
+    """
+    Pool redis.asyncio baru dengan konfigurasi yang sama dengan pool sync. Pool async terikat ke
+    event loop, jadi pemanggil (async_model) menyimpannya per loop; tidak ada I/O sampai perintah pertama.
+    """
+    return TrackedAsyncConnectionPool.from_url(
+        redis_url(),
+        decode_responses=decode_responses,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL
+    )
+
+
+def get_shared_client(decode_responses=True):
+    """Klien Redis di atas pool bersama (membuat objek klien tidak membuka koneksi)."""
+    client = _clients.get(decode_responses)
+    if client is None:
+        client = _clients.setdefault(decode_responses, redis.Redis(connection_pool=get_connection_pool(decode_responses)))
+    return client
+
+
+def connection_stats():
+    """Statistik reuse koneksi: reuse_ratio = porsi checkout yang memakai koneksi yang sudah terbuka."""
+    with _stats_lock:
+        stats = dict(POOL_STATS)
+    checkouts = stats['checkouts']
+    stats['reuse_ratio'] = round(1 - min(stats['connections_created'], checkouts) / checkouts, 4) if checkouts else 0.0
+    stats['pools'] = {
+        ('text' if decode else 'binary'): {
+            'max_connections': pool.max_connections,
+            'idle': len(pool._available_connections),
+            'in_use': len(pool._in_use_connections)
+        }
+        for decode, pool in list(_pools.items())
+    }
+    stats['breaker'] = BREAKER.stats()
+    return stats
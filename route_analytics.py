@@ -0,0 +1,95 @@
+# route_analytics.py
+import numpy as np
+
+from route_codec import route_columns
+
+EARTH_RADIUS_M = 6371008.8
+
+# Segmen dengan kecepatan di bawah ambang ini dianggap berhenti (jeda)
+PAUSE_SPEED_MPS = 0.5
+BEST_EFFORT_DISTANCES_M = {'best_1k_sec': 1000.0, 'best_5k_sec': 5000.0}
+# Timestamp epoch di atas nilai ini dianggap milidetik (Date.now() dari browser)
+EPOCH_MS_THRESHOLD = 1e11
+
+
+def haversine_m(lats, lngs):
+    """Jarak (meter) antar titik berurutan, dihitung sekaligus untuk seluruh array."""
+    lat = np.radians(lats)
+    lng = np.radians(lngs)
+    dlat = np.diff(lat)
+    dlng = np.diff(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _relative_seconds(times):
+    times = np.asarray(times, dtype=np.float64)
+    if times[0] > EPOCH_MS_THRESHOLD:
+        times = times / 1000.0
+    return times - times[0]
+
+
+def best_effort_sec(cumulative_m, elapsed_sec, target_m):
+    """Waktu tercepat menempuh target_m di jendela mana pun pada rute (None jika rute lebih pendek)."""
+    reachable = cumulative_m + target_m <= cumulative_m[-1]
+    if not reachable.any():
+        return None
+    starts = cumulative_m[reachable]
+    finish = np.interp(starts + target_m, cumulative_m, elapsed_sec)
+    return float(np.min(finish - elapsed_sec[reachable]))
+
+
+def analyze_route(route_data, duration_sec=0, total_steps=0):
+    """
+    Menghitung statistik rute secara vektor: jarak haversine, split per km,
+    waktu bergerak vs jeda, best effort 1k/5k dan cadence dari total_steps.
+    Tanpa timestamp per titik, waktu diasumsikan merata terhadap jarak selama duration_sec.
+    """
+    lats, lngs, times = route_columns(route_data)
+    duration_sec = float(duration_sec or 0)
+
+    result = {
+        'distance_km': 0.0,
+        'moving_time_sec': int(duration_sec),
+        'paused_time_sec': 0,
+        'splits_sec': [],
+        'best_1k_sec': None,
+        'best_5k_sec': None,
+        'cadence_spm': 0.0,
+        'point_count': len(lats)
+    }
+
+    if len(lats) >= 2:
+        segment_m = haversine_m(np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64))
+        cumulative_m = np.concatenate(([0.0], np.cumsum(segment_m)))
+        total_m = float(cumulative_m[-1])
+        result['distance_km'] = round(total_m / 1000.0, 3)
+
+        if times is not None:
+            elapsed_sec = _relative_seconds(times)
+            segment_sec = np.diff(elapsed_sec)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                speed = np.where(segment_sec > 0, segment_m / segment_sec, 0.0)
+            moving = (segment_sec > 0) & (speed >= PAUSE_SPEED_MPS)
+            moving_sec = float(segment_sec[moving].sum())
+            result['moving_time_sec'] = int(round(moving_sec))
+            result['paused_time_sec'] = int(round(max(float(elapsed_sec[-1]) - moving_sec, 0.0)))
+        elif total_m > 0:
+            elapsed_sec = cumulative_m / total_m * duration_sec
+        else:
+            elapsed_sec = None
+
+        if elapsed_sec is not None and total_m > 0:
+            km_marks = np.arange(1000.0, total_m + 1e-9, 1000.0)
+            if km_marks.size:
+                mark_sec = np.interp(km_marks, cumulative_m, elapsed_sec)
+                result['splits_sec'] = np.round(np.diff(mark_sec, prepend=0.0)).astype(int).tolist()
+            for field, target_m in BEST_EFFORT_DISTANCES_M.items():
+                best = best_effort_sec(cumulative_m, elapsed_sec, target_m)
+                result[field] = int(round(best)) if best is not None else None
+
+    moving_min = result['moving_time_sec'] / 60.0
+    if total_steps and moving_min > 0:
+        result['cadence_spm'] = round(float(total_steps) / moving_min, 1)
+
+    return result
@@ -0,0 +1,161 @@
+# route_archive.py
+import fcntl
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+# Arsip dingin rute di disk lokal: file segmen append-only routes-<n>.seg berisi record
+#   header : MAGIC (4 byte) | run_id (uint64) | flags (1 byte) | jumlah level (1 byte) | panjang payload (uint32)
+#   payload: panjang blob per level (uint32[]) | blob level 0..n (format route_codec), opsional zlib
+# dan index offset routes-<n>.idx berisi entri tetap (run_id, offset, length) untuk setiap record.
+# Pointer "segmen:offset:length" disimpan di hash run, sehingga pembacaan tidak perlu mencari index.
+
+RECORD_MAGIC = b'RTA1'
+RECORD_HEADER = struct.Struct('<4sQBBI')
+FLAG_ZLIB = 0x01
+INDEX_ENTRY = np.dtype([('run_id', '<u8'), ('offset', '<u8'), ('length', '<u4')])
+SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+SEGMENT_PATTERN = re.compile(r'^routes-(\d+)\.seg$')
+
+
+def _pack_record(run_id, blobs):
+    lengths = struct.pack(f'<{len(blobs)}I', *(len(blob) for blob in blobs))
+    payload = lengths + b''.join(blobs)
+    flags = 0
+    # Blob route_codec biasanya sudah ter-zlib; kompresi ulang hanya dipakai jika memang lebih kecil
+    compressed = zlib.compress(payload, 6)
+    if len(compressed) < len(payload):
+        payload, flags = compressed, FLAG_ZLIB
+    return RECORD_HEADER.pack(RECORD_MAGIC, int(run_id), flags, len(blobs), len(payload)) + payload
+
+
+def _unpack_record(record):
+    magic, run_id, flags, level_count, payload_length = RECORD_HEADER.unpack_from(record, 0)
+    if magic != RECORD_MAGIC:
+        raise ValueError("Record arsip rute rusak")
+    payload = bytes(record[RECORD_HEADER.size:RECORD_HEADER.size + payload_length])
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    lengths = struct.unpack_from(f'<{level_count}I', payload, 0)
+    blobs = []
+    position = 4 * level_count
+    for length in lengths:
+        blobs.append(payload[position:position + length])
+        position += length
+    return run_id, blobs
+
+
+class RouteArchive:
+    """
+    Penyimpanan rute dingin. Penulisan (archive-routes) dikunci dengan flock sehingga aman
+    dijalankan dari beberapa proses; pembacaan memakai mmap read-only per segmen, dibagi antar thread.
+    Direktori harus berada di disk yang sama dengan proses yang melayani pembacaan.
+    """
+
+    def __init__(self, directory, segment_max_bytes=SEGMENT_MAX_BYTES):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def _path(self, segment, suffix):
+        return os.path.join(self.directory, f"routes-{segment:06d}.{suffix}")
+
+    def segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(match.group(1)) for match in map(SEGMENT_PATTERN.match, os.listdir(self.directory)) if match)
+
+    def append(self, records):
+        """
+        Menambahkan record [(run_id, [blob level 0..n])] lalu fsync segmen & index.
+        Mengembalikan {run_id: pointer}; pointer baru boleh disimpan setelah fungsi ini selesai.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        pointers = {}
+        with open(os.path.join(self.directory, 'archive.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            segments = self.segments()
+            segment = segments[-1] if segments else 1
+            if os.path.exists(self._path(segment, 'seg')) and os.path.getsize(self._path(segment, 'seg')) >= self.segment_max_bytes:
+                segment += 1
+
+            entries = np.zeros(len(records), dtype=INDEX_ENTRY)
+            with open(self._path(segment, 'seg'), 'ab') as seg_file, open(self._path(segment, 'idx'), 'ab') as idx_file:
+                offset = seg_file.tell()
+                for position, (run_id, blobs) in enumerate(records):
+                    record = _pack_record(run_id, blobs)
+                    seg_file.write(record)
+                    entries[position] = (int(run_id), offset, len(record))
+                    pointers[run_id] = f"{segment}:{offset}:{len(record)}"
+                    offset += len(record)
+                idx_file.write(entries.tobytes())
+                for handle in (seg_file, idx_file):
+                    handle.flush()
+                    os.fsync(handle.fileno())
+        return pointers
+
+    def _map(self, segment, end):
+        """
+        mmap read-only sebuah segmen. Mapping dipakai ulang selama mencakup record yang diminta; segmen
+        hanya dipetakan ulang jika file sudah bertambah melewati panjang mapping, lalu mapping lama ditutup.
+        """
+        mapped = self._maps.get(segment)
+        if mapped is not None and len(mapped) >= end:
+            return mapped
+        with self._lock:
+            mapped = self._maps.get(segment)
+            if mapped is None or len(mapped) < end:
+                with open(self._path(segment, 'seg'), 'rb') as seg_file:
+                    if os.fstat(seg_file.fileno()).st_size < end:
+                        raise ValueError(f"Pointer arsip melewati akhir segmen {segment}")
+                    remapped = mmap.mmap(seg_file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[segment] = remapped
+                if mapped is not None:
+                    mapped.close()
+                mapped = remapped
+            return mapped
+
+    def read(self, pointer):
+        """Blob rute per level dari pointer 'segmen:offset:length'."""
+        segment, offset, length = (int(part) for part in pointer.split(':'))
+        end = offset + length
+        try:
+            record = self._map(segment, end)[offset:end]
+        except ValueError:
+            # Thread lain memetakan ulang segmen (dan menutup mapping lama) di antara _map() dan slicing
+            record = self._map(segment, end)[offset:end]
+        return _unpack_record(record)[1]
+
+    def close(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+    def locate(self, run_id):
+        """Mencari pointer lewat index offset (segmen terbaru lebih dulu); dipakai jika pointer di Redis hilang."""
+        for segment in reversed(self.segments()):
+            path = self._path(segment, 'idx')
+            if not os.path.getsize(path):
+                continue
+            index = np.memmap(path, dtype=INDEX_ENTRY, mode='r')
+            hits = np.flatnonzero(index['run_id'] == int(run_id))
+            if len(hits):
+                entry = index[hits[-1]]
+                return f"{segment}:{int(entry['offset'])}:{int(entry['length'])}"
+        return None
+
+    def stats(self):
+        segments = self.segments()
+        return {
+            'directory': self.directory,
+            'segments': len(segments),
+            'bytes': sum(os.path.getsize(self._path(segment, 'seg')) for segment in segments),
+            'records': sum(os.path.getsize(self._path(segment, 'idx')) // INDEX_ENTRY.itemsize for segment in segments)
+        }
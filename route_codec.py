@@ -0,0 +1,274 @@
+# route_codec.py
+import json
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime, timezone
+from itertools import accumulate
+
+# Format biner rute (versi 1), little-endian:
+#   header : MAGIC (2 byte) | versi (1 byte) | flags (1 byte) | jumlah titik (uint32)
+#   payload: delta lat (int32[]) | delta lng (int32[]) | [delta waktu (int64[])] | [ekstra (JSON)]
+# Koordinat disimpan fixed-point 1e-6 derajat (~0.11 m), waktu dalam milidetik.
+# Payload di-compress zlib jika FLAG_ZLIB aktif.
+# Waktu string ISO 8601 disimpan sebagai epoch (FLAG_ISO_TIME: di-decode kembali ke ISO UTC).
+# Field per titik di luar lat/lng/waktu (elevasi, detak jantung, ...) dan nama kunci yang bukan
+# bawaan disimpan di bagian ekstra (FLAG_EXTRA), JSON {"keys": {...}, "fields": {nama: [nilai]}};
+# nilai null berarti titik itu tidak punya field tersebut.
+
+MAGIC = b'RT'
+VERSION = 1
+HEADER = struct.Struct('<2sBBI')
+
+FLAG_ZLIB = 0x01
+FLAG_TIME = 0x02
+FLAG_DICT = 0x04
+FLAG_EXTRA = 0x08
+FLAG_ISO_TIME = 0x10
+
+COORD_SCALE = 1_000_000
+TIME_SCALE = 1000
+
+LAT_KEYS = ('lat', 'latitude')
+LNG_KEYS = ('lng', 'lon', 'longitude')
+TIME_KEYS = ('timestamp', 'time', 't')
+
+
+def _first_key(point, keys):
+    for key in keys:
+        if key in point:
+            return key
+    return None
+
+
+def _parse_time(value, index):
+    """(epoch detik, berasal dari string ISO?) dari angka, string angka atau string ISO 8601."""
+    if isinstance(value, str):
+        try:
+            return float(value), False
+        except ValueError:
+            pass
+        try:
+            parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00').replace('z', '+00:00'))
+        except ValueError:
+            raise ValueError(f"waktu titik #{index} bukan angka atau ISO 8601: {value!r}") from None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp(), True
+    return float(value), False
+
+
+def _coordinate(value, name, index):
+    if value is None:
+        raise ValueError(f"titik #{index} tidak punya {name}")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} titik #{index} bukan angka: {value!r}") from None
+
+
+def _normalize_points(points):
+    """
+    Menyeragamkan titik ([lat, lng, t?, ...] atau dict lat/lng/timestamp) menjadi tuple
+    (lat, lng, epoch|None, waktu ISO?) plus info untuk encode tanpa kehilangan data.
+    """
+    as_dict = bool(points) and isinstance(points[0], dict)
+    normalized = []
+    for index, point in enumerate(points):
+        if isinstance(point, dict):
+            lat_key, lng_key, time_key = (_first_key(point, keys) for keys in (LAT_KEYS, LNG_KEYS, TIME_KEYS))
+            lat, lng = point.get(lat_key), point.get(lng_key)
+            ts = point.get(time_key)
+        elif isinstance(point, (list, tuple)):
+            if len(point) < 2:
+                raise ValueError(f"titik #{index} harus berisi minimal [lat, lng]")
+            lat, lng = point[0], point[1]
+            ts = point[2] if len(point) > 2 else None
+        else:
+            raise ValueError(f"titik #{index} harus list [lat, lng, ...] atau dict, bukan {type(point).__name__}")
+        lat, lng = _coordinate(lat, 'lat', index), _coordinate(lng, 'lng', index)
+        epoch, iso = (None, False) if ts is None else _parse_time(ts, index)
+        normalized.append((lat, lng, epoch, iso))
+    has_time = bool(normalized) and all(p[2] is not None for p in normalized)
+    return normalized, as_dict, has_time
+
+
+def _extra_fields(points, as_dict, has_time):
+    """Bagian ekstra (nama kunci non-bawaan dan field tambahan per titik), atau None jika kosong."""
+    keys = {}
+    fields = {}
+    if as_dict:
+        first = points[0]
+        used = {}
+        for role, candidates, default in (('lat', LAT_KEYS, 'lat'), ('lng', LNG_KEYS, 'lng'), ('time', TIME_KEYS, 'timestamp')):
+            key = _first_key(first, candidates) or default
+            used[role] = key
+            if key != default:
+                keys[role] = key
+        encoded_keys = {_first_key(p, LAT_KEYS) for p in points} | {_first_key(p, LNG_KEYS) for p in points}
+        if has_time:
+            encoded_keys |= {_first_key(p, TIME_KEYS) for p in points}
+        for index, point in enumerate(points):
+            for name, value in point.items():
+                if name in encoded_keys:
+                    continue
+                fields.setdefault(name, [None] * len(points))[index] = value
+    else:
+        first_extra = 3 if has_time else 2
+        for index, point in enumerate(points):
+            for position in range(first_extra, len(point)):
+                fields.setdefault(str(position), [None] * len(points))[index] = point[position]
+
+    if not keys and not fields:
+        return None
+    return {'keys': keys, 'fields': fields}
+
+
+def route_columns(points):
+    """Mengambil kolom (lats, lngs, times|None) dari list titik rute dalam format apa pun yang didukung."""
+    normalized, _, has_time = _normalize_points(points or [])
+    lats = [p[0] for p in normalized]
+    lngs = [p[1] for p in normalized]
+    times = [p[2] for p in normalized] if has_time else None
+    return lats, lngs, times
+
+
+def _deltas(values):
+    previous = 0
+    result = []
+    for value in values:
+        result.append(value - previous)
+        previous = value
+    return result
+
+
+def _to_le_bytes(arr):
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_le_bytes(typecode, data):
+    arr = array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+
+def encode_route(points, compress=True):
+    """Meng-encode list titik rute menjadi bytes ringkas (delta + fixed-point, opsional zlib)."""
+    points = points or []
+    normalized, as_dict, has_time = _normalize_points(points)
+
+    lat = array('i', _deltas([round(p[0] * COORD_SCALE) for p in normalized]))
+    lng = array('i', _deltas([round(p[1] * COORD_SCALE) for p in normalized]))
+    payload = _to_le_bytes(lat) + _to_le_bytes(lng)
+    if has_time:
+        payload += _to_le_bytes(array('q', _deltas([round(p[2] * TIME_SCALE) for p in normalized])))
+
+    flags = (FLAG_TIME if has_time else 0) | (FLAG_DICT if as_dict else 0)
+    if has_time and all(p[3] for p in normalized):
+        flags |= FLAG_ISO_TIME
+    extra = _extra_fields(points, as_dict, has_time) if points else None
+    if extra is not None:
+        payload += json.dumps(extra, separators=(',', ':')).encode('utf-8')
+        flags |= FLAG_EXTRA
+    if compress:
+        payload = zlib.compress(payload, 6)
+        flags |= FLAG_ZLIB
+
+    return HEADER.pack(MAGIC, VERSION, flags, len(normalized)) + payload
+
+
+def is_encoded_route(blob):
+    return isinstance(blob, (bytes, bytearray, memoryview)) and bytes(blob[:2]) == MAGIC
+
+
+def _decode(blob):
+    """(flags, lats, lngs, times|None, ekstra|None) dari bytes rute."""
+    magic, version, flags, count = HEADER.unpack_from(blob, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Format rute tidak dikenal (versi {version})")
+
+    payload = bytes(blob[HEADER.size:])
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+
+    coord_bytes = count * 4
+    lat = _from_le_bytes('i', payload[:coord_bytes])
+    lng = _from_le_bytes('i', payload[coord_bytes:2 * coord_bytes])
+    lats = [v / COORD_SCALE for v in accumulate(lat)]
+    lngs = [v / COORD_SCALE for v in accumulate(lng)]
+
+    offset = 2 * coord_bytes
+    times = None
+    if flags & FLAG_TIME:
+        raw_times = _from_le_bytes('q', payload[offset:offset + count * 8])
+        times = [v / TIME_SCALE for v in accumulate(raw_times)]
+        offset += count * 8
+
+    extra = json.loads(payload[offset:].decode('utf-8')) if flags & FLAG_EXTRA else None
+    return flags, lats, lngs, times, extra
+
+
+def decode_route_columns(blob):
+    """Men-decode bytes rute menjadi kolom (lat, lng, times|None) dalam bentuk list float."""
+    _, lats, lngs, times, _ = _decode(blob)
+    return lats, lngs, times
+
+
+def _plain_number(value):
+    return int(value) if value == int(value) else value
+
+
+def _iso_time(epoch):
+    moment = datetime.fromtimestamp(epoch, timezone.utc)
+    timespec = 'seconds' if epoch == int(epoch) else 'milliseconds'
+    return moment.isoformat(timespec=timespec).replace('+00:00', 'Z')
+
+
+def decode_route(blob):
+    """Men-decode bytes rute kembali ke bentuk list semula (list [lat, lng(, t), ...] atau dict)."""
+    flags, lats, lngs, times, extra = _decode(blob)
+    keys = (extra or {}).get('keys', {})
+    fields = (extra or {}).get('fields', {})
+
+    if times is not None:
+        times = [_iso_time(t) for t in times] if flags & FLAG_ISO_TIME else [_plain_number(t) for t in times]
+
+    if flags & FLAG_DICT:
+        lat_key, lng_key, time_key = keys.get('lat', 'lat'), keys.get('lng', 'lng'), keys.get('time', 'timestamp')
+        route = []
+        for index, (a, b) in enumerate(zip(lats, lngs)):
+            point = {lat_key: a, lng_key: b}
+            if times is not None:
+                point[time_key] = times[index]
+            for name, values in fields.items():
+                if values[index] is not None:
+                    point[name] = values[index]
+            route.append(point)
+        return route
+
+    positions = sorted(fields, key=int)
+    route = []
+    for index, (a, b) in enumerate(zip(lats, lngs)):
+        point = [a, b] if times is None else [a, b, times[index]]
+        tail = [fields[position][index] for position in positions]
+        while tail and tail[-1] is None:
+            tail.pop()
+        route.append(point + tail)
+    return route
+
+
+def load_route(value):
+    """Membaca rute dari format biner baru maupun string JSON lama (backward compatible)."""
+    if value is None:
+        return []
+    if is_encoded_route(value):
+        return decode_route(value)
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    return json.loads(value or '[]')
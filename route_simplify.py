@@ -0,0 +1,91 @@
+# route_simplify.py
+import numpy as np
+
+from route_codec import route_columns
+
+EARTH_RADIUS_M = 6371008.8
+
+# Toleransi (meter) untuk tiap level detail; level 0 selalu rute penuh
+LOD_TOLERANCES_M = (3.0, 10.0, 30.0)
+
+
+def project_local(lats, lngs):
+    """Proyeksi equirectangular lokal ke meter (cukup akurat untuk skala satu rute lari)."""
+    lat_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lng_rad = np.radians(np.asarray(lngs, dtype=np.float64))
+    if lat_rad.size == 0:
+        return lat_rad, lng_rad
+    x = EARTH_RADIUS_M * lng_rad * np.cos(lat_rad.mean())
+    y = EARTH_RADIUS_M * lat_rad
+    return x, y
+
+
+def rdp_indices(x, y, tolerance_m):
+    """
+    Ramer-Douglas-Peucker iteratif: jarak semua titik dalam satu segmen dihitung
+    sekaligus dengan NumPy, loop Python hanya per titik yang dipertahankan.
+    """
+    n = len(x)
+    if n < 3:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        px = x[start + 1:end] - x[start]
+        py = y[start + 1:end] - y[start]
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        segment_len2 = dx * dx + dy * dy
+        if segment_len2 == 0:
+            distances = np.hypot(px, py)
+        else:
+            t = np.clip((px * dx + py * dy) / segment_len2, 0.0, 1.0)
+            distances = np.hypot(px - t * dx, py - t * dy)
+
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+
+    return np.flatnonzero(keep)
+
+
+def build_levels(points, tolerances=LOD_TOLERANCES_M):
+    """Mengembalikan list level rute: [rute penuh, level 1, level 2, ...] dengan bentuk titik asli."""
+    points = points or []
+    levels = [points]
+    if len(points) < 3:
+        return levels + [points for _ in tolerances]
+
+    lats, lngs, _ = route_columns(points)
+    x, y = project_local(lats, lngs)
+    for tolerance in tolerances:
+        levels.append([points[i] for i in rdp_indices(x, y, tolerance)])
+    return levels
+
+
+def select_level(point_counts, tolerances=LOD_TOLERANCES_M, max_points=None, tolerance=None):
+    """
+    Memilih level paling detail yang memenuhi batas max_points dan/atau toleransi.
+    point_counts[i] adalah jumlah titik level i (level 0 = rute penuh).
+    """
+    level_tolerances = (0.0,) + tuple(tolerances)
+    levels = range(min(len(point_counts), len(level_tolerances)))
+
+    candidates = list(levels)
+    if tolerance is not None:
+        coarse_enough = [i for i in candidates if level_tolerances[i] >= tolerance]
+        candidates = coarse_enough or [candidates[-1]]
+    if max_points is not None:
+        small_enough = [i for i in candidates if point_counts[i] <= max_points]
+        candidates = small_enough or [candidates[-1]]
+
+    return candidates[0]
@@ -0,0 +1,164 @@
+# run_export.py
+import csv
+import io
+import json
+import zipfile
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from route_analytics import EPOCH_MS_THRESHOLD
+from route_codec import route_columns
+
+# Formatter ekspor dalam bentuk generator (pasangan run_import.py): masukan berupa iterator
+# (position, summary, route_data|None) dan keluaran berupa potongan bytes, sehingga memori
+# terbatas pada satu run / satu buffer, bukan seluruh riwayat.
+# NDJSON dan GPX hasil ekspor bisa diimpor ulang lewat /api/import.
+
+EXPORT_BUFFER_BYTES = 64 * 1024
+CSV_FIELDS = (
+    'position', 'run_id', 'timestamp', 'duration_sec', 'distance_km', 'average_pace', 'total_steps',
+    'moving_time_sec', 'cadence_spm'
+)
+GPX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx version="1.1" creator="RunTracker" xmlns="http://www.topografix.com/GPX/1/1">\n'
+)
+
+
+def _buffered(pieces, size=EXPORT_BUFFER_BYTES):
+    """Menggabungkan potongan kecil (str/bytes) menjadi chunk bytes sekitar size byte."""
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        if isinstance(piece, str):
+            piece = piece.encode('utf-8')
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield b''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_csv(runs):
+    """Ringkasan run sebagai CSV (satu header, satu baris per run)."""
+    def rows():
+        line = io.StringIO()
+        writer = csv.writer(line)
+        writer.writerow(CSV_FIELDS)
+        for position, summary, _ in runs:
+            writer.writerow([position] + [summary.get(field) for field in CSV_FIELDS[1:]])
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+        yield line.getvalue()
+
+    return _buffered(rows())
+
+
+def iter_ndjson(runs):
+    """Satu objek JSON per baris: ringkasan run + route_data (format yang diterima iter_ndjson_runs)."""
+    def lines():
+        for position, summary, route_data in runs:
+            record = {'position': position, **summary}
+            if route_data is not None:
+                record['route_data'] = route_data
+            yield json.dumps(record, separators=(',', ':')) + '\n'
+
+    return _buffered(lines())
+
+
+def _point_times(times, start_timestamp):
+    """Waktu ISO (UTC) per titik; waktu relatif (detik sejak mulai) diberi offset timestamp run."""
+    if times is None or not len(times):
+        return None
+    if times[0] > EPOCH_MS_THRESHOLD:
+        seconds = [t / 1000.0 for t in times]
+    elif times[0] > 1e9:
+        seconds = list(times)
+    elif start_timestamp:
+        try:
+            started = datetime.fromisoformat(start_timestamp)
+        except ValueError:
+            return None
+        if started.tzinfo is None:
+            started = started.astimezone()
+        return [(started + timedelta(seconds=t)).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ') for t in times]
+    else:
+        return None
+    return [datetime.fromtimestamp(t, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ') for t in seconds]
+
+
+def gpx_lines(summary, route_data):
+    """Dokumen GPX 1.1 satu run (satu <trk>), baris demi baris."""
+    lats, lngs, times = route_columns(route_data or [])
+    iso_times = _point_times(times, summary.get('timestamp'))
+
+    yield GPX_HEADER
+    yield f"  <trk><name>Run {int(summary['run_id'])}</name><trkseg>\n"
+    for index, (lat, lng) in enumerate(zip(lats, lngs)):
+        if iso_times:
+            yield f'    <trkpt lat="{lat:.6f}" lon="{lng:.6f}"><time>{iso_times[index]}</time></trkpt>\n'
+        else:
+            yield f'    <trkpt lat="{lat:.6f}" lon="{lng:.6f}"/>\n'
+    yield '  </trkseg></trk>\n</gpx>\n'
+
+
+class _ChunkSink:
+    """File tujuan zipfile yang tidak bisa di-seek: byte yang ditulis diambil dengan drain()."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_gpx_zip(runs):
+    """
+    ZIP berisi satu file GPX per run, ditulis sebagai stream (data descriptor, tanpa seek);
+    setiap entri dikompresi sambil ditulis sehingga memori terbatas pada buffer satu entri.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for position, summary, route_data in runs:
+            name = f"{position:06d}-run-{summary['run_id']}.gpx"
+            with archive.open(name, mode='w', force_zip64=True) as entry:
+                for chunk in _buffered(gpx_lines(summary, route_data)):
+                    entry.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory ditulis saat ZipFile ditutup
+    yield sink.drain()
+
+
+def gzip_stream(chunks, level=6):
+    """Kompresi gzip on-the-fly atas generator bytes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+EXPORT_FORMATS = {
+    # format: (fungsi, mimetype, ekstensi, butuh route_data, boleh gzip)
+    'csv': (iter_csv, 'text/csv', 'csv', False, True),
+    'ndjson': (iter_ndjson, 'application/x-ndjson', 'ndjson', True, True),
+    'gpx': (iter_gpx_zip, 'application/zip', 'zip', True, False)
+}
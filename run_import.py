@@ -0,0 +1,102 @@
+# run_import.py
+import json
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+# Parser arsip lari dalam bentuk generator: memori terbatas pada satu run, bukan seluruh file.
+# Setiap item berupa (index, record) dengan record dict atau Exception untuk item yang gagal.
+# Field record: route_data, duration_sec, distance_km, total_steps, timestamp (ISO, opsional).
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _epoch_ms(iso_text):
+    return int(datetime.fromisoformat(iso_text.strip().replace('Z', '+00:00')).timestamp() * 1000)
+
+
+def _record_from_points(points, name=None, total_steps=0):
+    if not points:
+        raise ValueError("Track tidak memiliki titik")
+
+    has_time = all(len(point) > 2 for point in points)
+    duration_sec = (points[-1][2] - points[0][2]) / 1000.0 if has_time else 0
+    timestamp = datetime.fromtimestamp(points[0][2] / 1000.0).isoformat() if has_time else None
+    if not has_time:
+        points = [point[:2] for point in points]
+
+    return {
+        'name': name,
+        'route_data': points,
+        'duration_sec': int(duration_sec),
+        'distance_km': 0.0,
+        'total_steps': int(total_steps),
+        'timestamp': timestamp
+    }
+
+
+def iter_gpx_runs(stream):
+    """Stream-parse GPX: setiap <trk> menjadi satu run, elemen dibersihkan setelah diproses."""
+    index = 0
+    points = []
+    name = None
+    point_time = None
+
+    try:
+        for event, elem in ET.iterparse(stream, events=('end',)):
+            tag = _local_name(elem.tag)
+            if tag == 'time' and elem.text:
+                point_time = elem.text
+            elif tag == 'name' and name is None and elem.text:
+                name = elem.text.strip()
+            elif tag == 'trkpt':
+                try:
+                    point = [float(elem.get('lat')), float(elem.get('lon'))]
+                    if point_time:
+                        point.append(_epoch_ms(point_time))
+                    points.append(point)
+                except (TypeError, ValueError):
+                    pass
+                point_time = None
+                elem.clear()
+            elif tag == 'metadata':
+                name, point_time = None, None
+                elem.clear()
+            elif tag == 'trk':
+                try:
+                    yield index, _record_from_points(points, name=name)
+                except ValueError as e:
+                    yield index, e
+                index += 1
+                points, name, point_time = [], None, None
+                elem.clear()
+    except ET.ParseError as e:
+        yield index, ValueError(f"GPX tidak valid: {e}")
+
+
+def iter_ndjson_runs(stream):
+    """Stream-parse NDJSON: satu objek run per baris (baris kosong dilewati)."""
+    for index, line in enumerate(stream):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+            if not isinstance(raw, dict):
+                raise ValueError("Baris bukan objek JSON")
+            yield index, {
+                'name': raw.get('name'),
+                'route_data': raw.get('route_data') or [],
+                'duration_sec': int(raw.get('duration_sec') or 0),
+                'distance_km': float(raw.get('distance_km') or 0.0),
+                'total_steps': int(raw.get('total_steps') or 0),
+                'timestamp': raw.get('timestamp')
+            }
+        except (ValueError, TypeError) as e:
+            yield index, e
+
+
+PARSERS = {
+    'gpx': iter_gpx_runs,
+    'ndjson': iter_ndjson_runs
+}
@@ -0,0 +1,209 @@
+# segment_match.py
+import numpy as np
+
+from route_analytics import EARTH_RADIUS_M, EPOCH_MS_THRESHOLD, haversine_m
+from route_codec import route_columns
+
+# Ukuran sel grid (derajat, ~220 m lintang). Titik awal/akhir segmen didaftarkan ke selnya dan
+# 8 sel tetangga, sehingga titik rute dalam ENDPOINT_TOLERANCE_M cukup dicari di selnya sendiri.
+GRID_CELL_DEG = 0.002
+GRID_OFFSET = 1 << 20
+# Titik rute harus lewat sedekat ini dari titik awal & akhir segmen
+ENDPOINT_TOLERANCE_M = 25.0
+# Semua titik rute di antara awal & akhir harus berada dalam koridor ini dari polyline segmen
+CORRIDOR_M = 30.0
+# Panjang rute di antara awal & akhir minimal porsi ini dari panjang segmen (mencegah jalan pintas)
+MIN_LENGTH_RATIO = 0.9
+NEIGHBOR_OFFSETS = np.array([(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)], dtype=np.int64)
+
+
+def cell_keys(lats, lngs):
+    """Kunci sel grid (int64) untuk array koordinat."""
+    rows = np.floor(np.asarray(lats, dtype=np.float64) / GRID_CELL_DEG).astype(np.int64) + GRID_OFFSET
+    cols = np.floor(np.asarray(lngs, dtype=np.float64) / GRID_CELL_DEG).astype(np.int64) + GRID_OFFSET
+    return (rows << 32) | cols
+
+
+def _neighbor_keys(lats, lngs):
+    """Kunci 9 sel (sel sendiri + tetangga) per titik: array (n, 9)."""
+    rows = np.floor(np.asarray(lats, dtype=np.float64) / GRID_CELL_DEG).astype(np.int64) + GRID_OFFSET
+    cols = np.floor(np.asarray(lngs, dtype=np.float64) / GRID_CELL_DEG).astype(np.int64) + GRID_OFFSET
+    return ((rows[:, None] + NEIGHBOR_OFFSETS[:, 0]) << 32) | (cols[:, None] + NEIGHBOR_OFFSETS[:, 1])
+
+
+def _gather(sorted_keys, keys):
+    """Posisi di sorted_keys untuk semua entri yang kuncinya ada di keys (searchsorted + rentang)."""
+    low = np.searchsorted(sorted_keys, keys, side='left')
+    high = np.searchsorted(sorted_keys, keys, side='right')
+    counts = high - low
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.repeat(low, counts) + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def _visits(indices):
+    """Rentang [awal, akhir] dari indeks titik rute terurut yang berurutan (satu kali lewat)."""
+    breaks = np.flatnonzero(np.diff(indices) > 1)
+    return indices[np.concatenate(([0], breaks + 1))], indices[np.concatenate((breaks, [len(indices) - 1]))]
+
+
+def _coordinates(points):
+    """Kolom lat/lng segmen; list [lat, lng] diubah langsung oleh NumPy, format lain lewat route_columns."""
+    if len(points) and not isinstance(points[0], dict):
+        array = np.asarray(points, dtype=np.float64)
+        return array[:, 0], array[:, 1]
+    lats, lngs, _ = route_columns(points)
+    return np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64)
+
+
+def _point_to_polyline_m(px, py, sx, sy):
+    """Jarak minimum (meter) tiap titik (px, py) ke polyline (sx, sy), dihitung sekaligus."""
+    if len(sx) == 1:
+        return np.hypot(px - sx[0], py - sy[0])
+    ax, ay = sx[:-1], sy[:-1]
+    dx, dy = sx[1:] - ax, sy[1:] - ay
+    length2 = dx * dx + dy * dy
+    length2[length2 == 0] = 1e-12
+    t = np.clip(((px[:, None] - ax) * dx + (py[:, None] - ay) * dy) / length2, 0.0, 1.0)
+    return np.hypot(px[:, None] - (ax + t * dx), py[:, None] - (ay + t * dy)).min(axis=1)
+
+
+class SegmentIndex:
+    """
+    Indeks segmen in-memory: polyline semua segmen disimpan berurutan (CSR) dan kunci sel
+    titik awal/akhir disimpan terurut, sehingga kandidat untuk sebuah rute didapat dengan
+    searchsorted per sel rute (O(sel rute * log segmen)), bukan memeriksa setiap segmen.
+    """
+
+    def __init__(self, segments):
+        """segments: iterable dict {'segment_id', 'points': [(lat, lng), ...]} dengan minimal 2 titik."""
+        segment_ids, offsets, lats, lngs = [], [0], [], []
+        for segment in segments:
+            seg_lats, seg_lngs = _coordinates(segment['points'])
+            if len(seg_lats) < 2:
+                continue
+            segment_ids.append(int(segment['segment_id']))
+            lats.append(seg_lats)
+            lngs.append(seg_lngs)
+            offsets.append(offsets[-1] + len(seg_lats))
+
+        self.segment_ids = np.asarray(segment_ids, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.lats = np.concatenate(lats) if lats else np.empty(0)
+        self.lngs = np.concatenate(lngs) if lngs else np.empty(0)
+        # Panjang tiap segmen sekaligus: jarak antar titik berurutan, tanpa lompatan antar segmen
+        steps = np.append(haversine_m(self.lats, self.lngs), 0.0) if len(self.lats) else np.empty(0)
+        steps[self.offsets[1:] - 1] = 0.0
+        self.distance_m = np.add.reduceat(steps, self.offsets[:-1]) if len(segment_ids) else np.empty(0)
+
+        first, last = self.offsets[:-1], self.offsets[1:] - 1
+        self._start_keys, self._start_segments = self._build_cells(self.lats[first], self.lngs[first])
+        self._end_keys, self._end_segments = self._build_cells(self.lats[last], self.lngs[last])
+
+    def __len__(self):
+        return len(self.segment_ids)
+
+    @staticmethod
+    def _build_cells(lats, lngs):
+        keys = _neighbor_keys(lats, lngs).ravel()
+        segments = np.repeat(np.arange(len(lats), dtype=np.int64), NEIGHBOR_OFFSETS.shape[0])
+        order = np.argsort(keys, kind='stable')
+        return keys[order], segments[order]
+
+    def candidates(self, lats, lngs):
+        """Posisi segmen (bukan segment_id) yang titik awal DAN akhirnya berada di sel yang dilewati rute."""
+        if len(self) == 0 or len(lats) == 0:
+            return np.empty(0, dtype=np.int64)
+        route_cells = np.unique(cell_keys(lats, lngs))
+        starts = np.unique(self._start_segments[_gather(self._start_keys, route_cells)])
+        ends = np.unique(self._end_segments[_gather(self._end_keys, route_cells)])
+        return np.intersect1d(starts, ends, assume_unique=True)
+
+    def match(self, route_data):
+        """
+        Mencocokkan rute dengan semua segmen; mengembalikan effort tercepat per segmen:
+        [{'segment_id', 'start_index', 'end_index', 'elapsed_sec', 'distance_m'}].
+        Rute tanpa timestamp per titik tidak bisa diberi waktu, sehingga tidak dicocokkan.
+        """
+        lats, lngs, times = route_columns(route_data)
+        if len(lats) < 2 or times is None:
+            return []
+
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        times = np.asarray(times, dtype=np.float64)
+        if times[0] > EPOCH_MS_THRESHOLD:
+            times = times / 1000.0
+
+        candidates = self.candidates(lats, lngs)
+        if len(candidates) == 0:
+            return []
+
+        # Proyeksi equirectangular bersama untuk rute & segmen kandidat (skala satu rute lari)
+        scale = EARTH_RADIUS_M * np.cos(np.radians(lats.mean()))
+        rx = np.radians(lngs) * scale
+        ry = np.radians(lats) * EARTH_RADIUS_M
+        cumulative = np.concatenate(([0.0], np.cumsum(haversine_m(lats, lngs))))
+        # Titik rute diurutkan per sel agar titik di sekitar ujung segmen bisa diambil tanpa memindai rute
+        point_cells = cell_keys(lats, lngs)
+        point_order = np.argsort(point_cells, kind='stable')
+        route = (rx, ry, times, cumulative, point_cells[point_order], point_order)
+
+        efforts = []
+        for position in candidates:
+            effort = self._confirm(position, route, scale)
+            if effort is not None:
+                efforts.append(effort)
+        return efforts
+
+    def _near_indices(self, vertex, route, x, y):
+        """Indeks titik rute (terurut) dalam ENDPOINT_TOLERANCE_M dari satu titik ujung segmen."""
+        rx, ry, _, _, sorted_cells, point_order = route
+        keys = _neighbor_keys(self.lats[vertex:vertex + 1], self.lngs[vertex:vertex + 1]).ravel()
+        indices = np.sort(point_order[_gather(sorted_cells, keys)])
+        return indices[np.hypot(rx[indices] - x, ry[indices] - y) <= ENDPOINT_TOLERANCE_M]
+
+    def _confirm(self, position, route, scale):
+        rx, ry, times, cumulative, _, _ = route
+        start, end = self.offsets[position], self.offsets[position + 1]
+        sx = np.radians(self.lngs[start:end]) * scale
+        sy = np.radians(self.lats[start:end]) * EARTH_RADIUS_M
+        segment_m = self.distance_m[position]
+
+        near_start = self._near_indices(start, route, sx[0], sy[0])
+        near_end = self._near_indices(end - 1, route, sx[-1], sy[-1])
+        if len(near_start) == 0 or len(near_end) == 0:
+            return None
+
+        start_begins, start_ends = _visits(near_start)
+        end_begins, end_ends = _visits(near_end)
+        best = None
+        for visit, (begin, finish) in enumerate(zip(start_begins, start_ends)):
+            # Kunjungan akhir pertama setelah kunjungan awal ini selesai
+            following = np.searchsorted(end_begins, finish, side='right')
+            if following >= len(end_begins):
+                break
+            end_begin, end_finish = end_begins[following], end_ends[following]
+            # Kunjungan awal berikutnya yang juga sebelum titik akhir memberi effort yang lebih pendek
+            if visit + 1 < len(start_begins) and start_begins[visit + 1] < end_begin:
+                continue
+
+            # Titik rute terdekat dengan titik awal & akhir segmen dalam masing-masing kunjungan
+            i = int(begin + np.argmin(np.hypot(rx[begin:finish + 1] - sx[0], ry[begin:finish + 1] - sy[0])))
+            j = int(end_begin + np.argmin(np.hypot(rx[end_begin:end_finish + 1] - sx[-1], ry[end_begin:end_finish + 1] - sy[-1])))
+            if cumulative[j] - cumulative[i] < MIN_LENGTH_RATIO * segment_m - 2 * ENDPOINT_TOLERANCE_M:
+                continue
+            if _point_to_polyline_m(rx[i:j + 1], ry[i:j + 1], sx, sy).max() > CORRIDOR_M:
+                continue
+
+            elapsed = float(times[j] - times[i])
+            if elapsed > 0 and (best is None or elapsed < best['elapsed_sec']):
+                best = {
+                    'segment_id': int(self.segment_ids[position]),
+                    'start_index': i,
+                    'end_index': j,
+                    'elapsed_sec': round(elapsed, 1),
+                    'distance_m': round(float(cumulative[j] - cumulative[i]), 1)
+                }
+        return best
@@ -0,0 +1,606 @@
+# storage.py
+import bisect
+import json
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+from http_cache import compress_payload, route_response_body
+from route_analytics import analyze_route
+from route_codec import encode_route, load_route
+from route_simplify import LOD_TOLERANCES_M, build_levels, select_level
+
+# Backend penyimpanan di balik model: Redis (lihat RedisStorage di app.py), in-memory, dan SQLite.
+# Semua backend mengembalikan bentuk data yang sama dengan RunTrackerModel sehingga route Flask
+# tidak perlu tahu engine mana yang dipakai.
+
+RECENT_WEEKS = 8
+RECENT_MONTHS = 6
+
+
+def time_buckets(timestamp):
+    """Bucket agregat dari timestamp ISO run: ('2026-W42', '2026-10')."""
+    run_time = datetime.fromisoformat(timestamp)
+    iso_year, iso_week, _ = run_time.isocalendar()
+    return f"{iso_year}-W{iso_week:02d}", f"{run_time.year}-{run_time.month:02d}"
+
+
+def recent_buckets(now=None, weeks=RECENT_WEEKS, months=RECENT_MONTHS):
+    """Daftar bucket minggu & bulan terbaru (terbaru lebih dulu)."""
+    now = now or datetime.now()
+    week_buckets = [time_buckets((now - timedelta(weeks=offset)).isoformat())[0] for offset in range(weeks)]
+    month_buckets = []
+    year, month = now.year, now.month
+    for _ in range(months):
+        month_buckets.append(f"{year}-{month:02d}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return week_buckets, month_buckets
+
+
+def page_bounds(total, cursor, limit):
+    """
+    Batas halaman riwayat berbasis cursor (posisi dihitung dari run paling lama),
+    sama dengan semantik RunTrackerModel.get_user_runs_page. Mengembalikan (low, high, next_cursor).
+    """
+    high = total - 1 if cursor is None else min(int(cursor), total - 1)
+    low = max(high - limit + 1, 0)
+    next_cursor = low - 1 if high >= 0 and low > 0 else None
+    return low, high, next_cursor
+
+
+class StorageBackend(ABC):
+    """Antarmuka penyimpanan yang dipakai route web & API inti."""
+
+    name = 'abstract'
+    RUNS_PAGE_DEFAULT = 20
+    RUNS_PAGE_MAX = 100
+
+    @abstractmethod
+    def register_user(self, username, password):
+        """Mengembalikan user_id baru, 'duplicate', atau None jika gagal."""
+
+    @abstractmethod
+    def find_user_by_username(self, username):
+        pass
+
+    @abstractmethod
+    def get_user_data(self, user_id):
+        pass
+
+    @abstractmethod
+    def add_run(self, user_id, duration_sec, distance_km, average_pace, route_data, total_steps,
+                analytics=None, timestamp=None):
+        pass
+
+    @abstractmethod
+    def get_run_detail(self, run_id, max_points=None):
+        pass
+
+    @abstractmethod
+    def get_route_for_display(self, run_id, max_points=None, tolerance=None):
+        pass
+
+    @abstractmethod
+    def get_user_runs_page(self, user_id, cursor=None, limit=RUNS_PAGE_DEFAULT):
+        pass
+
+    @abstractmethod
+    def get_global_leaderboard(self, count=5):
+        pass
+
+    @abstractmethod
+    def get_user_stats(self, user_id):
+        pass
+
+    @abstractmethod
+    def memory_usage_bytes(self):
+        """Perkiraan memori/penyimpanan yang dipakai backend (untuk perbandingan beban kerja)."""
+
+    def route_is_final(self, run_id):
+        """
+        True jika run ada dan representasinya tidak akan berubah lagi (boleh di-cache klien dengan ETag kuat).
+        Dipakai sebelum menjawab 304, jadi backend sebaiknya menggantinya dengan pemeriksaan yang murah.
+        """
+        return self.get_route_for_display(run_id) is not None
+
+    def get_route_payload(self, run_id, max_points=None, tolerance=None):
+        """
+        Body respons rute yang sudah dikompresi: {'level', 'final', 'encoded': {content-coding: bytes}}.
+        Backend non-Redis mengompresi saat diminta; cache respons di app.py mencegah kompresi berulang.
+        """
+        route = self.get_route_for_display(run_id, max_points=max_points, tolerance=tolerance)
+        if route is None:
+            return None
+        return {
+            'level': route['level'],
+            'final': self.route_is_final(run_id),
+            'encoded': compress_payload(route_response_body(route))
+        }
+
+    # --- Helper bersama untuk backend non-Redis ---
+
+    @staticmethod
+    def _build_run(run_id, user_id, duration_sec, distance_km, average_pace, route_data, total_steps,
+                   analytics=None, timestamp=None):
+        """Menyusun record run bertipe beserta blob rute per level (sama seperti add_run Redis)."""
+        if analytics is None:
+            analytics = analyze_route(route_data, duration_sec, total_steps)
+
+        levels = build_levels(route_data, LOD_TOLERANCES_M)
+        summary = {
+            'run_id': int(run_id),
+            'user_id': int(user_id),
+            'timestamp': timestamp or datetime.now().isoformat(),
+            'duration_sec': int(duration_sec),
+            'distance_km': float(distance_km),
+            'average_pace': float(average_pace),
+            'total_steps': int(total_steps),
+            'moving_time_sec': int(analytics['moving_time_sec']),
+            'cadence_spm': float(analytics['cadence_spm'])
+        }
+        extra = {
+            'paused_time_sec': int(analytics['paused_time_sec']),
+            'best_1k_sec': analytics['best_1k_sec'],
+            'best_5k_sec': analytics['best_5k_sec'],
+            'splits_sec': list(analytics['splits_sec'])
+        }
+        return summary, extra, [len(level) for level in levels], [encode_route(level) for level in levels]
+
+    @staticmethod
+    def _route_payload(run_id, point_counts, blobs_by_level, max_points=None, tolerance=None):
+        level = 0
+        if point_counts and (max_points is not None or tolerance is not None):
+            level = select_level(point_counts, LOD_TOLERANCES_M, max_points=max_points, tolerance=tolerance)
+        route = load_route(blobs_by_level(level))
+        return {
+            'run_id': int(run_id),
+            'level': level,
+            'tolerance_m': ((0.0,) + LOD_TOLERANCES_M)[level],
+            'points': len(route),
+            'route_data': route
+        }
+
+    @staticmethod
+    def _empty_stats(user_id):
+        return {
+            'user_id': int(user_id),
+            'run_count': 0,
+            'total_distance_km': 0.0,
+            'total_duration_sec': 0,
+            'total_steps': 0,
+            'longest_run_km': 0.0,
+            'longest_run_id': None,
+            'fastest_pace': 0.0,
+            'fastest_pace_run_id': None
+        }
+
+    @staticmethod
+    def _apply_run_to_stats(stats, summary):
+        stats['run_count'] += 1
+        stats['total_distance_km'] += summary['distance_km']
+        stats['total_duration_sec'] += summary['duration_sec']
+        stats['total_steps'] += summary['total_steps']
+        if summary['distance_km'] > stats['longest_run_km']:
+            stats['longest_run_km'] = summary['distance_km']
+            stats['longest_run_id'] = summary['run_id']
+        pace = summary['average_pace']
+        if pace > 0 and (stats['fastest_pace_run_id'] is None or pace < stats['fastest_pace']):
+            stats['fastest_pace'] = pace
+            stats['fastest_pace_run_id'] = summary['run_id']
+
+    @staticmethod
+    def _stats_payload(stats, weekly, monthly):
+        """weekly/monthly: dict bucket -> (distance_km, duration_sec, runs)."""
+        weeks, months = recent_buckets()
+
+        def buckets(names, source):
+            result = []
+            for name in names:
+                distance, duration, runs = source.get(name, (0.0, 0, 0))
+                result.append({'bucket': name, 'distance_km': round(distance, 3), 'duration_sec': duration, 'runs': runs})
+            return result
+
+        return {
+            **stats,
+            'total_distance_km': round(stats['total_distance_km'], 3),
+            'weekly': buckets(weeks, weekly),
+            'monthly': buckets(months, monthly)
+        }
+
+
+class MemoryStorage(StorageBackend):
+    """Backend murni in-memory (per proses), untuk pengembangan dan uji beban tanpa Redis."""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._users = {}
+        self._usernames = {}
+        self._runs = {}
+        self._run_extra = {}
+        self._routes = {}
+        self._route_points = {}
+        self._user_runs = {}
+        self._stats = {}
+        self._buckets = {}
+        # Terurut naik berdasarkan (-distance_km, run_id) sehingga top-N = potongan awal list
+        self._leaderboard = []
+
+    def register_user(self, username, password):
+        with self._lock:
+            if username in self._usernames:
+                return 'duplicate'
+            user_id = len(self._users) + 1
+            self._users[user_id] = {
+                'username': username,
+                'password': password,
+                'registered_at': datetime.now().isoformat(),
+                'id': user_id
+            }
+            self._usernames[username] = user_id
+            return user_id
+
+    def find_user_by_username(self, username):
+        user_id = self._usernames.get(username)
+        return self.get_user_data(user_id) if user_id else None
+
+    def get_user_data(self, user_id):
+        user = self._users.get(int(user_id))
+        return dict(user) if user else None
+
+    def add_run(self, user_id, duration_sec, distance_km, average_pace, route_data, total_steps,
+                analytics=None, timestamp=None):
+        with self._lock:
+            run_id = len(self._runs) + 1
+            summary, extra, point_counts, blobs = self._build_run(
+                run_id, user_id, duration_sec, distance_km, average_pace, route_data, total_steps,
+                analytics=analytics, timestamp=timestamp
+            )
+            user_id = summary['user_id']
+            self._runs[run_id] = summary
+            self._run_extra[run_id] = extra
+            self._routes[run_id] = blobs
+            self._route_points[run_id] = point_counts
+            self._user_runs.setdefault(user_id, []).append(run_id)
+            bisect.insort(self._leaderboard, (-summary['distance_km'], run_id))
+
+            stats = self._stats.setdefault(user_id, self._empty_stats(user_id))
+            self._apply_run_to_stats(stats, summary)
+            for bucket in time_buckets(summary['timestamp']):
+                distance, duration, runs = self._buckets.setdefault(user_id, {}).get(bucket, (0.0, 0, 0))
+                self._buckets[user_id][bucket] = (
+                    distance + summary['distance_km'], duration + summary['duration_sec'], runs + 1
+                )
+            return run_id
+
+    def get_run_detail(self, run_id, max_points=None):
+        run_id = int(run_id)
+        if run_id not in self._runs:
+            return None
+        route = self.get_route_for_display(run_id, max_points=max_points)
+        return {
+            **self._runs[run_id],
+            **self._run_extra[run_id],
+            'route_data': route['route_data'],
+            'route_level': route['level']
+        }
+
+    def get_route_for_display(self, run_id, max_points=None, tolerance=None):
+        run_id = int(run_id)
+        if run_id not in self._runs:
+            return None
+        blobs = self._routes[run_id]
+        return self._route_payload(run_id, self._route_points[run_id], lambda level: blobs[level],
+                                   max_points=max_points, tolerance=tolerance)
+
+    def route_is_final(self, run_id):
+        # Run id dimulai ulang dari 1 setiap proses baru, jadi ETag run tidak boleh disimpan klien
+        return False
+
+    def get_user_runs_page(self, user_id, cursor=None, limit=StorageBackend.RUNS_PAGE_DEFAULT):
+        limit = max(1, min(int(limit), self.RUNS_PAGE_MAX))
+        run_ids = self._user_runs.get(int(user_id), [])
+        low, high, next_cursor = page_bounds(len(run_ids), cursor, limit)
+        page_ids = run_ids[low:high + 1][::-1] if high >= 0 else []
+        return {
+            'runs': [dict(self._runs[run_id]) for run_id in page_ids],
+            'total': len(run_ids),
+            'next_cursor': next_cursor
+        }
+
+    def get_global_leaderboard(self, count=5):
+        leaderboard = []
+        for negative_distance, run_id in self._leaderboard[:count]:
+            run = self._runs[run_id]
+            user = self._users.get(run['user_id'], {})
+            leaderboard.append({
+                'run_id': run_id,
+                'username': user.get('username', f"Runner {run['user_id']}"),
+                'distance': -negative_distance,
+                'average_pace': run['average_pace'],
+                'timestamp': run['timestamp']
+            })
+        return leaderboard
+
+    def get_user_stats(self, user_id):
+        user_id = int(user_id)
+        stats = dict(self._stats.get(user_id) or self._empty_stats(user_id))
+        buckets = self._buckets.get(user_id, {})
+        return self._stats_payload(stats, buckets, buckets)
+
+    def memory_usage_bytes(self):
+        """Perkiraan kasar: ukuran objek container + blob rute (tanpa overhead allocator)."""
+        with self._lock:
+            total = sum(len(blob) for blobs in self._routes.values() for blob in blobs)
+            for container in (self._users, self._runs, self._run_extra, self._user_runs, self._stats, self._buckets):
+                total += sys.getsizeof(container)
+                for value in container.values():
+                    total += sys.getsizeof(value)
+            return total + sys.getsizeof(self._leaderboard)
+
+
+class SQLiteStorage(StorageBackend):
+    """Backend SQLite (mode WAL), satu koneksi per thread, diindeks per user_id dan waktu."""
+
+    name = 'sqlite'
+
+    SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    registered_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    user_seq INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    duration_sec INTEGER NOT NULL,
+    distance_km REAL NOT NULL,
+    average_pace REAL NOT NULL,
+    total_steps INTEGER NOT NULL,
+    moving_time_sec INTEGER NOT NULL,
+    paused_time_sec INTEGER NOT NULL,
+    best_1k_sec INTEGER,
+    best_5k_sec INTEGER,
+    cadence_spm REAL NOT NULL,
+    splits_sec TEXT NOT NULL,
+    route_lod_points TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_runs_user_seq ON runs (user_id, user_seq);
+CREATE INDEX IF NOT EXISTS idx_runs_user_timestamp ON runs (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_runs_distance ON runs (distance_km DESC);
+CREATE TABLE IF NOT EXISTS run_routes (
+    run_id INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    route BLOB NOT NULL,
+    PRIMARY KEY (run_id, level)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY,
+    run_count INTEGER NOT NULL,
+    total_distance_km REAL NOT NULL,
+    total_duration_sec INTEGER NOT NULL,
+    total_steps INTEGER NOT NULL,
+    longest_run_km REAL NOT NULL,
+    longest_run_id INTEGER,
+    fastest_pace REAL NOT NULL,
+    fastest_pace_run_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS user_buckets (
+    user_id INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    distance_km REAL NOT NULL,
+    duration_sec INTEGER NOT NULL,
+    runs INTEGER NOT NULL,
+    PRIMARY KEY (user_id, bucket)
+) WITHOUT ROWID;
+"""
+    SUMMARY_COLUMNS = (
+        'run_id', 'user_id', 'timestamp', 'duration_sec', 'distance_km', 'average_pace', 'total_steps',
+        'moving_time_sec', 'cadence_spm'
+    )
+    STATS_COLUMNS = (
+        'run_count', 'total_distance_km', 'total_duration_sec', 'total_steps',
+        'longest_run_km', 'longest_run_id', 'fastest_pace', 'fastest_pace_run_id'
+    )
+
+    def __init__(self, path='runtracker.db'):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def register_user(self, username, password):
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    'INSERT INTO users (username, password, registered_at) VALUES (?, ?, ?)',
+                    (username, password, datetime.now().isoformat())
+                )
+                return cursor.lastrowid
+        except sqlite3.IntegrityError:
+            return 'duplicate'
+
+    def find_user_by_username(self, username):
+        with self._connect() as conn:
+            row = conn.execute('SELECT user_id FROM users WHERE username = ?', (username,)).fetchone()
+        return self.get_user_data(row['user_id']) if row else None
+
+    def get_user_data(self, user_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT user_id, username, password, registered_at FROM users WHERE user_id = ?', (int(user_id),)
+            ).fetchone()
+        if not row:
+            return None
+        return {'username': row['username'], 'password': row['password'],
+                'registered_at': row['registered_at'], 'id': row['user_id']}
+
+    def add_run(self, user_id, duration_sec, distance_km, average_pace, route_data, total_steps,
+                analytics=None, timestamp=None):
+        # Analitik & encode rute dihitung di luar transaksi agar kunci tulis SQLite singkat
+        summary, extra, point_counts, blobs = self._build_run(
+            0, user_id, duration_sec, distance_km, average_pace, route_data, total_steps,
+            analytics=analytics, timestamp=timestamp
+        )
+        user_id = summary['user_id']
+
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT * FROM user_stats WHERE user_id = ?', (user_id,)).fetchone()
+            stats = {**self._empty_stats(user_id), **(dict(row) if row else {})}
+
+            cursor = conn.execute(
+                'INSERT INTO runs (user_id, user_seq, timestamp, duration_sec, distance_km, average_pace, '
+                'total_steps, moving_time_sec, paused_time_sec, best_1k_sec, best_5k_sec, cadence_spm, '
+                'splits_sec, route_lod_points) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (user_id, stats['run_count'], summary['timestamp'], summary['duration_sec'], summary['distance_km'],
+                 summary['average_pace'], summary['total_steps'], summary['moving_time_sec'],
+                 extra['paused_time_sec'], extra['best_1k_sec'], extra['best_5k_sec'], summary['cadence_spm'],
+                 json.dumps(extra['splits_sec']), ','.join(str(count) for count in point_counts))
+            )
+            run_id = cursor.lastrowid
+            conn.executemany(
+                'INSERT INTO run_routes (run_id, level, route) VALUES (?, ?, ?)',
+                [(run_id, level, blob) for level, blob in enumerate(blobs)]
+            )
+
+            summary['run_id'] = run_id
+            self._apply_run_to_stats(stats, summary)
+            conn.execute(
+                f"INSERT OR REPLACE INTO user_stats (user_id, {', '.join(self.STATS_COLUMNS)}) "
+                f"VALUES (?, {', '.join('?' for _ in self.STATS_COLUMNS)})",
+                (user_id, *(stats[column] for column in self.STATS_COLUMNS))
+            )
+            conn.executemany(
+                'INSERT INTO user_buckets (user_id, bucket, distance_km, duration_sec, runs) VALUES (?, ?, ?, ?, 1) '
+                'ON CONFLICT (user_id, bucket) DO UPDATE SET distance_km = distance_km + excluded.distance_km, '
+                'duration_sec = duration_sec + excluded.duration_sec, runs = runs + 1',
+                [(user_id, bucket, summary['distance_km'], summary['duration_sec'])
+                 for bucket in time_buckets(summary['timestamp'])]
+            )
+            return run_id
+
+    def get_run_detail(self, run_id, max_points=None):
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM runs WHERE run_id = ?', (int(run_id),)).fetchone()
+        if not row:
+            return None
+
+        detail = {column: row[column] for column in self.SUMMARY_COLUMNS}
+        detail.update(
+            paused_time_sec=row['paused_time_sec'],
+            best_1k_sec=row['best_1k_sec'],
+            best_5k_sec=row['best_5k_sec'],
+            splits_sec=json.loads(row['splits_sec'])
+        )
+        route = self._route_for_row(row, max_points=max_points)
+        detail['route_data'] = route['route_data']
+        detail['route_level'] = route['level']
+        return detail
+
+    def _route_for_row(self, row, max_points=None, tolerance=None):
+        point_counts = [int(count) for count in row['route_lod_points'].split(',')]
+
+        def blob_for_level(level):
+            with self._connect() as conn:
+                route_row = conn.execute(
+                    'SELECT route FROM run_routes WHERE run_id = ? AND level = ?', (row['run_id'], level)
+                ).fetchone()
+            return route_row['route'] if route_row else None
+
+        return self._route_payload(row['run_id'], point_counts, blob_for_level,
+                                   max_points=max_points, tolerance=tolerance)
+
+    def get_route_for_display(self, run_id, max_points=None, tolerance=None):
+        with self._connect() as conn:
+            row = conn.execute('SELECT run_id, route_lod_points FROM runs WHERE run_id = ?', (int(run_id),)).fetchone()
+        if not row:
+            return None
+        return self._route_for_row(row, max_points=max_points, tolerance=tolerance)
+
+    def route_is_final(self, run_id):
+        with self._connect() as conn:
+            return conn.execute('SELECT 1 FROM runs WHERE run_id = ?', (int(run_id),)).fetchone() is not None
+
+    def get_user_runs_page(self, user_id, cursor=None, limit=StorageBackend.RUNS_PAGE_DEFAULT):
+        limit = max(1, min(int(limit), self.RUNS_PAGE_MAX))
+        with self._connect() as conn:
+            total_row = conn.execute('SELECT run_count FROM user_stats WHERE user_id = ?', (int(user_id),)).fetchone()
+            total = total_row['run_count'] if total_row else 0
+            low, high, next_cursor = page_bounds(total, cursor, limit)
+            rows = conn.execute(
+                f"SELECT {', '.join(self.SUMMARY_COLUMNS)} FROM runs "
+                'WHERE user_id = ? AND user_seq BETWEEN ? AND ? ORDER BY user_seq DESC',
+                (int(user_id), low, high)
+            ).fetchall()
+        return {'runs': [dict(row) for row in rows], 'total': total, 'next_cursor': next_cursor}
+
+    def get_global_leaderboard(self, count=5):
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT r.run_id, r.user_id, u.username, r.distance_km, r.average_pace, r.timestamp '
+                'FROM runs r LEFT JOIN users u ON u.user_id = r.user_id '
+                'ORDER BY r.distance_km DESC, r.run_id ASC LIMIT ?', (int(count),)
+            ).fetchall()
+        return [
+            {
+                'run_id': row['run_id'],
+                'username': row['username'] or f"Runner {row['user_id']}",
+                'distance': row['distance_km'],
+                'average_pace': row['average_pace'],
+                'timestamp': row['timestamp']
+            }
+            for row in rows
+        ]
+
+    def get_user_stats(self, user_id):
+        user_id = int(user_id)
+        weeks, months = recent_buckets()
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM user_stats WHERE user_id = ?', (user_id,)).fetchone()
+            bucket_rows = conn.execute(
+                f"SELECT bucket, distance_km, duration_sec, runs FROM user_buckets "
+                f"WHERE user_id = ? AND bucket IN ({', '.join('?' for _ in weeks + months)})",
+                (user_id, *weeks, *months)
+            ).fetchall()
+
+        stats = {**self._empty_stats(user_id), **({c: row[c] for c in self.STATS_COLUMNS} if row else {})}
+        buckets = {r['bucket']: (r['distance_km'], r['duration_sec'], r['runs']) for r in bucket_rows}
+        return self._stats_payload(stats, buckets, buckets)
+
+    def memory_usage_bytes(self):
+        with self._connect() as conn:
+            page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        return page_count * page_size
+
+
+class _Transaction:
+    """Context manager tipis: COMMIT jika sukses, ROLLBACK jika error (koneksi autocommit)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn.in_transaction:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
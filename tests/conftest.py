@@ -0,0 +1,116 @@
+# tests/conftest.py
+import asyncio
+import os
+import sys
+
+import fakeredis
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as runtracker  # noqa: E402
+import asgi  # noqa: E402
+import async_model  # noqa: E402
+from read_cache import LRUTTLCache  # noqa: E402
+from route_archive import RouteArchive  # noqa: E402
+
+MODEL_CLASSES = ('RunTrackerModel', 'RunSessionModel', 'SegmentModel', 'HeatmapModel', 'RunJobModel', 'TrainingModel')
+
+
+def _reset_model_state():
+    """Cache in-process dan script Lua terdaftar terikat ke klien lama; dikosongkan per test."""
+    for class_name in MODEL_CLASSES:
+        model = getattr(runtracker, class_name)
+        for name, value in vars(model).items():
+            if isinstance(value, LRUTTLCache):
+                value.clear()
+            elif name.endswith('_script_cache') and isinstance(value, dict):
+                value.clear()
+
+
+@pytest.fixture
+def fake_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_conn(fake_server, monkeypatch, tmp_path):
+    """Klien fakeredis (teks) yang dipakai app.py; klien biner berbagi server yang sama."""
+    client = fakeredis.FakeRedis(server=fake_server, decode_responses=True)
+    binary = fakeredis.FakeRedis(server=fake_server)
+    monkeypatch.setattr(runtracker, 'get_redis_client', lambda: client)
+    monkeypatch.setattr(runtracker, 'get_redis_binary_client', lambda: binary)
+    monkeypatch.setattr(runtracker, 'storage_instance', None)
+    monkeypatch.setattr(runtracker, 'STORAGE_BACKEND', 'redis')
+    monkeypatch.setattr(runtracker, 'POST_PROCESS_MODE', 'inline')
+    monkeypatch.setattr(runtracker.RunTrackerModel, 'SCRIPTING_AVAILABLE', True)
+    # Tanpa thread listener invalidasi: cache cukup dengan TTL selama test
+    monkeypatch.setattr(runtracker.RunTrackerModel, '_cache_listener', False)
+    monkeypatch.setattr(runtracker.RunTrackerModel, 'ROUTE_ARCHIVE', RouteArchive(str(tmp_path / 'segments')))
+    _reset_model_state()
+    yield client
+    _reset_model_state()
+
+
+@pytest.fixture
+def binary_conn(redis_conn):
+    return runtracker.get_redis_binary_client()
+
+
+@pytest.fixture
+def async_redis(redis_conn, fake_server, monkeypatch):
+    """Klien redis.asyncio palsu di server yang sama dengan klien sync (satu per event loop)."""
+    clients = {}
+
+    def get_async_redis(binary=False):
+        key = (id(asyncio.get_running_loop()), binary)
+        if key not in clients:
+            clients[key] = fakeredis.aioredis.FakeRedis(server=fake_server, decode_responses=not binary)
+        return clients[key]
+
+    monkeypatch.setattr(async_model, 'get_async_redis', get_async_redis)
+    return get_async_redis
+
+
+@pytest.fixture
+def client(redis_conn):
+    runtracker.app.config['TESTING'] = True
+    return runtracker.app.test_client()
+
+
+def make_route(points=200, start=(-6.2, 106.8), step=(0.0001, 0.00012), interval=5, start_time=0):
+    """Rute sintetis lurus-berbelok dengan waktu relatif (detik)."""
+    lat, lng = start
+    route = []
+    for index in range(points):
+        bend = 0.00005 * ((index // 20) % 2)
+        route.append({'lat': lat + index * step[0], 'lng': lng + index * step[1] + bend, 'time': start_time + index * interval})
+    return route
+
+
+@pytest.fixture
+def user_id(redis_conn):
+    return runtracker.RunTrackerModel.register_user('runner', 'secret')
+
+
+def asgi_get(path, headers=(), query=b''):
+    """Satu GET lewat asgi.app; mengembalikan (status, header dict, body)."""
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query,
+             'headers': [(name.lower().encode(), value.encode()) for name, value in headers]}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    return messages[0]['status'], {k.decode(): v.decode() for k, v in messages[0]['headers']}, messages[1]['body']
+
+
+def add_run(user_id, distance_km=5.0, duration_sec=1500, route=None, timestamp=None, total_steps=3000):
+    return runtracker.RunTrackerModel.add_run(
+        user_id, duration_sec, distance_km, round(duration_sec / 60.0 / distance_km, 2),
+        route if route is not None else make_route(), total_steps, timestamp=timestamp
+    )
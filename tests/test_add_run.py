@@ -0,0 +1,92 @@
+# tests/test_add_run.py
+import pytest
+import redis
+from redis.commands.core import Script
+
+from conftest import add_run, make_route
+
+import app as runtracker
+from app import RunTrackerModel
+
+
+@pytest.fixture
+def no_post_processing(monkeypatch):
+    monkeypatch.setattr(runtracker.RunJobModel, 'process_run', staticmethod(lambda run_id, route_data=None: None))
+
+
+def _run_state(redis_conn, binary_conn, user_id, run_id):
+    return {
+        'run': redis_conn.hgetall(RunTrackerModel.RUN_DETAIL.format(run_id)),
+        'route': binary_conn.get(RunTrackerModel.RUN_ROUTE.format(run_id)),
+        'stats': redis_conn.hgetall(RunTrackerModel.USER_STATS.format(user_id)),
+        'runs': redis_conn.lrange(RunTrackerModel.USER_RUNS.format(user_id), 0, -1),
+        'distance': redis_conn.zscore(RunTrackerModel.PERIOD_LEADERBOARD.format('alltime'), user_id)
+    }
+
+
+def test_script_writes_only_declared_keys(user_id, redis_conn, monkeypatch, no_post_processing):
+    declared = []
+    original = Script.__call__
+
+    def recording_call(self, keys=[], args=[], client=None):
+        declared.extend(keys)
+        return original(self, keys=keys, args=args, client=client)
+
+    monkeypatch.setattr(Script, '__call__', recording_call)
+    before = set(redis_conn.keys('*'))
+    run_id = add_run(user_id, route=make_route(300))
+
+    written = set(redis_conn.keys('*')) - before
+    assert RunTrackerModel.RUN_ROUTE_LOD.format(run_id, 1) in written
+    assert written - {RunTrackerModel.RUN_ID_COUNTER} <= set(declared)
+
+
+def test_pipeline_fallback_writes_same_state(user_id, redis_conn, binary_conn, monkeypatch, no_post_processing):
+    timestamp = '2026-10-12T07:00:00'
+    first = add_run(user_id, distance_km=6.5, route=make_route(120), timestamp=timestamp)
+    scripted = _run_state(redis_conn, binary_conn, user_id, first)
+
+    other = RunTrackerModel.register_user('fallback', 'secret')
+    monkeypatch.setattr(RunTrackerModel, 'SCRIPTING_AVAILABLE', False)
+    second = add_run(other, distance_km=6.5, route=make_route(120), timestamp=timestamp)
+    piped = _run_state(redis_conn, binary_conn, other, second)
+
+    for state, run_id, owner in ((scripted, first, user_id), (piped, second, other)):
+        assert state['run'].pop('run_id') == str(run_id)
+        assert state['run'].pop('user_id') == str(owner)
+        assert state['stats'].pop('longest_run_id') == str(run_id)
+        assert state['stats'].pop('fastest_pace_run_id') == str(run_id)
+        assert state.pop('runs') == [str(run_id)]
+    assert scripted == piped
+
+
+def test_scripting_disabled_falls_back_without_losing_the_run(user_id, redis_conn, monkeypatch, no_post_processing):
+    def refuse(*args, **kwargs):
+        raise redis.exceptions.ResponseError("unknown command 'evalsha'")
+
+    monkeypatch.setattr(RunTrackerModel, '_add_run_script', staticmethod(refuse))
+    run_id = add_run(user_id)
+
+    assert RunTrackerModel.SCRIPTING_AVAILABLE is False
+    assert redis_conn.hget(RunTrackerModel.RUN_DETAIL.format(run_id), 'run_id') == str(run_id)
+    assert redis_conn.get(RunTrackerModel.RUN_ID_COUNTER) == str(run_id)
+
+
+def test_script_error_does_not_write_partial_run(user_id, redis_conn, monkeypatch, no_post_processing):
+    def broken(*args, **kwargs):
+        raise redis.exceptions.ResponseError("ERR Error running script: user_script:1: boom")
+
+    monkeypatch.setattr(RunTrackerModel, '_add_run_script', staticmethod(broken))
+    assert add_run(user_id) is None
+    assert redis_conn.keys('run:*') == []
+    assert RunTrackerModel.SCRIPTING_AVAILABLE is True
+
+
+def test_import_chunk_allocates_contiguous_ids(user_id, redis_conn, no_post_processing):
+    add_run(user_id)
+    records = ((index, {'duration_sec': 1200, 'distance_km': 4.0, 'total_steps': 0, 'route_data': make_route(30)})
+               for index in range(5))
+    report = RunTrackerModel.import_runs(user_id, records, chunk_size=2)
+
+    assert report['imported'] == 5
+    assert redis_conn.lrange(RunTrackerModel.USER_RUNS.format(user_id), 0, -1) == ['6', '5', '4', '3', '2', '1']
@@ -0,0 +1,78 @@
+# tests/test_async_model.py
+import asyncio
+
+import pytest
+
+import async_model
+from async_model import AsyncRunTrackerModel
+from conftest import _reset_model_state, add_run, make_route, runtracker
+
+RunTrackerModel = runtracker.RunTrackerModel
+
+
+@pytest.fixture
+def history(user_id):
+    return [add_run(user_id, distance_km=1.0 + i, route=make_route(points=30)) for i in range(7)]
+
+
+def walk_pages(fetch, user_id, limit):
+    pages = []
+    cursor = None
+    while True:
+        _reset_model_state()
+        page = fetch(user_id, cursor, limit)
+        pages.append(page)
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('limit', [1, 3, 7, 50])
+def test_sync_and_async_pages_are_identical(user_id, history, async_redis, limit):
+    sync_pages = walk_pages(lambda uid, cursor, lim: RunTrackerModel.get_user_runs_page(uid, cursor=cursor, limit=lim), user_id, limit)
+    async_pages = walk_pages(
+        lambda uid, cursor, lim: asyncio.run(AsyncRunTrackerModel.get_user_runs_page(uid, cursor=cursor, limit=lim)),
+        user_id, limit
+    )
+
+    assert async_pages == sync_pages
+    assert [run['run_id'] for page in sync_pages for run in page['runs']] == history[::-1]
+
+
+def test_pages_stay_stable_when_runs_are_added(user_id, history, async_redis):
+    first = asyncio.run(AsyncRunTrackerModel.get_user_runs_page(user_id, limit=3))
+    add_run(user_id)
+
+    sync_next = RunTrackerModel.get_user_runs_page(user_id, cursor=first['next_cursor'], limit=3)
+    async_next = asyncio.run(AsyncRunTrackerModel.get_user_runs_page(user_id, cursor=first['next_cursor'], limit=3))
+    assert async_next == sync_next
+    assert [run['run_id'] for run in async_next['runs']] == history[3:0:-1]
+
+
+def test_page_helpers():
+    assert RunTrackerModel._runs_page_range(None, 5) == (0, 4)
+    assert RunTrackerModel._runs_page_range(9, 5) == (-10, -6)
+    assert RunTrackerModel._runs_page_range(2, 5) == (-3, -1)
+    assert RunTrackerModel._runs_page_next_cursor(10, None, 5) == 4
+    assert RunTrackerModel._runs_page_next_cursor(10, 2, 3) is None
+    assert RunTrackerModel._runs_page_next_cursor(0, None, 0) is None
+
+
+def test_async_stats_route_and_dashboard_match_sync(user_id, history, async_redis):
+    run_id = history[0]
+
+    assert asyncio.run(AsyncRunTrackerModel.get_user_stats(user_id)) == RunTrackerModel.get_user_stats(user_id)
+    assert asyncio.run(AsyncRunTrackerModel.get_route_for_display(run_id, max_points=10)) == \
+        RunTrackerModel.get_route_for_display(run_id, max_points=10)
+    dashboard = asyncio.run(AsyncRunTrackerModel.get_dashboard(user_id))
+    assert dashboard['username'] == 'runner'
+    assert dashboard['runs_page']['total'] == len(history)
+
+
+def test_async_errors_return_none(user_id, async_redis, monkeypatch):
+    def broken(binary=False):
+        raise ConnectionError("redis mati")
+
+    monkeypatch.setattr(async_model, 'get_async_redis', broken)
+    assert asyncio.run(AsyncRunTrackerModel.get_user_runs_page(user_id)) is None
+    assert asyncio.run(AsyncRunTrackerModel.get_route_for_display(1)) is None
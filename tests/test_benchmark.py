@@ -0,0 +1,71 @@
+# tests/test_benchmark.py
+import json
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+import benchmark
+from conftest import runtracker
+
+
+@pytest.fixture
+def isolated_app(redis_conn, monkeypatch):
+    """main() mengganti klien & backend global; dikembalikan setelah test."""
+    for name in ('redis_client_instance', 'redis_binary_instance', 'STORAGE_BACKEND', 'storage_instance', 'get_current_user_id'):
+        monkeypatch.setattr(runtracker, name, getattr(runtracker, name))
+
+
+def test_generated_routes_have_requested_shape():
+    routes, durations = benchmark.generate_routes(np.random.default_rng(1), 3, 50, [benchmark.datetime.now()] * 3)
+
+    assert len(routes) == 3 and all(len(route) == 50 for route in routes)
+    assert durations == [98, 98, 98]
+    assert routes[0][1][2] - routes[0][0][2] == benchmark.SAMPLE_INTERVAL_SEC * 1000
+
+
+def test_non_2xx_responses_fail_the_scenario():
+    statuses = iter([200, 500, 200, 404, 200])
+    stats = benchmark.run_scenario(lambda: next(statuses), requests=4, warmup=1, counter=benchmark.RedisCommandCounter())
+
+    assert stats['failed'] and stats['errors'] == 2
+    assert stats['error_statuses'] == {'404': 1, '500': 1}
+
+
+def test_all_errors_leave_no_latency_numbers():
+    stats = benchmark.run_scenario(lambda: 500, requests=3, warmup=0, counter=benchmark.RedisCommandCounter())
+    assert stats['p50_ms'] is None and stats['errors'] == 3
+
+
+def test_missing_templates_detected():
+    assert benchmark.missing_templates('run_route') == []
+    # Checkout ini tidak menyertakan folder templates
+    assert 'dashboard.html' in benchmark.missing_templates('dashboard')
+
+
+def test_cli_skips_template_scenarios_and_writes_results(isolated_app, tmp_path):
+    output = tmp_path / 'bench.json'
+    result = CliRunner().invoke(benchmark.main, [
+        '--backend', 'memory', '--users', '2', '--runs-per-user', '2', '--points', '30',
+        '--requests', '3', '--warmup', '1', '--scenario', 'dashboard', '--scenario', 'runs_page',
+        '--output', str(output)
+    ])
+
+    assert result.exit_code == 0, result.output
+    scenarios = json.loads(output.read_text())['scenarios']
+    assert 'skipped' in scenarios['dashboard']
+    assert scenarios['runs_page']['failed'] is False
+
+
+def test_cli_exits_non_zero_when_a_scenario_fails(isolated_app, tmp_path, monkeypatch):
+    def broken_scenarios(client, storage, rng, user_ids, points):
+        return {name: (lambda: 500) for name in benchmark.SCENARIOS}
+
+    monkeypatch.setattr(benchmark, 'build_scenarios', broken_scenarios)
+    result = CliRunner().invoke(benchmark.main, [
+        '--backend', 'memory', '--users', '1', '--runs-per-user', '1', '--points', '10',
+        '--requests', '2', '--warmup', '0', '--scenario', 'run_route', '--output', str(tmp_path / 'bench.json')
+    ])
+
+    assert result.exit_code != 0
+    assert 'run_route' in result.output
@@ -0,0 +1,164 @@
+# tests/test_connection.py
+import asyncio
+
+import fakeredis
+import pytest
+import redis
+
+import async_model
+import redis_connection
+from async_model import AsyncRunTrackerModel
+from conftest import add_run, runtracker
+from instrumentation import RequestStats, _current_stats, instrument_async_redis_client
+from redis_connection import CircuitBreaker, TrackedAsyncConnectionPool, TrackedConnectionPool
+
+# Port yang tidak pernah listen: koneksi langsung ditolak
+UNREACHABLE = {'host': '127.0.0.1', 'port': 1, 'socket_connect_timeout': 0.2}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(redis_connection.time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    fresh = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    for module in (redis_connection, runtracker, async_model):
+        monkeypatch.setattr(module, 'BREAKER', fresh)
+    return fresh
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()['times_opened'] == 1
+
+
+def test_half_open_admits_a_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert all(breaker.allow_request() for _ in range(3))
+
+
+def test_failed_probe_reopens_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=10)
+    for _ in range(5):
+        breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    clock[0] += 10
+    assert breaker.allow_request() and not breaker.allow_request()
+
+
+def test_lost_probe_is_replaced_after_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow_request()
+
+    clock[0] += 9
+    assert not breaker.allow_request()
+    clock[0] += 1
+    assert breaker.allow_request()
+
+
+def test_sync_pool_reports_connect_failures(breaker):
+    client = redis.Redis(connection_pool=TrackedConnectionPool(**UNREACHABLE))
+    failures_before = redis_connection.POOL_STATS['connect_failures']
+
+    with pytest.raises(redis.exceptions.ConnectionError):
+        client.ping()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert redis_connection.POOL_STATS['connect_failures'] > failures_before
+    assert runtracker.get_redis_client() is None
+
+
+def test_async_pool_reports_connect_failures(breaker):
+    async def ping():
+        client = redis.asyncio.Redis(connection_pool=TrackedAsyncConnectionPool(**UNREACHABLE))
+        try:
+            await client.ping()
+        finally:
+            await client.connection_pool.disconnect()
+
+    with pytest.raises(redis.exceptions.ConnectionError):
+        asyncio.run(ping())
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_async_model_fails_fast_while_breaker_open(breaker, redis_conn):
+    breaker.record_failure()
+
+    with pytest.raises(redis.exceptions.ConnectionError):
+        asyncio.run(_get_client())
+    assert asyncio.run(AsyncRunTrackerModel.get_user_runs_page(1)) is None
+    assert asyncio.run(AsyncRunTrackerModel.get_user_data(12345)) is None
+
+
+async def _get_client():
+    return async_model.get_async_redis()
+
+
+def test_async_client_commands_are_instrumented(fake_server):
+    async def scenario():
+        client = instrument_async_redis_client(fakeredis.aioredis.FakeRedis(server=fake_server, decode_responses=True))
+        await client.set('kunci', 'nilai')
+        pipe = client.pipeline(transaction=False)
+        pipe.get('kunci')
+        pipe.hset('hash', 'field', 1)
+        return await pipe.execute()
+
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+    try:
+        assert asyncio.run(scenario()) == ['nilai', 1]
+    finally:
+        _current_stats.reset(token)
+    assert stats.commands == {'SET': 1, 'GET': 1, 'HSET': 1}
+
+
+def test_connection_stats_endpoint(client):
+    body = client.get('/api/connection_stats').get_json()
+    assert 'probing' in body['redis']['breaker']
+
+
+def test_gathered_dashboard_shares_one_half_open_probe(breaker, clock, user_id, fake_server, monkeypatch):
+    add_run(user_id)
+    breaker.record_failure()
+    clock[0] += 10
+    monkeypatch.setattr(async_model, '_clients', {})
+    runtracker.RunTrackerModel.USER_CACHE.clear()
+
+    async def dashboard():
+        loop_id = id(asyncio.get_running_loop())
+        for binary in (False, True):
+            async_model._clients[(loop_id, binary)] = fakeredis.aioredis.FakeRedis(server=fake_server, decode_responses=not binary)
+        return await AsyncRunTrackerModel.get_dashboard(user_id)
+
+    result = asyncio.run(dashboard())
+    assert result['username'] == 'runner'
+    assert result['runs_page']['total'] == 1 and len(result['leaderboard']) == 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN and breaker.probing
@@ -0,0 +1,131 @@
+# tests/test_export.py
+import csv
+import gzip
+import io
+import json
+import zipfile
+
+import pytest
+
+from conftest import _reset_model_state, add_run, make_route, runtracker
+from run_import import iter_gpx_runs, iter_ndjson_runs
+
+RunTrackerModel = runtracker.RunTrackerModel
+
+
+@pytest.fixture
+def history(user_id):
+    return [
+        add_run(user_id, distance_km=1.0 + i, route=make_route(points=40 + i), timestamp=f'2026-10-{10 + i:02d}T06:00:00')
+        for i in range(5)
+    ]
+
+
+def export(client, user_id, query='', headers=None):
+    return client.get(f'/api/users/{user_id}/export?{query}', headers=headers or {})
+
+
+def csv_rows(data):
+    return list(csv.DictReader(io.StringIO(data.decode('utf-8'))))
+
+
+def test_csv_lists_runs_oldest_first(client, user_id, history):
+    response = export(client, user_id, 'format=csv')
+
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    assert response.headers['X-Export-Total'] == '5'
+    rows = csv_rows(response.data)
+    assert [int(row['run_id']) for row in rows] == history
+    assert [int(row['position']) for row in rows] == list(range(5))
+    assert float(rows[-1]['distance_km']) == 5.0
+
+
+def test_gzip_is_negotiated(client, user_id, history):
+    plain = export(client, user_id, 'format=csv').data
+    response = export(client, user_id, 'format=csv', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == plain
+    assert 'Content-Encoding' not in export(client, user_id, 'format=gpx', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_ndjson_round_trips_through_import(client, user_id, history):
+    lines = export(client, user_id, 'format=ndjson').data.decode('utf-8').splitlines()
+    records = [json.loads(line) for line in lines]
+
+    assert [record['run_id'] for record in records] == history
+    assert records[0]['route_data'] == RunTrackerModel.get_run_route(history[0])
+    imported = [record for _, record in iter_ndjson_runs(io.StringIO('\n'.join(lines)))]
+    assert [record['distance_km'] for record in imported] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_gpx_zip_has_one_track_per_run(client, user_id, history):
+    response = export(client, user_id, 'format=gpx')
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+
+    names = archive.namelist()
+    assert names == [f"{position:06d}-run-{run_id}.gpx" for position, run_id in enumerate(history)]
+    [(_, track)] = list(iter_gpx_runs(io.BytesIO(archive.read(names[2]))))
+    assert len(track['route_data']) == 42
+    assert track['duration_sec'] == 41 * 5
+
+
+def test_range_resumes_an_interrupted_export(client, user_id, history):
+    full = csv_rows(export(client, user_id, 'format=csv').data)
+
+    head = export(client, user_id, 'format=csv', headers={'Range': 'runs=0-1'})
+    tail = export(client, user_id, 'format=csv', headers={'Range': 'runs=2-'})
+    assert (head.status_code, tail.status_code) == (206, 206)
+    assert head.headers['Content-Range'] == 'runs 0-1/5' and tail.headers['Content-Range'] == 'runs 2-4/5'
+    assert csv_rows(head.data) + csv_rows(tail.data) == full
+
+    assert csv_rows(export(client, user_id, 'format=csv&start=3&end=3').data) == full[3:4]
+    # Range dengan unit lain diabaikan
+    assert export(client, user_id, 'format=csv', headers={'Range': 'bytes=0-10'}).status_code == 200
+
+
+def test_chunked_reads_match_a_single_chunk(user_id, history):
+    small = list(RunTrackerModel.iter_user_runs(user_id, 0, 4, with_routes=True, chunk_size=2))
+    large = list(RunTrackerModel.iter_user_runs(user_id, 0, 4, with_routes=True, chunk_size=100))
+    assert small == large and len(small) == 5
+
+
+def test_archived_routes_are_exported(client, user_id):
+    route = make_route(points=300)
+    run_id = add_run(user_id, route=route, timestamp='2025-01-01T06:00:00')
+    RunTrackerModel.archive_routes(older_than_days=90)
+
+    [record] = [json.loads(line) for line in export(client, user_id, 'format=ndjson').data.decode().splitlines()]
+    assert record['run_id'] == run_id
+    assert [point['time'] for point in record['route_data']] == [point['time'] for point in route]
+
+
+@pytest.mark.parametrize('query, headers, status', [
+    ('format=xlsx', {}, 400),
+    ('start=-1', {}, 400),
+    ('start=3&end=1', {}, 400),
+    ('start=abc', {}, 400),
+    ('', {'Range': 'runs=a-b'}, 416),
+    ('', {'Range': 'runs=9-'}, 416),
+])
+def test_invalid_export_requests(client, user_id, history, query, headers, status):
+    response = export(client, user_id, query, headers=headers)
+    assert response.status_code == status and response.get_json()['success'] is False
+
+
+def test_empty_history_exports_only_the_header(client, user_id):
+    response = export(client, user_id, 'format=csv')
+    assert response.status_code == 200 and csv_rows(response.data) == []
+
+
+def test_broken_archive_pointer_does_not_truncate_export(client, user_id, redis_conn):
+    route = make_route(points=300)
+    archived = add_run(user_id, route=route, timestamp='2025-01-01T06:00:00')
+    latest = add_run(user_id, route=make_route(points=40), timestamp='2026-10-10T06:00:00')
+    RunTrackerModel.archive_routes(older_than_days=90)
+    redis_conn.hset(RunTrackerModel.RUN_DETAIL.format(archived), 'route_archived', '7:0:10')
+    _reset_model_state()
+
+    records = [json.loads(line) for line in export(client, user_id, 'format=ndjson').data.decode().splitlines()]
+    assert [record['run_id'] for record in records] == [archived, latest]
+    assert [point['time'] for point in records[0]['route_data']] == [point['time'] for point in route]
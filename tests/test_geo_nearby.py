@@ -0,0 +1,120 @@
+# tests/test_geo_nearby.py
+import pytest
+
+from conftest import _reset_model_state, add_run, make_route, runtracker
+
+RunTrackerModel = runtracker.RunTrackerModel
+ORIGIN = (-6.2, 106.8)
+
+
+def run_at(user_id, lat, lng, distance_km=5.0, points=30):
+    return add_run(user_id, distance_km=distance_km, route=make_route(points=points, start=(lat, lng)))
+
+
+@pytest.fixture
+def spread(user_id):
+    """Run berjarak ~0 m, ~550 m, ~1.1 km dan ~110 km dari ORIGIN."""
+    lat, lng = ORIGIN
+    return {
+        'here': run_at(user_id, lat, lng, distance_km=3.0),
+        'near': run_at(user_id, lat + 0.005, lng, distance_km=8.0),
+        'mid': run_at(user_id, lat + 0.01, lng, distance_km=12.0),
+        'far': run_at(user_id, lat + 1.0, lng, distance_km=5.0),
+    }
+
+
+def ids(result):
+    return [run['run_id'] for run in result['runs']]
+
+
+def test_route_geo_points_start_end_and_center():
+    route = [{'lat': 0.0, 'lng': 0.0}, {'lat': 2.0, 'lng': 4.0}, {'lat': 1.0, 'lng': 1.0}]
+    assert RunTrackerModel._route_geo_points(route) == [(0.0, 0.0), (1.0, 1.0), (2.0, 1.0)]
+    assert RunTrackerModel._route_geo_points([]) is None
+    assert RunTrackerModel._route_geo_points([{'lat': 89.0, 'lng': 0.0}]) is None
+
+
+def test_radius_search_sorts_by_distance(spread):
+    result = RunTrackerModel.get_nearby_runs(*ORIGIN, radius_m=2000)
+
+    assert ids(result) == [spread['here'], spread['near'], spread['mid']]
+    distances = [run['distance_m'] for run in result['runs']]
+    assert distances == sorted(distances) and distances[0] < 1
+    assert result['next_cursor'] is None
+
+
+def test_box_search_sends_bybox(redis_conn, monkeypatch):
+    # fakeredis belum mendukung GEOSEARCH BYBOX; cukup periksa argumen yang dikirim
+    calls = []
+    monkeypatch.setattr(redis_conn, 'geosearch', lambda key, **kwargs: calls.append((key, kwargs)) or [])
+
+    result = RunTrackerModel.get_nearby_runs(*ORIGIN, width_m=400, height_m=1400, anchor='center')
+    assert result == {'anchor': 'center', 'runs': [], 'next_cursor': None}
+    key, kwargs = calls[0]
+    assert key == RunTrackerModel.RUN_GEO.format('center')
+    assert (kwargs['width'], kwargs['height'], kwargs['unit']) == (400, 1400, 'm')
+    assert 'radius' not in kwargs
+
+
+def test_distance_filters(spread):
+    filtered = RunTrackerModel.get_nearby_runs(*ORIGIN, radius_m=2000, min_km=5, max_km=10)
+    assert ids(filtered) == [spread['near']]
+
+
+def test_end_anchor_uses_last_point(user_id):
+    lat, lng = ORIGIN
+    # Rute 30 titik, langkah 0.0001 derajat: titik akhir ~320 m dari titik awal
+    run_id = run_at(user_id, lat, lng)
+
+    assert ids(RunTrackerModel.get_nearby_runs(lat + 0.0029, lng + 0.0035, radius_m=50, anchor='end')) == [run_id]
+    assert ids(RunTrackerModel.get_nearby_runs(lat + 0.0029, lng + 0.0035, radius_m=50, anchor='start')) == []
+
+
+def test_cursor_pages_cover_every_run_once(user_id):
+    lat, lng = ORIGIN
+    run_ids = [run_at(user_id, lat + i * 0.0005, lng) for i in range(7)]
+
+    seen = []
+    cursor = 0
+    while cursor is not None:
+        page = RunTrackerModel.get_nearby_runs(lat, lng, radius_m=5000, cursor=cursor, limit=3)
+        seen.extend(ids(page))
+        cursor = page['next_cursor']
+
+    assert seen == run_ids
+
+
+def test_rebuild_geo_index_restores_and_is_repeatable(spread, redis_conn):
+    for anchor in RunTrackerModel.GEO_ANCHORS:
+        redis_conn.delete(RunTrackerModel.RUN_GEO.format(anchor))
+    assert ids(RunTrackerModel.get_nearby_runs(*ORIGIN, radius_m=2000)) == []
+
+    assert RunTrackerModel.rebuild_geo_index(batch_size=2) == 4
+    assert RunTrackerModel.rebuild_geo_index(batch_size=2) == 4
+    assert redis_conn.zcard(RunTrackerModel.RUN_GEO.format('start')) == 4
+    _reset_model_state()
+    assert ids(RunTrackerModel.get_nearby_runs(*ORIGIN, radius_m=2000)) == [spread['here'], spread['near'], spread['mid']]
+
+
+def test_nearby_endpoint(client, spread):
+    body = client.get('/api/runs/nearby?lat=-6.2&lng=106.8&radius_m=700').get_json()
+    assert body['success'] and ids(body) == [spread['here'], spread['near']]
+
+
+@pytest.mark.parametrize('query', [
+    'lng=106.8',
+    'lat=-6.2&lng=106.8&anchor=middle',
+    'lat=89&lng=106.8',
+    'lat=-6.2&lng=106.8&radius_m=0',
+    'lat=-6.2&lng=106.8&width_m=100',
+    'lat=-6.2&lng=106.8&min_km=10&max_km=5',
+    'lat=-6.2&lng=106.8&cursor=-1',
+])
+def test_nearby_endpoint_rejects_bad_parameters(client, query):
+    response = client.get(f'/api/runs/nearby?{query}')
+    assert response.status_code == 400 and response.get_json()['success'] is False
+
+
+def test_nearby_endpoint_reports_redis_failure(client, monkeypatch):
+    monkeypatch.setattr(RunTrackerModel, 'get_redis_conn', staticmethod(lambda: None))
+    assert client.get('/api/runs/nearby?lat=-6.2&lng=106.8').status_code == 500
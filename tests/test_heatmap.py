@@ -0,0 +1,162 @@
+# tests/test_heatmap.py
+import pytest
+import redis
+
+import worker
+from conftest import add_run, make_route, runtracker
+from heatmap import TILE_BINS, route_tiles
+
+HeatmapModel = runtracker.HeatmapModel
+RunJobModel = runtracker.RunJobModel
+ROUTE = make_route(points=120)
+
+
+def tile_counts(redis_conn, tiles):
+    """{tile: {bin: hitungan}} untuk semua tile rute, tanpa field versi."""
+    counts = {}
+    for tile in tiles:
+        raw = redis_conn.hgetall(HeatmapModel.HEATMAP_TILE.format(*tile))
+        raw.pop(HeatmapModel.TILE_VERSION_FIELD, None)
+        counts[tile] = {int(index): int(value) for index, value in raw.items()}
+    return counts
+
+
+def assert_counted(redis_conn, times):
+    tiles = route_tiles(ROUTE)
+    for tile, bins in tiles.items():
+        assert tile_counts(redis_conn, [tile])[tile] == {int(index): times for index in bins}
+
+
+@pytest.fixture(params=[True, False], ids=['script', 'pipeline'])
+def scripting(request, monkeypatch):
+    monkeypatch.setattr(runtracker.RunTrackerModel, 'SCRIPTING_AVAILABLE', request.param)
+    return request.param
+
+
+def test_route_tiles_count_each_bin_once():
+    out_and_back = ROUTE + ROUTE[::-1]
+    tiles = route_tiles(out_and_back)
+
+    assert tiles.keys() == route_tiles(ROUTE).keys()
+    assert all(len(set(bins.tolist())) == len(bins) and bins.max() < TILE_BINS * TILE_BINS for bins in tiles.values())
+    assert route_tiles([]) == {}
+
+
+def test_add_route_is_counted_once(user_id, redis_conn, scripting, monkeypatch):
+    monkeypatch.setattr(runtracker.RunJobModel, 'process_run', staticmethod(lambda run_id, route_data=None: None))
+    run_id = add_run(user_id, route=ROUTE)
+
+    assert HeatmapModel.add_route(run_id) == len(route_tiles(ROUTE))
+    assert HeatmapModel.add_route(run_id) == 0
+    assert redis_conn.getbit(HeatmapModel.HEATMAP_INDEXED_RUNS, run_id) == 1
+    assert_counted(redis_conn, 1)
+
+    add_run(user_id, route=ROUTE)
+    HeatmapModel.add_route(run_id + 1)
+    assert_counted(redis_conn, 2)
+
+
+def test_failed_tile_write_leaves_no_trace_and_retry_counts_once(user_id, redis_conn, scripting):
+    tiles = list(route_tiles(ROUTE))
+    broken = HeatmapModel.HEATMAP_TILE.format(*tiles[-1])
+    redis_conn.set(broken, 'bukan hash')
+    run_id = add_run(user_id, route=ROUTE)
+
+    with pytest.raises(redis.exceptions.ResponseError):
+        HeatmapModel.add_route(run_id, route_data=ROUTE)
+    assert redis_conn.getbit(HeatmapModel.HEATMAP_INDEXED_RUNS, run_id) == 0
+    # Tipe tile diperiksa sebelum menulis apa pun, jadi tile lain juga belum tersentuh
+    assert all(not counts for counts in tile_counts(redis_conn, tiles[:-1]).values())
+
+    redis_conn.delete(broken)
+    assert HeatmapModel.add_route(run_id, route_data=ROUTE) == len(tiles)
+    assert HeatmapModel.add_route(run_id, route_data=ROUTE) == 0
+    assert_counted(redis_conn, 1)
+
+
+def test_failed_heatmap_job_stays_pending_until_retry_succeeds(user_id, redis_conn, monkeypatch):
+    monkeypatch.setattr(runtracker, 'POST_PROCESS_MODE', 'stream')
+    broken = HeatmapModel.HEATMAP_TILE.format(*next(iter(route_tiles(ROUTE))))
+    redis_conn.set(broken, 'bukan hash')
+    run_id = add_run(user_id, route=ROUTE)
+
+    RunJobModel.ensure_group(redis_conn)
+    job_worker = worker.JobWorker('test', processes=0, batch_size=10, block_ms=None)
+    [(_, entries)] = redis_conn.xreadgroup(RunJobModel.GROUP, 'test', {RunJobModel.STREAM: '>'}, count=10)
+    job_worker.handle(redis_conn, entries)
+
+    message_id = entries[0][0]
+    assert redis_conn.xpending(RunJobModel.STREAM, RunJobModel.GROUP)['pending'] == 1
+    assert 'WRONGTYPE' in redis_conn.hget(RunJobModel.ERRORS, message_id)
+    assert redis_conn.getbit(HeatmapModel.HEATMAP_INDEXED_RUNS, run_id) == 0
+
+    redis_conn.delete(broken)
+    job_worker.handle(redis_conn, entries)
+    assert redis_conn.xpending(RunJobModel.STREAM, RunJobModel.GROUP)['pending'] == 0
+    assert_counted(redis_conn, 1)
+
+
+def test_rebuild_recounts_every_run(user_id, redis_conn):
+    for _ in range(3):
+        add_run(user_id, route=ROUTE)
+    assert_counted(redis_conn, 3)
+
+    assert HeatmapModel.rebuild() == 3
+    assert_counted(redis_conn, 3)
+
+
+def heatmap_snapshot(redis_conn):
+    tiles = {key: redis_conn.hgetall(key) for key in redis_conn.scan_iter(match='heatmap:*:*:*')}
+    return tiles, redis_conn.get(HeatmapModel.HEATMAP_INDEXED_RUNS)
+
+
+def test_rebuild_keeps_runs_ingested_meanwhile(user_id, redis_conn, monkeypatch):
+    for _ in range(3):
+        add_run(user_id, route=ROUTE)
+    original = HeatmapModel._read_routes
+    added = []
+
+    def ingest_during_read(*args):
+        if not added:
+            added.append(add_run(user_id, route=ROUTE))
+        return original(*args)
+
+    monkeypatch.setattr(HeatmapModel, '_read_routes', staticmethod(ingest_during_read))
+    assert HeatmapModel.rebuild(batch_size=2) == 4
+    assert_counted(redis_conn, 4)
+    assert redis_conn.getbit(HeatmapModel.HEATMAP_INDEXED_RUNS, added[0]) == 1
+    assert list(redis_conn.scan_iter(match='heatmap_rebuild:*')) == []
+
+    during = heatmap_snapshot(redis_conn)
+    monkeypatch.setattr(HeatmapModel, '_read_routes', staticmethod(original))
+    HeatmapModel.rebuild()
+    assert heatmap_snapshot(redis_conn) == during
+
+
+def test_rebuild_drops_stale_tiles_and_leftovers(user_id, redis_conn):
+    add_run(user_id, route=ROUTE)
+    redis_conn.hset(HeatmapModel.HEATMAP_TILE.format(3, 1, 1), mapping={'5': 9, '_version': 9})
+    redis_conn.hset(HeatmapModel.REBUILD_TILE.format(3, 1, 1), '5', 9)
+
+    assert HeatmapModel.rebuild() == 1
+    assert not redis_conn.exists(HeatmapModel.HEATMAP_TILE.format(3, 1, 1))
+    assert list(redis_conn.scan_iter(match='heatmap_rebuild:*')) == []
+    assert_counted(redis_conn, 1)
+
+
+def test_tile_endpoint_uses_version_etag(client, user_id):
+    add_run(user_id, route=ROUTE)
+    zoom, x, y = next(iter(route_tiles(ROUTE)))
+    url = f'/api/heatmap/{zoom}/{x}/{y}.json'
+
+    response = client.get(url)
+    body = response.get_json()
+    assert body['version'] == 1 and body['max'] == 1 and body['pixels']
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    add_run(user_id, route=ROUTE)
+    again = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 200 and again.get_json()['max'] == 2
+
+    assert client.get('/api/heatmap/11/0/0.json').status_code == 400
+    assert client.get(f'/api/heatmap/10/{1 << 10}/0.json').status_code == 400
@@ -0,0 +1,140 @@
+# tests/test_http_cache.py
+import gzip
+import json
+
+import pytest
+
+import http_cache
+from conftest import _reset_model_state, add_run, asgi_get, make_route, runtracker
+from http_cache import choose_encoding, compress_payload, not_modified_encoding, run_etag
+
+RunTrackerModel = runtracker.RunTrackerModel
+ROUTE = make_route(points=300)
+
+
+@pytest.fixture
+def run_id(user_id):
+    return add_run(user_id, route=ROUTE)
+
+
+def route_url(run_id, query=''):
+    return f'/api/runs/{run_id}/route{query}'
+
+
+def etag_of(response):
+    return response.headers['ETag'].strip('"')
+
+
+def test_encoding_negotiation():
+    encoded = compress_payload(b'{"a":1}')
+    assert choose_encoding('gzip, deflate', encoded) == 'gzip'
+    assert choose_encoding('gzip;q=0', encoded) == 'identity'
+    assert choose_encoding(None, encoded) == 'identity'
+    assert http_cache.encoded_body(encoded, 'identity') == b'{"a":1}'
+
+    etag = run_etag(7, 'route', None, 2.5)
+    assert etag == f'run-7-s{http_cache.SCHEMA_VERSION}-route--2.5'
+    assert not_modified_encoding(f'"{etag}.gz"', etag) == 'gzip'
+    assert not_modified_encoding(f'W/"{etag}"', etag) == 'identity'
+    assert not_modified_encoding('"lain"', etag) is None
+
+
+def test_final_route_is_immutable_and_compressed(client, run_id):
+    plain = client.get(route_url(run_id))
+    compressed = client.get(route_url(run_id), headers={'Accept-Encoding': 'gzip'})
+
+    assert plain.headers.get('Content-Encoding') is None
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert etag_of(compressed) == etag_of(plain) + '.gz'
+    assert plain.headers['Cache-Control'] == f'public, max-age={http_cache.IMMUTABLE_MAX_AGE}, immutable'
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+    body = json.loads(plain.data)
+    assert body['success'] and body['run_id'] == run_id
+
+
+def test_conditional_get_skips_storage(client, run_id, monkeypatch):
+    etag = etag_of(client.get(route_url(run_id, '?max_points=50'), headers={'Accept-Encoding': 'gzip'}))
+
+    def unavailable():
+        raise AssertionError("storage tidak boleh dibaca untuk 304")
+
+    monkeypatch.setattr(runtracker, 'get_storage', unavailable)
+    response = client.get(route_url(run_id, '?max_points=50'), headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 304 and response.data == b''
+    assert response.headers['ETag'] == f'"{etag}"'
+    assert 'Content-Encoding' not in response.headers
+
+    # ETag varian gzip juga berlaku untuk klien tanpa kompresi
+    identity = client.get(route_url(run_id, '?max_points=50'), headers={'If-None-Match': f'"{etag}"', 'Accept-Encoding': ''})
+    assert identity.status_code == 304
+
+
+def test_different_parameters_have_different_etags(client, run_id):
+    full = client.get(route_url(run_id))
+    coarse = client.get(route_url(run_id, '?max_points=20'))
+
+    assert etag_of(full) != etag_of(coarse)
+    assert len(json.loads(coarse.data)['route_data']) <= 20
+    assert client.get(route_url(run_id, '?max_points=20'), headers={'If-None-Match': full.headers['ETag']}).status_code == 200
+
+
+def test_payload_is_compressed_once_and_reused(client, run_id, binary_conn, monkeypatch):
+    first = client.get(route_url(run_id), headers={'Accept-Encoding': 'gzip'})
+    [key] = binary_conn.scan_iter(match=f'run:{run_id}:route:payload:*')
+    assert 0 < binary_conn.ttl(key) <= RunTrackerModel.ROUTE_PAYLOAD_TTL
+
+    _reset_model_state()
+    monkeypatch.setattr(RunTrackerModel, 'get_route_for_display', staticmethod(lambda *args, **kwargs: None))
+    again = client.get(route_url(run_id), headers={'Accept-Encoding': 'gzip'})
+    assert again.status_code == 200 and again.data == first.data
+
+
+def test_route_pending_levels_is_not_cacheable(client, user_id, redis_conn, binary_conn, monkeypatch):
+    monkeypatch.setattr(runtracker, 'POST_PROCESS_MODE', 'stream')
+    run_id = add_run(user_id, route=ROUTE)
+
+    response = client.get(route_url(run_id))
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers and response.headers['Cache-Control'] == 'no-cache'
+    assert list(binary_conn.scan_iter(match=f'run:{run_id}:route:payload:*')) == []
+
+    runtracker.RunJobModel.process_run(run_id)
+    assert 'ETag' in client.get(route_url(run_id)).headers
+
+
+def test_route_errors(client):
+    assert client.get(route_url(999)).status_code == 404
+    assert client.get(route_url(1, '?max_points=abc')).status_code == 400
+    assert client.get(route_url(1, '?tolerance=x')).status_code == 400
+
+
+def test_not_modified_requires_an_existing_run(client, run_id, monkeypatch):
+    missing = run_etag(999, 'route', None, None)
+    assert client.get(route_url(999), headers={'If-None-Match': f'"{missing}"'}).status_code == 404
+    assert client.get(route_url(999), headers={'If-None-Match': '*'}).status_code == 404
+    assert client.get(route_url(run_id), headers={'If-None-Match': '*'}).status_code == 304
+
+    # Tanpa payload di RESPONSE_CACHE: cukup satu pemeriksaan route_is_final, rute tidak dibaca
+    _reset_model_state()
+    monkeypatch.setattr(RunTrackerModel, 'get_route_payload', staticmethod(lambda *args, **kwargs: None))
+    etag = run_etag(run_id, 'route', None, None)
+    assert client.get(route_url(run_id), headers={'If-None-Match': f'"{etag}.gz"'}).status_code == 304
+
+
+def test_predicted_etag_of_pending_run_is_not_honoured(client, user_id, monkeypatch):
+    monkeypatch.setattr(runtracker, 'POST_PROCESS_MODE', 'stream')
+    run_id = add_run(user_id, route=ROUTE)
+
+    response = client.get(route_url(run_id), headers={'If-None-Match': f'"{run_etag(run_id, "route", None, None)}"'})
+    assert response.status_code == 200 and 'ETag' not in response.headers
+
+
+def test_asgi_route_checks_run_before_not_modified(run_id, async_redis):
+    status, headers, body = asgi_get(route_url(run_id), headers=[('Accept-Encoding', 'gzip')])
+    assert status == 200 and headers['content-encoding'] == 'gzip'
+    etag = headers['etag']
+
+    _reset_model_state()
+    assert asgi_get(route_url(run_id), headers=[('If-None-Match', etag)])[0] == 304
+    assert asgi_get(route_url(999), headers=[('If-None-Match', '*')])[0] == 404
@@ -0,0 +1,86 @@
+# tests/test_import.py
+import io
+import json
+
+import pytest
+
+from conftest import make_route, runtracker
+from run_import import iter_gpx_runs, iter_ndjson_runs
+
+RunTrackerModel = runtracker.RunTrackerModel
+
+GPX = b"""<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1">
+  <metadata><name>Ekspor</name><time>2026-01-01T00:00:00Z</time></metadata>
+  <trk><name>Pagi</name><trkseg>
+    <trkpt lat="-6.2000" lon="106.8000"><time>2026-10-16T06:00:00Z</time></trkpt>
+    <trkpt lat="-6.2010" lon="106.8000"><time>2026-10-16T06:00:30Z</time></trkpt>
+    <trkpt lat="-6.2020" lon="106.8000"><time>2026-10-16T06:01:00Z</time></trkpt>
+  </trkseg></trk>
+  <trk><name>Kosong</name><trkseg></trkseg></trk>
+  <trk><trkseg>
+    <trkpt lat="-6.3" lon="106.9"/><trkpt lat="-6.301" lon="106.9"/>
+  </trkseg></trk>
+</gpx>
+"""
+
+
+def ndjson(*rows):
+    return io.StringIO('\n'.join(row if isinstance(row, str) else json.dumps(row) for row in rows))
+
+
+def test_gpx_tracks_become_records():
+    items = list(iter_gpx_runs(io.BytesIO(GPX)))
+
+    assert [index for index, _ in items] == [0, 1, 2]
+    first = items[0][1]
+    assert first['name'] == 'Pagi'
+    assert first['duration_sec'] == 60
+    assert first['timestamp'] is not None
+    assert isinstance(items[1][1], ValueError)
+    assert items[2][1]['route_data'] == [[-6.3, 106.9], [-6.301, 106.9]]
+
+
+def test_invalid_gpx_reports_error():
+    items = list(iter_gpx_runs(io.BytesIO(b'<gpx><trk>')))
+    assert isinstance(items[-1][1], ValueError)
+
+
+def test_ndjson_skips_blank_lines_and_reports_bad_rows():
+    items = list(iter_ndjson_runs(ndjson({'duration_sec': 60, 'route_data': []}, '', '[1, 2]', '{bad')))
+
+    assert items[0][1]['duration_sec'] == 60
+    assert [index for index, record in items if isinstance(record, Exception)] == [2, 3]
+
+
+@pytest.mark.parametrize('scripting', [True, False])
+def test_import_writes_runs_and_stats(user_id, redis_conn, monkeypatch, scripting):
+    monkeypatch.setattr(RunTrackerModel, 'SCRIPTING_AVAILABLE', scripting)
+    rows = [{'duration_sec': 600 + i, 'distance_km': 2.0, 'total_steps': 1000, 'route_data': make_route(40),
+             'timestamp': f'2026-10-{10 + i:02d}T06:00:00'} for i in range(5)]
+    report = RunTrackerModel.import_runs(user_id, iter_ndjson_runs(ndjson(*rows, {'duration_sec': 'x'})), chunk_size=2)
+
+    assert report['imported'] == 5
+    assert report['failed'] == 1 and report['errors'][0]['index'] == 5
+    stats = redis_conn.hgetall(RunTrackerModel.USER_STATS.format(user_id))
+    assert stats['run_count'] == '5'
+    assert int(stats['total_duration_sec']) == sum(row['duration_sec'] for row in rows)
+    assert redis_conn.llen(RunTrackerModel.USER_RUNS.format(user_id)) == 5
+
+
+def test_import_error_list_is_capped(user_id, monkeypatch):
+    monkeypatch.setattr(RunTrackerModel, 'IMPORT_MAX_ERRORS', 3)
+    records = ((index, ValueError('rusak')) for index in range(10))
+    report = RunTrackerModel.import_runs(user_id, records)
+
+    assert report['failed'] == 10
+    assert len(report['errors']) == 3
+
+
+def test_import_endpoint_streams_gpx(client, user_id, redis_conn):
+    response = client.post(f'/api/import?format=gpx&user_id={user_id}', data=GPX)
+    body = response.get_json()
+
+    assert body['success'] and body['imported'] == 2 and body['failed'] == 1
+    assert client.post('/api/import?format=csv', data=b'').status_code == 400
+    assert client.post('/api/import?user_id=abc', data=b'').status_code == 400
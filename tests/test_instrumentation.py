@@ -0,0 +1,122 @@
+# tests/test_instrumentation.py
+import json
+
+import fakeredis
+from flask import Flask
+
+import instrumentation
+from conftest import add_run, asgi_get, runtracker
+from instrumentation import (
+    HTTP_DURATION, REDIS_COMMANDS_PER_REQUEST, MetricsRegistry, RequestStats, _current_stats, init_app,
+    instrument_redis_client, timed
+)
+
+
+def test_histogram_renders_cumulative_buckets_and_escaped_labels():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latensi.', ('endpoint',), buckets=(0.1, 1.0))
+    counter = registry.counter('calls_total', 'Panggilan.', ('path',))
+    histogram.observe(0.05, 'a')
+    histogram.observe(0.5, 'a')
+    histogram.observe(3.0, 'a')
+    counter.inc('/x"y\n')
+
+    text = registry.render()
+    assert 'latency_seconds_bucket{endpoint="a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{endpoint="a",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{endpoint="a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{endpoint="a"} 3' in text
+    assert 'calls_total{path="/x\\"y\\n"} 1' in text
+
+
+def test_failing_collector_does_not_break_render():
+    registry = MetricsRegistry()
+    registry.add_collector(lambda: 1 / 0)
+    registry.add_collector(lambda: ['ok_metric 1'])
+
+    assert registry.render() == 'ok_metric 1\n'
+
+
+def test_instrumented_client_counts_commands_and_pipelines(fake_server):
+    client = instrument_redis_client(fakeredis.FakeRedis(server=fake_server, decode_responses=True))
+    assert instrument_redis_client(client) is client
+
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+    try:
+        client.set('kunci', 'nilai')
+        pipe = client.pipeline(transaction=False)
+        pipe.get('kunci')
+        pipe.hset('hash', 'field', 1)
+        pipe.execute()
+    finally:
+        _current_stats.reset(token)
+
+    assert stats.commands == {'SET': 1, 'GET': 1, 'HSET': 1}
+    assert stats.bytes_received >= len('nilai')
+    client.get('kunci')
+    assert sum(stats.commands.values()) == 3
+
+
+def test_timed_records_model_time_even_on_error():
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+
+    def broken():
+        raise ValueError('gagal')
+
+    try:
+        timed('Model.ok', lambda: 1)()
+        try:
+            timed('Model.broken', broken)()
+        except ValueError:
+            pass
+    finally:
+        _current_stats.reset(token)
+
+    assert set(stats.model_sec) == {'Model.ok', 'Model.broken'}
+
+
+def test_metrics_endpoint_reports_requests_and_redis_commands(client, user_id, redis_conn, monkeypatch):
+    instrument_redis_client(redis_conn)
+    add_run(user_id)
+
+    assert client.get(f'/api/runs?user_id={user_id}').status_code == 200
+    text = client.get('/metrics').get_data(as_text=True)
+
+    assert 'runtracker_http_request_duration_seconds_count{endpoint="api_runs",method="GET",status="200"}' in text
+    assert 'runtracker_redis_commands_per_request_count{endpoint="api_runs"}' in text
+    assert '# TYPE runtracker_cache_hits_total counter' in text
+    assert 'runtracker_cache_hits_total{cache="user_profiles"}' in text
+    assert '# TYPE runtracker_cache_evictions_total counter' in text
+    assert '# TYPE runtracker_cache_capacity gauge' in text
+    assert 'runtracker_cache_capacity{cache="run_summaries"} 50000' in text
+
+
+def test_slow_request_log_includes_redis_breakdown(capsys, fake_server):
+    app = Flask('slow')
+    client_redis = instrument_redis_client(fakeredis.FakeRedis(server=fake_server))
+    init_app(app, slow_request_ms=0)
+
+    @app.route('/lambat')
+    def lambat():
+        client_redis.ping()
+        return 'ok'
+
+    before = sum(value for key, value in instrumentation.SLOW_REQUESTS._values.items() if key == ('lambat',))
+    app.test_client().get('/lambat')
+
+    output = capsys.readouterr().out
+    assert 'SLOW REQUEST' in output and '"PING": 1' in output
+    assert instrumentation.SLOW_REQUESTS._values[('lambat',)] == before + 1
+
+
+def test_async_fast_path_records_request_metrics(user_id, async_redis):
+    add_run(user_id)
+    before = HTTP_DURATION._series.get(('api_runs', 'GET', '200'), [None, 0.0, 0])[2]
+    commands_before = REDIS_COMMANDS_PER_REQUEST._series.get(('api_runs',), [None, 0.0, 0])[2]
+
+    status, _, body = asgi_get('/api/runs', query=f'user_id={user_id}'.encode())
+    assert status == 200 and json.loads(body)['total'] == 1
+    assert HTTP_DURATION._series[('api_runs', 'GET', '200')][2] == before + 1
+    assert REDIS_COMMANDS_PER_REQUEST._series[('api_runs',)][2] == commands_before + 1
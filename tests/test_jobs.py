@@ -0,0 +1,98 @@
+# tests/test_jobs.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+import worker
+from conftest import add_run, make_route, runtracker
+
+RunJobModel = runtracker.RunJobModel
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def stream_mode(redis_conn, monkeypatch):
+    monkeypatch.setattr(runtracker, 'POST_PROCESS_MODE', 'stream')
+    monkeypatch.setattr(RunJobModel, 'RETRY_IDLE_MS', 0)
+
+
+@pytest.fixture
+def job_worker(redis_conn):
+    RunJobModel.ensure_group(redis_conn)
+    return worker.JobWorker('test', processes=0, batch_size=10, block_ms=None)
+
+
+def read_jobs(redis_conn):
+    response = redis_conn.xreadgroup(RunJobModel.GROUP, 'test', {RunJobModel.STREAM: '>'}, count=10)
+    return response[0][1] if response else []
+
+
+def test_queue_stats_is_read_only_without_stream_or_group(redis_conn):
+    stats = RunJobModel.queue_stats()
+
+    assert stats['stream_length'] == stats['pending'] == stats['backlog'] == stats['consumers'] == 0
+    assert stats['lag_seconds'] == stats['oldest_pending_seconds'] == 0.0
+    assert not redis_conn.exists(RunJobModel.STREAM)
+
+    RunJobModel.enqueue(redis_conn, [1, 2])
+    stats = RunJobModel.queue_stats()
+    assert (stats['stream_length'], stats['backlog'], stats['pending'], stats['consumers']) == (2, 2, 0, 0)
+    assert redis_conn.xinfo_groups(RunJobModel.STREAM) == []
+
+
+def test_stream_mode_defers_post_processing_to_worker(user_id, redis_conn, stream_mode, job_worker):
+    run_id = add_run(user_id, route=make_route(points=300))
+    assert redis_conn.hget(runtracker.RunTrackerModel.RUN_DETAIL.format(run_id), 'route_lod_points') == '300'
+    assert RunJobModel.queue_stats()['backlog'] == 1
+
+    entries = read_jobs(redis_conn)
+    assert RunJobModel.queue_stats()['pending'] == 1
+    job_worker.handle(redis_conn, entries)
+
+    stats = RunJobModel.queue_stats()
+    assert (stats['stream_length'], stats['pending'], stats['processed']) == (0, 0, 1)
+    assert ',' in redis_conn.hget(runtracker.RunTrackerModel.RUN_DETAIL.format(run_id), 'route_lod_points')
+
+
+def test_reprocessing_a_run_is_idempotent(user_id, redis_conn, stream_mode, job_worker):
+    run_id = add_run(user_id, route=make_route(points=120))
+    RunJobModel.process_run(run_id)
+    tiles = {key: redis_conn.hgetall(key) for key in redis_conn.scan_iter(match='heatmap:*:*:*')}
+
+    job_worker.handle(redis_conn, read_jobs(redis_conn))
+    assert {key: redis_conn.hgetall(key) for key in redis_conn.scan_iter(match='heatmap:*:*:*')} == tiles
+
+
+def test_failing_job_is_retried_then_dead_lettered(redis_conn, stream_mode, job_worker, monkeypatch):
+    monkeypatch.setattr(RunJobModel, 'MAX_ATTEMPTS', 2)
+    RunJobModel.enqueue(redis_conn, [404])
+
+    job_worker.handle(redis_conn, read_jobs(redis_conn))
+    stats = RunJobModel.queue_stats()
+    assert (stats['pending'], stats['failed']) == (1, 1)
+
+    job_worker.reclaim(redis_conn)
+    assert RunJobModel.queue_stats()['failed'] == 2
+    job_worker.reclaim(redis_conn)
+
+    stats = RunJobModel.queue_stats()
+    assert (stats['stream_length'], stats['pending'], stats['dead_letter_length'], stats['dead']) == (0, 0, 1, 1)
+    [(_, dead)] = redis_conn.xrange(RunJobModel.DEAD_LETTER)
+    assert dead['run_id'] == '404' and dead['attempts'] == '2' and 'LookupError' in dead['error']
+
+
+def test_job_stats_endpoint(client):
+    body = client.get('/api/jobs/stats').get_json()
+    assert body['success'] and body['mode'] == 'inline' and body['stream_length'] == 0
+
+
+@pytest.mark.parametrize('mode, registered', [('inline', False), ('stream', True)])
+def test_job_metrics_collector_only_in_stream_mode(mode, registered):
+    script = 'import app, instrumentation; print(app.job_metrics in instrumentation.REGISTRY._collectors)'
+    result = subprocess.run(
+        [sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, timeout=60,
+        env={**os.environ, 'POST_PROCESS_MODE': mode}
+    )
+    assert result.stdout.strip().splitlines()[-1] == str(registered), result.stderr
@@ -0,0 +1,139 @@
+# tests/test_key_schema.py
+import pytest
+from click.testing import CliRunner
+
+import key_schema
+from conftest import _reset_model_state, add_run, make_route, runtracker
+from key_schema import compact_number, encode_run_fields, username_index_key
+
+RunTrackerModel = runtracker.RunTrackerModel
+
+
+def seed_v1(redis_conn, users=3):
+    """Data tulisan skema v1: username string key, field run float panjang, jarak statistik dalam km."""
+    for user_id in range(1, users + 1):
+        redis_conn.set(key_schema.LEGACY_USERNAME_KEY.format(f'lama{user_id}'), user_id)
+        redis_conn.hset(key_schema.RUN_DETAIL.format(user_id), mapping={
+            'run_id': user_id, 'user_id': user_id, 'distance_km': '5.000000', 'average_pace': '5.25000',
+            'paused_time_sec': '0', 'splits_sec': '[]', 'best_1k_sec': ''
+        })
+        redis_conn.hset(key_schema.USER_STATS.format(user_id), mapping={
+            'run_count': 1, 'total_distance_km': '5.5', 'longest_run_km': '5.5'
+        })
+        redis_conn.hset(key_schema.USER_STATS_WEEKLY.format(user_id), '2026-W42:distance_km', '5.5')
+
+
+def payload_keys(binary_conn):
+    return list(binary_conn.scan_iter(match='run:*:route:payload:*'))
+
+
+@pytest.fixture
+def cached_payload(user_id, client, binary_conn):
+    """Run final yang payload rutenya sudah di-cache sebagai hash run:{id}:route:payload:{n}."""
+    run_id = add_run(user_id, route=make_route(points=300))
+    assert client.get(f'/api/runs/{run_id}/route').status_code == 200
+    assert payload_keys(binary_conn)
+    return run_id
+
+
+def test_compact_encoding():
+    assert compact_number('5.000000', 3) == '5'
+    assert compact_number(5.12345, 3) == '5.123'
+    assert compact_number(-0.0001, 2) == '0'
+    assert encode_run_fields({'distance_km': 5.0, 'paused_time_sec': 0, 'splits_sec': [300, 301]}) == {
+        'distance_km': '5', 'splits_sec': '[300,301]'
+    }
+
+
+def test_run_detail_key_pattern():
+    assert key_schema.RUN_DETAIL_KEY.match('run:42')
+    for key in ('run:42:route:payload:0', 'run:42:segments', 'run:abc', 'run:'):
+        assert not key_schema.RUN_DETAIL_KEY.match(key)
+
+
+def test_migration_converts_v1_keys(redis_conn):
+    seed_v1(redis_conn)
+    state = RunTrackerModel.migrate_schema(batch_size=2)
+
+    assert state['phase'] == 'done' and RunTrackerModel.get_schema_version() == 2
+    assert (state['usernames_converted'], state['runs_converted'], state['stats_converted']) == (3, 3, 6)
+    assert redis_conn.hget(username_index_key('lama2'), 'lama2') == '2'
+    assert not redis_conn.exists(key_schema.LEGACY_USERNAME_KEY.format('lama2'))
+    assert redis_conn.hgetall(key_schema.RUN_DETAIL.format(1)) == {
+        'run_id': '1', 'user_id': '1', 'distance_km': '5', 'average_pace': '5.25'
+    }
+    assert redis_conn.hgetall(key_schema.USER_STATS.format(1)) == {
+        'run_count': '1', 'total_distance_m': '5500', 'longest_run_m': '5500'
+    }
+    assert redis_conn.hgetall(key_schema.USER_STATS_WEEKLY.format(1)) == {'2026-W42:distance_m': '5500'}
+
+
+@pytest.mark.parametrize('scripting', [True, False], ids=['script', 'pipeline'])
+def test_migration_is_idempotent(redis_conn, monkeypatch, scripting):
+    monkeypatch.setattr(RunTrackerModel, 'SCRIPTING_AVAILABLE', scripting)
+    seed_v1(redis_conn)
+    RunTrackerModel.migrate_schema()
+    snapshot = {key: redis_conn.hgetall(key) for key in redis_conn.scan_iter(_type='hash') if key != key_schema.SCHEMA_MIGRATION_KEY}
+
+    assert RunTrackerModel.migrate_schema()['phase'] == 'done'
+    again = RunTrackerModel.migrate_schema(reset=True)
+    assert (again['usernames_converted'], again['runs_converted'], again['stats_converted']) == (0, 0, 0)
+    assert {key: redis_conn.hgetall(key) for key in snapshot} == snapshot
+
+
+def test_interrupted_migration_resumes_from_saved_cursor(redis_conn):
+    seed_v1(redis_conn, users=6)
+
+    def crash(state):
+        if state['phase'] == 'runs':
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        RunTrackerModel.migrate_schema(batch_size=2, progress=crash)
+    saved = redis_conn.hgetall(key_schema.SCHEMA_MIGRATION_KEY)
+    assert saved['phase'] == 'runs' and RunTrackerModel.get_schema_version() == 1
+
+    state = RunTrackerModel.migrate_schema(batch_size=2)
+    assert state['phase'] == 'done'
+    assert (int(state['usernames_converted']), int(state['runs_converted'])) == (6, 6)
+    assert all(redis_conn.hget(key_schema.RUN_DETAIL.format(i), 'distance_km') == '5' for i in range(1, 7))
+
+
+def test_run_scans_skip_route_payload_hashes(cached_payload, redis_conn):
+    state = RunTrackerModel.migrate_schema()
+    assert int(state['runs_scanned']) == 1
+
+    report = RunTrackerModel.schema_memory_report()
+    assert next(group for group in report['groups'] if group['name'] == 'runs')['keys'] == 1
+
+    assert RunTrackerModel.archive_routes(older_than_days=90)['scanned'] == 1
+    assert RunTrackerModel.rebuild_geo_index() == 1
+
+
+def test_archiving_drops_cached_payloads(user_id, client, binary_conn):
+    run_id = add_run(user_id, route=make_route(points=300), timestamp='2025-01-01T06:00:00')
+    before = client.get(f'/api/runs/{run_id}/route').get_json()
+    assert payload_keys(binary_conn)
+
+    assert RunTrackerModel.archive_routes(older_than_days=90)['archived'] == 1
+    assert payload_keys(binary_conn) == []
+    _reset_model_state()
+    assert client.get(f'/api/runs/{run_id}/route').get_json() == before
+
+
+def test_new_writes_are_already_v2(user_id, redis_conn):
+    run_id = add_run(user_id, distance_km=5.0, duration_sec=1500)
+    fields = redis_conn.hgetall(key_schema.RUN_DETAIL.format(run_id))
+
+    assert fields['distance_km'] == '5' and 'paused_time_sec' not in fields
+    assert redis_conn.hget(key_schema.USER_STATS.format(user_id), 'total_distance_m') == '5000'
+    assert RunTrackerModel.migrate_schema()['runs_converted'] == 0
+
+
+def test_cli_prints_progress_and_reports(redis_conn):
+    seed_v1(redis_conn, users=1)
+    result = CliRunner().invoke(runtracker.migrate_schema_command, ['--batch-size', '10'])
+
+    assert result.exit_code == 0, result.output
+    assert 'runs: 1 kunci diperiksa, 1 dikonversi.' in result.output
+    assert 'Migrasi selesai' in result.output
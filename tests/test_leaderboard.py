@@ -0,0 +1,43 @@
+# tests/test_leaderboard.py
+import json
+
+from conftest import add_run
+
+from app import RunTrackerModel
+
+
+def test_top_runs_by_distance_with_summaries(user_id):
+    other = RunTrackerModel.register_user('other', 'secret')
+    add_run(user_id, distance_km=5)
+    longest = add_run(other, distance_km=12)
+    add_run(user_id, distance_km=8)
+
+    leaderboard = RunTrackerModel.get_global_leaderboard(count=2)
+    assert [entry['distance'] for entry in leaderboard] == [12.0, 8.0]
+    assert leaderboard[0]['run_id'] == longest
+    assert leaderboard[0]['username'] == 'other'
+
+
+def test_top_n_is_cached_and_invalidated_by_add_run(user_id, redis_conn):
+    add_run(user_id, distance_km=5)
+    RunTrackerModel.get_global_leaderboard(count=5)
+    assert json.loads(redis_conn.get(RunTrackerModel.LEADERBOARD_CACHE))[0]['distance'] == 5.0
+
+    add_run(user_id, distance_km=9)
+    assert redis_conn.get(RunTrackerModel.LEADERBOARD_CACHE) is None
+    assert RunTrackerModel.get_global_leaderboard(count=5)[0]['distance'] == 9.0
+
+
+def test_missing_summaries_are_backfilled_once(user_id, redis_conn):
+    run_id = add_run(user_id, distance_km=7)
+    redis_conn.delete(RunTrackerModel.LEADERBOARD_SUMMARY, RunTrackerModel.LEADERBOARD_CACHE)
+
+    leaderboard = RunTrackerModel.get_global_leaderboard(count=5)
+    assert leaderboard[0]['run_id'] == run_id
+    assert redis_conn.hexists(RunTrackerModel.LEADERBOARD_SUMMARY, f"{user_id}:{run_id}")
+
+
+def test_leaderboard_larger_than_cache_bypasses_cache(user_id, redis_conn):
+    add_run(user_id, distance_km=4)
+    assert len(RunTrackerModel.get_global_leaderboard(count=RunTrackerModel.LEADERBOARD_CACHE_SIZE + 1)) == 1
+    assert redis_conn.get(RunTrackerModel.LEADERBOARD_CACHE) is None
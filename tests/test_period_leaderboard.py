@@ -0,0 +1,76 @@
+# tests/test_period_leaderboard.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import add_run, runtracker
+
+RunTrackerModel = runtracker.RunTrackerModel
+
+
+def test_runs_land_in_week_month_and_alltime(user_id, redis_conn):
+    now = datetime.now()
+    add_run(user_id, distance_km=5.0, timestamp=now.isoformat())
+    add_run(user_id, distance_km=3.0, timestamp=(now - timedelta(days=70)).isoformat())
+
+    assert RunTrackerModel.get_period_leaderboard('week')['top'][0]['distance_km'] == 5.0
+    assert RunTrackerModel.get_period_leaderboard('alltime')['top'][0]['distance_km'] == 8.0
+    old_month = RunTrackerModel._time_buckets((now - timedelta(days=70)).isoformat())[1]
+    assert RunTrackerModel.get_period_leaderboard('month', bucket=old_month)['top'][0]['distance_km'] == 3.0
+
+    week_key = RunTrackerModel._period_leaderboard_key('week')
+    assert 0 < redis_conn.ttl(week_key) <= RunTrackerModel.LEADERBOARD_WEEK_TTL
+
+
+def test_rank_and_neighbors_for_user(redis_conn):
+    user_ids = [RunTrackerModel.register_user(f'runner{i}', 'secret') for i in range(8)]
+    for index, uid in enumerate(user_ids):
+        add_run(uid, distance_km=float(index + 1))
+
+    board = RunTrackerModel.get_period_leaderboard('alltime', count=3, user_id=user_ids[2], neighbors=1)
+
+    assert [entry['username'] for entry in board['top']] == ['runner7', 'runner6', 'runner5']
+    assert board['total_members'] == 8
+    assert board['me']['rank'] == 6
+    assert [entry['rank'] for entry in board['me']['neighbors']] == [5, 6, 7]
+
+
+def test_user_without_runs_has_no_position(user_id):
+    board = RunTrackerModel.get_period_leaderboard('week', user_id=user_id)
+    assert board['me'] is None and board['top'] == []
+
+
+def test_rebuild_restores_period_leaderboards(user_id, redis_conn):
+    add_run(user_id, distance_km=4.0, timestamp=datetime.now().isoformat())
+    expected = RunTrackerModel.get_period_leaderboard('week', user_id=user_id)['me']['distance_km']
+    redis_conn.delete(RunTrackerModel._period_leaderboard_key('week'), RunTrackerModel._period_leaderboard_key('alltime'))
+
+    RunTrackerModel.rebuild_user_stats(user_id)
+    RunTrackerModel.rebuild_user_stats(user_id)
+    assert RunTrackerModel.get_period_leaderboard('week', user_id=user_id)['me']['distance_km'] == expected
+    assert RunTrackerModel.get_period_leaderboard('alltime', user_id=user_id)['me']['distance_km'] == expected
+
+
+def test_leaderboard_endpoint_validates_input(client, user_id):
+    add_run(user_id)
+
+    assert client.get('/api/leaderboards/year').status_code == 400
+    assert client.get('/api/leaderboards/week?count=abc').status_code == 400
+    assert client.get('/api/leaderboards/week?bucket=2026-10').status_code == 400
+    assert client.get('/api/leaderboards/month?bucket=2026-10:x').status_code == 400
+    assert client.get('/api/leaderboards/month?bucket=2026-10').status_code == 200
+    body = client.get(f'/api/leaderboards/alltime?user_id={user_id}').get_json()
+    assert body['success'] and body['me']['rank'] == 1
+
+
+@pytest.mark.parametrize('scripting', [True, False], ids=['script', 'pipeline'])
+def test_backdated_runs_do_not_revive_expired_period_boards(user_id, redis_conn, monkeypatch, scripting):
+    monkeypatch.setattr(RunTrackerModel, 'SCRIPTING_AVAILABLE', scripting)
+    old = datetime.now() - timedelta(days=3 * 365)
+    add_run(user_id, distance_km=6.0, timestamp=old.isoformat())
+
+    week_bucket, month_bucket = RunTrackerModel._time_buckets(old.isoformat())
+    assert not redis_conn.exists(RunTrackerModel._period_leaderboard_key('week', week_bucket))
+    assert not redis_conn.exists(RunTrackerModel._period_leaderboard_key('month', month_bucket))
+    assert RunTrackerModel.get_period_leaderboard('alltime')['top'][0]['distance_km'] == 6.0
+    assert RunTrackerModel.get_user_stats(user_id)['total_distance_km'] == 6.0
@@ -0,0 +1,89 @@
+# tests/test_read_cache.py
+import redis
+
+import read_cache
+from conftest import add_run, runtracker
+from read_cache import LRUTTLCache
+
+RunTrackerModel = runtracker.RunTrackerModel
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUTTLCache('test', maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 3 and stats['misses'] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(read_cache.time, 'monotonic', lambda: now[0])
+    cache = LRUTTLCache('test', ttl=10)
+    cache.set('a', 1)
+
+    now[0] += 9
+    assert cache.get('a') == 1
+    now[0] += 2
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_user_profile_served_from_cache(user_id, redis_conn, monkeypatch):
+    assert RunTrackerModel.get_user_data(user_id)['username'] == 'runner'
+
+    def no_reads(*args, **kwargs):
+        raise AssertionError("HGETALL tidak boleh dipanggil saat cache hit")
+
+    monkeypatch.setattr(redis_conn, 'hgetall', no_reads)
+    cached = RunTrackerModel.get_user_data(user_id)
+    cached['username'] = 'diubah'
+    # Salinan dikembalikan: mengubah hasil tidak mengotori cache
+    assert RunTrackerModel.get_user_data(user_id)['username'] == 'runner'
+
+
+def test_invalidation_is_broadcast_and_applied(user_id, redis_conn):
+    RunTrackerModel.get_user_data(user_id)
+    pubsub = redis_conn.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(RunTrackerModel.CACHE_INVALIDATION_CHANNEL)
+
+    redis_conn.hset(RunTrackerModel.USER_KEY.format(user_id), 'username', 'baru')
+    RunTrackerModel.invalidate_cached('user', user_id)
+
+    assert RunTrackerModel.get_user_data(user_id)['username'] == 'baru'
+    messages = [pubsub.get_message(timeout=0.1) for _ in range(3)]
+    assert f'user:{user_id}' in [message['data'] for message in messages if message]
+
+
+def test_remote_invalidation_message_evicts_entry(user_id):
+    run_id = add_run(user_id)
+    RunTrackerModel.get_run_summaries([run_id])
+    assert RunTrackerModel.RUN_SUMMARY_CACHE.get(str(run_id)) is not None
+
+    RunTrackerModel._handle_cache_invalidation(f'run:{run_id}'.encode())
+    assert RunTrackerModel.RUN_SUMMARY_CACHE.get(str(run_id)) is None
+
+
+def test_publish_failure_still_invalidates_locally(user_id, redis_conn, monkeypatch):
+    RunTrackerModel.get_user_data(user_id)
+
+    def broken_publish(*args, **kwargs):
+        raise redis.exceptions.ConnectionError("koneksi putus")
+
+    monkeypatch.setattr(redis_conn, 'publish', broken_publish)
+    RunTrackerModel.invalidate_cached('user', user_id)
+    assert RunTrackerModel.USER_CACHE.get(str(user_id)) is None
+
+
+def test_cache_stats_endpoint(client, user_id):
+    RunTrackerModel.get_user_data(user_id)
+    body = client.get('/api/cache_stats').get_json()
+
+    names = {cache['name'] for cache in body['caches']}
+    assert {'user_profiles', 'run_summaries'} <= names
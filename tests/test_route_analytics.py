@@ -0,0 +1,82 @@
+# tests/test_route_analytics.py
+import pytest
+
+from conftest import runtracker
+from route_analytics import analyze_route, haversine_m
+
+# 0.001 derajat lintang ~ 111.2 m
+STEP_M = 111.19
+
+
+def straight_route(points, interval=30, start_time=0, time_key='time'):
+    return [{'lat': -6.2 + i * 0.001, 'lng': 106.8, time_key: start_time + i * interval} for i in range(points)]
+
+
+def test_distance_and_splits_from_timestamps():
+    result = analyze_route(straight_route(40), duration_sec=0, total_steps=0)
+
+    assert result['distance_km'] == pytest.approx(39 * STEP_M / 1000, rel=1e-3)
+    assert len(result['splits_sec']) == 4
+    # 30 detik per 111 m -> ~270 detik per km
+    assert all(split == pytest.approx(270, abs=2) for split in result['splits_sec'])
+    assert result['best_1k_sec'] == pytest.approx(270, abs=2)
+    assert result['best_5k_sec'] is None
+
+
+def test_pause_excluded_from_moving_time_and_cadence():
+    route = straight_route(11)
+    # Berhenti 120 detik di titik terakhir
+    route.append({'lat': route[-1]['lat'], 'lng': 106.8, 'time': route[-1]['time'] + 120})
+
+    result = analyze_route(route, duration_sec=420, total_steps=900)
+
+    assert result['moving_time_sec'] == 300
+    assert result['paused_time_sec'] == 120
+    assert result['cadence_spm'] == pytest.approx(180.0)
+
+
+def test_millisecond_and_iso_times_match_seconds():
+    seconds = analyze_route(straight_route(20))
+    millis = analyze_route(straight_route(20, interval=30000, start_time=1_700_000_000_000))
+    iso = analyze_route([{'lat': p['lat'], 'lng': p['lng'], 'time': f"2026-10-16T06:{p['time'] // 60:02d}:{p['time'] % 60:02d}Z"}
+                         for p in straight_route(20)])
+
+    assert millis == seconds
+    assert iso == seconds
+
+
+def test_without_times_spreads_duration_over_distance():
+    route = [[-6.2 + i * 0.001, 106.8] for i in range(19)]
+    result = analyze_route(route, duration_sec=600)
+
+    assert result['moving_time_sec'] == 600
+    assert result['splits_sec'] and result['splits_sec'][0] == pytest.approx(600 * 1000 / (18 * STEP_M), abs=1)
+
+
+def test_short_routes_have_no_distance():
+    assert analyze_route([], duration_sec=60)['distance_km'] == 0.0
+    assert analyze_route([[-6.2, 106.8]])['point_count'] == 1
+    assert haversine_m([-6.2], [106.8]).size == 0
+
+
+def test_log_run_stores_server_computed_distance(client, user_id):
+    response = client.post('/api/log_run', json={
+        'user_id': user_id, 'duration_sec': 1350, 'distance_km': 99.0, 'total_steps': 4000,
+        'route_data': straight_route(46),
+    })
+    run_id = response.get_json()['run_id']
+
+    detail = runtracker.RunTrackerModel.get_run_detail(run_id)
+    assert detail['distance_km'] == pytest.approx(45 * STEP_M / 1000, rel=1e-3)
+    assert len(detail['splits_sec']) == 5
+    assert detail['best_1k_sec'] is not None
+
+
+def test_log_run_rejects_malformed_route(client, user_id):
+    response = client.post('/api/log_run', json={
+        'user_id': user_id, 'duration_sec': 60, 'distance_km': 1.0, 'total_steps': 10,
+        'route_data': [{'lat': -6.2}],
+    })
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
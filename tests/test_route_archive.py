@@ -0,0 +1,136 @@
+# tests/test_route_archive.py
+from datetime import datetime, timedelta
+
+import pytest
+from click.testing import CliRunner
+
+from conftest import _reset_model_state, add_run, make_route, runtracker
+from route_archive import RouteArchive
+
+RunTrackerModel = runtracker.RunTrackerModel
+ROUTE = make_route(points=300)
+
+
+def days_ago(days):
+    return (datetime.now() - timedelta(days=days)).isoformat()
+
+
+@pytest.fixture
+def runs(user_id):
+    return {
+        'old': add_run(user_id, route=ROUTE, timestamp=days_ago(200)),
+        'older': add_run(user_id, route=ROUTE, timestamp=days_ago(400)),
+        'recent': add_run(user_id, route=ROUTE, timestamp=days_ago(5)),
+    }
+
+
+def snapshot(run_id):
+    _reset_model_state()
+    return {
+        'route': RunTrackerModel.get_run_route(run_id),
+        'display': RunTrackerModel.get_route_for_display(run_id, max_points=50),
+        'detail_route': RunTrackerModel.get_run_detail(run_id)['route_data'],
+    }
+
+
+def route_keys(binary_conn, run_id):
+    return sorted(binary_conn.scan_iter(match=f"run:{run_id}:route*"))
+
+
+def test_archive_round_trip(tmp_path):
+    archive = RouteArchive(str(tmp_path), segment_max_bytes=64)
+    first = archive.append([(1, [b'a' * 40, b'b']), (2, [b'c' * 100])])
+    second = archive.append([(3, [b'd' * 10])])
+
+    assert archive.read(first[1]) == [b'a' * 40, b'b']
+    assert archive.read(first[2]) == [b'c' * 100]
+    assert archive.read(second[3]) == [b'd' * 10]
+    assert second[3].startswith('2:')
+    assert archive.locate(2) == first[2] and archive.locate(99) is None
+    assert archive.stats()['records'] == 3 and archive.stats()['segments'] == 2
+
+
+def test_growing_segment_is_remapped_once_and_old_mapping_closed(tmp_path):
+    archive = RouteArchive(str(tmp_path))
+    first = archive.append([(1, [b'a' * 40])])[1]
+    archive.read(first)
+    mapped = archive._maps[1]
+
+    second = archive.append([(2, [b'b' * 40])])[2]
+    assert archive.read(first) == [b'a' * 40] and archive._maps[1] is mapped
+    assert archive.read(second) == [b'b' * 40]
+    assert mapped.closed and archive._maps[1] is not mapped
+
+    remapped = archive._maps[1]
+    with pytest.raises(ValueError):
+        archive.read('1:0:100000')
+    assert archive._maps[1] is remapped and not remapped.closed
+    archive.close()
+    assert remapped.closed and archive._maps == {}
+
+
+def test_old_routes_move_to_disk_and_read_the_same(runs, binary_conn, redis_conn):
+    before = {name: snapshot(run_id) for name, run_id in runs.items()}
+
+    report = RunTrackerModel.archive_routes(older_than_days=90)
+    assert report['archived'] == 2 and report['redis_bytes_freed'] > 0
+    assert report['archive']['records'] == 2
+
+    for name in ('old', 'older'):
+        assert route_keys(binary_conn, runs[name]) == []
+        assert redis_conn.hget(RunTrackerModel.RUN_DETAIL.format(runs[name]), 'route_archived')
+    assert route_keys(binary_conn, runs['recent'])
+    assert {name: snapshot(run_id) for name, run_id in runs.items()} == before
+
+
+def test_dry_run_and_repeat_runs_change_nothing(runs, binary_conn):
+    keys = {run_id: route_keys(binary_conn, run_id) for run_id in runs.values()}
+
+    dry = RunTrackerModel.archive_routes(older_than_days=90, dry_run=True)
+    assert dry['archived'] == 2 and dry['archive']['records'] == 0
+    assert {run_id: route_keys(binary_conn, run_id) for run_id in runs.values()} == keys
+
+    assert RunTrackerModel.archive_routes(older_than_days=90)['archived'] == 2
+    assert RunTrackerModel.archive_routes(older_than_days=90)['archived'] == 0
+    assert RunTrackerModel.ROUTE_ARCHIVE.stats()['records'] == 2
+
+
+def test_orphan_record_from_interrupted_run_is_harmless(runs):
+    before = snapshot(runs['old'])
+    # Proses mati setelah segmen ditulis tetapi sebelum pointer disimpan: record yatim di arsip
+    RunTrackerModel.ROUTE_ARCHIVE.append([(runs['old'], [b'sisa'])])
+
+    assert RunTrackerModel.archive_routes(older_than_days=90)['archived'] == 2
+    assert snapshot(runs['old']) == before
+
+
+def test_broken_pointer_falls_back_to_index(runs, redis_conn):
+    before = snapshot(runs['old'])
+    RunTrackerModel.archive_routes(older_than_days=90)
+    redis_conn.hset(RunTrackerModel.RUN_DETAIL.format(runs['old']), 'route_archived', '7:0:10')
+
+    assert snapshot(runs['old']) == before
+
+
+def test_heatmap_rebuild_reads_archived_routes(runs, redis_conn):
+    HeatmapModel = runtracker.HeatmapModel
+
+    def tiles():
+        counts = {}
+        for key in redis_conn.scan_iter(match=HeatmapModel.HEATMAP_TILE.format('*', '*', '*')):
+            counts[key] = redis_conn.hgetall(key)
+            counts[key].pop(HeatmapModel.TILE_VERSION_FIELD, None)
+        return counts
+
+    before = tiles()
+    assert RunTrackerModel.archive_routes(older_than_days=90)['archived'] == 2
+    assert HeatmapModel.rebuild() == 3
+    assert tiles() == before
+
+
+def test_cli_reports_archived_routes(runs):
+    result = CliRunner().invoke(runtracker.archive_routes_command, ['--older-than-days', '300'])
+
+    assert result.exit_code == 0, result.output
+    assert '1 rute diarsip' in result.output
+    assert '1 record di 1 segmen' in result.output
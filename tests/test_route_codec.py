@@ -0,0 +1,90 @@
+# tests/test_route_codec.py
+import json
+
+import pytest
+
+from conftest import add_run, runtracker
+from route_codec import FLAG_EXTRA, FLAG_ISO_TIME, decode_route, encode_route, load_route, route_columns
+
+
+@pytest.mark.parametrize('route', [
+    [[-6.2, 106.8], [-6.200123, 106.800456]],
+    [[-6.2, 106.8, 0], [-6.200123, 106.800456, 5.5]],
+    [[-6.2, 106.8, 1700000000, 812.5, 141], [-6.200123, 106.800456, 1700000005, 813.0, 143]],
+    [{'lat': -6.2, 'lng': 106.8}, {'lat': -6.200123, 'lng': 106.800456}],
+    [{'lat': -6.2, 'lng': 106.8, 'timestamp': 0}, {'lat': -6.200123, 'lng': 106.800456, 'timestamp': 5}],
+    [{'latitude': -6.2, 'longitude': 106.8, 'time': 10}, {'latitude': -6.200123, 'longitude': 106.800456, 'time': 15}],
+    [{'lat': -6.2, 'lon': 106.8, 't': 1.25, 'ele': 12.5, 'hr': 140},
+     {'lat': -6.200123, 'lon': 106.800456, 't': 2.5, 'ele': 13.0, 'hr': 142}],
+    [{'lat': -6.2, 'lng': 106.8, 'time': '2026-10-16T06:00:00Z'},
+     {'lat': -6.200123, 'lng': 106.800456, 'time': '2026-10-16T06:00:05.250Z'}],
+    [],
+], ids=['list', 'list-time', 'list-extra', 'dict', 'dict-time', 'dict-alias', 'dict-extra', 'dict-iso', 'empty'])
+def test_round_trip_each_input_shape(route):
+    for compress in (True, False):
+        assert decode_route(encode_route(route, compress=compress)) == route
+
+
+def test_iso_time_converted_to_epoch_for_columns():
+    route = [{'lat': -6.2, 'lng': 106.8, 'time': '2026-10-16T13:00:00+07:00'},
+             {'lat': -6.2001, 'lng': 106.8001, 'time': '2026-10-16T06:00:10'}]
+    blob = encode_route(route)
+
+    assert blob[3] & FLAG_ISO_TIME
+    _, _, times = route_columns(route)
+    assert times[1] - times[0] == 10
+    # Offset zona waktu dinormalisasi ke UTC
+    assert decode_route(blob)[0]['time'] == '2026-10-16T06:00:00Z'
+
+
+def test_partial_times_and_extras_kept_without_time_column():
+    route = [{'lat': -6.2, 'lng': 106.8, 'time': 5, 'cadence': 170},
+             {'lat': -6.2001, 'lng': 106.8001}]
+    blob = encode_route(route)
+
+    assert blob[3] & FLAG_EXTRA
+    assert decode_route(blob) == route
+    assert route_columns(route)[2] is None
+
+
+def test_default_shapes_do_not_carry_extra_section():
+    blob = encode_route([{'lat': -6.2, 'lng': 106.8, 'timestamp': 1}])
+    assert not blob[3] & (FLAG_EXTRA | FLAG_ISO_TIME)
+
+
+@pytest.mark.parametrize('route, message', [
+    ([{'lng': 106.8}], 'tidak punya lat'),
+    ([{'lat': 'abc', 'lng': 106.8}], 'lat titik #0 bukan angka'),
+    ([[-6.2, 106.8], [-6.2]], 'titik #1 harus berisi minimal'),
+    ([[-6.2, 106.8, 'kemarin']], 'bukan angka atau ISO 8601'),
+    (['-6.2,106.8'], 'harus list'),
+])
+def test_invalid_points_raise_clear_error(route, message):
+    with pytest.raises(ValueError, match=message):
+        encode_route(route)
+
+
+def test_load_route_reads_legacy_json():
+    legacy = [{'lat': -6.2, 'lng': 106.8, 'time': '2024-01-01T00:00:00Z', 'hr': 150}]
+    assert load_route(json.dumps(legacy)) == legacy
+    assert load_route(None) == []
+
+
+def test_stored_run_keeps_extra_fields_and_iso_times(user_id):
+    route = [{'lat': -6.2 + i * 0.0001, 'lng': 106.8, 'time': f'2026-10-16T06:00:{i * 5:02d}Z', 'ele': 10 + i}
+             for i in range(10)]
+    run_id = add_run(user_id, distance_km=0.1, duration_sec=45, route=route)
+
+    stored = runtracker.RunTrackerModel.get_run_detail(run_id)['route_data']
+    assert [p['ele'] for p in stored] == [p['ele'] for p in route]
+    assert [p['time'] for p in stored] == [p['time'] for p in route]
+
+
+def test_log_run_rejects_invalid_route_with_message(client, user_id):
+    response = client.post('/api/log_run', json={
+        'user_id': user_id, 'duration_sec': 60, 'distance_km': 0.2, 'total_steps': 100,
+        'route_data': [{'lat': -6.2, 'lng': 106.8, 'time': 'kemarin'}, {'lat': -6.2001, 'lng': 106.8}],
+    })
+
+    assert response.status_code == 400
+    assert 'ISO 8601' in response.get_json()['message']
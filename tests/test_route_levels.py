@@ -0,0 +1,77 @@
+# tests/test_route_levels.py
+import numpy as np
+
+from conftest import add_run, make_route, runtracker
+from route_simplify import LOD_TOLERANCES_M, build_levels, project_local, rdp_indices, select_level
+
+RunTrackerModel = runtracker.RunTrackerModel
+
+
+def test_rdp_keeps_corner_and_drops_collinear_points():
+    x = np.array([0.0, 10.0, 20.0, 30.0, 30.0, 30.0])
+    y = np.array([0.0, 0.0, 0.0, 0.0, 10.0, 20.0])
+
+    assert list(rdp_indices(x, y, 1.0)) == [0, 3, 5]
+    assert list(rdp_indices(x[:2], y[:2], 1.0)) == [0, 1]
+
+
+def test_levels_shrink_and_keep_original_point_shape():
+    route = make_route(points=300)
+    levels = build_levels(route)
+
+    assert levels[0] is route
+    counts = [len(level) for level in levels]
+    assert counts == sorted(counts, reverse=True)
+    assert levels[-1][0] == route[0] and levels[-1][-1] == route[-1]
+    assert all(point in route for point in levels[1])
+
+
+def test_short_route_repeats_full_level():
+    route = make_route(points=2)
+    assert build_levels(route) == [route] * (len(LOD_TOLERANCES_M) + 1)
+    assert len(project_local([], [])[0]) == 0
+
+
+def test_select_level_prefers_most_detailed_within_limits():
+    counts = [500, 120, 40, 10]
+
+    assert select_level(counts) == 0
+    assert select_level(counts, max_points=100) == 2
+    assert select_level(counts, max_points=5) == 3
+    assert select_level(counts, tolerance=10.0) == 2
+    assert select_level(counts, tolerance=1000.0) == 3
+
+
+def test_stored_run_serves_level_by_max_points(user_id, redis_conn):
+    run_id = add_run(user_id, route=make_route(points=400))
+    lod_points = redis_conn.hget(RunTrackerModel.RUN_DETAIL.format(run_id), 'route_lod_points')
+    counts = [int(count) for count in lod_points.split(',')]
+
+    full = RunTrackerModel.get_route_for_display(run_id)
+    assert full['level'] == 0 and full['points'] == 400
+
+    limited = RunTrackerModel.get_route_for_display(run_id, max_points=counts[1])
+    assert limited['level'] == 1
+    assert limited['points'] == counts[1]
+    assert limited['tolerance_m'] == LOD_TOLERANCES_M[0]
+
+
+def test_store_route_levels_is_idempotent(user_id, redis_conn):
+    route = make_route(points=250)
+    run_id = add_run(user_id, route=route)
+    key = RunTrackerModel.RUN_DETAIL.format(run_id)
+    before = redis_conn.hget(key, 'route_lod_points')
+
+    assert RunTrackerModel.store_route_levels(run_id, route) == before
+    assert RunTrackerModel.store_route_levels(run_id, route) == before
+    stored = RunTrackerModel.get_run_route(run_id, 1)
+    assert [point['time'] for point in stored] == [point['time'] for point in build_levels(route)[1]]
+
+
+def test_route_endpoint_validates_parameters(client, user_id):
+    run_id = add_run(user_id)
+
+    assert client.get(f'/api/runs/{run_id}/route?max_points=abc').status_code == 400
+    assert client.get('/api/runs/999999/route').status_code == 404
+    body = client.get(f'/api/runs/{run_id}/route?max_points=20').get_json()
+    assert body['success'] and body['points'] <= 20
@@ -0,0 +1,49 @@
+# tests/test_run_history.py
+from conftest import add_run
+
+from app import RunTrackerModel
+
+
+def test_page_newest_first_with_cursor(user_id):
+    run_ids = [add_run(user_id, distance_km=3 + index) for index in range(7)]
+
+    first = RunTrackerModel.get_user_runs_page(user_id, limit=3)
+    assert [run['run_id'] for run in first['runs']] == run_ids[::-1][:3]
+    assert first['total'] == 7
+    assert first['next_cursor'] == 3
+
+    second = RunTrackerModel.get_user_runs_page(user_id, cursor=first['next_cursor'], limit=3)
+    third = RunTrackerModel.get_user_runs_page(user_id, cursor=second['next_cursor'], limit=3)
+    assert [run['run_id'] for run in second['runs'] + third['runs']] == run_ids[::-1][3:]
+    assert third['next_cursor'] is None
+
+
+def test_cursor_stable_when_run_added_while_paging(user_id):
+    run_ids = [add_run(user_id) for _ in range(5)]
+    first = RunTrackerModel.get_user_runs_page(user_id, limit=2)
+
+    add_run(user_id)
+    second = RunTrackerModel.get_user_runs_page(user_id, cursor=first['next_cursor'], limit=2)
+    assert [run['run_id'] for run in second['runs']] == [run_ids[2], run_ids[1]]
+
+
+def test_summaries_have_no_route_and_use_batched_reads(user_id, redis_conn, monkeypatch):
+    for _ in range(4):
+        add_run(user_id)
+    RunTrackerModel.RUN_SUMMARY_CACHE.clear()
+
+    calls = []
+    original = type(redis_conn).hgetall
+    monkeypatch.setattr(type(redis_conn), 'hgetall', lambda self, *args: calls.append(args) or original(self, *args))
+    page = RunTrackerModel.get_user_runs_page(user_id, limit=10)
+
+    assert len(page['runs']) == 4
+    assert all('route_data' not in run for run in page['runs'])
+    assert calls == []
+
+
+def test_empty_history_and_api_validation(client, user_id):
+    assert RunTrackerModel.get_user_runs_page(user_id) == {'runs': [], 'total': 0, 'next_cursor': None}
+    assert client.get(f'/api/runs?user_id={user_id}&cursor=-1').status_code == 400
+    assert client.get(f'/api/runs?user_id={user_id}&limit=x').status_code == 400
+    assert client.get(f'/api/runs?user_id={user_id}').json['success'] is True
@@ -0,0 +1,127 @@
+# tests/test_run_sessions.py
+import pytest
+import redis
+
+from conftest import make_route, runtracker
+
+RunSessionModel = runtracker.RunSessionModel
+RunTrackerModel = runtracker.RunTrackerModel
+
+
+@pytest.fixture
+def no_post_processing(monkeypatch):
+    monkeypatch.setattr(runtracker.RunJobModel, 'process_run', staticmethod(lambda run_id, route_data=None: None))
+
+
+def stream_route(session_id, route, batch=50):
+    for seq, start in enumerate(range(0, len(route), batch), start=1):
+        assert RunSessionModel.append_points(session_id, seq, route[start:start + batch])[0] == 'accepted'
+
+
+def run_count(redis_conn, user_id):
+    return int(redis_conn.hget(RunTrackerModel.USER_STATS.format(user_id), 'run_count') or 0)
+
+
+def test_streamed_points_become_one_run(user_id, redis_conn):
+    route = make_route(points=180)
+    session_id = RunSessionModel.start_session(user_id)
+    stream_route(session_id, route)
+
+    status, run_id = RunSessionModel.finish_session(session_id, 900, 2500)
+
+    assert status == 'finished'
+    assert [p['time'] for p in RunTrackerModel.get_run_route(run_id)] == [p['time'] for p in route]
+    assert RunSessionModel.get_session(session_id)['run_id'] == run_id
+    assert not redis_conn.exists(RunSessionModel.SESSION_POINTS.format(session_id))
+    assert RunSessionModel.finish_session(session_id, 900, 2500) == ('finished', run_id)
+    assert run_count(redis_conn, user_id) == 1
+
+
+def test_append_is_idempotent_and_rejects_gaps(user_id):
+    session_id = RunSessionModel.start_session(user_id)
+    batch = make_route(points=10)
+
+    assert RunSessionModel.append_points(session_id, 1, batch) == ('accepted', 1)
+    assert RunSessionModel.append_points(session_id, 1, batch) == ('duplicate', 1)
+    assert RunSessionModel.append_points(session_id, 3, batch) == ('gap', 1)
+    assert RunSessionModel.get_session(session_id)['point_count'] == 10
+    assert RunSessionModel.append_points(999, 1, batch) == ('not_found', 0)
+    with pytest.raises(ValueError):
+        RunSessionModel.append_points(session_id, 2, [])
+
+
+def test_failed_handoff_after_run_stored_does_not_duplicate(user_id, redis_conn, monkeypatch, no_post_processing):
+    session_id = RunSessionModel.start_session(user_id)
+    stream_route(session_id, make_route(points=100))
+
+    original_pipeline = redis_conn.pipeline
+    calls = []
+
+    def failing_once(*args, **kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise redis.exceptions.ConnectionError("koneksi putus")
+        return original_pipeline(*args, **kwargs)
+
+    monkeypatch.setattr(redis_conn, 'pipeline', failing_once)
+    assert RunSessionModel.finish_session(session_id, 600, 1500) == ('error', None)
+
+    session = RunSessionModel.get_session(session_id)
+    assert session['status'] == 'finishing'
+    assert run_count(redis_conn, user_id) == 1
+    # Run sudah tersimpan: sesi tidak dibuka kembali untuk titik baru
+    assert RunSessionModel.append_points(session_id, 3, make_route(points=5))[0] == 'closed'
+
+    status, run_id = RunSessionModel.finish_session(session_id, 600, 1500)
+    assert status == 'finished'
+    assert run_id == int(redis_conn.hget(RunSessionModel.SESSION_KEY.format(session_id), 'reserved_run_id'))
+    assert run_count(redis_conn, user_id) == 1
+    assert redis_conn.lrange(RunTrackerModel.USER_RUNS.format(user_id), 0, -1) == [str(run_id)]
+
+
+def test_failed_add_run_reopens_session_and_keeps_reserved_id(user_id, redis_conn, monkeypatch, no_post_processing):
+    session_id = RunSessionModel.start_session(user_id)
+    stream_route(session_id, make_route(points=60))
+
+    original_add_run = RunTrackerModel.add_run
+    failures = [True]
+
+    def add_run_failing_once(*args, **kwargs):
+        if failures:
+            failures.pop()
+            return None
+        return original_add_run(*args, **kwargs)
+
+    monkeypatch.setattr(RunTrackerModel, 'add_run', staticmethod(add_run_failing_once))
+    assert RunSessionModel.finish_session(session_id, 300, 800) == ('error', None)
+
+    session_key = RunSessionModel.SESSION_KEY.format(session_id)
+    reserved = int(redis_conn.hget(session_key, 'reserved_run_id'))
+    assert RunSessionModel.get_session(session_id)['status'] == 'active'
+    assert RunSessionModel.append_points(session_id, 3, make_route(points=5))[0] == 'accepted'
+    assert run_count(redis_conn, user_id) == 0
+
+    assert RunSessionModel.finish_session(session_id, 300, 800) == ('finished', reserved)
+    assert run_count(redis_conn, user_id) == 1
+
+
+@pytest.mark.parametrize('scripting', [True, False])
+def test_add_run_with_stored_run_id_is_noop(user_id, redis_conn, monkeypatch, no_post_processing, scripting):
+    monkeypatch.setattr(RunTrackerModel, 'SCRIPTING_AVAILABLE', scripting)
+    route = make_route(points=50)
+    run_id = RunTrackerModel.add_run(user_id, 300, 1.0, 5.0, route, 500)
+
+    assert RunTrackerModel.add_run(user_id, 300, 1.0, 5.0, route, 500, run_id=run_id) == run_id
+    assert run_count(redis_conn, user_id) == 1
+    assert redis_conn.llen(RunTrackerModel.USER_RUNS.format(user_id)) == 1
+
+
+def test_finish_endpoint_reports_status(client, user_id):
+    session_id = client.post('/api/run_sessions', json={'user_id': user_id}).get_json()['session_id']
+    client.post(f'/api/run_sessions/{session_id}/points', json={'seq': 1, 'points': make_route(points=20)})
+
+    assert client.post(f'/api/run_sessions/{session_id}/finish', json={}).status_code == 400
+    assert client.post('/api/run_sessions/999/finish', json={'duration_sec': 60, 'total_steps': 10}).status_code == 404
+    first = client.post(f'/api/run_sessions/{session_id}/finish', json={'duration_sec': 95, 'total_steps': 200}).get_json()
+    again = client.post(f'/api/run_sessions/{session_id}/finish', json={'duration_sec': 95, 'total_steps': 200}).get_json()
+    assert first['success'] and again['run_id'] == first['run_id']
@@ -0,0 +1,121 @@
+# tests/test_segments.py
+import pytest
+from click.testing import CliRunner
+
+from conftest import add_run, make_route, runtracker
+from segment_match import SegmentIndex
+
+SegmentModel = runtracker.SegmentModel
+ROUTE = make_route(points=200)
+# Segmen = titik 20..80 rute sintetis (~1 km); dengan interval 5 detik effort-nya 300 detik
+SEGMENT_POINTS = [[p['lat'], p['lng']] for p in ROUTE[20:81]]
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    monkeypatch.setattr(SegmentModel, '_index', None)
+    monkeypatch.setattr(SegmentModel, '_index_version', None)
+    monkeypatch.setattr(SegmentModel, '_index_checked_at', 0.0)
+
+
+@pytest.fixture
+def segment_id(redis_conn):
+    return SegmentModel.create_segment('Tanjakan', SEGMENT_POINTS)
+
+
+def test_index_matches_traversal_with_elapsed_time():
+    index = SegmentIndex([{'segment_id': 7, 'points': SEGMENT_POINTS}])
+    [effort] = index.match(ROUTE)
+
+    assert effort['segment_id'] == 7
+    assert (effort['start_index'], effort['end_index']) == (20, 80)
+    assert effort['elapsed_sec'] == 300
+
+
+@pytest.mark.parametrize('route', [
+    ROUTE[::-1],
+    ROUTE[:60],
+    make_route(points=200, start=(-6.3, 106.8)),
+    [{'lat': p['lat'], 'lng': p['lng']} for p in ROUTE],
+], ids=['reversed', 'partial', 'elsewhere', 'no-times'])
+def test_index_rejects_non_traversals(route):
+    assert SegmentIndex([{'segment_id': 1, 'points': SEGMENT_POINTS}]).match(route) == []
+
+
+def test_index_rejects_shortcut_outside_corridor():
+    # Rute melewati kedua ujung segmen, tetapi menyimpang ~110 m di tengahnya
+    detour = [dict(p) for p in ROUTE]
+    for point in detour[45:55]:
+        point['lng'] += 0.001
+    assert SegmentIndex([{'segment_id': 1, 'points': SEGMENT_POINTS}]).match(detour) == []
+
+
+@pytest.mark.parametrize('points, message', [
+    ([[0.0, 0.0]], 'titik'),
+    ([[0.0, 0.0], [0.0, 0.0001]], 'minimal'),
+    ([[95.0, 0.0], [0.0, 0.0]], 'jangkauan'),
+])
+def test_create_segment_validation(redis_conn, points, message):
+    with pytest.raises(ValueError, match=message):
+        SegmentModel.create_segment('x', points)
+
+
+def test_new_runs_are_matched_and_only_faster_efforts_replace_the_record(user_id, segment_id):
+    slow = add_run(user_id, route=make_route(points=200, interval=6))
+    fast = add_run(user_id, route=ROUTE)
+    slower_again = add_run(user_id, route=make_route(points=200, interval=7))
+
+    assert SegmentModel.get_run_segments(slow)[0]['personal_best'] is True
+    assert SegmentModel.get_run_segments(fast)[0]['personal_best'] is True
+    assert SegmentModel.get_run_segments(slower_again)[0]['personal_best'] is False
+
+    leaderboard = SegmentModel.get_segment_leaderboard(segment_id, user_id=user_id)
+    assert leaderboard['total_athletes'] == 1
+    assert leaderboard['top'][0]['elapsed_sec'] == 300 and leaderboard['top'][0]['run_id'] == fast
+    assert leaderboard['me'] == {'user_id': int(user_id), 'rank': 1, 'elapsed_sec': 300, 'run_id': fast}
+
+
+def test_rematching_a_run_is_idempotent(user_id, segment_id):
+    run_id = add_run(user_id, route=ROUTE)
+    before = SegmentModel.get_segment_leaderboard(segment_id)
+
+    [effort] = SegmentModel.match_run(run_id)
+    assert effort['personal_best'] is False
+    assert SegmentModel.get_segment_leaderboard(segment_id) == before
+
+
+def test_leaderboard_ranks_athletes(user_id, segment_id):
+    other = runtracker.RunTrackerModel.register_user('cepat', 'secret')
+    add_run(user_id, route=make_route(points=200, interval=6))
+    add_run(other, route=ROUTE)
+
+    leaderboard = SegmentModel.get_segment_leaderboard(segment_id, count=1, user_id=user_id)
+    assert [entry['username'] for entry in leaderboard['top']] == ['cepat']
+    assert leaderboard['me']['rank'] == 2 and leaderboard['total_athletes'] == 2
+
+
+def test_cli_matches_runs_logged_before_the_segment(user_id, redis_conn):
+    run_id = add_run(user_id, route=ROUTE)
+    assert SegmentModel.get_run_segments(run_id) == []
+
+    segment_id = SegmentModel.create_segment('Baru', SEGMENT_POINTS)
+    result = CliRunner().invoke(runtracker.match_segments_command, [])
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith('1 effort')
+    assert SegmentModel.get_segment_leaderboard(segment_id)['top'][0]['run_id'] == run_id
+
+
+def test_segment_endpoints(client, user_id):
+    response = client.post('/api/segments', json={'name': 'Tanjakan', 'points': SEGMENT_POINTS})
+    segment_id = response.get_json()['segment_id']
+    run_id = add_run(user_id, route=ROUTE)
+
+    detail = client.get(f'/api/segments/{segment_id}').get_json()
+    assert detail['efforts'] == 1 and detail['point_count'] == len(SEGMENT_POINTS)
+    assert client.get(f'/api/runs/{run_id}/segments').get_json()['efforts'][0]['segment_id'] == segment_id
+    assert client.get(f'/api/segments/{segment_id}/leaderboard?user_id={user_id}').get_json()['me']['rank'] == 1
+
+    assert client.get('/api/segments/999').status_code == 404
+    assert client.post('/api/segments', json={'name': 'x'}).status_code == 400
+    assert client.post('/api/segments', json={'name': 'x', 'points': [[0, 0]]}).status_code == 400
+    assert client.get(f'/api/segments/{segment_id}/leaderboard?count=abc').status_code == 400
@@ -0,0 +1,92 @@
+# tests/test_storage_backends.py
+import pytest
+
+from conftest import make_route, runtracker
+from storage import MemoryStorage, SQLiteStorage, page_bounds
+
+SUMMARY_KEYS = {'run_id', 'user_id', 'timestamp', 'duration_sec', 'distance_km', 'average_pace'}
+
+
+@pytest.fixture(params=['redis', 'memory', 'sqlite'])
+def storage(request, redis_conn, tmp_path):
+    if request.param == 'redis':
+        return runtracker.RedisStorage()
+    if request.param == 'memory':
+        return MemoryStorage()
+    return SQLiteStorage(str(tmp_path / 'runtracker.db'))
+
+
+def log_run(storage, user_id, distance_km, timestamp, points=60):
+    duration_sec = int(distance_km * 300)
+    return storage.add_run(user_id, duration_sec, distance_km, 5.0, make_route(points=points), 1000, timestamp=timestamp)
+
+
+def test_page_bounds():
+    assert page_bounds(0, None, 20) == (0, -1, None)
+    assert page_bounds(5, None, 2) == (3, 4, 2)
+    assert page_bounds(5, 2, 2) == (1, 2, 0)
+    assert page_bounds(5, 0, 2) == (0, 0, None)
+
+
+def test_users_and_duplicates(storage):
+    user_id = storage.register_user('runner', 'secret')
+
+    assert storage.register_user('runner', 'lain') == 'duplicate'
+    assert storage.find_user_by_username('runner')['username'] == 'runner'
+    assert storage.get_user_data(user_id)['username'] == 'runner'
+    assert storage.find_user_by_username('tidak-ada') is None
+
+
+def test_runs_round_trip_with_same_shape(storage):
+    user_id = storage.register_user('runner', 'secret')
+    run_id = log_run(storage, user_id, 3.0, '2026-10-16T06:00:00', points=300)
+
+    detail = storage.get_run_detail(run_id)
+    assert SUMMARY_KEYS <= set(detail)
+    assert detail['user_id'] == user_id and detail['route_level'] == 0
+    assert [p['time'] for p in detail['route_data']] == [p['time'] for p in make_route(points=300)]
+
+    display = storage.get_route_for_display(run_id, max_points=50)
+    assert display['level'] > 0 and display['points'] <= 50
+    assert storage.get_run_detail(999) is None
+    assert storage.get_route_for_display(999) is None
+    assert storage.get_route_payload(run_id)['encoded']['gzip']
+
+
+def test_history_paging_and_stats_agree(storage):
+    user_id = storage.register_user('runner', 'secret')
+    run_ids = [log_run(storage, user_id, km, f'2026-10-{day:02d}T06:00:00') for day, km in zip(range(10, 15), (1, 2, 3, 4, 5))]
+
+    first = storage.get_user_runs_page(user_id, limit=2)
+    second = storage.get_user_runs_page(user_id, cursor=first['next_cursor'], limit=2)
+    last = storage.get_user_runs_page(user_id, cursor=second['next_cursor'], limit=2)
+
+    assert [run['run_id'] for run in first['runs'] + second['runs'] + last['runs']] == run_ids[::-1]
+    assert last['next_cursor'] is None and first['total'] == 5
+
+    stats = storage.get_user_stats(user_id)
+    assert stats['run_count'] == 5
+    assert stats['total_distance_km'] == 15.0
+
+    leaderboard = storage.get_global_leaderboard(count=2)
+    assert [entry['run_id'] for entry in leaderboard] == [run_ids[4], run_ids[3]]
+    assert leaderboard[0]['username'] == 'runner'
+
+
+def test_sqlite_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'runtracker.db')
+    first = SQLiteStorage(path)
+    user_id = first.register_user('runner', 'secret')
+    run_id = log_run(first, user_id, 2.0, '2026-10-16T06:00:00')
+
+    reopened = SQLiteStorage(path)
+    assert reopened.get_run_detail(run_id)['distance_km'] == first.get_run_detail(run_id)['distance_km']
+    assert reopened.route_is_final(run_id)
+    assert not reopened.route_is_final(run_id + 1)
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setattr(runtracker, 'storage_instance', None)
+    monkeypatch.setattr(runtracker, 'STORAGE_BACKEND', 'cassandra')
+    with pytest.raises(ValueError, match='STORAGE_BACKEND'):
+        runtracker.get_storage()
@@ -0,0 +1,108 @@
+# tests/test_training.py
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import training_analytics
+from conftest import add_run, make_route, runtracker
+from training_analytics import RIEGEL_EXPONENT, analyze_training, append_columns, empty_columns
+
+TrainingModel = runtracker.TrainingModel
+TODAY = date(2026, 10, 16)
+EPOCH_DAY = (TODAY - date(1970, 1, 1)).days
+
+
+def columns_for(*runs):
+    """runs: (hari sebelum TODAY, km, detik); run_id = urutan."""
+    rows = [(EPOCH_DAY - ago + 0.25, km, sec, sec, run_id) for run_id, (ago, km, sec) in enumerate(runs, start=1)]
+    return append_columns(empty_columns(), rows)
+
+
+def reference_ewma(values, days):
+    state, result = 0.0, []
+    for value in values:
+        state += (value - state) / days
+        result.append(state)
+    return np.array(result)
+
+
+@pytest.mark.parametrize('length', [1, 10, 600])
+def test_vectorized_ewma_matches_the_recurrence(length):
+    values = np.random.default_rng(length).uniform(0, 150, length)
+    for days in (7, 42):
+        np.testing.assert_allclose(training_analytics._ewma(values, days), reference_ewma(values, days), rtol=1e-9, atol=1e-9)
+
+
+def test_append_keeps_columns_sorted_by_day():
+    columns = append_columns(columns_for((1, 5.0, 1500)), [(EPOCH_DAY - 10, 3.0, 900, 900, 9)])
+    assert columns['run_id'].tolist() == [9, 1]
+
+
+def test_empty_history():
+    result = analyze_training(empty_columns(), today=TODAY)
+    assert result['runs'] == 0 and result['series'] is None and result['predictions'] == {}
+
+
+def test_predictions_use_riegel_from_best_run():
+    result = analyze_training(columns_for((3, 5.0, 1500), (2, 10.0, 3600)), today=TODAY)
+
+    predictions = result['predictions']
+    assert predictions['10k'] == {'time_sec': round(1500 * 2 ** RIEGEL_EXPONENT), 'run_id': 1}
+    assert predictions['5k'] == {'time_sec': 1500, 'run_id': 1}
+
+
+def test_load_series_and_rolling_volume():
+    result = analyze_training(columns_for((8, 5.0, 1500), (3, 4.0, 1300), (0, 6.0, 1900)), today=TODAY)
+
+    series = result['series']
+    assert series['start_date'] == str(TODAY - timedelta(days=8))
+    assert series['rolling_7d_km'][-1] == 10.0
+    assert len(series['load']) == 9 and series['load'][0] > 0
+    assert result['load']['atl'] == series['atl'][-1] and result['load']['ctl'] == series['ctl'][-1]
+    # Beban hari ini belum masuk TSB hari ini
+    assert result['load']['tsb'] == round(series['ctl'][-2] - series['atl'][-2], 1)
+
+
+def test_future_and_invalid_runs_are_ignored():
+    result = analyze_training(columns_for((2, 5.0, 1500), (-3, 5.0, 1000), (1, 0.0, 600)), today=TODAY)
+    assert result['runs'] == 1
+
+
+def test_pace_trend_detects_improvement():
+    runs = [(60 - 7 * week, 8.0, 8.0 * (330 - 5 * week)) for week in range(8)]
+    trend = analyze_training(columns_for(*runs), today=TODAY)['pace_trend']
+
+    assert trend['runs'] == 8
+    assert trend['sec_per_km_per_week'] == pytest.approx(-5.0, abs=0.01)
+    assert trend['r2'] == pytest.approx(1.0)
+
+
+def test_summary_is_extended_incrementally(user_id, monkeypatch):
+    for ago in (10, 5):
+        add_run(user_id, distance_km=5.0, duration_sec=1500, route=make_route(points=30),
+                timestamp=f'{TODAY - timedelta(days=ago)}T06:00:00')
+    first = TrainingModel.get_training_summary(user_id, today=TODAY)
+    assert first['runs'] == 2
+
+    reads = []
+    original = runtracker.RunTrackerModel.iter_user_runs
+    monkeypatch.setattr(runtracker.RunTrackerModel, 'iter_user_runs',
+                        staticmethod(lambda uid, start, end, **kwargs: reads.append((start, end)) or original(uid, start, end, **kwargs)))
+    add_run(user_id, distance_km=10.0, duration_sec=3300, route=make_route(points=30),
+            timestamp=f'{TODAY - timedelta(days=1)}T06:00:00')
+    second = TrainingModel.get_training_summary(user_id, today=TODAY)
+
+    assert reads == [(2, 2)]
+    assert second['runs'] == 3
+    TrainingModel.COLUMN_CACHE.clear()
+    assert TrainingModel.get_training_summary(user_id, today=TODAY) == second
+
+
+def test_training_endpoint(client, user_id, monkeypatch):
+    add_run(user_id, timestamp=f'{date.today() - timedelta(days=1)}T06:00:00')
+    body = client.get(f'/api/users/{user_id}/training').get_json()
+    assert body['success'] and body['runs'] == 1 and body['user_id'] == user_id
+
+    monkeypatch.setattr(runtracker.RunTrackerModel, 'get_redis_conn', staticmethod(lambda: None))
+    assert client.get(f'/api/users/{user_id}/training').status_code == 500
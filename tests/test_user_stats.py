@@ -0,0 +1,91 @@
+# tests/test_user_stats.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import add_run, runtracker
+
+RunTrackerModel = runtracker.RunTrackerModel
+
+
+def recent(days_ago):
+    return (datetime.now() - timedelta(days=days_ago)).isoformat()
+
+
+@pytest.fixture
+def history(user_id):
+    runs = [(5.0, 1500, 0), (10.0, 3300, 1), (3.0, 840, 40)]
+    return [add_run(user_id, distance_km=km, duration_sec=sec, timestamp=recent(days)) for km, sec, days in runs]
+
+
+def test_totals_and_records_maintained_at_write_time(user_id, history):
+    stats = RunTrackerModel.get_user_stats(user_id)
+
+    assert stats['run_count'] == 3
+    assert stats['total_distance_km'] == 18.0
+    assert stats['total_duration_sec'] == 5640
+    assert stats['longest_run_km'] == 10.0 and stats['longest_run_id'] == history[1]
+    assert stats['fastest_pace_run_id'] == history[2]
+    assert stats['weekly'][0]['bucket'] == RunTrackerModel._time_buckets(recent(0))[0]
+    assert sum(bucket['runs'] for bucket in stats['monthly']) == 3
+
+
+def test_rebuild_matches_incremental_and_is_idempotent(user_id, history, redis_conn):
+    incremental = RunTrackerModel.get_user_stats(user_id)
+    redis_conn.delete(RunTrackerModel.USER_STATS.format(user_id))
+
+    assert RunTrackerModel.rebuild_user_stats(user_id, batch_size=2) == 3
+    assert RunTrackerModel.get_user_stats(user_id) == incremental
+    RunTrackerModel.rebuild_user_stats(user_id)
+    assert RunTrackerModel.get_user_stats(user_id) == incremental
+
+
+def test_legacy_kilometre_fields_are_summed(user_id, redis_conn):
+    add_run(user_id, distance_km=2.0, timestamp=recent(0))
+    redis_conn.hset(RunTrackerModel.USER_STATS.format(user_id), mapping={'total_distance_km': 1.5, 'longest_run_km': 4.0})
+
+    stats = RunTrackerModel.get_user_stats(user_id)
+    assert stats['total_distance_km'] == 3.5
+    assert stats['longest_run_km'] == 4.0
+
+
+def test_user_without_runs_has_empty_stats(user_id):
+    stats = RunTrackerModel.get_user_stats(user_id)
+
+    assert stats['run_count'] == 0 and stats['longest_run_id'] is None
+    assert all(bucket['runs'] == 0 for bucket in stats['weekly'])
+
+
+def test_stats_endpoint_and_rebuild_command(client, user_id, history):
+    body = client.get(f'/api/users/{user_id}/stats').get_json()
+    assert body['success'] and body['run_count'] == 3
+
+    result = runtracker.app.test_cli_runner().invoke(args=['rebuild-stats', '--user-id', str(user_id)])
+    assert result.exit_code == 0, result.output
+    assert client.get(f'/api/users/{user_id}/stats').get_json()['run_count'] == 3
+
+
+def test_rebuild_keeps_users_without_runs_off_the_alltime_board(user_id, redis_conn):
+    alltime_key = RunTrackerModel.PERIOD_LEADERBOARD.format('alltime')
+    redis_conn.zadd(alltime_key, {user_id: 0})
+
+    assert RunTrackerModel.rebuild_user_stats(user_id) == 0
+    assert redis_conn.zscore(alltime_key, user_id) is None
+
+
+def test_run_added_during_rebuild_is_not_lost(user_id, history, monkeypatch):
+    original = RunTrackerModel._aggregate_user_runs
+    reads = []
+
+    def concurrent_add(*args):
+        result = original(*args)
+        if not reads:
+            add_run(user_id, distance_km=7.0, duration_sec=2100, timestamp=recent(0))
+        reads.append(result[0]['run_count'])
+        return result
+
+    monkeypatch.setattr(RunTrackerModel, '_aggregate_user_runs', staticmethod(concurrent_add))
+    assert RunTrackerModel.rebuild_user_stats(user_id) == 4
+    assert reads == [3, 4]
+    stats = RunTrackerModel.get_user_stats(user_id)
+    assert stats['run_count'] == 4 and stats['total_distance_km'] == 25.0
@@ -0,0 +1,154 @@
+# training_analytics.py
+from datetime import date
+
+import numpy as np
+
+# Analitik latihan dari kolom ringkasan run (satu elemen per run, urut hari):
+#   day (hari sejak epoch, waktu lokal run), distance_km, duration_sec, moving_time_sec, run_id
+# Semua metrik dihitung sekaligus dengan operasi array, tanpa loop per run.
+ATL_DAYS = 7
+CTL_DAYS = 42
+# Panjang blok EWMA: faktor (1 - 1/ATL_DAYS)^-blok harus tetap jauh di bawah batas float64
+EWMA_BLOCK_DAYS = 256
+SERIES_DAYS = 84
+TREND_DAYS = 90
+PREDICTION_DAYS = 90
+MIN_TREND_KM = 1.0
+MIN_PREDICTION_KM = 3.0
+# Rumus Riegel: T2 = T1 * (D2 / D1) ^ 1.06
+RIEGEL_EXPONENT = 1.06
+RACE_DISTANCES_KM = {'5k': 5.0, '10k': 10.0, 'half_marathon': 21.0975, 'marathon': 42.195}
+# Kecepatan ambang = kecepatan lomba ~60 menit (dipakai untuk intensitas beban latihan)
+THRESHOLD_RACE_SEC = 3600.0
+COLUMNS = {
+    'day': np.float64, 'distance_km': np.float64, 'duration_sec': np.float64,
+    'moving_time_sec': np.float64, 'run_id': np.int64
+}
+EPOCH_DATE = date(1970, 1, 1)
+
+
+def empty_columns():
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+
+def append_columns(columns, rows):
+    """Menambahkan baris (day, distance_km, duration_sec, moving_time_sec, run_id); hasil tetap urut hari."""
+    if not rows:
+        return columns
+    fresh = zip(*rows)
+    merged = {
+        name: np.concatenate((columns[name], np.asarray(values, dtype=COLUMNS[name])))
+        for name, values in zip(COLUMNS, fresh)
+    }
+    # Run impor bisa bertanggal lebih lama dari run yang sudah ada
+    order = np.argsort(merged['day'], kind='stable')
+    return {name: values[order] for name, values in merged.items()}
+
+
+def _iso_date(day):
+    return str(np.datetime64(int(day), 'D'))
+
+
+def _ewma(values, days):
+    """EWMA model Banister (y_t = y_t-1 + (x_t - y_t-1) / days) secara vektor, per blok untuk stabilitas numerik."""
+    decay = 1.0 - 1.0 / days
+    result = np.empty_like(values)
+    state = 0.0
+    for begin in range(0, len(values), EWMA_BLOCK_DAYS):
+        block = values[begin:begin + EWMA_BLOCK_DAYS]
+        steps = np.arange(len(block))
+        powers = decay ** steps
+        result[begin:begin + len(block)] = decay ** (steps + 1) * state + (1.0 - decay) * powers * np.cumsum(block / powers)
+        state = result[begin + len(block) - 1]
+    return result
+
+
+def _race_predictions(distance_km, time_sec, run_ids):
+    """Prediksi Riegel terbaik per jarak lomba dari semua run sekaligus (matriks run x jarak)."""
+    if not len(distance_km):
+        return {}
+    targets = np.fromiter(RACE_DISTANCES_KM.values(), dtype=np.float64)
+    predicted = time_sec[:, None] * (targets[None, :] / distance_km[:, None]) ** RIEGEL_EXPONENT
+    best = np.argmin(predicted, axis=0)
+    return {
+        race: {'time_sec': int(round(predicted[best[index], index])), 'run_id': int(run_ids[best[index]])}
+        for index, race in enumerate(RACE_DISTANCES_KM)
+    }
+
+
+def _pace_trend(days, distance_km, time_sec):
+    """Regresi linear berbobot jarak dari pace (menit/km) terhadap hari."""
+    if len(days) < 3 or np.ptp(days) < 1:
+        return None
+    pace = time_sec / 60.0 / distance_km
+    weights = distance_km / distance_km.sum()
+    mean_day, mean_pace = weights @ days, weights @ pace
+    slope = (weights @ ((days - mean_day) * (pace - mean_pace))) / (weights @ (days - mean_day) ** 2)
+    fitted = mean_pace + slope * (days - mean_day)
+    total = weights @ (pace - mean_pace) ** 2
+    return {
+        'runs': int(len(days)),
+        'sec_per_km_per_week': round(float(slope * 60.0 * 7.0), 2),
+        'current_pace': round(float(mean_pace + slope * (days.max() - mean_day)), 2),
+        'r2': round(float(1.0 - (weights @ (pace - fitted) ** 2) / total), 3) if total > 0 else 0.0
+    }
+
+
+def analyze_training(columns, today=None):
+    """
+    Volume mingguan bergulir, beban latihan (ATL/CTL/TSB), tren pace dan prediksi waktu lomba.
+    Beban per run = jam bergerak * IF^2 * 100 (rTSS), IF = kecepatan run / kecepatan ambang.
+    """
+    today = ((today or date.today()) - EPOCH_DATE).days
+    day, distance_km = columns['day'], columns['distance_km']
+    time_sec = np.where(columns['moving_time_sec'] > 0, columns['moving_time_sec'], columns['duration_sec'])
+    valid = (distance_km > 0) & (time_sec > 0) & (day < today + 1)
+    day, distance_km, time_sec, run_ids = day[valid], distance_km[valid], time_sec[valid], columns['run_id'][valid]
+
+    result = {
+        'runs': int(len(day)),
+        'today': _iso_date(today),
+        'load': {'atl': 0.0, 'ctl': 0.0, 'tsb': 0.0},
+        'series': None,
+        'pace_trend': None,
+        'predictions': {}
+    }
+    if not len(day):
+        return result
+
+    recent = day >= today - PREDICTION_DAYS
+    racing = (distance_km >= MIN_PREDICTION_KM) & (recent if recent.any() else True)
+    result['predictions'] = _race_predictions(distance_km[racing], time_sec[racing], run_ids[racing])
+
+    # Kecepatan ambang dari performa terbaik (jarak yang bisa ditempuh dalam THRESHOLD_RACE_SEC)
+    speed = distance_km / time_sec
+    pool = racing if racing.any() else np.ones(len(day), dtype=bool)
+    threshold = np.max(distance_km[pool] * (THRESHOLD_RACE_SEC / time_sec[pool]) ** (1.0 / RIEGEL_EXPONENT)) / THRESHOLD_RACE_SEC
+    intensity = np.clip(speed / threshold, 0.3, 1.5)
+    load = time_sec / 3600.0 * intensity ** 2 * 100.0
+
+    first = int(np.floor(day.min()))
+    length = today - first + 1
+    index = np.floor(day).astype(np.int64) - first
+    daily_load = np.bincount(index, weights=load, minlength=length)
+    daily_km = np.bincount(index, weights=distance_km, minlength=length)
+    atl = _ewma(daily_load, ATL_DAYS)
+    ctl = _ewma(daily_load, CTL_DAYS)
+    # TSB hari ini memakai ATL/CTL kemarin (kesegaran sebelum latihan hari ini)
+    tsb = np.concatenate(([0.0], ctl[:-1] - atl[:-1]))
+    rolling_km = np.convolve(daily_km, np.ones(7))[:length]
+
+    tail = slice(max(length - SERIES_DAYS, 0), length)
+    result['load'] = {'atl': round(float(atl[-1]), 1), 'ctl': round(float(ctl[-1]), 1), 'tsb': round(float(tsb[-1]), 1)}
+    result['series'] = {
+        'start_date': _iso_date(first + tail.start),
+        'load': np.round(daily_load[tail], 1).tolist(),
+        'atl': np.round(atl[tail], 1).tolist(),
+        'ctl': np.round(ctl[tail], 1).tolist(),
+        'tsb': np.round(tsb[tail], 1).tolist(),
+        'rolling_7d_km': np.round(rolling_km[tail], 2).tolist()
+    }
+
+    trending = (day >= today - TREND_DAYS) & (distance_km >= MIN_TREND_KM)
+    result['pace_trend'] = _pace_trend(day[trending], distance_km[trending], time_sec[trending])
+    return result
@@ -0,0 +1,137 @@
+# worker.py
+"""
+Worker job pasca-simpan run (POST_PROCESS_MODE=stream):
+
+    python worker.py --processes 4
+
+Proses utama membaca jobs:runs lewat consumer group (XREADGROUP), lalu tahap CPU-bound
+(simplifikasi RDP, pencocokan segmen, binning heatmap) dijalankan di multiprocessing.Pool
+agar pemrosesan memakai semua core. Job sukses di-ACK; job gagal tetap pending, diklaim ulang
+setelah RunJobModel.RETRY_IDLE_MS dan dipindah ke dead-letter setelah MAX_ATTEMPTS pengiriman.
+Beberapa worker (di host mana pun) boleh berjalan bersamaan dengan nama consumer berbeda.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+import click
+
+import app as runtracker
+from app import RunJobModel
+
+
+def process_job(job):
+    """Dijalankan di proses pool; mengembalikan (message_id, None) atau (message_id, pesan error)."""
+    message_id, run_id = job
+    try:
+        RunJobModel.process_run(int(run_id))
+        return message_id, None
+    except Exception as e:
+        return message_id, f"{type(e).__name__}: {e}"
+
+
+class JobWorker:
+
+    def __init__(self, consumer, processes, batch_size, block_ms):
+        self.consumer = consumer
+        self.processes = processes
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.running = True
+        self.pool = None
+        self.last_reclaim = 0.0
+
+    def stop(self, *_):
+        print(f"Worker {self.consumer}: berhenti setelah batch berjalan selesai.")
+        self.running = False
+
+    def run(self):
+        redis_conn = runtracker.get_redis_client()
+        if not redis_conn:
+            raise click.ClickException("Koneksi Redis gagal.")
+        RunJobModel.ensure_group(redis_conn)
+
+        if self.processes > 0:
+            self.pool = multiprocessing.Pool(self.processes)
+        print(f"Worker {self.consumer}: {self.processes or 'tanpa'} proses pool, membaca {RunJobModel.STREAM}.")
+        try:
+            while self.running:
+                if time.monotonic() - self.last_reclaim >= RunJobModel.RETRY_IDLE_MS / 2000:
+                    self.reclaim(redis_conn)
+                    self.last_reclaim = time.monotonic()
+
+                response = redis_conn.xreadgroup(
+                    RunJobModel.GROUP, self.consumer, {RunJobModel.STREAM: '>'},
+                    count=self.batch_size, block=self.block_ms
+                )
+                for _, entries in response or []:
+                    self.handle(redis_conn, entries)
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+
+    def handle(self, redis_conn, entries):
+        jobs = [(message_id, fields.get('run_id')) for message_id, fields in entries]
+        started = time.perf_counter()
+        if self.pool is not None:
+            results = self.pool.map(process_job, jobs)
+        else:
+            results = [process_job(job) for job in jobs]
+
+        done = [message_id for message_id, error in results if error is None]
+        failures = {message_id: error for message_id, error in results if error is not None}
+        if done:
+            RunJobModel.ack(redis_conn, done)
+        if failures:
+            RunJobModel.record_failures(redis_conn, failures)
+            for message_id, error in failures.items():
+                print(f"Worker {self.consumer}: job {message_id} gagal: {error}")
+        print(f"Worker {self.consumer}: {len(done)} job selesai, {len(failures)} gagal "
+              f"dalam {time.perf_counter() - started:.3f} detik.")
+
+    def reclaim(self, redis_conn):
+        """Mengklaim job yang idle > RETRY_IDLE_MS (gagal atau worker-nya mati); yang sudah habis jatah ke dead-letter."""
+        pending = redis_conn.xpending_range(
+            RunJobModel.STREAM, RunJobModel.GROUP, '-', '+', self.batch_size, idle=RunJobModel.RETRY_IDLE_MS
+        )
+        if not pending:
+            return
+
+        attempts = {entry['message_id']: entry['times_delivered'] for entry in pending}
+        expired = [message_id for message_id, count in attempts.items() if count >= RunJobModel.MAX_ATTEMPTS]
+        retry = [message_id for message_id, count in attempts.items() if count < RunJobModel.MAX_ATTEMPTS]
+
+        if expired:
+            entries = redis_conn.xclaim(
+                RunJobModel.STREAM, RunJobModel.GROUP, self.consumer, RunJobModel.RETRY_IDLE_MS, expired
+            )
+            RunJobModel.dead_letter(redis_conn, [entry for entry in entries if entry[1]], attempts)
+            print(f"Worker {self.consumer}: {len(entries)} job dipindah ke {RunJobModel.DEAD_LETTER}.")
+        if retry:
+            entries = redis_conn.xclaim(
+                RunJobModel.STREAM, RunJobModel.GROUP, self.consumer, RunJobModel.RETRY_IDLE_MS, retry
+            )
+            entries = [entry for entry in entries if entry[1]]
+            if entries:
+                self.handle(redis_conn, entries)
+
+
+@click.command()
+@click.option('--processes', default=os.cpu_count() or 1, show_default=True,
+              help='Ukuran multiprocessing pool (0 = proses di proses utama).')
+@click.option('--batch-size', default=32, show_default=True, help='Job per XREADGROUP.')
+@click.option('--block-ms', default=5000, show_default=True, help='Lama menunggu job baru per XREADGROUP.')
+@click.option('--consumer', default=None, help='Nama consumer (default: host-pid).')
+def main(processes, batch_size, block_ms, consumer):
+    """Menjalankan worker job pasca-simpan run."""
+    worker = JobWorker(consumer or f"{socket.gethostname()}-{os.getpid()}", processes, batch_size, block_ms)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()